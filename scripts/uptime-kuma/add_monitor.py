@@ -3,13 +3,36 @@
 Add a new monitor to Uptime Kuma using the uptime-kuma-api wrapper.
 
 Reads JSON from stdin and outputs JSON to stdout.
+
+Batch mode: pass a JSON array of monitors (or {"items": [...], "concurrency": 4})
+to add them all over one authenticated session. The output then has a
+per-item "results" array and "batch" timing totals; a failing item does not
+fail the batch.
+Add "async": true (or set UPTIME_KUMA_ASYNC=true) to send the batch from one
+asyncio event loop instead of a thread per in-flight call (see kuma_async.py);
+"callTimeout" sets a per-call timeout in seconds. The output is the same.
+
+The input is validated against monitor_schema.py before connecting: invalid
+input fails at once with "fieldErrors", and invalid batch items are rejected
+in their own results without being sent.
+
+With several Uptime Kuma instances in UPTIME_KUMA_SHARDS, each monitor is
+added on the shard that owns its domain; "monitorID" is then a global ID and
+"shard" names the instance (see kuma_shards.py).
+
+Add "idempotent": true (or set UPTIME_KUMA_IDEMPOTENT_ADD=true) to add a
+monitor only if none with the same type and normalized URL exists. The local
+monitor key index (monitor_index.py) is checked before connecting: a monitor
+it already has is answered with its "monitorID" and "created": false, without
+a session or a monitor list. Repeats of a key within one batch are sent once.
+New monitors are answered with "created": true.
+
+The run() function is also used by kuma_worker.py to serve add requests over
+a long-lived session.
 """
 
 import sys
-import json
 import os
-import time
-import urllib.request
 from pathlib import Path
 
 # Add .python-packages directory to Python path (for Render deployment)
@@ -18,281 +41,262 @@ project_root = Path(__file__).parent.parent.parent
 python_packages_path = project_root / '.python-packages'
 if python_packages_path.exists():
     sys.path.insert(0, str(python_packages_path))
-    print(f"[add_monitor] Added .python-packages to sys.path: {python_packages_path}", file=sys.stderr)
-else:
-    print(f"[add_monitor] WARNING: .python-packages directory not found at {python_packages_path}", file=sys.stderr)
 
-from uptime_kuma_api import UptimeKumaApi, MonitorType, AuthMethod
+from kuma_common import get_batch, get_connection_settings, log, log_diagnostics, open_session, run_batch
+from kuma_async import async_enabled, get_call_timeout, run_batch_async
+from kuma_metrics import RunTimer, run_main
+from kuma_shards import sharding_enabled
+from monitor_schema import MonitorInputError, merge_rejected, normalize_monitor_input, validate_batch
+
+def build_monitor_kwargs(input_data):
+    """Validate the JSON input and map it to uptime-kuma-api add_monitor kwargs (see monitor_schema.py)."""
+    return normalize_monitor_input(input_data, mode='add')
+
+def idempotent_enabled(input_data):
+    """Adds are idempotent when the request sets "idempotent": true or UPTIME_KUMA_IDEMPOTENT_ADD=true."""
+    if isinstance(input_data, dict) and 'idempotent' in input_data:
+        return bool(input_data['idempotent'])
+    return os.getenv('UPTIME_KUMA_IDEMPOTENT_ADD', 'false').lower() in ('1', 'true', 'yes')
+
+def run(api, input_data):
+    """Add a monitor over an authenticated session and return the JSON output dict."""
+    monitor_kwargs = build_monitor_kwargs(input_data)
+    
+    if idempotent_enabled(input_data):
+        from monitor_index import MonitorIndex, monitor_key
+        
+        # Look up and add under the key's claim, so concurrent adds of one key create one monitor
+        key = monitor_key(monitor_kwargs)
+        with MonitorIndex(api.url) as index, index.claim(key):
+            existing = index.lookup(key)
+            if existing is not None:
+                return existing_output(existing)
+            output = add_output(api.add_monitor(**monitor_kwargs))
+            if output['monitorID'] is not None:
+                index.record(key, output['monitorID'])
+            return output
+    
+    # Add monitor using **kwargs to match the API signature
+    result = api.add_monitor(**monitor_kwargs)
+    return add_output(result)
+
+async def run_async(client, input_data):
+    """The same as run(), over a kuma_async.AsyncKumaClient."""
+    monitor_kwargs = build_monitor_kwargs(input_data)
+    if idempotent_enabled(input_data):
+        from monitor_index import MonitorIndex, monitor_key
+        
+        # main() sends each key once per batch, so the claim only waits on other processes
+        key = monitor_key(monitor_kwargs)
+        with MonitorIndex(client.api.url) as index, index.claim(key):
+            existing = index.lookup(key)
+            if existing is not None:
+                return existing_output(existing)
+            output = add_output(await client.add_monitor(**monitor_kwargs))
+            if output['monitorID'] is not None:
+                index.record(key, output['monitorID'])
+            return output
+    result = await client.add_monitor(**monitor_kwargs)
+    return add_output(result)
+
+def find_existing(input_data):
+    """
+    The output for a monitor the local key index already has, or None. Needs
+    no session; with shards, every shard's index is checked.
+    """
+    from monitor_index import MonitorIndex, monitor_key
+    
+    key = monitor_key(normalize_monitor_input(input_data, mode='add', enums=False))
+    if not sharding_enabled():
+        with MonitorIndex(get_connection_settings()['api_url']) as index:
+            existing = index.lookup(key)
+        return None if existing is None else existing_output(existing)
+    
+    from kuma_shards import get_shards, global_monitor_id
+    
+    for shard in get_shards():
+        with MonitorIndex(shard.api_url) as index:
+            existing = index.lookup(key)
+        if existing is not None:
+            return dict(existing_output(global_monitor_id(shard, existing)), shard=shard.name)
+    return None
+
+def resolve_existing(items, pending):
+    """
+    Answer the pending batch items the key index already has, and send each
+    other key once. Returns (resolved results, items still to send, repeats
+    as {index: index of the item sent for the same key}).
+    """
+    from monitor_index import monitor_key
+    
+    resolved = []
+    to_send = []
+    repeats = {}
+    sent_keys = {}
+    for index in pending:
+        if not idempotent_enabled(items[index]):
+            to_send.append(index)
+            continue
+        existing = find_existing(items[index])
+        if existing is not None:
+            resolved.append(dict(index=index, **existing, durationMs=0.0))
+            continue
+        key = monitor_key(normalize_monitor_input(items[index], mode='add', enums=False))
+        if key in sent_keys:
+            repeats[index] = sent_keys[key]
+        else:
+            sent_keys[key] = index
+            to_send.append(index)
+    return resolved, to_send, repeats
+
+def fill_repeats(output, repeats):
+    """Answer repeated keys of a batch with the result of the item that was sent for them."""
+    from kuma_common import batch_output
+    
+    results = {result['index']: result for result in output['results']}
+    for index, sent in repeats.items():
+        result = dict(results[sent], index=index, durationMs=0.0)
+        if result.get('success'):
+            result.update(created=False, message='Monitor already exists')
+        results[index] = result
+    merged = batch_output(sorted(results.values(), key=lambda r: r['index']),
+                          output['batch']['concurrency'], output['batch']['totalMs'])
+    for key, value in output.items():
+        merged.setdefault(key, value)
+    return merged
+
+def run_sharded(input_data, items, concurrency):
+    """Add monitors on the shards that own their domains (see kuma_shards.py)."""
+    from kuma_shards import run_sharded_batch, shard_for_monitor
+    
+    def run_group(api, shard_items):
+        if async_enabled(input_data):
+            return run_batch_async(api, shard_items, run_async, concurrency, tag='add_monitor',
+                                   timeout=get_call_timeout(input_data))
+        return run_batch(api, shard_items, run, concurrency, tag='add_monitor')
+    
+    return run_sharded_batch('add_monitor', items, lambda item: (shard_for_monitor(item), item), run_group)
+
+def add_output(result):
+    """The JSON output dict for the result of an 'add' call."""
+    # According to UptimeSpecs.txt, the response has 'monitorID' (capital ID), not 'monitorId'
+    # Try both formats for compatibility
+    monitor_id = None
+    if isinstance(result, dict):
+        monitor_id = result.get('monitorID') or result.get('monitorId')
+    
+    return {
+        'success': True,
+        'monitorID': monitor_id,
+        'created': True,
+        'message': result.get('msg', 'Monitor added successfully') if isinstance(result, dict) else 'Monitor added successfully'
+    }
+
+def existing_output(monitor_id):
+    """The JSON output dict for an idempotent add of a monitor that already exists."""
+    return {
+        'success': True,
+        'monitorID': monitor_id,
+        'created': False,
+        'message': 'Monitor already exists'
+    }
+
+def prepare(input_data):
+    """
+    Validate a request before connecting. Returns (plan, answer): answer is the
+    whole output when no session is needed (every batch item rejected or
+    already in the key index), otherwise plan is what execute() runs.
+    """
+    # A JSON array (or {"items": [...]}) adds every item over one session
+    items, concurrency = get_batch(input_data)
+    
+    # Validate before connecting: a bad request (or batch item) fails without a login
+    repeats = {}
+    if items is None:
+        normalize_monitor_input(input_data, mode='add', enums=False)
+        # An idempotent add of an indexed monitor is answered without a login too
+        if idempotent_enabled(input_data):
+            existing = find_existing(input_data)
+            if existing is not None:
+                return None, existing
+        return (items, concurrency, [], None, repeats), None
+    
+    # {"items": [...], "idempotent": true} applies to every item that doesn't say otherwise
+    if isinstance(input_data, dict) and 'idempotent' in input_data:
+        items = [dict({'idempotent': input_data['idempotent']}, **item) if isinstance(item, dict) else item
+                 for item in items]
+    rejected, pending = validate_batch(items, mode='add')
+    resolved, pending, repeats = resolve_existing(items, pending)
+    rejected += resolved
+    if not pending:
+        return None, merge_rejected(None, rejected, pending)
+    return (items, concurrency, rejected, pending, repeats), None
+
+def finish_batch(output, plan):
+    """Put the rejected, already indexed and repeated items of a batch back into its output."""
+    items, concurrency, rejected, pending, repeats = plan
+    if rejected or repeats:
+        output = merge_rejected(output, rejected, pending)
+    if repeats:
+        output = fill_repeats(output, repeats)
+    return output
+
+def execute(api, input_data, plan):
+    """Run a prepare()d request over an authenticated session and return the JSON output dict."""
+    items, concurrency, rejected, pending, repeats = plan
+    if items is None:
+        return run(api, input_data)
+    if async_enabled(input_data):
+        output = run_batch_async(api, [items[i] for i in pending], run_async, concurrency,
+                                 tag='add_monitor', timeout=get_call_timeout(input_data))
+    else:
+        output = run_batch(api, [items[i] for i in pending], run, concurrency, tag='add_monitor')
+    return finish_batch(output, plan)
+
+def run_request(api, input_data):
+    """A single or batch request over an open session, exactly as main() runs it (used by kuma_worker.py)."""
+    plan, answer = prepare(input_data)
+    return answer if plan is None else execute(api, input_data, plan)
 
 def main():
+    timer = RunTimer('add_monitor')
     try:
         # Read JSON from stdin
-        input_data = json.load(sys.stdin)
+        input_data = timer.read_input()
         
-        # Get environment variables
-        api_url = os.getenv('UPTIME_KUMA_API_URL', 'http://localhost:3003')
-        username = os.getenv('UPTIME_KUMA_USERNAME', 'admin')
-        password = os.getenv('UPTIME_KUMA_PASSWORD', 'admin123')
-        # Note: API keys are for REST endpoints only, not Socket.io authentication
+        plan, answer = prepare(input_data)
+        if plan is None:
+            print(timer.emit(answer))
+            return
+        items, concurrency, rejected, pending, repeats = plan
         
-        # Debug logging (mask password)
-        print(f"[add_monitor] ===== CONNECTION DETAILS =====", file=sys.stderr)
-        print(f"[add_monitor] Connecting to: {api_url}", file=sys.stderr)
-        print(f"[add_monitor] Username: {username}", file=sys.stderr)
-        password_length = len(password) if password else 0
-        print(f"[add_monitor] Password set: {'Yes' if password else 'No'} (length: {password_length})", file=sys.stderr)
-        print(f"[add_monitor] Password value (first 3 chars): {password[:3] if password and len(password) >= 3 else '(too short)'}", file=sys.stderr)
-        print(f"[add_monitor] Password value (last 3 chars): {password[-3:] if password and len(password) >= 3 else '(too short)'}", file=sys.stderr)
-        print(f"[add_monitor] Full password (for debugging): {repr(password)}", file=sys.stderr)
-        print(f"[add_monitor] ==============================", file=sys.stderr)
+        # Debug diagnostics (UPTIME_KUMA_VERBOSITY=2), never password material
+        log_diagnostics('add_monitor')
         
-        # Map monitor type string to MonitorType enum
-        type_map = {
-            'http': MonitorType.HTTP,
-            'https': MonitorType.HTTP,  # HTTP includes HTTPS
-            'tcp': MonitorType.PORT,  # PORT is the TCP Port monitor type
-            'ping': MonitorType.PING,
-            'dns': MonitorType.DNS,
-        }
-        
-        monitor_type = type_map.get(input_data.get('type', 'https'), MonitorType.HTTP)
-        
-        # For Render services, wake up the service first with a simple HTTP request
-        # This helps avoid Socket.io timeout errors when the service is sleeping
-        if 'onrender.com' in api_url or 'render.com' in api_url:
-            print(f"[add_monitor] Detected Render service, sending wake-up request...", file=sys.stderr)
-            try:
-                # Make a simple HTTP request to wake up the service
-                wake_url = api_url.rstrip('/') + '/api/status-page'
-                print(f"[add_monitor] Wake-up request to: {wake_url}", file=sys.stderr)
-                req = urllib.request.Request(wake_url)
-                req.add_header('User-Agent', 'iaccessible-cc/1.0')
-                with urllib.request.urlopen(req, timeout=30) as response:
-                    print(f"[add_monitor] Wake-up request successful (status: {response.getcode()})", file=sys.stderr)
-                # Give the service a moment to fully wake up
-                time.sleep(2)
-            except Exception as wake_error:
-                print(f"[add_monitor] Wake-up request failed (non-fatal): {wake_error}", file=sys.stderr)
-                # Continue anyway - the service might already be awake
-        
-        # Connect to Uptime Kuma with increased timeout for Render services
-        # Render free tier services can be slow to wake up, so use 60 second timeout
-        timeout_seconds = 60.0
-        print(f"[add_monitor] Creating UptimeKumaApi connection with {timeout_seconds}s timeout", file=sys.stderr)
-        
-        with UptimeKumaApi(api_url, timeout=timeout_seconds) as api:
-            # Monkey-patch to inject 'conditions' field for Uptime Kuma v2 compatibility
-            # Uptime Kuma v2 requires 'conditions' to be NOT NULL, but the library doesn't support it
-            # Patch _build_monitor_data if it exists (this is the method that builds the data dict)
-            if hasattr(api, '_build_monitor_data'):
-                original_build_monitor_data = api._build_monitor_data
-                
-                def patched_build_monitor_data(**kwargs):
-                    data = original_build_monitor_data(**kwargs)
-                    # Add conditions field if not present (required by Uptime Kuma v2)
-                    if 'conditions' not in data or data['conditions'] is None:
-                        data['conditions'] = []  # Default to empty array for new monitors
-                        print(f"[add_monitor] Injected 'conditions' field (empty array) for Uptime Kuma v2 compatibility", file=sys.stderr)
-                    else:
-                        print(f"[add_monitor] 'conditions' field already present: {data.get('conditions')}", file=sys.stderr)
-                    return data
-                
-                api._build_monitor_data = patched_build_monitor_data
-                print(f"[add_monitor] Successfully patched _build_monitor_data method for Uptime Kuma v2", file=sys.stderr)
-            else:
-                # Fallback: patch _call method to inject conditions into data before sending
-                print(f"[add_monitor] _build_monitor_data not found, patching _call method instead", file=sys.stderr)
-                original_call = api._call
-                
-                def patched_call(event, data=None, **kwargs):
-                    # If this is an 'add' event for a monitor, inject conditions
-                    if event == 'add' and isinstance(data, dict):
-                        if 'conditions' not in data or data['conditions'] is None:
-                            data['conditions'] = []
-                            print(f"[add_monitor] Injected 'conditions' field via _call patch for Uptime Kuma v2", file=sys.stderr)
-                    return original_call(event, data, **kwargs)
-                
-                api._call = patched_call
-            
-            # Authenticate using username/password
-            # Note: API keys are for REST endpoints only, not Socket.io
-            # login_by_token() requires a JWT token from a previous login session
-            try:
-                # Log exact values being used (mask password)
-                print(f"[add_monitor] Attempting login with:", file=sys.stderr)
-                print(f"[add_monitor]   URL: {api_url}", file=sys.stderr)
-                print(f"[add_monitor]   Username: {username}", file=sys.stderr)
-                print(f"[add_monitor]   Password length: {len(password) if password else 0}", file=sys.stderr)
-                print(f"[add_monitor]   Password starts with: {password[:3] if password and len(password) >= 3 else '(too short)'}", file=sys.stderr)
-                print(f"[add_monitor]   Password ends with: {password[-3:] if password and len(password) >= 3 else '(too short)'}", file=sys.stderr)
-                
-                # Retry login up to 3 times with exponential backoff for Render services
-                max_retries = 3
-                retry_delay = 2  # Start with 2 seconds
-                
-                for attempt in range(1, max_retries + 1):
-                    try:
-                        print(f"[add_monitor] Login attempt {attempt}/{max_retries}", file=sys.stderr)
-                        api.login(username, password)
-                        print(f"[add_monitor] Authentication successful", file=sys.stderr)
-                        break  # Success, exit retry loop
-                    except Exception as login_error:
-                        error_type = type(login_error).__name__
-                        if error_type == 'TimeoutError' and attempt < max_retries:
-                            # Wait before retrying (exponential backoff)
-                            print(f"[add_monitor] Timeout on attempt {attempt}, waiting {retry_delay}s before retry...", file=sys.stderr)
-                            time.sleep(retry_delay)
-                            retry_delay *= 2  # Exponential backoff: 2s, 4s, 8s
-                        else:
-                            # Not a timeout or last attempt, re-raise
-                            raise
-            except Exception as auth_error:
-                error_msg = str(auth_error)
-                print(f"[add_monitor] Authentication failed: {error_msg}", file=sys.stderr)
-                print(f"[add_monitor] Error type: {type(auth_error).__name__}", file=sys.stderr)
-                print(f"[add_monitor] Attempted login with username: '{username}', password length: {len(password) if password else 0}", file=sys.stderr)
-                # Print full error details
-                import traceback
-                print(f"[add_monitor] Full error traceback:", file=sys.stderr)
-                traceback.print_exc(file=sys.stderr)
-                raise
+        # With several Uptime Kuma instances, each monitor goes to the shard that owns its domain
+        if sharding_enabled():
+            from kuma_shards import single_result
             
-            # Prepare monitor kwargs according to uptime-kuma-api documentation
-            # Note: 'conditions' is required by the database but not accepted as a parameter
-            # The uptime-kuma-api wrapper should handle this internally
-            # Reference: UptimeSpecs.txt lines 416-615
-            monitor_kwargs = {
-                'type': monitor_type,
-                'name': input_data.get('name', ''),
-            }
-            
-            # Add optional parameters if provided (following UptimeSpecs.txt)
-            if input_data.get('url'):
-                monitor_kwargs['url'] = input_data['url']
-            if input_data.get('description'):
-                monitor_kwargs['description'] = input_data['description']
-            if input_data.get('parent'):
-                monitor_kwargs['parent'] = input_data['parent']
-            if 'heartbeatInterval' in input_data:
-                monitor_kwargs['interval'] = input_data.get('heartbeatInterval', 60)
-            if 'heartbeatRetryInterval' in input_data:
-                monitor_kwargs['retryInterval'] = input_data.get('heartbeatRetryInterval', 60)
-            if 'resendInterval' in input_data:
-                monitor_kwargs['resendInterval'] = input_data.get('resendInterval', 0)
-            if 'retries' in input_data:
-                monitor_kwargs['maxretries'] = input_data.get('retries', 0)
-            if 'upsideDown' in input_data:
-                monitor_kwargs['upsideDown'] = bool(input_data.get('upsideDown', False))
-            if 'requestTimeout' in input_data:
-                monitor_kwargs['timeout'] = input_data.get('requestTimeout', 48)
-            if input_data.get('httpMethod') or input_data.get('method'):
-                monitor_kwargs['method'] = input_data.get('httpMethod') or input_data.get('method', 'GET')
-            if 'body' in input_data:
-                monitor_kwargs['body'] = input_data.get('body', '')
-            if input_data.get('bodyEncoding'):
-                # Map to httpBodyEncoding (allowed values: "json", "xml" per specs)
-                body_encoding = input_data.get('bodyEncoding', 'json').lower()
-                if body_encoding == 'json':
-                    monitor_kwargs['httpBodyEncoding'] = 'json'
-                elif body_encoding == 'xml':
-                    monitor_kwargs['httpBodyEncoding'] = 'xml'
+            with timer.phase('operation'):
+                if items is None:
+                    output = single_result(run_sharded(input_data, [input_data], 1))
                 else:
-                    monitor_kwargs['httpBodyEncoding'] = 'json'  # Default
-            if 'keyword' in input_data:
-                monitor_kwargs['keyword'] = input_data.get('keyword', '')
-            if 'invertKeyword' in input_data:
-                monitor_kwargs['invertKeyword'] = bool(input_data.get('invertKeyword', False))
-            if 'maxredirects' in input_data:
-                monitor_kwargs['maxredirects'] = input_data.get('maxredirects', 10)
-            if 'expiryNotification' in input_data:
-                monitor_kwargs['expiryNotification'] = bool(input_data.get('expiryNotification', False))
-            if 'ignoreTls' in input_data:
-                monitor_kwargs['ignoreTls'] = bool(input_data.get('ignoreTls', False))
-            if 'proxyId' in input_data:
-                monitor_kwargs['proxyId'] = input_data.get('proxyId')
-            
-            # accepted_statuscodes should be a list (per specs line 448)
-            if input_data.get('acceptedStatusCodes'):
-                monitor_kwargs['accepted_statuscodes'] = input_data['acceptedStatusCodes']
-            
-            # headers should be a string, not a list (per specs line 458)
-            if input_data.get('headers'):
-                headers = input_data['headers']
-                if isinstance(headers, list):
-                    # Convert list of objects to string format (Header: Value format)
-                    header_lines = []
-                    for h in headers:
-                        if isinstance(h, dict):
-                            header_lines.append(f"{h.get('key', '')}: {h.get('value', '')}")
-                        else:
-                            header_lines.append(str(h))
-                    monitor_kwargs['headers'] = '\n'.join(header_lines)
-                else:
-                    monitor_kwargs['headers'] = str(headers)
-            
-            # notificationIDList should be a list (per specs line 438)
-            if input_data.get('notificationIDList'):
-                monitor_kwargs['notificationIDList'] = input_data['notificationIDList']
-            
-            # authMethod - convert string to AuthMethod enum (per specs line 460)
-            if input_data.get('authMethod'):
-                auth_str = input_data.get('authMethod', 'none').lower()
-                auth_map = {
-                    'none': AuthMethod.NONE,
-                    'basic': AuthMethod.HTTP_BASIC,
-                    'ntlm': AuthMethod.NTLM,
-                    'mtls': AuthMethod.MTLS,
-                }
-                monitor_kwargs['authMethod'] = auth_map.get(auth_str, AuthMethod.NONE)
-            
-            # Basic auth credentials (per specs lines 468-470)
-            if input_data.get('basicAuthUser'):
-                monitor_kwargs['basic_auth_user'] = input_data['basicAuthUser']
-            if input_data.get('basicAuthPass'):
-                monitor_kwargs['basic_auth_pass'] = input_data['basicAuthPass']
-            
-            # NTLM auth (per specs lines 472-474)
-            if input_data.get('authDomain'):
-                monitor_kwargs['authDomain'] = input_data['authDomain']
-            if input_data.get('authWorkstation'):
-                monitor_kwargs['authWorkstation'] = input_data['authWorkstation']
-            
-            # mTLS certificates (per specs lines 462-466)
-            if input_data.get('tlsCert'):
-                monitor_kwargs['tlsCert'] = input_data['tlsCert']
-            if input_data.get('tlsKey'):
-                monitor_kwargs['tlsKey'] = input_data['tlsKey']
-            if input_data.get('tlsCa'):
-                monitor_kwargs['tlsCa'] = input_data['tlsCa']
-            
-            # OAuth2 (per specs lines 476-484)
-            if input_data.get('oauthAuthMethod'):
-                monitor_kwargs['oauth_auth_method'] = input_data['oauthAuthMethod']
-            if input_data.get('oauthTokenUrl'):
-                monitor_kwargs['oauth_token_url'] = input_data['oauthTokenUrl']
-            if input_data.get('oauthClientId'):
-                monitor_kwargs['oauth_client_id'] = input_data['oauthClientId']
-            if input_data.get('oauthClientSecret'):
-                monitor_kwargs['oauth_client_secret'] = input_data['oauthClientSecret']
-            if input_data.get('oauthScopes'):
-                monitor_kwargs['oauth_scopes'] = input_data['oauthScopes']
-            
-            # Add monitor using **kwargs to match the API signature
-            result = api.add_monitor(**monitor_kwargs)
-            
-            # Output success result
-            # According to UptimeSpecs.txt, the response has 'monitorID' (capital ID), not 'monitorId'
-            # Try both formats for compatibility
-            monitor_id = None
-            if isinstance(result, dict):
-                monitor_id = result.get('monitorID') or result.get('monitorId')
-            
-            output = {
-                'success': True,
-                'monitorID': monitor_id,
-                'message': result.get('msg', 'Monitor added successfully') if isinstance(result, dict) else 'Monitor added successfully'
-            }
-            print(json.dumps(output))
+                    output = finish_batch(run_sharded(input_data, [items[i] for i in pending], concurrency), plan)
+            print(timer.emit(output))
+            return
+        
+        # Connect, wake Render if needed, patch for Uptime Kuma v2 and log in
+        try:
+            api, session = open_session('add_monitor', timer=timer)
+        except Exception as auth_error:
+            log('add_monitor', f"Authentication failed ({type(auth_error).__name__}): {auth_error}", level=0)
+            raise
+        
+        with api:
+            with timer.phase('operation'):
+                output = execute(api, input_data, plan)
+            output.update(session)
+            print(timer.emit(output))
             
     except Exception as e:
         # Output error result with more details for debugging
@@ -302,8 +306,10 @@ def main():
             'error': str(e),
             'traceback': traceback.format_exc()
         }
-        print(json.dumps(error_output))
+        if isinstance(e, MonitorInputError):
+            error_output['fieldErrors'] = e.errors
+        print(timer.emit(error_output))
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
+    run_main('add_monitor', main)
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Summary statistics over a beats window, used by get_monitor_beats.py's
+"aggregate" mode so the UI gets a few kilobytes instead of every raw beat.
+
+The beats are first split into columns (time, status, ping), and each
+statistic is computed over a column. Sums use math.fsum, which is exactly
+rounded and does not depend on summation order, and percentiles use linear
+interpolation between closest ranks. So the results are identical to
+computing the same definitions directly over the raw beats.
+
+Definitions:
+- uptimePercent: up / (up + down) * 100; pending and maintenance beats are
+  not counted. None when there are no up or down beats.
+- ping: over beats with a non-null ping.
+- incidents: number of runs of consecutive down beats (ordered by time).
+  Each run lasts from its first down beat to the next non-down beat, or to
+  the end of the window if it is still down.
+- series: the window split into N equal time buckets, returned as one array
+  per field.
+"""
+
+import math
+from datetime import datetime, timezone
+
+STATUS_DOWN = 0
+STATUS_UP = 1
+STATUS_PENDING = 2
+STATUS_MAINTENANCE = 3
+
+DEFAULT_BUCKETS = 60
+
+
+def parse_beat_time(value):
+    """Parse an Uptime Kuma beat time ('YYYY-MM-DD HH:MM:SS.mmm', UTC) to a unix timestamp."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def percentile(sorted_values, pct):
+    """Linear-interpolation percentile of an already sorted list (NumPy's default method)."""
+    if not sorted_values:
+        return None
+    rank = (len(sorted_values) - 1) * pct / 100
+    lower = math.floor(rank)
+    upper = math.ceil(rank)
+    if lower == upper:
+        return sorted_values[lower]
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (rank - lower)
+
+
+def to_columns(beats):
+    """Split beats into time-ordered (times, statuses, pings) columns."""
+    # Order by time only: equal times would go on to compare a None ping with a number
+    rows = sorted((
+        (parse_beat_time(beat['time']), int(beat.get('status', STATUS_PENDING)), beat.get('ping'))
+        for beat in beats
+        if beat.get('time')
+    ), key=lambda row: row[0])
+    if not rows:
+        return [], [], []
+    times, statuses, pings = (list(column) for column in zip(*rows))
+    return times, statuses, pings
+
+
+def summarize_pings(pings):
+    values = sorted(p for p in pings if p is not None)
+    if not values:
+        return {'count': 0, 'avg': None, 'min': None, 'max': None, 'p50': None, 'p95': None, 'p99': None}
+    return {
+        'count': len(values),
+        'avg': math.fsum(values) / len(values),
+        'min': values[0],
+        'max': values[-1],
+        'p50': percentile(values, 50),
+        'p95': percentile(values, 95),
+        'p99': percentile(values, 99),
+    }
+
+
+def summarize_incidents(times, statuses, window_end):
+    incidents = 0
+    downtime = []
+    down_since = None
+    for t, status in zip(times, statuses):
+        if status == STATUS_DOWN:
+            if down_since is None:
+                down_since = t
+                incidents += 1
+        elif down_since is not None:
+            downtime.append(t - down_since)
+            down_since = None
+    if down_since is not None:
+        downtime.append(max(window_end, down_since) - down_since)
+    return incidents, math.fsum(downtime), down_since is not None
+
+
+def downsample(times, statuses, pings, window_start, window_end, buckets):
+    buckets = max(1, int(buckets))
+    width = (window_end - window_start) / buckets
+    up = [0] * buckets
+    down = [0] * buckets
+    pending = [0] * buckets
+    bucket_pings = [[] for _ in range(buckets)]
+
+    for t, status, ping in zip(times, statuses, pings):
+        index = int((t - window_start) // width) if width > 0 else 0
+        index = min(max(index, 0), buckets - 1)
+        if status == STATUS_UP:
+            up[index] += 1
+        elif status == STATUS_DOWN:
+            down[index] += 1
+        else:
+            pending[index] += 1
+        if ping is not None:
+            bucket_pings[index].append(ping)
+
+    return {
+        'bucketSeconds': width,
+        'start': [window_start + i * width for i in range(buckets)],
+        'up': up,
+        'down': down,
+        'pending': pending,
+        'avgPing': [math.fsum(p) / len(p) if p else None for p in bucket_pings],
+        'maxPing': [max(p) if p else None for p in bucket_pings],
+    }
+
+
+def aggregate_beats(beats, window_start, window_end, buckets=DEFAULT_BUCKETS):
+    """
+    Compute the summary for one monitor's beats.
+
+    window_start and window_end are unix timestamps; they bound the
+    downsampled series and close an incident that is still ongoing.
+    """
+    times, statuses, pings = to_columns(beats)
+
+    up = statuses.count(STATUS_UP)
+    down = statuses.count(STATUS_DOWN)
+    incidents, downtime_seconds, ongoing = summarize_incidents(times, statuses, window_end)
+
+    return {
+        'windowStart': window_start,
+        'windowEnd': window_end,
+        'beats': len(times),
+        'up': up,
+        'down': down,
+        'pending': statuses.count(STATUS_PENDING),
+        'maintenance': statuses.count(STATUS_MAINTENANCE),
+        'uptimePercent': up / (up + down) * 100 if up + down else None,
+        'ping': summarize_pings(pings),
+        'incidents': incidents,
+        'downtimeSeconds': downtime_seconds,
+        'ongoingIncident': ongoing,
+        'series': downsample(times, statuses, pings, window_start, window_end, buckets),
+    }
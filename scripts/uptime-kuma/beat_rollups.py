@@ -0,0 +1,575 @@
+#!/usr/bin/env python3
+"""
+Hourly and daily uptime rollups for SLA reports.
+
+A monthly report from raw beats means pulling up to 720 hours of beats per
+monitor. Instead, the local heartbeat store (heartbeat_store.py) keeps one
+rollup row per monitor and UTC hour, updated in the same transaction as every
+merge of new beats, and one row per UTC day merged from its hours. A row holds:
+
+- up / down / pending / maintenance beat counts
+- downtime seconds: the time from each down beat to the next beat (split at
+  hour boundaries), the definition beat_aggregates.py uses for incidents
+- ping count, sum, min and max, plus a PingSketch of the pings
+
+PingSketch is a log-bucketed quantile sketch (as in DDSketch): every ping is
+counted in the bucket [gamma^(i-1), gamma^i), so two sketches merge by adding
+their counts, and any percentile of the merged sketch is within
+SKETCH_ACCURACY (1%) of the exact value. Reports merge rows instead of beats.
+
+Rollups are incremental: each merge only rolls up the beats newer than the
+last one rolled up. Beats merged in before that point (a wider backfill)
+re-roll the monitor's hours from the earliest of them. Beat compaction leaves
+the rollups alone, so they outlive the raw beats.
+
+  python3 beat_rollups.py report --ids 1,2 --from 2026-09-01 --to 2026-10-01 [--by day]
+  python3 beat_rollups.py report --group 12 --from 2026-09-01 --to 2026-10-01
+  python3 beat_rollups.py verify --from 2026-09-01 --to 2026-10-01   # against raw beats
+  python3 beat_rollups.py rebuild [--ids 1,2]   # only from the beats compaction kept
+  python3 beat_rollups.py stats
+
+Ranges are UTC and cover whole hours: "from" is rounded down and "to" up.
+A report reads whole days from the daily rows and the partial days at either
+end from the hourly rows.
+"""
+
+import sys
+import json
+import math
+import time
+import argparse
+
+from beat_aggregates import STATUS_DOWN, STATUS_MAINTENANCE, STATUS_PENDING, STATUS_UP, parse_beat_time, percentile
+
+HOUR = 3600
+DAY = 86400
+
+# Relative accuracy of the percentiles read from a PingSketch
+SKETCH_ACCURACY = 0.01
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rollups (
+    monitor_id INTEGER NOT NULL,
+    grain TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    up INTEGER NOT NULL,
+    down INTEGER NOT NULL,
+    pending INTEGER NOT NULL,
+    maintenance INTEGER NOT NULL,
+    downtime REAL NOT NULL,
+    ping_count INTEGER NOT NULL,
+    ping_sum REAL NOT NULL,
+    ping_min REAL,
+    ping_max REAL,
+    sketch TEXT NOT NULL,
+    PRIMARY KEY (monitor_id, grain, start)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS rollup_state (
+    monitor_id INTEGER PRIMARY KEY,
+    last_time TEXT NOT NULL,
+    last_status INTEGER NOT NULL
+);
+"""
+
+
+class PingSketch:
+    """Mergeable quantile sketch with relative accuracy SKETCH_ACCURACY."""
+
+    gamma = (1 + SKETCH_ACCURACY) / (1 - SKETCH_ACCURACY)
+    log_gamma = math.log(gamma)
+
+    def __init__(self, bins=None, zeros=0):
+        self.bins = bins or {}
+        self.zeros = zeros
+
+    @property
+    def count(self):
+        return self.zeros + sum(self.bins.values())
+
+    def add(self, value):
+        if value <= 0:
+            self.zeros += 1
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.bins[index] = self.bins.get(index, 0) + 1
+
+    def merge(self, other):
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        self.zeros += other.zeros
+        return self
+
+    def value_at_rank(self, rank):
+        """Estimate of the value at 0-based rank in sorted order."""
+        if rank < self.zeros:
+            return 0.0
+        seen = self.zeros
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if rank < seen:
+                # Midpoint (in relative terms) of [gamma^(i-1), gamma^i)
+                return 2 * self.gamma ** index / (self.gamma + 1)
+        return None
+
+    def quantile(self, pct):
+        """Percentile with the same linear interpolation between ranks as beat_aggregates.percentile()."""
+        count = self.count
+        if not count:
+            return None
+        rank = (count - 1) * pct / 100
+        lower = self.value_at_rank(math.floor(rank))
+        upper = self.value_at_rank(math.ceil(rank))
+        return lower + (upper - lower) * (rank - math.floor(rank))
+
+    def to_json(self):
+        return json.dumps({'z': self.zeros, 'b': self.bins}, separators=(',', ':'))
+
+    @classmethod
+    def from_json(cls, data):
+        raw = json.loads(data)
+        return cls({int(index): count for index, count in raw['b'].items()}, raw['z'])
+
+
+class Rollup:
+    """The rolled-up beats of one monitor over one period."""
+
+    FIELDS = ('up', 'down', 'pending', 'maintenance', 'downtime', 'ping_count', 'ping_sum', 'ping_min', 'ping_max')
+
+    def __init__(self):
+        self.up = self.down = self.pending = self.maintenance = 0
+        self.downtime = 0.0
+        self.ping_count = 0
+        self.ping_sum = 0.0
+        self.ping_min = self.ping_max = None
+        self.sketch = PingSketch()
+
+    def add_beat(self, status, ping):
+        if status == STATUS_UP:
+            self.up += 1
+        elif status == STATUS_DOWN:
+            self.down += 1
+        elif status == STATUS_MAINTENANCE:
+            self.maintenance += 1
+        else:
+            self.pending += 1
+        if ping is not None:
+            ping = float(ping)
+            self.ping_count += 1
+            self.ping_sum += ping
+            self.ping_min = ping if self.ping_min is None else min(self.ping_min, ping)
+            self.ping_max = ping if self.ping_max is None else max(self.ping_max, ping)
+            self.sketch.add(ping)
+
+    def merge(self, other):
+        for field in ('up', 'down', 'pending', 'maintenance', 'downtime', 'ping_count', 'ping_sum'):
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        if other.ping_min is not None:
+            self.ping_min = other.ping_min if self.ping_min is None else min(self.ping_min, other.ping_min)
+            self.ping_max = other.ping_max if self.ping_max is None else max(self.ping_max, other.ping_max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def to_row(self):
+        return tuple(getattr(self, field) for field in self.FIELDS) + (self.sketch.to_json(),)
+
+    @classmethod
+    def from_row(cls, row):
+        rollup = cls()
+        for field, value in zip(cls.FIELDS, row):
+            setattr(rollup, field, value)
+        rollup.sketch = PingSketch.from_json(row[len(cls.FIELDS)])
+        return rollup
+
+    def summary(self):
+        beats = self.up + self.down + self.pending + self.maintenance
+        return {
+            'beats': beats,
+            'up': self.up,
+            'down': self.down,
+            'pending': self.pending,
+            'maintenance': self.maintenance,
+            'uptimePercent': self.up / (self.up + self.down) * 100 if self.up + self.down else None,
+            'downtimeSeconds': self.downtime,
+            'ping': {
+                'count': self.ping_count,
+                'avg': self.ping_sum / self.ping_count if self.ping_count else None,
+                'min': self.ping_min,
+                'max': self.ping_max,
+                'p50': self.sketch.quantile(50),
+                'p95': self.sketch.quantile(95),
+                'p99': self.sketch.quantile(99),
+            },
+        }
+
+
+def add_downtime(rollups, start, end, clip_from=None):
+    """Credit the down interval [start, end) to the hourly rollups it overlaps."""
+    if clip_from is not None:
+        start = max(start, clip_from)
+    hour = int(start // HOUR) * HOUR
+    while start < end:
+        segment_end = min(end, hour + HOUR)
+        rollups.setdefault(hour, Rollup()).downtime += segment_end - start
+        start = segment_end
+        hour += HOUR
+
+
+def create_schema(conn):
+    """Create the rollup tables (HeartbeatStore does, when it opens the database)."""
+    conn.executescript(SCHEMA)
+
+
+class RollupStore:
+    """Rollup tables in the heartbeat store's database; share its connection (and its transactions)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def _state(self, monitor_id):
+        row = self.conn.execute(
+            'SELECT last_time, last_status FROM rollup_state WHERE monitor_id = ?', (monitor_id,)
+        ).fetchone()
+        return row if row else (None, None)
+
+    def count_beats(self, monitor_id, since, until):
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM beats WHERE monitor_id = ? AND time >= ? AND time <= ?', (monitor_id, since, until)
+        ).fetchone()[0]
+
+    def before_merge(self, monitor_id, beats):
+        """
+        Call before merging beats into the store. Returns what after_merge()
+        needs to tell whether beats older than the last rolled-up one were added.
+        """
+        last_time, _ = self._state(monitor_id)
+        times = [str(beat['time']) for beat in beats if beat.get('time')]
+        if last_time is None or not times or min(times) > last_time:
+            return None
+        oldest = min(times)
+        return oldest, last_time, self.count_beats(monitor_id, oldest, last_time)
+
+    def after_merge(self, monitor_id, backfill):
+        """Roll up the beats merged in; re-roll from the oldest new one if it predates the last rollup."""
+        if backfill is not None:
+            oldest, last_time, count = backfill
+            if self.count_beats(monitor_id, oldest, last_time) != count:
+                return self.rebuild(monitor_id, oldest)
+        return self.ingest(monitor_id)
+
+    def ingest(self, monitor_id, clip_from=None):
+        """Roll up the stored beats newer than the last rolled-up one. Returns the number of beats."""
+        last_time, last_status = self._state(monitor_id)
+        rows = self.conn.execute(
+            'SELECT time, data FROM beats WHERE monitor_id = ? AND time > ? ORDER BY time',
+            (monitor_id, last_time or '')
+        )
+        hours = {}
+        previous = (parse_beat_time(last_time), last_status) if last_time is not None else None
+        count = 0
+        for beat_time, data in rows:
+            beat = json.loads(data)
+            t = parse_beat_time(beat_time)
+            status = int(beat.get('status', STATUS_PENDING))
+            if previous is not None and previous[1] == STATUS_DOWN:
+                add_downtime(hours, previous[0], t, clip_from)
+            hours.setdefault(int(t // HOUR) * HOUR, Rollup()).add_beat(status, beat.get('ping'))
+            previous = (t, status)
+            last_time, last_status = beat_time, status
+            count += 1
+        if not count:
+            return 0
+
+        for start, rollup in hours.items():
+            self._add_row(monitor_id, 'hour', start, rollup)
+        for day in sorted({start // DAY * DAY for start in hours}):
+            self._roll_day(monitor_id, day)
+        self.conn.execute(
+            'INSERT INTO rollup_state (monitor_id, last_time, last_status) VALUES (?, ?, ?) '
+            'ON CONFLICT(monitor_id) DO UPDATE SET last_time = excluded.last_time, last_status = excluded.last_status',
+            (monitor_id, last_time, last_status)
+        )
+        return count
+
+    def rebuild(self, monitor_id, since=None):
+        """Re-roll a monitor's hours from the hour of `since` (a beat time; None: everything)."""
+        from heartbeat_store import format_beat_time
+
+        if since is None:
+            self.conn.execute('DELETE FROM rollups WHERE monitor_id = ?', (monitor_id,))
+            self.conn.execute('DELETE FROM rollup_state WHERE monitor_id = ?', (monitor_id,))
+            return self.ingest(monitor_id)
+
+        hour = int(parse_beat_time(since) // HOUR) * HOUR
+        self.conn.execute(
+            "DELETE FROM rollups WHERE monitor_id = ? AND grain = 'hour' AND start >= ?", (monitor_id, hour)
+        )
+        self.conn.execute(
+            "DELETE FROM rollups WHERE monitor_id = ? AND grain = 'day' AND start >= ?", (monitor_id, hour // DAY * DAY)
+        )
+        # Resume from the last beat before that hour; the part of its down
+        # interval before the hour is still in the kept rows
+        previous = self.conn.execute(
+            'SELECT time, data FROM beats WHERE monitor_id = ? AND time < ? ORDER BY time DESC LIMIT 1',
+            (monitor_id, format_beat_time(hour))
+        ).fetchone()
+        if previous is None:
+            self.conn.execute('DELETE FROM rollup_state WHERE monitor_id = ?', (monitor_id,))
+        else:
+            status = int(json.loads(previous[1]).get('status', STATUS_PENDING))
+            self.conn.execute(
+                'INSERT INTO rollup_state (monitor_id, last_time, last_status) VALUES (?, ?, ?) '
+                'ON CONFLICT(monitor_id) DO UPDATE SET last_time = excluded.last_time, last_status = excluded.last_status',
+                (monitor_id, previous[0], status)
+            )
+        count = self.ingest(monitor_id, clip_from=hour)
+        # The first day may have kept hours before `hour` and no new ones
+        self._roll_day(monitor_id, hour // DAY * DAY)
+        return count
+
+    def _add_row(self, monitor_id, grain, start, rollup):
+        row = self.conn.execute(
+            f'SELECT {", ".join(Rollup.FIELDS)}, sketch FROM rollups WHERE monitor_id = ? AND grain = ? AND start = ?',
+            (monitor_id, grain, start)
+        ).fetchone()
+        if row is not None:
+            rollup = Rollup.from_row(row).merge(rollup)
+        self._write_row(monitor_id, grain, start, rollup)
+
+    def _write_row(self, monitor_id, grain, start, rollup):
+        self.conn.execute(
+            f'INSERT OR REPLACE INTO rollups (monitor_id, grain, start, {", ".join(Rollup.FIELDS)}, sketch) '
+            f'VALUES (?, ?, ?, {", ".join("?" * (len(Rollup.FIELDS) + 1))})',
+            (monitor_id, grain, start) + rollup.to_row()
+        )
+
+    def _roll_day(self, monitor_id, day):
+        """Recompute a daily row as the merge of its hourly rows."""
+        day_rollup = self.read(monitor_id, 'hour', day, day + DAY)
+        if day_rollup is None:
+            self.conn.execute(
+                "DELETE FROM rollups WHERE monitor_id = ? AND grain = 'day' AND start = ?", (monitor_id, day)
+            )
+        else:
+            self._write_row(monitor_id, 'day', day, day_rollup)
+
+    def read(self, monitor_id, grain, start, end):
+        """Merge the rows of one grain with start <= row start < end; None if there are none."""
+        rows = self.conn.execute(
+            f'SELECT {", ".join(Rollup.FIELDS)}, sketch FROM rollups '
+            'WHERE monitor_id = ? AND grain = ? AND start >= ? AND start < ?',
+            (monitor_id, grain, start, end)
+        ).fetchall()
+        if not rows:
+            return None
+        merged = Rollup()
+        for row in rows:
+            merged.merge(Rollup.from_row(row))
+        return merged
+
+    def read_range(self, monitor_id, start, end, now=None):
+        """
+        The rollup of [start, end) (whole hours): daily rows for the whole days,
+        hourly rows for the rest, plus the still-open down interval after the
+        last beat when the monitor is down.
+        """
+        rollup = Rollup()
+        first_day = -(-start // DAY) * DAY
+        last_day = end // DAY * DAY
+        if first_day < last_day:
+            parts = [('hour', start, first_day), ('day', first_day, last_day), ('hour', last_day, end)]
+        else:
+            parts = [('hour', start, end)]
+        for grain, part_start, part_end in parts:
+            if part_start < part_end:
+                rollup.merge(self.read(monitor_id, grain, part_start, part_end) or Rollup())
+
+        last_time, last_status = self._state(monitor_id)
+        if last_status == STATUS_DOWN:
+            now = time.time() if now is None else now
+            open_from = max(parse_beat_time(last_time), start)
+            rollup.downtime += max(0.0, min(end, now) - open_from)
+        return rollup
+
+    def monitors(self):
+        return [row[0] for row in self.conn.execute('SELECT monitor_id FROM rollup_state ORDER BY monitor_id')]
+
+    def stats(self):
+        rows, monitors = self.conn.execute('SELECT COUNT(*), COUNT(DISTINCT monitor_id) FROM rollups').fetchone()
+        return {'rollupRows': rows, 'rollupMonitors': monitors}
+
+
+def raw_summary(beats, start, end, now):
+    """
+    The report summary computed directly from raw beats, with the rollup
+    definitions (beats before `start` only matter for downtime). Used by verify.
+    """
+    columns = sorted((
+        (parse_beat_time(beat['time']), int(beat.get('status', STATUS_PENDING)), beat.get('ping'))
+        for beat in beats
+    ), key=lambda row: row[0])
+    downtime = []
+    for (t, status, _), (next_t, _, _) in zip(columns, columns[1:] + [(min(end, now), None, None)]):
+        if status == STATUS_DOWN:
+            downtime.append(max(0.0, min(next_t, end) - max(t, start)))
+    inside = [(t, status, ping) for t, status, ping in columns if start <= t < end]
+    statuses = [status for _, status, _ in inside]
+    pings = sorted(float(ping) for _, _, ping in inside if ping is not None)
+    up = statuses.count(STATUS_UP)
+    down = statuses.count(STATUS_DOWN)
+    return {
+        'beats': len(inside),
+        'up': up,
+        'down': down,
+        'pending': statuses.count(STATUS_PENDING),
+        'maintenance': statuses.count(STATUS_MAINTENANCE),
+        'uptimePercent': up / (up + down) * 100 if up + down else None,
+        'downtimeSeconds': math.fsum(downtime),
+        'ping': {
+            'count': len(pings),
+            'avg': math.fsum(pings) / len(pings) if pings else None,
+            'min': pings[0] if pings else None,
+            'max': pings[-1] if pings else None,
+            'p50': percentile(pings, 50),
+            'p95': percentile(pings, 95),
+            'p99': percentile(pings, 99),
+        },
+    }
+
+
+def compare_summaries(rolled, raw):
+    """List the fields where a rollup summary differs from the raw one beyond float rounding or sketch accuracy."""
+    mismatches = []
+
+    def close(a, b, rel):
+        if a is None or b is None:
+            return a is None and b is None
+        return abs(a - b) <= rel * max(abs(a), abs(b)) + 1e-6
+
+    for field in ('beats', 'up', 'down', 'pending', 'maintenance'):
+        if rolled[field] != raw[field]:
+            mismatches.append(field)
+    for field in ('uptimePercent', 'downtimeSeconds'):
+        if not close(rolled[field], raw[field], 1e-9):
+            mismatches.append(field)
+    for field in ('count', 'min', 'max', 'avg'):
+        if not close(rolled['ping'][field], raw['ping'][field], 1e-9):
+            mismatches.append(f'ping.{field}')
+    for field in ('p50', 'p95', 'p99'):
+        if not close(rolled['ping'][field], raw['ping'][field], SKETCH_ACCURACY):
+            mismatches.append(f'ping.{field}')
+    return mismatches
+
+
+def parse_range_time(value, round_up=False):
+    """An ISO date or datetime (UTC unless it says otherwise) or unix time, rounded to a whole hour."""
+    t = parse_beat_time(float(value) if value.replace('.', '', 1).isdigit() else value)
+    return (-(-int(t) // HOUR) if round_up else int(t // HOUR)) * HOUR
+
+
+def group_members(group_id):
+    """The IDs of a group monitor's children (recursively), from the local monitor list snapshot."""
+    from kuma_common import get_connection_settings
+    from monitor_list_snapshot import MonitorListSnapshot
+
+    data = MonitorListSnapshot(get_connection_settings()['api_url']).load()
+    if data is None:
+        raise ValueError('No monitor list snapshot yet; run list_monitors.py once, or pass --ids')
+    children = {}
+    for monitor in data['monitors'].values():
+        if monitor.get('parent') is not None:
+            children.setdefault(int(monitor['parent']), []).append(int(monitor['id']))
+    members = []
+    pending = [int(group_id)]
+    while pending:
+        for child in children.get(pending.pop(), []):
+            members.append(child)
+            pending.append(child)
+    if not members:
+        raise ValueError(f'Monitor {group_id} has no child monitors in the monitor list snapshot')
+    return sorted(members)
+
+
+def report(rollups, monitor_ids, start, end, by=None):
+    """Rollup summaries for [start, end): per monitor, for all of them together, and per day or hour with `by`."""
+    from heartbeat_store import format_beat_time
+
+    now = time.time()
+    group = Rollup()
+    output = {'from': format_beat_time(start), 'to': format_beat_time(end), 'monitors': {}}
+    for monitor_id in monitor_ids:
+        rollup = rollups.read_range(monitor_id, start, end, now)
+        output['monitors'][str(monitor_id)] = rollup.summary()
+        group.merge(rollup)
+    if len(monitor_ids) > 1:
+        output['group'] = group.summary()
+    if by is not None:
+        step = DAY if by == 'day' else HOUR
+        output['series'] = []
+        period = start // step * step
+        while period < end:
+            period_rollup = Rollup()
+            for monitor_id in monitor_ids:
+                period_rollup.merge(rollups.read_range(monitor_id, max(period, start), min(period + step, end), now))
+            output['series'].append(dict(start=format_beat_time(max(period, start)), **period_rollup.summary()))
+            period += step
+    return output
+
+
+def main():
+    from heartbeat_store import HeartbeatStore, format_beat_time
+
+    parser = argparse.ArgumentParser(description='Report uptime from the hourly/daily rollups of the heartbeat store.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name in ('report', 'verify'):
+        sub = subparsers.add_parser(name)
+        sub.add_argument('--from', dest='start', required=True, help='UTC date/datetime or unix time')
+        sub.add_argument('--to', dest='end', required=True, help='UTC date/datetime or unix time (exclusive)')
+        sub.add_argument('--ids', help='comma-separated monitor IDs (default: every rolled-up monitor)')
+        if name == 'report':
+            sub.add_argument('--group', type=int, help='a group monitor; reports its child monitors')
+            sub.add_argument('--by', choices=['day', 'hour'], help='also return one row per day or hour')
+    rebuild_parser = subparsers.add_parser('rebuild', help='Re-roll monitors from the stored beats')
+    rebuild_parser.add_argument('--ids')
+    subparsers.add_parser('stats')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        with HeartbeatStore() as store:
+            rollups = RollupStore(store.conn)
+            ids = [int(i) for i in args.ids.split(',')] if getattr(args, 'ids', None) else None
+            if args.command == 'stats':
+                output = rollups.stats()
+            elif args.command == 'rebuild':
+                with store.conn:
+                    output = {'rebuilt': {str(m): rollups.rebuild(m) for m in ids or rollups.monitors()}}
+            else:
+                start = parse_range_time(args.start)
+                end = parse_range_time(args.end, round_up=True)
+                if end <= start:
+                    raise ValueError('"to" must be after "from"')
+                if args.command == 'report':
+                    if args.group is not None:
+                        ids = group_members(args.group)
+                    output = report(rollups, ids or rollups.monitors(), start, end, args.by)
+                else:
+                    now = time.time()
+                    output = {'from': format_beat_time(start), 'to': format_beat_time(end), 'monitors': {}}
+                    for monitor_id in ids or rollups.monitors():
+                        rolled = rollups.read_range(monitor_id, start, end, now).summary()
+                        raw = raw_summary(store.read_window(monitor_id, ''), start, end, now)
+                        output['monitors'][str(monitor_id)] = {'beats': raw['beats'], 'mismatches': compare_summaries(rolled, raw)}
+                    output['ok'] = not any(m['mismatches'] for m in output['monitors'].values())
+        output['success'] = True
+        output['queryMs'] = round((time.perf_counter() - started) * 1000, 1)
+        print(json.dumps(output))
+        if output.get('ok') is False:
+            sys.exit(1)
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': str(e)}))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
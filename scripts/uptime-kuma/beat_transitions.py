@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Status-transition index for incident queries.
+
+"When was this site down in the last 30 days, and for how long" should not
+mean scanning 43,200 beats. Next to the beats, the local heartbeat store
+(heartbeat_store.py) keeps one row per run of beats with the same status:
+a down run is an incident, an up run the time between failures, and
+pending and maintenance runs are kept the same way. A run starts at its
+first beat and ends at the first beat of the next run (the beat_aggregates.py
+incident definition); the last run of a monitor is open (no end yet).
+
+Rows are keyed by (monitor_id, start), so every point query is one B-tree
+seek, i.e. a binary search over the runs instead of a scan of the beats:
+
+- status at time T: the last run that started at or before T
+- incidents in a range: the down runs from the run holding the range start
+  to the range end
+- MTTR / MTBF over a set of monitors and a range
+
+A monitor that checks every 60 s and changes status a few times a day has a
+few runs a day against 1,440 beats. The index is updated in the same
+transaction as every merge of new beats; beats merged in before the last
+indexed one re-index the monitor from the run they fall in.
+
+  python3 beat_transitions.py status --ids 1,2 --at "2026-10-01 12:00"
+  python3 beat_transitions.py incidents --ids 1 --from 2026-09-01 --to 2026-10-01
+  python3 beat_transitions.py mttr --group 12 --from 2026-09-01 --to 2026-10-01
+  python3 beat_transitions.py rebuild [--ids 1,2]   # only from the beats compaction kept
+  python3 beat_transitions.py stats
+
+Times are UTC dates/datetimes or unix times.
+"""
+
+import sys
+import json
+import math
+import time
+import argparse
+
+from beat_aggregates import STATUS_DOWN, STATUS_MAINTENANCE, STATUS_PENDING, STATUS_UP, parse_beat_time
+
+STATUS_NAMES = {STATUS_DOWN: 'down', STATUS_UP: 'up', STATUS_PENDING: 'pending', STATUS_MAINTENANCE: 'maintenance'}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transitions (
+    monitor_id INTEGER NOT NULL,
+    started REAL NOT NULL,
+    status INTEGER NOT NULL,
+    ended REAL,
+    beats INTEGER NOT NULL,
+    last_beat TEXT NOT NULL,
+    PRIMARY KEY (monitor_id, started)
+) WITHOUT ROWID;
+"""
+
+COLUMNS = 'started, status, ended, beats, last_beat'
+
+
+def create_schema(conn):
+    """Create the transitions table (HeartbeatStore does, when it opens the database)."""
+    conn.executescript(SCHEMA)
+
+
+def run_output(row, now):
+    """A run row as returned by the queries; an open run lasts until now."""
+    from heartbeat_store import format_beat_time
+
+    started, status, ended, beats, _ = row
+    return {
+        'status': STATUS_NAMES.get(status, status),
+        'start': format_beat_time(started),
+        'end': None if ended is None else format_beat_time(ended),
+        'durationSeconds': (now if ended is None else ended) - started,
+        'beats': beats,
+        'ongoing': ended is None,
+    }
+
+
+class TransitionStore:
+    """The transitions table in the heartbeat store's database; shares its connection (and its transactions)."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def _open_run(self, monitor_id):
+        return self.conn.execute(
+            f'SELECT {COLUMNS} FROM transitions WHERE monitor_id = ? AND ended IS NULL', (monitor_id,)
+        ).fetchone()
+
+    def count_beats(self, monitor_id, since, until):
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM beats WHERE monitor_id = ? AND time >= ? AND time <= ?', (monitor_id, since, until)
+        ).fetchone()[0]
+
+    def before_merge(self, monitor_id, beats):
+        """
+        Call before merging beats into the store. Returns what after_merge()
+        needs to tell whether beats older than the last indexed one were added.
+        """
+        open_run = self._open_run(monitor_id)
+        times = [str(beat['time']) for beat in beats if beat.get('time')]
+        if open_run is None or not times or min(times) > open_run[4]:
+            return None
+        oldest = min(times)
+        return oldest, open_run[4], self.count_beats(monitor_id, oldest, open_run[4])
+
+    def after_merge(self, monitor_id, backfill):
+        """Index the beats merged in; re-index from the oldest new one if it predates the last indexed beat."""
+        if backfill is not None:
+            oldest, last_beat, count = backfill
+            if self.count_beats(monitor_id, oldest, last_beat) != count:
+                return self.rebuild(monitor_id, oldest)
+        return self.ingest(monitor_id)
+
+    def _write(self, monitor_id, run):
+        self.conn.execute(
+            f'INSERT OR REPLACE INTO transitions (monitor_id, {COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)',
+            (monitor_id,) + tuple(run)
+        )
+
+    def ingest(self, monitor_id, open_run=None):
+        """Extend the index with the stored beats after the last indexed one. Returns the number of beats."""
+        open_run = list(open_run or self._open_run(monitor_id) or ()) or None
+        rows = self.conn.execute(
+            'SELECT time, data FROM beats WHERE monitor_id = ? AND time > ? ORDER BY time',
+            (monitor_id, open_run[4] if open_run else '')
+        )
+        count = 0
+        for beat_time, data in rows:
+            status = int(json.loads(data).get('status', STATUS_PENDING))
+            count += 1
+            if open_run is not None and open_run[1] == status:
+                open_run[3] += 1
+                open_run[4] = beat_time
+                continue
+            t = parse_beat_time(beat_time)
+            if open_run is not None:
+                open_run[2] = t
+                self._write(monitor_id, open_run)
+            open_run = [t, status, None, 1, beat_time]
+        if count:
+            self._write(monitor_id, open_run)
+        return count
+
+    def rebuild(self, monitor_id, since=None):
+        """Re-index a monitor from the run holding `since` (a beat time; None: everything)."""
+        if since is None:
+            self.conn.execute('DELETE FROM transitions WHERE monitor_id = ?', (monitor_id,))
+            return self.ingest(monitor_id)
+
+        first = self.run_at(monitor_id, parse_beat_time(since))
+        if first is None:
+            return self.rebuild(monitor_id)
+        # Every new beat is in or after that run, so the runs before it stand;
+        # re-read its beats after the previous run's last one, keeping its
+        # start (compaction may have dropped its first beats)
+        previous = self.conn.execute(
+            'SELECT last_beat FROM transitions WHERE monitor_id = ? AND started < ? ORDER BY started DESC LIMIT 1',
+            (monitor_id, first[0])
+        ).fetchone()
+        self.conn.execute('DELETE FROM transitions WHERE monitor_id = ? AND started >= ?', (monitor_id, first[0]))
+        return self.ingest(monitor_id, [first[0], first[1], None, 0, previous[0] if previous else ''])
+
+    def run_at(self, monitor_id, t):
+        """The run holding time t (the last one started at or before it), or None before the first beat."""
+        return self.conn.execute(
+            f'SELECT {COLUMNS} FROM transitions WHERE monitor_id = ? AND started <= ? ORDER BY started DESC LIMIT 1',
+            (monitor_id, t)
+        ).fetchone()
+
+    def runs(self, monitor_id, start, end, status=None):
+        """The runs overlapping [start, end), oldest first, optionally of one status."""
+        first = self.run_at(monitor_id, start)
+        rows = self.conn.execute(
+            f'SELECT {COLUMNS} FROM transitions WHERE monitor_id = ? AND started >= ? AND started < ? '
+            'ORDER BY started',
+            (monitor_id, first[0] if first else start, end)
+        ).fetchall()
+        return [row for row in rows if status is None or row[1] == status]
+
+    def status_at(self, monitor_id, t, now=None):
+        """The status at time t with the run it belongs to; None before the first beat or after now."""
+        now = time.time() if now is None else now
+        row = self.run_at(monitor_id, t)
+        if row is None or t > now:
+            return None
+        return run_output(row, now)
+
+    def incidents(self, monitor_id, start, end, now=None):
+        """The down runs overlapping [start, end); durations are whole incidents, not clipped to the range."""
+        now = time.time() if now is None else now
+        return [run_output(row, now) for row in self.runs(monitor_id, start, end, STATUS_DOWN)]
+
+    def monitors(self):
+        return [row[0] for row in self.conn.execute('SELECT DISTINCT monitor_id FROM transitions ORDER BY monitor_id')]
+
+    def stats(self):
+        runs, monitors = self.conn.execute('SELECT COUNT(*), COUNT(DISTINCT monitor_id) FROM transitions').fetchone()
+        return {'transitionRuns': runs, 'transitionMonitors': monitors}
+
+
+def reliability(transitions, monitor_ids, start, end, now=None):
+    """
+    MTTR and MTBF over [start, end) across monitors, with time clipped to the
+    range and to the monitors' first beat and now:
+
+    - failures: incidents that started in the range
+    - MTTR: mean duration of the incidents that ended (were repaired) in the range
+    - MTBF: the time not down, divided by the failures
+    """
+    now = time.time() if now is None else now
+    end = min(end, now)
+    failures = 0
+    repairs = []
+    observed = []
+    downtime = []
+    for monitor_id in monitor_ids:
+        runs = transitions.runs(monitor_id, start, end)
+        if not runs:
+            continue
+        observed.append(end - max(start, runs[0][0]))
+        for started, status, ended, _, _ in runs:
+            if status != STATUS_DOWN:
+                continue
+            failures += start <= started
+            if ended is not None and ended <= end:
+                repairs.append(ended - started)
+            downtime.append(min(end if ended is None else ended, end) - max(started, start))
+    uptime = math.fsum(observed) - math.fsum(downtime)
+    return {
+        'monitors': len(monitor_ids),
+        'observedSeconds': math.fsum(observed),
+        'downtimeSeconds': math.fsum(downtime),
+        'failures': failures,
+        'repairs': len(repairs),
+        'mttrSeconds': math.fsum(repairs) / len(repairs) if repairs else None,
+        'mtbfSeconds': uptime / failures if failures else None,
+    }
+
+
+def parse_time(value):
+    """An ISO date or datetime (UTC unless it says otherwise) or unix time."""
+    return parse_beat_time(float(value) if value.replace('.', '', 1).isdigit() else value)
+
+
+def main():
+    from heartbeat_store import HeartbeatStore, format_beat_time
+    from beat_rollups import group_members
+
+    parser = argparse.ArgumentParser(description='Query the status-transition index of the heartbeat store.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name in ('status', 'incidents', 'mttr'):
+        sub = subparsers.add_parser(name)
+        sub.add_argument('--ids', help='comma-separated monitor IDs (default: every indexed monitor)')
+        sub.add_argument('--group', type=int, help='a group monitor; queries its child monitors')
+        if name == 'status':
+            sub.add_argument('--at', required=True, help='UTC date/datetime or unix time')
+        else:
+            sub.add_argument('--from', dest='start', required=True, help='UTC date/datetime or unix time')
+            sub.add_argument('--to', dest='end', help='UTC date/datetime or unix time (default: now)')
+    rebuild_parser = subparsers.add_parser('rebuild', help='Re-index monitors from the stored beats')
+    rebuild_parser.add_argument('--ids')
+    subparsers.add_parser('stats')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    try:
+        with HeartbeatStore() as store:
+            transitions = TransitionStore(store.conn)
+            ids = [int(i) for i in args.ids.split(',')] if getattr(args, 'ids', None) else None
+            if getattr(args, 'group', None) is not None:
+                ids = group_members(args.group)
+            ids = ids or transitions.monitors()
+            now = time.time()
+            if args.command == 'stats':
+                output = transitions.stats()
+                beats = store.stats()['beats']
+                output['beats'] = beats
+                output['runsPerBeat'] = output['transitionRuns'] / beats if beats else None
+            elif args.command == 'rebuild':
+                with store.conn:
+                    output = {'rebuilt': {str(m): transitions.rebuild(m) for m in ids}}
+            elif args.command == 'status':
+                at = parse_time(args.at)
+                output = {'at': format_beat_time(at), 'monitors': {str(m): transitions.status_at(m, at, now) for m in ids}}
+            else:
+                start = parse_time(args.start)
+                end = parse_time(args.end) if args.end else now
+                if end <= start:
+                    raise ValueError('"to" must be after "from"')
+                output = {'from': format_beat_time(start), 'to': format_beat_time(end)}
+                if args.command == 'incidents':
+                    output['monitors'] = {str(m): transitions.incidents(m, start, end, now) for m in ids}
+                else:
+                    output.update(reliability(transitions, ids, start, end, now))
+        output['success'] = True
+        output['queryMs'] = round((time.perf_counter() - started) * 1000, 1)
+        print(json.dumps(output))
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': str(e)}))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+Compact columnar wire format for beat payloads (get_monitor_beats.py "format": "columnar").
+
+Instead of an array of objects that repeats every key on every beat, a list
+of beats is encoded as one array per field:
+
+{
+  "version": 1,
+  "count": 3,
+  "fields": ["id", "monitor_id", "status", "ping", "msg", "time", ...],
+  "encodings": {"id": "delta", "time": "delta-ms", "msg": "dict", "important": "bool"},
+  "msgDict": ["200 - OK", "timeout of 48000ms exceeded"],
+  "columns": {
+    "id": [25, 1, 1],                          # first value, then differences
+    "monitor_id": [1, 1, 1],
+    "status": [1, 1, 0],
+    "ping": [201, 193, null],
+    "msg": [0, 0, 1],                          # indexes into msgDict
+    "time": [1671107922661, 60217, 60105],     # epoch ms, first value then differences
+    "important": [1, 0, 1],
+    ...
+  }
+}
+
+Encodings:
+- "delta": integers stored as the first value followed by successive differences
+- "delta-ms": beat times ('YYYY-MM-DD HH:MM:SS.mmm', UTC) as epoch milliseconds,
+  delta-encoded; decoded back to the same string format
+- "dict": strings stored once in msgDict and referenced by index (null stays null)
+- "bool": booleans as 0/1 (null stays null)
+- fields without an entry in "encodings" are stored as plain arrays
+
+A column only gets an encoding when every value fits it, so any beat list
+round-trips through decode_columnar(). Fields missing from a beat decode as
+absent.
+
+pack() turns the document into bytes: JSON (default) or MessagePack (needs the
+optional 'msgpack' package), optionally compressed with gzip or zlib.
+"""
+
+import base64
+import gzip
+import json
+import zlib
+from datetime import datetime, timezone
+
+from beat_aggregates import parse_beat_time
+
+WIRE_VERSION = 1
+
+# Marks a field that is missing from a beat (as opposed to present and null)
+_MISSING = object()
+
+
+def _format_ms(ms):
+    return datetime.fromtimestamp(ms / 1000, timezone.utc).strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
+
+
+def _delta_encode(values):
+    previous = 0
+    out = []
+    for value in values:
+        out.append(value - previous)
+        previous = value
+    return out
+
+
+def _delta_decode(values):
+    total = 0
+    out = []
+    for value in values:
+        total += value
+        out.append(total)
+    return out
+
+
+def _is_int(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _time_to_ms(value):
+    """Return epoch ms if value round-trips through the beat time format exactly, else None."""
+    if not isinstance(value, str):
+        return None
+    try:
+        ms = round(parse_beat_time(value) * 1000)
+    except ValueError:
+        return None
+    return ms if _format_ms(ms) == value else None
+
+
+def _encode_column(name, values, msg_dict, msg_index):
+    """Return (encoding, encoded values) for one column."""
+    if name == 'time':
+        times_ms = [_time_to_ms(v) for v in values]
+        if all(ms is not None for ms in times_ms):
+            return 'delta-ms', _delta_encode(times_ms)
+    if all(_is_int(v) for v in values):
+        if name in ('id', 'monitor_id'):
+            return 'delta', _delta_encode(values)
+        return None, values
+    if all(v is None or isinstance(v, bool) for v in values) and any(isinstance(v, bool) for v in values):
+        return 'bool', [None if v is None else int(v) for v in values]
+    if all(v is None or isinstance(v, str) for v in values) and any(isinstance(v, str) for v in values):
+        encoded = []
+        for v in values:
+            if v is None:
+                encoded.append(None)
+                continue
+            index = msg_index.get(v)
+            if index is None:
+                index = msg_index[v] = len(msg_dict)
+                msg_dict.append(v)
+            encoded.append(index)
+        return 'dict', encoded
+    return None, values
+
+
+def encode_columnar(beats):
+    """Encode a list of normalized beat dicts as a columnar document."""
+    fields = []
+    seen = set()
+    for beat in beats:
+        for key in beat:
+            if key not in seen:
+                seen.add(key)
+                fields.append(key)
+
+    msg_dict = []
+    msg_index = {}
+    encodings = {}
+    columns = {}
+    missing = {}
+    for field in fields:
+        values = [beat.get(field, _MISSING) for beat in beats]
+        absent = [i for i, v in enumerate(values) if v is _MISSING]
+        if absent:
+            missing[field] = absent
+            values = [None if v is _MISSING else v for v in values]
+        encoding, encoded = _encode_column(field, values, msg_dict, msg_index)
+        if encoding:
+            encodings[field] = encoding
+        columns[field] = encoded
+
+    document = {
+        'version': WIRE_VERSION,
+        'count': len(beats),
+        'fields': fields,
+        'encodings': encodings,
+        'msgDict': msg_dict,
+        'columns': columns,
+    }
+    if missing:
+        # Row indexes where a field was absent from the beat
+        document['missing'] = missing
+    return document
+
+
+def decode_columnar(document):
+    """Decode a columnar document back into a list of beat dicts."""
+    if document.get('version') != WIRE_VERSION:
+        raise ValueError(f"Unsupported columnar version: {document.get('version')}")
+
+    msg_dict = document.get('msgDict', [])
+    encodings = document.get('encodings', {})
+    decoded = {}
+    for field in document['fields']:
+        values = document['columns'][field]
+        encoding = encodings.get(field)
+        if encoding == 'delta':
+            values = _delta_decode(values)
+        elif encoding == 'delta-ms':
+            values = [_format_ms(ms) for ms in _delta_decode(values)]
+        elif encoding == 'dict':
+            values = [None if i is None else msg_dict[i] for i in values]
+        elif encoding == 'bool':
+            values = [None if v is None else bool(v) for v in values]
+        elif encoding is not None:
+            raise ValueError(f"Unknown column encoding {encoding!r} for field {field!r}")
+        decoded[field] = values
+
+    missing = {field: set(rows) for field, rows in document.get('missing', {}).items()}
+    beats = []
+    for row in range(document['count']):
+        beat = {}
+        for field in document['fields']:
+            if row not in missing.get(field, ()):
+                beat[field] = decoded[field][row]
+        beats.append(beat)
+    return beats
+
+
+def pack(document, encoding='json', compression=None):
+    """Serialize a document to bytes as JSON or MessagePack, optionally compressed."""
+    if encoding == 'json':
+        data = json.dumps(document, separators=(',', ':')).encode('utf-8')
+    elif encoding == 'msgpack':
+        try:
+            import msgpack
+        except ImportError:
+            raise ValueError("The 'msgpack' encoding needs the msgpack package (pip install msgpack)")
+        data = msgpack.packb(document, use_bin_type=True)
+    else:
+        raise ValueError(f"Unknown encoding {encoding!r}; expected 'json' or 'msgpack'")
+
+    if compression == 'gzip':
+        return gzip.compress(data, mtime=0)
+    if compression == 'zlib':
+        return zlib.compress(data)
+    if compression:
+        raise ValueError(f"Unknown compression {compression!r}; expected 'gzip' or 'zlib'")
+    return data
+
+
+def unpack(data, encoding='json', compression=None):
+    """Inverse of pack()."""
+    if compression == 'gzip':
+        data = gzip.decompress(data)
+    elif compression == 'zlib':
+        data = zlib.decompress(data)
+    if encoding == 'msgpack':
+        import msgpack
+        return msgpack.unpackb(data, raw=False)
+    return json.loads(data)
+
+
+def encode_output(beats, encoding='json', compression=None):
+    """
+    Build the JSON-safe output value for a beat list in columnar format.
+
+    Plain JSON without compression is embedded as-is; binary or compressed
+    payloads are base64-encoded so they fit in the script's JSON output.
+    """
+    document = encode_columnar(beats)
+    if encoding == 'json' and not compression:
+        return document
+    return {
+        'encoding': encoding,
+        'compression': compression,
+        'payload': base64.b64encode(pack(document, encoding, compression)).decode('ascii'),
+    }
+
+
+def decode_output(value):
+    """Inverse of encode_output(): return the list of beats."""
+    if 'payload' in value:
+        value = unpack(base64.b64decode(value['payload']), value.get('encoding', 'json'), value.get('compression'))
+    return decode_columnar(value)
@@ -0,0 +1,223 @@
+#!/usr/bin/env python3
+"""
+Short-lived results cache for get_monitor_beats.py.
+
+Several people looking at the same monitor start identical get_monitor_beats.py
+runs within seconds of each other. Normalized beats are therefore cached per
+(Uptime Kuma URL, monitor, hours) for UPTIME_KUMA_BEATS_CACHE_TTL seconds
+(default 10; 0 turns the cache off), in a SQLite file in the state directory
+shared by every script process. The cache holds at most
+UPTIME_KUMA_BEATS_CACHE_MAX_MB (default 64) of beats; the least recently used
+entries are evicted first.
+
+Identical requests in flight are coalesced: the first process to miss a key
+claims it (an flock on a per-key lock file, removed when the claim is released)
+until it has stored the result. Processes that miss the same key meanwhile wait
+for the claim, up to UPTIME_KUMA_BEATS_CACHE_WAIT seconds, and then read the
+stored result instead of opening their own session. If the claimant fails, the
+next waiter fetches.
+
+Requests choose with "cache": false (skip the cache) and report what
+happened under "cache":
+  {"status": "hit", "ageMs": 2310.4}          single monitor
+  {"status": "coalesced", "waitMs": 412.9}
+  {"hits": 3, "coalesced": 1, "misses": 2}      several monitors
+"""
+
+import json
+import os
+import threading
+import time
+
+from kuma_common import acquire_file_lock, get_state_dir, log, release_file_lock
+
+CACHE_TTL = float(os.getenv('UPTIME_KUMA_BEATS_CACHE_TTL', '10'))
+CACHE_MAX_BYTES = int(float(os.getenv('UPTIME_KUMA_BEATS_CACHE_MAX_MB', '64')) * 1024 * 1024)
+CACHE_WAIT = float(os.getenv('UPTIME_KUMA_BEATS_CACHE_WAIT', '30'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    saved_at REAL NOT NULL,
+    used_at REAL NOT NULL,
+    size INTEGER NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_used_at ON entries (used_at);
+"""
+
+
+def cache_enabled(input_data):
+    """The cache is used unless the request sets "cache": false or the TTL is 0."""
+    if isinstance(input_data, dict) and 'cache' in input_data and not input_data['cache']:
+        return False
+    return CACHE_TTL > 0
+
+
+class BeatsCache:
+    """
+    Cross-process beats cache with in-flight coalescing. One instance may be
+    shared by the threads of one request.
+    """
+
+    def __init__(self, api_url, ttl=None, max_bytes=None, path=None):
+        # Imported here so scripts that skip the cache start faster
+        import sqlite3
+
+        self.api_url = api_url.rstrip('/')
+        self.ttl = CACHE_TTL if ttl is None else ttl
+        self.max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.path = str(path or get_state_dir() / 'beats-cache.sqlite3')
+        self.conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        self.lock_dir = get_state_dir() / 'beats-cache-locks'
+        self.lock_dir.mkdir(mode=0o700, exist_ok=True)
+        # Guards the connection, the counters and the dicts below across threads
+        self.lock = threading.Lock()
+        self.memo = {}
+        self.claims = {}
+        self.counts = {'hits': 0, 'coalesced': 0, 'misses': 0}
+        self.last = None
+
+    def close(self):
+        for key, fd in self.claims.items():
+            release_file_lock(self._lock_path(key), fd)
+        self.claims.clear()
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _key(self, monitor_id, hours):
+        import hashlib
+
+        raw = f'{self.api_url}|{int(monitor_id)}|{float(hours):g}'
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+    def _get(self, key):
+        """Return (beats, age_seconds) for a fresh entry, or (None, None)."""
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT saved_at, data FROM entries WHERE key = ? AND saved_at >= ?', (key, now - self.ttl)
+            ).fetchone()
+            if row is None:
+                return None, None
+            with self.conn:
+                self.conn.execute('UPDATE entries SET used_at = ? WHERE key = ?', (now, key))
+        return json.loads(row[1]), now - row[0]
+
+    def _put(self, key, beats):
+        """Store an entry, then drop expired entries and the least recently used ones over the size bound."""
+        data = json.dumps(beats, default=str)
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                'INSERT OR REPLACE INTO entries (key, saved_at, used_at, size, data) VALUES (?, ?, ?, ?, ?)',
+                (key, now, now, len(data), data)
+            )
+            self.conn.execute('DELETE FROM entries WHERE saved_at < ?', (now - self.ttl,))
+            total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM entries').fetchone()[0]
+            if total > self.max_bytes:
+                evict = []
+                for old_key, size in self.conn.execute('SELECT key, size FROM entries ORDER BY used_at'):
+                    if total <= self.max_bytes:
+                        break
+                    evict.append((old_key,))
+                    total -= size
+                self.conn.executemany('DELETE FROM entries WHERE key = ?', evict)
+
+    def _lock_path(self, key):
+        return self.lock_dir / f'{key}.lock'
+
+    def _claim(self, key, timeout):
+        """
+        Take the per-key fetch claim. Returns (fd, waited_ms); fd is None when
+        the claim could not be taken within `timeout`.
+        """
+        started = time.perf_counter()
+        fd = acquire_file_lock(self._lock_path(key), timeout)
+        return fd, (time.perf_counter() - started) * 1000
+
+    def _record(self, status, **info):
+        with self.lock:
+            self.counts[{'hit': 'hits', 'coalesced': 'coalesced', 'miss': 'misses'}[status]] += 1
+            self.last = dict(status=status, **{k: round(v, 1) for k, v in info.items()})
+
+    def _lookup(self, key):
+        """
+        Look the key up, waiting for another process's fetch of it if one is
+        in flight. Returns (beats, status, info, fd): beats on a hit, otherwise
+        the claim to fetch under (fd is None if the wait timed out).
+        """
+        beats, age = self._get(key)
+        if beats is not None:
+            return beats, 'hit', {'ageMs': age * 1000}, None
+        fd, waited_ms = self._claim(key, CACHE_WAIT)
+        if fd is None:
+            log('beats_cache', f"Gave up waiting for another fetch after {CACHE_WAIT:g} s, fetching", level=2)
+            return None, None, None, None
+        # Whoever held the claim has stored its result by now
+        beats, age = self._get(key)
+        if beats is None:
+            return None, None, None, fd
+        release_file_lock(self._lock_path(key), fd)
+        if waited_ms >= 1:
+            return beats, 'coalesced', {'waitMs': waited_ms}, None
+        return beats, 'hit', {'ageMs': age * 1000}, None
+
+    def prefetch(self, monitor_id, hours, claim=True):
+        """
+        Make the beats available to the next fetch() without fetching anything:
+        True on a hit, or (with claim=True) after waiting for another process's
+        fetch of the same key. Otherwise returns False, keeping the claim for
+        the fetch() that follows.
+        """
+        key = self._key(monitor_id, hours)
+        if not claim:
+            beats, age = self._get(key)
+            if beats is None:
+                return False
+            self.memo[key] = (beats, 'hit', {'ageMs': age * 1000})
+            return True
+        beats, status, info, fd = self._lookup(key)
+        if beats is None:
+            if fd is not None:
+                self.claims[key] = fd
+            return False
+        self.memo[key] = (beats, status, info)
+        return True
+
+    def fetch(self, monitor_id, hours, load):
+        """Return the cached beats for the key, or call load() (coalesced with other processes) and cache them."""
+        key = self._key(monitor_id, hours)
+        with self.lock:
+            memo = self.memo.pop(key, None)
+            fd = self.claims.pop(key, None)
+        if memo is None and fd is None:
+            beats, status, info, fd = self._lookup(key)
+            if beats is not None:
+                memo = (beats, status, info)
+        if memo is not None:
+            beats, status, info = memo
+            self._record(status, **info)
+            return beats
+        try:
+            beats = load()
+            self._put(key, beats)
+        finally:
+            if fd is not None:
+                release_file_lock(self._lock_path(key), fd)
+        self._record('miss')
+        return beats
+
+    def report(self, single):
+        """The "cache" block of a request's output."""
+        if single:
+            return self.last
+        return dict(self.counts)
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark for the Uptime Kuma scripts.
+
+Starts fake_kuma_server.py (or uses --url), then runs add_monitor.py,
+update_monitor.py, get_monitor_beats.py and delete_monitor.py as one-shot
+processes, `--runs` times per scenario with up to `--concurrency` processes at
+once. get_monitor_beats.py runs once per beat window in `--hours`.
+
+For every scenario it reports:
+- latencyMs: p50/p90/p95/p99/max wall time of one script process
+- throughputPerSec: completed calls per second of scenario wall time
+- peakRssMb: highest peak RSS of any of its processes
+- phasesMs: median of each phase from the scripts' own "timings" block
+- errors: calls that exited non-zero or printed "success": false
+
+Monitors for the update, beats and delete scenarios are created up front with
+one unmeasured batch add_monitor.py call, and the monitors the benchmark
+created are deleted again at the end.
+
+Usage:
+  python3 bench_kuma.py [--runs 20] [--concurrency 1,4,8] [--hours 1,24,168]
+                        [--latency-ms 20] [--jitter-ms 5] [--beat-interval 60]
+                        [--scripts add_monitor,update_monitor,get_monitor_beats,delete_monitor]
+                        [--beats-options '{"format": "columnar"}'] [--output report.json]
+
+--url runs against an existing Uptime Kuma instead (credentials from
+UPTIME_KUMA_USERNAME / UPTIME_KUMA_PASSWORD). Only point it at a staging
+instance: the benchmark adds, edits and deletes monitors.
+"""
+
+import sys
+import json
+import os
+import time
+import argparse
+import shutil
+import statistics
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+
+SCRIPTS = ['add_monitor', 'update_monitor', 'get_monitor_beats', 'delete_monitor']
+
+# Monitors the update scenario cycles through
+UPDATE_POOL_SIZE = 10
+
+PHASES = ['interpreterStartMs', 'admissionMs', 'connectMs', 'loginMs', 'operationMs', 'serializationMs', 'totalMs']
+
+
+def parse_list(value, cast=int):
+    return [cast(v) for v in value.split(',') if v.strip()]
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def start_fake_server(args):
+    """Start fake_kuma_server.py on a free port and return (process, url)."""
+    process = subprocess.Popen(
+        [
+            sys.executable, str(SCRIPT_DIR / 'fake_kuma_server.py'), '--port', '0',
+            '--username', args.username, '--password', args.password,
+            '--latency-ms', str(args.latency_ms), '--jitter-ms', str(args.jitter_ms),
+            '--beat-interval', str(args.beat_interval),
+        ],
+        stdout=subprocess.PIPE, text=True
+    )
+    line = process.stdout.readline()
+    try:
+        return process, json.loads(line)['url']
+    except (ValueError, KeyError):
+        process.kill()
+        raise RuntimeError(f'Fake Uptime Kuma server did not start: {line!r}')
+
+
+def run_script(script, payload, env):
+    """
+    Run one script with a JSON payload. Returns (wall_ms, peak_rss_kb, output).
+
+    The child is reaped with os.wait4 so its peak RSS comes from the kernel.
+    """
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, str(SCRIPT_DIR / f'{script}.py')],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, env=env
+    )
+    process.stdin.write(json.dumps(payload).encode('utf-8'))
+    process.stdin.close()
+    stdout = process.stdout.read()
+    process.stdout.close()
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    wall_ms = (time.perf_counter() - started) * 1000
+
+    try:
+        output = json.loads(stdout)
+    except ValueError:
+        output = {'success': False, 'error': stdout[-500:].decode('utf-8', 'replace')}
+    if process.returncode != 0:
+        output['success'] = False
+    # ru_maxrss is in kilobytes on Linux
+    return wall_ms, usage.ru_maxrss, output
+
+
+def run_scenario(name, script, payloads, concurrency, env):
+    """Run the script once per payload, `concurrency` at a time, and summarize."""
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda payload: run_script(script, payload, env), payloads))
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(wall_ms for wall_ms, _, _ in results)
+    errors = [output.get('error') for _, _, output in results if not output.get('success')]
+    phases = {}
+    for phase in PHASES:
+        values = [output['timings'][phase] for _, _, output in results
+                  if isinstance(output.get('timings'), dict) and output['timings'].get(phase) is not None]
+        if values:
+            phases[phase] = round(statistics.median(values), 1)
+
+    summary = {
+        'scenario': name,
+        'script': script,
+        'concurrency': concurrency,
+        'runs': len(results),
+        'errors': len(errors),
+        'latencyMs': {
+            'p50': round(percentile(latencies, 50), 1),
+            'p90': round(percentile(latencies, 90), 1),
+            'p95': round(percentile(latencies, 95), 1),
+            'p99': round(percentile(latencies, 99), 1),
+            'max': round(latencies[-1], 1),
+        },
+        'throughputPerSec': round(len(results) / elapsed, 2),
+        'peakRssMb': round(max(rss for _, rss, _ in results) / 1024, 1),
+        'phasesMs': phases,
+    }
+    if errors:
+        summary['firstError'] = errors[0]
+    return summary, [output for _, _, output in results]
+
+
+def print_progress(summary):
+    print(f"[bench_kuma] {summary['scenario']}: p50 {summary['latencyMs']['p50']} ms, "
+          f"{summary['throughputPerSec']}/s, peak RSS {summary['peakRssMb']} MB, {summary['errors']} errors",
+          file=sys.stderr)
+
+
+def batch_call(script, items, env):
+    """One unmeasured batch call (setup and cleanup)."""
+    _, _, output = run_script(script, {'items': items, 'concurrency': 8}, env)
+    if not output.get('success'):
+        raise RuntimeError(f"{script} batch failed: {output.get('error')}")
+    return output.get('results', [])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the Uptime Kuma scripts against a fake Uptime Kuma server.')
+    parser.add_argument('--runs', type=int, default=20, help='Calls per scenario')
+    parser.add_argument('--concurrency', type=parse_list, default=[1, 4, 8], help='Comma-separated process counts')
+    parser.add_argument('--hours', type=parse_list, default=[1, 24, 168], help='Comma-separated beat windows')
+    parser.add_argument('--scripts', type=lambda v: parse_list(v, str), default=SCRIPTS)
+    parser.add_argument('--latency-ms', type=float, default=20.0)
+    parser.add_argument('--jitter-ms', type=float, default=5.0)
+    parser.add_argument('--beat-interval', type=int, default=60)
+    parser.add_argument('--beats-options', type=json.loads, default={},
+                        help='Extra get_monitor_beats.py input, e.g. \'{"format": "columnar"}\'')
+    parser.add_argument('--url', help='Benchmark an existing Uptime Kuma instead of the fake server')
+    parser.add_argument('--username', default=os.getenv('UPTIME_KUMA_USERNAME', 'admin'))
+    parser.add_argument('--password', default=os.getenv('UPTIME_KUMA_PASSWORD', 'admin123'))
+    parser.add_argument('--output', help='Also write the report to this file')
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        url = args.url
+    else:
+        server, url = start_fake_server(args)
+
+    state_dir = tempfile.mkdtemp(prefix='kuma-bench-')
+    env = dict(os.environ)
+    env.update({
+        'UPTIME_KUMA_API_URL': url,
+        'UPTIME_KUMA_USERNAME': args.username,
+        'UPTIME_KUMA_PASSWORD': args.password,
+        # Token cache, snapshots and markers start empty and stay out of the real state directory
+        'UPTIME_KUMA_STATE_DIR': state_dir,
+        'UPTIME_KUMA_VERBOSITY': '0',
+    })
+    # Every run sends the same request, so the beats cache would answer all but the first
+    env.setdefault('UPTIME_KUMA_BEATS_CACHE_TTL', '0')
+    env.pop('UPTIME_KUMA_METRICS_FILE', None)
+    env.pop('UPTIME_KUMA_PROFILE_DIR', None)
+
+    created = []
+    scenarios = []
+    try:
+        delete_count = args.runs * len(args.concurrency) if 'delete_monitor' in args.scripts else 0
+        setup = batch_call('add_monitor', [
+            {'name': f'bench-pool-{i}', 'url': f'https://bench.example/pool/{i}', 'type': 'https'}
+            for i in range(UPDATE_POOL_SIZE + delete_count)
+        ], env)
+        pool = [result['monitorID'] for result in setup if result.get('success')]
+        created += pool
+        update_pool, delete_pool = pool[:UPDATE_POOL_SIZE], pool[UPDATE_POOL_SIZE:]
+
+        call = 0
+        for script in args.scripts:
+            for concurrency in args.concurrency:
+                if script == 'add_monitor':
+                    payloads = [{'name': f'bench-add-{call + i}', 'url': f'https://bench.example/add/{call + i}', 'type': 'https'}
+                                for i in range(args.runs)]
+                elif script == 'update_monitor':
+                    # A new interval every call, so no update is skipped as a no-op
+                    payloads = [{'id': update_pool[i % len(update_pool)], 'heartbeatInterval': 30 + call + i}
+                                for i in range(args.runs)]
+                elif script == 'delete_monitor':
+                    payloads = [{'id': delete_pool.pop()} for _ in range(args.runs)]
+                elif script == 'get_monitor_beats':
+                    for hours in args.hours:
+                        payload = dict(args.beats_options, id=update_pool[0], hours=hours)
+                        summary, _ = run_scenario(f'{script} c={concurrency} hours={hours}', script,
+                                                  [payload] * args.runs, concurrency, env)
+                        summary['hours'] = hours
+                        scenarios.append(summary)
+                        print_progress(summary)
+                    continue
+                else:
+                    raise ValueError(f'Unknown script: {script}')
+                call += args.runs
+
+                summary, outputs = run_scenario(f'{script} c={concurrency}', script, payloads, concurrency, env)
+                if script == 'add_monitor':
+                    created += [output['monitorID'] for output in outputs if output.get('monitorID')]
+                elif script == 'delete_monitor':
+                    deleted = {payload['id'] for payload in payloads}
+                    created = [monitor_id for monitor_id in created if monitor_id not in deleted]
+                scenarios.append(summary)
+                print_progress(summary)
+    finally:
+        try:
+            if created:
+                batch_call('delete_monitor', [{'id': monitor_id} for monitor_id in created], env)
+        except Exception as e:
+            print(f'[bench_kuma] Cleanup failed: {e}', file=sys.stderr)
+        if server is not None:
+            server.terminate()
+            server.wait()
+        shutil.rmtree(state_dir, ignore_errors=True)
+
+    report = {
+        'success': all(s['errors'] == 0 for s in scenarios),
+        'server': 'fake' if server is not None else url,
+        'latencyMs': args.latency_ms if server is not None else None,
+        'beatInterval': args.beat_interval if server is not None else None,
+        'runs': args.runs,
+        'scenarios': scenarios,
+    }
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + '\n')
+    if not report['success']:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
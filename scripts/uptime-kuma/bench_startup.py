@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the Uptime Kuma scripts.
+
+Starts a fresh interpreter that imports each script (its module-level code,
+not main()) several times and records the median wall time. That is the
+fixed cost every one-shot call pays before it reads stdin. An empty
+interpreter is measured as well, so the import share can be read off.
+
+Fails (exit code 1) when a script's median exceeds the budget, given by
+--budget-ms or UPTIME_KUMA_STARTUP_BUDGET_MS (default 250).
+
+Usage:
+  python3 bench_startup.py [--runs 10] [--budget-ms 250] [--importtime]
+
+--importtime adds the slowest imports (python -X importtime, self time) for
+each script that is over budget.
+"""
+
+import sys
+import json
+import os
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+SCRIPT_DIR = Path(__file__).parent
+
+SCRIPTS = ['add_monitor', 'update_monitor', 'delete_monitor', 'get_monitor_beats', 'list_monitors', 'reconcile_monitors',
+           'subscribe_beats']
+
+DEFAULT_BUDGET_MS = float(os.getenv('UPTIME_KUMA_STARTUP_BUDGET_MS', '250'))
+
+
+def time_command(args, runs):
+    """Run a command `runs` times (after one warm-up run) and return the wall times in ms."""
+    timings = []
+    for i in range(runs + 1):
+        started = time.perf_counter()
+        subprocess.run(args, cwd=SCRIPT_DIR, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        elapsed = (time.perf_counter() - started) * 1000
+        # The first run fills the bytecode and OS file caches
+        if i > 0:
+            timings.append(elapsed)
+    return timings
+
+
+def slowest_imports(module, limit=5):
+    """Return the modules with the highest self import time, from python -X importtime."""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SCRIPT_DIR, capture_output=True, text=True
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|', 2)
+        rows.append((int(self_us), name.strip()))
+    rows.sort(reverse=True)
+    return [{'module': name, 'selfMs': round(self_us / 1000, 1)} for self_us, name in rows[:limit]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure interpreter + import time of the Uptime Kuma scripts.')
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument('--importtime', action='store_true', help='Show the slowest imports of scripts over budget')
+    parser.add_argument('scripts', nargs='*', default=SCRIPTS)
+    args = parser.parse_args()
+
+    interpreter_ms = statistics.median(time_command([sys.executable, '-c', 'pass'], args.runs))
+
+    results = {}
+    over_budget = []
+    for script in args.scripts:
+        timings = time_command([sys.executable, '-c', f'import {script}'], args.runs)
+        median_ms = statistics.median(timings)
+        results[script] = {
+            'medianMs': round(median_ms, 1),
+            'maxMs': round(max(timings), 1),
+            'importMs': round(median_ms - interpreter_ms, 1),
+        }
+        if median_ms > args.budget_ms:
+            over_budget.append(script)
+            if args.importtime:
+                results[script]['slowestImports'] = slowest_imports(script)
+
+    print(json.dumps({
+        'success': not over_budget,
+        'budgetMs': args.budget_ms,
+        'runs': args.runs,
+        'interpreterMs': round(interpreter_ms, 1),
+        'scripts': results,
+        'overBudget': over_budget,
+    }, indent=2))
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -18,11 +18,23 @@ or on error:
   "success": false,
   "error": "Error message"
 }
+
+Batch mode: pass a JSON array such as [{"id": 1}, {"id": 2}] (or
+{"items": [...], "concurrency": 4}) to delete them all over one authenticated
+session. The output then has a per-item "results" array and "batch" timing
+totals; a failing item does not fail the batch.
+Add "async": true (or set UPTIME_KUMA_ASYNC=true) to send the batch from one
+asyncio event loop instead of a thread per in-flight call (see kuma_async.py);
+"callTimeout" sets a per-call timeout in seconds. The output is the same.
+
+With several Uptime Kuma instances in UPTIME_KUMA_SHARDS, "id" is a global
+monitor ID and each delete goes to the shard holding it (see kuma_shards.py).
+
+The run() function is also used by kuma_worker.py to serve delete requests
+over a long-lived session.
 """
 
 import sys
-import json
-import os
 from pathlib import Path
 
 # Add .python-packages directory to Python path (for Render deployment)
@@ -32,41 +44,121 @@ python_packages_path = project_root / '.python-packages'
 if python_packages_path.exists():
     sys.path.insert(0, str(python_packages_path))
 
-from uptime_kuma_api import UptimeKumaApi
+from kuma_common import get_batch, log_diagnostics, open_session, run_batch
+from kuma_async import async_enabled, get_call_timeout, run_batch_async
+from kuma_metrics import RunTimer, run_main
+from kuma_shards import sharding_enabled
+
+def run(api, input_data):
+    """Delete a monitor over an authenticated session and return the JSON output dict."""
+    # Validate required fields
+    if 'id' not in input_data:
+        raise ValueError('Monitor ID is required')
+    
+    monitor_id = int(input_data['id'])
+    
+    # Delete monitor
+    result = api.delete_monitor(monitor_id)
+    forget_monitor(api.url, monitor_id)
+    return delete_output(result)
+
+async def run_async(client, input_data):
+    """The same as run(), over a kuma_async.AsyncKumaClient."""
+    if 'id' not in input_data:
+        raise ValueError('Monitor ID is required')
+    result = await client.delete_monitor(int(input_data['id']))
+    forget_monitor(client.api.url, input_data['id'])
+    return delete_output(result)
+
+def forget_monitor(api_url, monitor_id):
+    """Drop a deleted monitor from the key index idempotent adds use (see monitor_index.py)."""
+    from monitor_index import MonitorIndex
+    
+    with MonitorIndex(api_url) as index:
+        index.forget(monitor_id)
+
+def delete_output(result):
+    """The JSON output dict for the result of a 'deleteMonitor' call."""
+    return {
+        'success': True,
+        'message': result.get('msg', 'Monitor deleted successfully') if isinstance(result, dict) else 'Monitor deleted successfully'
+    }
+
+def run_sharded(input_data, items, concurrency):
+    """Delete monitors on the shards that hold them; "id" is a global monitor ID (see kuma_shards.py)."""
+    from kuma_shards import resolve_monitor_id, run_sharded_batch
+    
+    def route(item):
+        if not isinstance(item, dict) or 'id' not in item:
+            raise ValueError('Monitor ID is required')
+        shard, monitor_id = resolve_monitor_id(item['id'])
+        return shard, dict(item, id=monitor_id)
+    
+    def run_group(api, shard_items):
+        if async_enabled(input_data):
+            return run_batch_async(api, shard_items, run_async, concurrency, tag='delete_monitor',
+                                   timeout=get_call_timeout(input_data))
+        return run_batch(api, shard_items, run, concurrency, tag='delete_monitor')
+    
+    return run_sharded_batch('delete_monitor', items, route, run_group, timeout=10, max_login_retries=1)
+
+def prepare(input_data):
+    """Validate a request before connecting; returns the (items, concurrency) plan execute() runs."""
+    # A JSON array (or {"items": [...]}) runs every item over one session
+    items, concurrency = get_batch(input_data)
+    
+    # Validate required fields before connecting
+    if items is None and 'id' not in input_data:
+        raise ValueError('Monitor ID is required')
+    return items, concurrency
+
+def execute(api, input_data, plan):
+    """Run a prepare()d request over an authenticated session and return the JSON output dict."""
+    items, concurrency = plan
+    if items is None:
+        return run(api, input_data)
+    if async_enabled(input_data):
+        return run_batch_async(api, items, run_async, concurrency, tag='delete_monitor',
+                               timeout=get_call_timeout(input_data))
+    return run_batch(api, items, run, concurrency, tag='delete_monitor')
+
+def run_request(api, input_data):
+    """A single or batch request over an open session, exactly as main() runs it (used by kuma_worker.py)."""
+    return execute(api, input_data, prepare(input_data))
 
 def main():
+    timer = RunTimer('delete_monitor')
     try:
         # Read JSON from stdin
-        input_data = json.load(sys.stdin)
+        input_data = timer.read_input()
         
-        # Validate required fields
-        if 'id' not in input_data:
-            raise ValueError('Monitor ID is required')
+        plan = prepare(input_data)
+        items, concurrency = plan
         
-        monitor_id = int(input_data['id'])
+        # Debug diagnostics (UPTIME_KUMA_VERBOSITY=2), never password material
+        log_diagnostics('delete_monitor')
         
-        # Get environment variables
-        api_url = os.getenv('UPTIME_KUMA_API_URL', 'http://localhost:3003')
-        username = os.getenv('UPTIME_KUMA_USERNAME', 'admin')
-        password = os.getenv('UPTIME_KUMA_PASSWORD', 'admin123')
-        # api_key is not used for Socket.io authentication (only for REST endpoints)
+        # With several Uptime Kuma instances, each delete goes to the shard holding the monitor
+        if sharding_enabled():
+            from kuma_shards import single_result
+            
+            with timer.phase('operation'):
+                if items is None:
+                    output = single_result(run_sharded(input_data, [input_data], 1))
+                else:
+                    output = run_sharded(input_data, items, concurrency)
+            print(timer.emit(output))
+            return
         
         # Connect to Uptime Kuma
-        with UptimeKumaApi(api_url) as api:
-            # Authenticate using username/password
-            # Note: API keys are for REST endpoints only, not Socket.io
-            # login_by_token() requires a JWT token from a previous login session
-            api.login(username, password)
-            
-            # Delete monitor
-            result = api.delete_monitor(monitor_id)
-            
-            # Output success result
-            output = {
-                'success': True,
-                'message': result.get('msg', 'Monitor deleted successfully') if isinstance(result, dict) else 'Monitor deleted successfully'
-            }
-            print(json.dumps(output))
+        # Note: API keys are for REST endpoints only, not Socket.io
+        # login_by_token() requires a JWT token from a previous login session
+        api, session = open_session('delete_monitor', timeout=10, max_login_retries=1, timer=timer)
+        with api:
+            with timer.phase('operation'):
+                output = execute(api, input_data, plan)
+            output.update(session)
+            print(timer.emit(output))
             
     except Exception as e:
         # Output error result
@@ -74,9 +166,9 @@ def main():
             'success': False,
             'error': str(e)
         }
-        print(json.dumps(error_output))
+        print(timer.emit(error_output))
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
+    run_main('delete_monitor', main)
 
@@ -0,0 +1,433 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for an Uptime Kuma server, for benchmarks and offline testing.
+
+Speaks the subset of the Uptime Kuma Socket.io protocol the scripts use:
+login, loginByToken, add, editMonitor, getMonitor, deleteMonitor and
+getMonitorBeats, plus the info and monitorList pushes that follow a login and
+every change. With --live-interval it also pushes a heartbeat event per
+monitor every N seconds, and a heartbeatList of recent beats after login. GET /api/entry-page answers 200, so the Render readiness probe
+works against it too. State is kept in memory and lost on exit.
+
+Usage:
+  python3 fake_kuma_server.py [--port 3099] [--latency-ms 20] [--jitter-ms 5]
+                              [--beat-interval 60] [--seed-monitors 50]
+                              [--live-interval 5]
+
+Point the scripts at it with UPTIME_KUMA_API_URL=http://127.0.0.1:3099 and the
+--username/--password it was started with (admin/admin123 by default).
+
+- --latency-ms / --jitter-ms: delay added to every acknowledged call, to
+  stand in for network round trips and database work on the real server.
+- --beat-interval: seconds between generated heartbeats, so a getMonitorBeats
+  call for H hours returns H * 3600 / interval beats per monitor.
+- --seed-monitors: number of HTTP monitors (IDs 1..N) to start with.
+- --live-interval: seconds between live heartbeat pushes (0, the default,
+  pushes none).
+
+Once listening it prints one JSON line to stdout:
+{"listening": true, "url": "http://127.0.0.1:3099"}
+so a harness started with --port 0 can read the chosen port.
+"""
+
+import sys
+import json
+import argparse
+import base64
+import random
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import ServerHandler, WSGIRequestHandler, WSGIServer, make_server
+
+# Add .python-packages directory to Python path (for Render deployment)
+# This ensures python-socketio is found even if PYTHONPATH isn't set correctly
+project_root = Path(__file__).parent.parent.parent
+python_packages_path = project_root / '.python-packages'
+if python_packages_path.exists():
+    sys.path.insert(0, str(python_packages_path))
+
+import socketio
+
+SERVER_VERSION = '1.23.16'
+
+# Every field a monitor row has in Uptime Kuma 1.23, with its default value
+MONITOR_DEFAULTS = {
+    'accepted_statuscodes': ['200-299'],
+    'active': 1,
+    'authDomain': None,
+    'authMethod': None,
+    'authWorkstation': None,
+    'basic_auth_pass': None,
+    'basic_auth_user': None,
+    'body': None,
+    'childrenIDs': [],
+    'conditions': [],
+    'databaseConnectionString': None,
+    'databaseQuery': None,
+    'description': None,
+    'dns_last_result': None,
+    'dns_resolve_server': '1.1.1.1',
+    'dns_resolve_type': 'A',
+    'docker_container': None,
+    'docker_host': None,
+    'expiryNotification': False,
+    'forceInactive': False,
+    'game': None,
+    'gamedigGivenPortOnly': True,
+    'grpcBody': None,
+    'grpcEnableTls': False,
+    'grpcMetadata': None,
+    'grpcMethod': None,
+    'grpcProtobuf': None,
+    'grpcServiceName': None,
+    'grpcUrl': None,
+    'headers': None,
+    'hostname': None,
+    'httpBodyEncoding': 'json',
+    'ignoreTls': False,
+    'includeSensitiveData': True,
+    'interval': 60,
+    'invertKeyword': False,
+    'keyword': None,
+    'maintenance': False,
+    'maxredirects': 10,
+    'maxretries': 0,
+    'method': 'GET',
+    'mqttPassword': '',
+    'mqttSuccessMessage': '',
+    'mqttTopic': '',
+    'mqttUsername': '',
+    'notificationIDList': {},
+    'oauth_auth_method': None,
+    'oauth_client_id': None,
+    'oauth_client_secret': None,
+    'oauth_scopes': None,
+    'oauth_token_url': None,
+    'packetSize': 56,
+    'parent': None,
+    'port': None,
+    'proxyId': None,
+    'pushToken': None,
+    'radiusCalledStationId': None,
+    'radiusCallingStationId': None,
+    'radiusPassword': None,
+    'radiusSecret': None,
+    'radiusUsername': None,
+    'resendInterval': 0,
+    'retryInterval': 60,
+    'tags': [],
+    'timeout': 48,
+    'tlsCa': None,
+    'tlsCert': None,
+    'tlsKey': None,
+    'type': 'http',
+    'upsideDown': False,
+    'url': 'https://',
+    'weight': 2000,
+}
+
+
+class FakeKuma:
+    """In-memory monitors, sessions and generated heartbeats."""
+
+    def __init__(self, username='admin', password='admin123', latency_ms=0.0, jitter_ms=0.0,
+                 beat_interval=60, seed_monitors=0, live_interval=0.0):
+        self.username = username
+        self.password = password
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.beat_interval = max(1, int(beat_interval))
+        self.live_interval = live_interval
+        self.lock = threading.Lock()
+        self.monitors = {}
+        self.next_id = 1
+        self.tokens = set()
+        self.logged_in = set()
+        self.calls = {}
+        for i in range(seed_monitors):
+            self.create_monitor({'name': f'seed-{i + 1}', 'url': f'https://example.com/{i + 1}'})
+
+    def delay(self):
+        """Stand-in for the round trip and database work of a real call."""
+        ms = self.latency_ms + (random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0)
+        if ms > 0:
+            time.sleep(ms / 1000)
+
+    def count(self, event):
+        with self.lock:
+            self.calls[event] = self.calls.get(event, 0) + 1
+
+    def create_monitor(self, data):
+        with self.lock:
+            monitor_id = self.next_id
+            self.next_id += 1
+            monitor = dict(MONITOR_DEFAULTS)
+            monitor.update({k: v for k, v in data.items() if k != 'id'})
+            monitor['id'] = monitor_id
+            monitor['pathName'] = monitor.get('name')
+            self.monitors[monitor_id] = monitor
+            return monitor_id
+
+    def monitor_list(self):
+        with self.lock:
+            return {str(monitor_id): dict(m) for monitor_id, m in self.monitors.items()}
+
+    def issue_token(self, username):
+        claims = json.dumps({'username': username, 'h': random.getrandbits(32)}).encode('utf-8')
+        token = '.'.join([
+            base64.urlsafe_b64encode(b'{"alg":"HS256","typ":"JWT"}').decode().rstrip('='),
+            base64.urlsafe_b64encode(claims).decode().rstrip('='),
+            base64.urlsafe_b64encode(random.randbytes(16)).decode().rstrip('='),
+        ])
+        with self.lock:
+            self.tokens.add(token)
+        return token
+
+    def beats(self, monitor_id, hours):
+        """Generate the monitor's beats for the last `hours`, oldest first, like the real server."""
+        now = datetime.now(timezone.utc)
+        count = int(hours * 3600 // self.beat_interval)
+        rng = random.Random(monitor_id)
+        beats = []
+        down_count = 0
+        for i in range(count):
+            beat_time = now - timedelta(seconds=(count - i) * self.beat_interval)
+            # Roughly one short outage a day
+            status = 0 if rng.random() < self.beat_interval / 86400 * 3 else 1
+            down_count = down_count + 1 if status == 0 else 0
+            beats.append({
+                'id': monitor_id * 10_000_000 + i,
+                'monitor_id': monitor_id,
+                'status': status,
+                'ping': None if status == 0 else rng.randint(40, 400),
+                'msg': '200 - OK' if status == 1 else 'timeout of 48000ms exceeded',
+                'time': beat_time.strftime('%Y-%m-%d %H:%M:%S.') + f'{beat_time.microsecond // 1000:03d}',
+                'duration': self.beat_interval,
+                'important': 1 if i == 0 or status != beats[-1]['status'] else 0,
+                'down_count': down_count,
+            })
+        return beats
+
+    def live_beat(self, monitor_id):
+        """A heartbeat event for now, shaped like the ones Uptime Kuma pushes."""
+        now = datetime.now(timezone.utc)
+        status = 0 if random.random() < 0.05 else 1
+        return {
+            'monitorID': monitor_id,
+            'status': status,
+            'time': now.strftime('%Y-%m-%d %H:%M:%S.') + f'{now.microsecond // 1000:03d}',
+            'msg': '200 - OK' if status == 1 else 'timeout of 48000ms exceeded',
+            'ping': None if status == 0 else random.randint(40, 400),
+            'important': False,
+            'duration': self.live_interval,
+        }
+
+
+def create_app(kuma, transports=None):
+    """Build the WSGI app: the Socket.io server plus /api/entry-page."""
+    sio = socketio.Server(async_mode='threading', cors_allowed_origins='*', transports=transports)
+
+    def send_monitor_list(sid):
+        sio.emit('monitorList', kuma.monitor_list(), to=sid)
+
+    def after_login(sid):
+        with kuma.lock:
+            kuma.logged_in.add(sid)
+        sio.emit('info', {'version': SERVER_VERSION, 'latestVersion': SERVER_VERSION, 'primaryBaseURL': None}, to=sid)
+        send_monitor_list(sid)
+        if kuma.live_interval:
+            with kuma.lock:
+                monitor_ids = list(kuma.monitors)
+            for monitor_id in monitor_ids:
+                recent = kuma.beats(monitor_id, 100 * kuma.beat_interval / 3600)
+                sio.emit('heartbeatList', (monitor_id, recent, True), to=sid)
+
+    def push_live_beats():
+        while True:
+            time.sleep(kuma.live_interval)
+            with kuma.lock:
+                monitor_ids = list(kuma.monitors)
+                sids = list(kuma.logged_in)
+            for monitor_id in monitor_ids:
+                beat = kuma.live_beat(monitor_id)
+                for sid in sids:
+                    sio.emit('heartbeat', beat, to=sid)
+
+    if kuma.live_interval:
+        threading.Thread(target=push_live_beats, daemon=True).start()
+
+    def handler(event, needs_login=True):
+        def decorator(fn):
+            def wrapped(sid, *args):
+                kuma.count(event)
+                kuma.delay()
+                if needs_login and sid not in kuma.logged_in:
+                    return {'ok': False, 'msg': 'You are not logged in.'}
+                try:
+                    return fn(sid, *args)
+                except Exception as e:
+                    return {'ok': False, 'msg': str(e)}
+            sio.on(event, wrapped)
+            return fn
+        return decorator
+
+    @sio.on('connect')
+    def on_connect(sid, environ, auth=None):
+        sio.emit('info', {'primaryBaseURL': None, 'serverTimezone': 'UTC'}, to=sid)
+        sio.emit('loginRequired', to=sid)
+
+    @sio.on('disconnect')
+    def on_disconnect(sid, reason=None):
+        with kuma.lock:
+            kuma.logged_in.discard(sid)
+
+    @handler('login', needs_login=False)
+    def on_login(sid, data):
+        if data.get('username') != kuma.username or data.get('password') != kuma.password:
+            return {'ok': False, 'msg': 'Incorrect username or password.'}
+        after_login(sid)
+        return {'ok': True, 'token': kuma.issue_token(data['username'])}
+
+    @handler('loginByToken', needs_login=False)
+    def on_login_by_token(sid, token):
+        if token not in kuma.tokens:
+            return {'ok': False, 'msg': 'Invalid token.'}
+        after_login(sid)
+        return {'ok': True}
+
+    @handler('add')
+    def on_add(sid, data):
+        monitor_id = kuma.create_monitor(data)
+        send_monitor_list(sid)
+        return {'ok': True, 'msg': 'Added Successfully.', 'monitorID': monitor_id}
+
+    @handler('editMonitor')
+    def on_edit_monitor(sid, data):
+        monitor_id = int(data['id'])
+        with kuma.lock:
+            if monitor_id not in kuma.monitors:
+                return {'ok': False, 'msg': 'Monitor not found.'}
+            kuma.monitors[monitor_id].update(data)
+        send_monitor_list(sid)
+        return {'ok': True, 'msg': 'Saved.', 'monitorID': monitor_id}
+
+    @handler('getMonitor')
+    def on_get_monitor(sid, monitor_id):
+        with kuma.lock:
+            monitor = kuma.monitors.get(int(monitor_id))
+            monitor = dict(monitor) if monitor else None
+        if monitor is None:
+            return {'ok': False, 'msg': 'Monitor not found.'}
+        return {'ok': True, 'monitor': monitor}
+
+    @handler('deleteMonitor')
+    def on_delete_monitor(sid, monitor_id):
+        with kuma.lock:
+            kuma.monitors.pop(int(monitor_id), None)
+        send_monitor_list(sid)
+        return {'ok': True, 'msg': 'Deleted Successfully.'}
+
+    @handler('getMonitorBeats')
+    def on_get_monitor_beats(sid, monitor_id, hours):
+        with kuma.lock:
+            exists = int(monitor_id) in kuma.monitors
+        if not exists:
+            return {'ok': False, 'msg': 'Monitor not found.'}
+        return {'ok': True, 'data': kuma.beats(int(monitor_id), float(hours))}
+
+    def http_app(environ, start_response):
+        if environ.get('PATH_INFO') == '/api/entry-page':
+            start_response('200 OK', [('Content-Type', 'application/json')])
+            return [b'{"type":"entryPage","entryPage":"dashboard"}']
+        start_response('404 Not Found', [('Content-Type', 'text/plain')])
+        return [b'Not Found']
+
+    return socketio.WSGIApp(sio, http_app)
+
+
+class ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients dropping the connection at exit is normal here
+        if not isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            super().handle_error(request, client_address)
+
+
+class WebSocketServerHandler(ServerHandler):
+    def handle_error(self):
+        # engine.io raises StopIteration once a WebSocket it took over has
+        # closed; there is no HTTP response left to send
+        if isinstance(sys.exc_info()[1], StopIteration):
+            self.status = '101 Switching Protocols'
+            self.close()
+            return
+        super().handle_error()
+
+
+class QuietHandler(WSGIRequestHandler):
+    def get_environ(self):
+        environ = super().get_environ()
+        # simple-websocket takes over the raw socket for the WebSocket upgrade
+        environ['gunicorn.socket'] = self.connection
+        return environ
+
+    def handle(self):
+        # WSGIRequestHandler.handle() with the WebSocket-aware ServerHandler
+        self.raw_requestline = self.rfile.readline(65537)
+        if len(self.raw_requestline) > 65536:
+            self.send_error(414)
+            return
+        if not self.parse_request():
+            return
+        handler = WebSocketServerHandler(
+            self.rfile, self.wfile, self.get_stderr(), self.get_environ(), multithread=False
+        )
+        handler.request_handler = self
+        handler.run(self.server.get_app())
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(kuma, host='127.0.0.1', port=3099):
+    """Create the HTTP server (not started yet). Returns (server, url)."""
+    server = make_server(host, port, create_app(kuma), server_class=ThreadingWSGIServer, handler_class=QuietHandler)
+    return server, f'http://{host}:{server.server_port}'
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a fake Uptime Kuma Socket.io API for benchmarks.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=3099, help='0 picks a free port')
+    parser.add_argument('--username', default='admin')
+    parser.add_argument('--password', default='admin123')
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--jitter-ms', type=float, default=0.0)
+    parser.add_argument('--beat-interval', type=int, default=60, help='Seconds between generated beats')
+    parser.add_argument('--seed-monitors', type=int, default=0)
+    parser.add_argument('--live-interval', type=float, default=0.0, help='Seconds between live heartbeat pushes')
+    args = parser.parse_args()
+
+    kuma = FakeKuma(
+        username=args.username, password=args.password,
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms,
+        beat_interval=args.beat_interval, seed_monitors=args.seed_monitors,
+        live_interval=args.live_interval,
+    )
+    server, url = serve(kuma, args.host, args.port)
+    print(json.dumps({'listening': True, 'url': url}), flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(json.dumps({'listening': False, 'calls': kuma.calls}), flush=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -8,6 +8,50 @@ Reads JSON from stdin:
   "hours": 1
 }
 
+or, for several monitors over one session ("ids" may also be "all"):
+{
+  "ids": [1, 2, 3],
+  "hours": 1,
+  "concurrency": 4
+}
+
+Multi-monitor requests without the local store can add "async": true (or set
+UPTIME_KUMA_ASYNC=true) to fetch from one asyncio event loop instead of a
+thread per in-flight call (see kuma_async.py), with an optional per-call
+"callTimeout" in seconds. The output is the same.
+
+Add "aggregate": true (or {"buckets": 60}) to get summary statistics instead
+of raw beats: uptime percentage, ping average and p50/p95/p99, down
+incidents and total downtime, and a series downsampled to N time buckets
+(see beat_aggregates.py). Multi-monitor requests then return
+"aggregatesByMonitor".
+
+Add "stream": true to get NDJSON instead: one beat object per line as soon as
+it is normalized, then a final summary line:
+{"done": true, "success": true, "count": 1440, "errors": {}}
+getMonitorBeats only takes a period ending now, so a monitor's raw window
+still arrives (and is held) as one list; streaming saves the normalized copy
+and the output string, not that list.
+
+Add "store": true (or set UPTIME_KUMA_BEAT_STORE=true) to serve the window
+from the local heartbeat store (heartbeat_store.py) and only fetch beats newer
+than the last sync from Uptime Kuma.
+
+Identical requests within UPTIME_KUMA_BEATS_CACHE_TTL seconds (default 10) are
+answered from a shared results cache, and identical requests in flight wait
+for one fetch instead of each opening a session (see beats_cache.py). The
+output reports it under "cache"; "cache": false skips the cache.
+
+With several Uptime Kuma instances in UPTIME_KUMA_SHARDS, monitor IDs are
+global IDs: a request is split by shard, the shards are read in parallel and
+the results merged, with a "shards" block per instance (see kuma_shards.py).
+
+Add "format": "columnar" to get the beats as one array per field (delta-encoded
+times, interned messages; see beat_wire.py for the schema) under "columnar"
+instead of "beats" ("columnarByMonitor" for several monitors). "encoding":
+"msgpack" and/or "compression": "gzip" | "zlib" return the document as a
+base64 "payload" instead.
+
 Outputs JSON to stdout:
 {
   "success": true,
@@ -26,11 +70,23 @@ Outputs JSON to stdout:
     ...
   ]
 }
+
+For several monitors the beats are grouped by monitor ID, and a monitor that
+fails is reported in "errors" without failing the others:
+{
+  "success": true,
+  "hours": 1,
+  "beatsByMonitor": {"1": [...], "2": [...]},
+  "errors": {"3": "monitor does not exist"}
+}
+
+The run() function is also used by kuma_worker.py to serve beats requests
+over a long-lived session.
 """
 
 import sys
 import json
-import os
+import time
 from pathlib import Path
 
 # Add .python-packages directory to Python path (for Render deployment)
@@ -39,89 +95,514 @@ project_root = Path(__file__).parent.parent.parent
 python_packages_path = project_root / '.python-packages'
 if python_packages_path.exists():
     sys.path.insert(0, str(python_packages_path))
-    print(f"[get_monitor_beats] Added .python-packages to sys.path: {python_packages_path}", file=sys.stderr)
-    # Debug: List contents of .python-packages
-    try:
-        contents = list(python_packages_path.iterdir())
-        print(f"[get_monitor_beats] Contents of .python-packages: {[str(c.name) for c in contents[:10]]}", file=sys.stderr)
-        # Check for uptime_kuma_api specifically
-        uptime_kuma_path = python_packages_path / 'uptime_kuma_api'
-        if uptime_kuma_path.exists():
-            print(f"[get_monitor_beats] Found uptime_kuma_api directory", file=sys.stderr)
+
+from kuma_common import DEFAULT_BATCH_CONCURRENCY, log_diagnostics, open_session
+from kuma_metrics import RunTimer, run_main
+from heartbeat_store import store_enabled
+from kuma_async import async_enabled, get_call_timeout
+from beat_aggregates import DEFAULT_BUCKETS, aggregate_beats
+from kuma_shards import sharding_enabled
+
+def _enum_value(value):
+    return getattr(value, 'value', value)
+
+def _to_str(value):
+    return value if value is None else str(value)
+
+def _converter_for(value):
+    """Pick the converter for a field from its first non-null value."""
+    # Handle MonitorStatus and any other enum types
+    if hasattr(value, 'value'):
+        return _enum_value
+    # Handle datetime objects
+    if hasattr(value, 'isoformat'):
+        return _to_str
+    return None
+
+def make_beat_normalizer():
+    """
+    Return a function that normalizes one beat for JSON output.
+
+    The converter for each key is decided once, from the first non-null value
+    seen for it, instead of inspecting every value of every beat.
+    """
+    converters = {}
+    
+    def normalize(beat):
+        normalized_beat = {}
+        for key, value in beat.items():
+            if key in converters:
+                converter = converters[key]
+            elif value is None:
+                converter = None
+            else:
+                converter = converters[key] = _converter_for(value)
+            normalized_beat[key] = converter(value) if converter else value
+        return normalized_beat
+    
+    return normalize
+
+def normalize_beats(beats):
+    """Normalize beats data - ensure all fields are properly serialized."""
+    if not isinstance(beats, list):
+        return []
+    normalize = make_beat_normalizer()
+    return [normalize(beat) for beat in beats]
+
+def get_requested_ids(input_data):
+    """
+    Return the monitor IDs of a multi-monitor request ('all' or a list of ints),
+    or None when the request is for a single 'id'.
+    """
+    ids = input_data.get('ids')
+    if ids is None and input_data.get('id') == 'all':
+        ids = 'all'
+    if ids is None:
+        return None
+    if ids == 'all':
+        return 'all'
+    if not isinstance(ids, list):
+        raise ValueError('"ids" must be a list of monitor IDs or "all"')
+    return [int(monitor_id) for monitor_id in ids]
+
+def fetch_beats(api, monitor_id, hours, use_store, cache=None):
+    """Fetch one monitor's beats, through the local heartbeat store or the results cache when enabled."""
+    if cache is not None and not use_store:
+        return cache.fetch(monitor_id, hours, lambda: normalize_beats(api.get_monitor_beats(monitor_id, hours)))
+    if not use_store:
+        return normalize_beats(api.get_monitor_beats(monitor_id, hours))
+    from heartbeat_store import HeartbeatStore, fetch_window
+    
+    # SQLite connections can't be shared between threads, so open one per fetch
+    with HeartbeatStore(api.url) as store:
+        beats, _ = fetch_window(store, api, monitor_id, hours, normalize_beats)
+    return beats
+
+def get_aggregate_buckets(input_data):
+    """
+    Return the number of series buckets for "aggregate" mode, or None when the
+    raw beats are wanted. Accepts "aggregate": true or {"buckets": N}.
+    """
+    aggregate = input_data.get('aggregate')
+    if not aggregate:
+        return None
+    if isinstance(aggregate, dict):
+        return int(aggregate.get('buckets', DEFAULT_BUCKETS))
+    return DEFAULT_BUCKETS
+
+def fetch_aggregate(api, monitor_id, hours, use_store, buckets, cache=None):
+    """Fetch one monitor's window and reduce it to summary statistics."""
+    window_end = time.time()
+    beats = fetch_beats(api, monitor_id, hours, use_store, cache)
+    return aggregate_beats(beats, window_end - hours * 3600, window_end, buckets)
+
+def get_wire_format(input_data):
+    """
+    Return (encoding, compression) when the beats should be sent in the
+    columnar format, or None for the default array of beat objects.
+    """
+    if input_data.get('format') in (None, 'objects'):
+        return None
+    if input_data['format'] != 'columnar':
+        raise ValueError('"format" must be "objects" or "columnar"')
+    return input_data.get('encoding', 'json'), input_data.get('compression')
+
+def apply_wire_format(output, wire_format):
+    """Re-encode the beats of a run() output in the columnar format (aggregates are left as they are)."""
+    if wire_format is None:
+        return output
+    from beat_wire import encode_output
+    
+    encoding, compression = wire_format
+    if 'beats' in output:
+        output['columnar'] = encode_output(output.pop('beats'), encoding, compression)
+        output['format'] = 'columnar'
+    elif 'beatsByMonitor' in output:
+        output['columnarByMonitor'] = {
+            monitor_id: encode_output(beats, encoding, compression)
+            for monitor_id, beats in output.pop('beatsByMonitor').items()
+        }
+        output['format'] = 'columnar'
+    return output
+
+def run_multi(api, monitor_ids, hours, concurrency=DEFAULT_BATCH_CONCURRENCY, use_store=False, buckets=None, cache=None):
+    """Fetch beats (or aggregates) for several monitors over one session, grouped by monitor ID."""
+    from concurrent.futures import ThreadPoolExecutor
+    
+    if monitor_ids == 'all':
+        monitor_ids = [monitor['id'] for monitor in api.get_monitors()]
+    
+    def fetch(monitor_id):
+        try:
+            if buckets is not None:
+                return monitor_id, fetch_aggregate(api, monitor_id, hours, use_store, buckets, cache), None
+            return monitor_id, fetch_beats(api, monitor_id, hours, use_store, cache), None
+        except Exception as e:
+            return monitor_id, None, str(e)
+    
+    beats_by_monitor = {}
+    errors = {}
+    # Socket.io matches each response to its call, so several fetches can
+    # share the connection
+    workers = max(1, min(int(concurrency), len(monitor_ids) or 1))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for monitor_id, beats, error in executor.map(fetch, monitor_ids):
+            if error is None:
+                beats_by_monitor[str(monitor_id)] = beats
+            else:
+                errors[str(monitor_id)] = error
+    
+    output = {
+        'success': True,
+        'hours': hours,
+        'aggregatesByMonitor' if buckets is not None else 'beatsByMonitor': beats_by_monitor,
+        'errors': errors
+    }
+    if cache is not None:
+        output['cache'] = cache.report(single=False)
+    return output
+
+def run_multi_async(api, monitor_ids, hours, concurrency=DEFAULT_BATCH_CONCURRENCY, buckets=None, timeout=None):
+    """The same as run_multi() without the store, with the calls in flight on one event loop."""
+    import asyncio
+    from kuma_async import AsyncKumaClient, gather_limited
+    
+    if monitor_ids == 'all':
+        monitor_ids = [monitor['id'] for monitor in api.get_monitors()]
+    client = AsyncKumaClient(api, timeout)
+    
+    async def fetch(monitor_id):
+        try:
+            window_end = time.time()
+            beats = normalize_beats(await client.get_monitor_beats(monitor_id, hours))
+            if buckets is not None:
+                return monitor_id, aggregate_beats(beats, window_end - hours * 3600, window_end, buckets), None
+            return monitor_id, beats, None
+        except Exception as e:
+            return monitor_id, None, str(e)
+    
+    results = asyncio.run(gather_limited([lambda m=m: fetch(m) for m in monitor_ids], concurrency))
+    beats_by_monitor = {}
+    errors = {}
+    for monitor_id, beats, error in results:
+        if error is None:
+            beats_by_monitor[str(monitor_id)] = beats
         else:
-            print(f"[get_monitor_beats] WARNING: uptime_kuma_api directory not found in .python-packages", file=sys.stderr)
-            # Try to find it
-            for item in python_packages_path.iterdir():
-                if 'uptime' in item.name.lower() or 'kuma' in item.name.lower():
-                    print(f"[get_monitor_beats] Found related item: {item.name}", file=sys.stderr)
-    except Exception as e:
-        print(f"[get_monitor_beats] Error listing .python-packages: {e}", file=sys.stderr)
-    # Debug: Show sys.path
-    print(f"[get_monitor_beats] sys.path: {sys.path[:3]}", file=sys.stderr)
-else:
-    print(f"[get_monitor_beats] WARNING: .python-packages directory not found at {python_packages_path}", file=sys.stderr)
-    print(f"[get_monitor_beats] Current working directory: {os.getcwd()}", file=sys.stderr)
-    print(f"[get_monitor_beats] Script location: {__file__}", file=sys.stderr)
-    print(f"[get_monitor_beats] Project root: {project_root}", file=sys.stderr)
+            errors[str(monitor_id)] = error
+    
+    return {
+        'success': True,
+        'hours': hours,
+        'aggregatesByMonitor' if buckets is not None else 'beatsByMonitor': beats_by_monitor,
+        'errors': errors
+    }
+
+def open_cache(input_data, api_url=None):
+    """The results cache for a request, or None when it doesn't apply (store, stream, async or "cache": false)."""
+    from beats_cache import cache_enabled
+    
+    if input_data.get('stream') or store_enabled(input_data) or not cache_enabled(input_data):
+        return None
+    if get_requested_ids(input_data) is not None and async_enabled(input_data):
+        return None
+    from beats_cache import BeatsCache
+    from kuma_common import get_connection_settings
+    
+    return BeatsCache(api_url or get_connection_settings()['api_url'])
+
+def cached_output(input_data, cache):
+    """
+    Answer the request from the cache alone (waiting for an identical fetch in
+    flight), or return None. On a miss of a single-monitor request the fetch is
+    claimed, so identical requests wait for this one.
+    """
+    hours = int(input_data.get('hours', 1))
+    monitor_ids = get_requested_ids(input_data)
+    if monitor_ids == 'all':
+        return None
+    if monitor_ids is None:
+        if not cache.prefetch(int(input_data['id']), hours):
+            return None
+    elif not all([cache.prefetch(monitor_id, hours, claim=False) for monitor_id in monitor_ids]):
+        return None
+    # Every beat is in the cache, so no session is needed
+    return run(None, input_data, cache)
+
+def run(api, input_data, cache=None):
+    """Fetch monitor beats over an authenticated session and return the JSON output dict."""
+    if cache is None:
+        cache = open_cache(input_data, getattr(api, 'url', None))
+        if cache is not None:
+            with cache:
+                return run(api, input_data, cache)
+    
+    hours = int(input_data.get('hours', 1))
+    
+    buckets = get_aggregate_buckets(input_data)
+    wire_format = get_wire_format(input_data)
+    
+    monitor_ids = get_requested_ids(input_data)
+    if monitor_ids is not None:
+        concurrency = input_data.get('concurrency') or DEFAULT_BATCH_CONCURRENCY
+        if async_enabled(input_data) and not store_enabled(input_data):
+            output = run_multi_async(api, monitor_ids, hours, concurrency, buckets=buckets,
+                                     timeout=get_call_timeout(input_data))
+            return apply_wire_format(output, wire_format)
+        output = run_multi(api, monitor_ids, hours, concurrency, use_store=store_enabled(input_data), buckets=buckets,
+                           cache=cache)
+        return apply_wire_format(output, wire_format)
+    
+    # Validate required fields
+    if 'id' not in input_data:
+        raise ValueError('Monitor ID is required')
+    
+    monitor_id = int(input_data['id'])
+    
+    # Summary statistics only, computed before anything is serialized
+    if buckets is not None:
+        output = {
+            'success': True,
+            'hours': hours,
+            'aggregate': fetch_aggregate(api, monitor_id, hours, store_enabled(input_data), buckets, cache)
+        }
+        if cache is not None:
+            output['cache'] = cache.report(single=True)
+        return output
+    
+    # Serve from the local store and only fetch the delta from Uptime Kuma
+    if store_enabled(input_data):
+        from heartbeat_store import HeartbeatStore, fetch_window
+        
+        with HeartbeatStore(api.url) as store:
+            beats, store_info = fetch_window(store, api, monitor_id, hours, normalize_beats)
+        return apply_wire_format({
+            'success': True,
+            'beats': beats,
+            'store': store_info
+        }, wire_format)
+    
+    # Get monitor beats
+    output = {
+        'success': True,
+        'beats': fetch_beats(api, monitor_id, hours, False, cache)
+    }
+    if cache is not None:
+        output['cache'] = cache.report(single=True)
+    return apply_wire_format(output, wire_format)
+
+def iter_monitor_beats(api, monitor_id, hours, use_store):
+    """
+    Yield one monitor's normalized beats without building a normalized copy.
+    
+    Uptime Kuma's getMonitorBeats takes a period back from now, not a range,
+    so the window can't be fetched in chunks: the raw list of one reply is
+    held until its last beat is yielded. With the store, only the delta since
+    the last sync is fetched (the whole window on the first sync).
+    """
+    if use_store:
+        from heartbeat_store import HeartbeatStore, sync_window
+        
+        # Only the delta is fetched; the window is then read row by row from SQLite
+        with HeartbeatStore(api.url) as store:
+            window_start, _ = sync_window(store, api, monitor_id, hours, normalize_beats)
+            yield from store.iter_window(monitor_id, window_start)
+        return
+    beats = api.get_monitor_beats(monitor_id, hours)
+    if isinstance(beats, list):
+        normalize = make_beat_normalizer()
+        # Normalize in place, dropping each raw beat as soon as it is written
+        beats.reverse()
+        while beats:
+            yield normalize(beats.pop())
+
+def stream(api, input_data, write_line):
+    """
+    Write beats as NDJSON: one line per beat, then a summary line with "done": true.
 
-from uptime_kuma_api import UptimeKumaApi
+    Each beat is normalized and written as it goes, so memory doesn't grow
+    with a second normalized copy or one large JSON string.
+    """
+    hours = int(input_data.get('hours', 1))
+    use_store = store_enabled(input_data)
+    monitor_ids = get_requested_ids(input_data)
+    if monitor_ids is None:
+        if 'id' not in input_data:
+            raise ValueError('Monitor ID is required')
+        monitor_ids = [int(input_data['id'])]
+    elif monitor_ids == 'all':
+        monitor_ids = [monitor['id'] for monitor in api.get_monitors()]
+    
+    count = 0
+    errors = {}
+    for monitor_id in monitor_ids:
+        try:
+            for beat in iter_monitor_beats(api, monitor_id, hours, use_store):
+                write_line(beat)
+                count += 1
+        except Exception as e:
+            if len(monitor_ids) == 1:
+                raise
+            errors[str(monitor_id)] = str(e)
+    
+    return {
+        'done': True,
+        'success': True,
+        'count': count,
+        'errors': errors
+    }
+
+def shard_groups(input_data):
+    """
+    Split a request across shards: {shard: the request as that shard sees it}.
+    Monitor IDs become the shard's own IDs and the wire format is applied
+    after the merge; the local store keeps each shard's beats apart.
+    """
+    from kuma_shards import get_shards, group_monitor_ids, resolve_monitor_id
+    
+    request = {k: v for k, v in input_data.items() if k not in ('id', 'ids', 'format', 'encoding', 'compression')}
+    monitor_ids = get_requested_ids(input_data)
+    if monitor_ids is None:
+        shard, monitor_id = resolve_monitor_id(input_data['id'])
+        return {shard: dict(request, id=monitor_id)}
+    if monitor_ids == 'all':
+        return {shard: dict(request, ids='all') for shard in get_shards()}
+    return {
+        shard: dict(request, ids=[monitor_id for _, monitor_id in entries])
+        for shard, entries in group_monitor_ids(monitor_ids).items()
+    }
+
+def merge_shard_outputs(input_data, gathered):
+    """Merge the per-shard run() outputs of a scatter-gather under global monitor IDs."""
+    from kuma_shards import global_monitor_id, globalize_beats, resolve_monitor_id
+    
+    if get_requested_ids(input_data) is None:
+        [(shard, (output, error))] = gathered.items()
+        if error is not None:
+            raise error
+        if 'beats' in output:
+            globalize_beats(shard, output['beats'])
+        output['shard'] = shard.name
+        return apply_wire_format(output, get_wire_format(input_data))
+    
+    key = 'aggregatesByMonitor' if get_aggregate_buckets(input_data) is not None else 'beatsByMonitor'
+    merged = {'success': True, 'hours': int(input_data.get('hours', 1)), key: {}, 'errors': {}, 'shards': {}}
+    for shard, (output, error) in sorted(gathered.items(), key=lambda entry: entry[0].number):
+        if error is not None:
+            requested = get_requested_ids(input_data)
+            if requested == 'all':
+                merged['errors'][shard.name] = str(error)
+            else:
+                # Every monitor of a failed shard gets the shard's error
+                for monitor_id in requested:
+                    if resolve_monitor_id(monitor_id)[0] == shard:
+                        merged['errors'][str(monitor_id)] = str(error)
+            merged['shards'][shard.name] = {'error': str(error)}
+            continue
+        for monitor_id, value in output[key].items():
+            if key == 'beatsByMonitor':
+                globalize_beats(shard, value)
+            merged[key][str(global_monitor_id(shard, monitor_id))] = value
+        for monitor_id, message in output['errors'].items():
+            merged['errors'][str(global_monitor_id(shard, monitor_id))] = message
+        merged['shards'][shard.name] = output.get('session', {})
+        if 'cache' in output:
+            merged.setdefault('cache', {'hits': 0, 'coalesced': 0, 'misses': 0})
+            for name, count in output['cache'].items():
+                merged['cache'][name] += count
+    return apply_wire_format(merged, get_wire_format(input_data))
+
+def run_sharded(input_data):
+    """Scatter a beats request across the shards holding the monitors and gather the results (see kuma_shards.py)."""
+    from kuma_shards import open_shard_session, scatter_gather
+    
+    def run_shard(shard, request):
+        api, session = open_shard_session(shard, 'get_monitor_beats', timeout=10, max_login_retries=1)
+        with api:
+            output = run(api, request)
+        if get_requested_ids(request) is None:
+            output.update(session)
+        else:
+            output['session'] = session
+        return output
+    
+    return merge_shard_outputs(input_data, scatter_gather(shard_groups(input_data), run_shard, 'get_monitor_beats'))
+
+def stream_sharded(input_data, write_line):
+    """stream() over every shard in turn, with beats under their global monitor IDs."""
+    from kuma_shards import global_monitor_id, globalize_beats, open_shard_session
+    
+    groups = shard_groups(input_data)
+    summary = {'done': True, 'success': True, 'count': 0, 'errors': {}}
+    for shard, request in sorted(groups.items(), key=lambda entry: entry[0].number):
+        try:
+            api, _ = open_shard_session(shard, 'get_monitor_beats', timeout=10, max_login_retries=1)
+            with api:
+                result = stream(api, request, lambda beat: write_line(globalize_beats(shard, [beat])[0]))
+        except Exception as e:
+            if len(groups) == 1 and get_requested_ids(input_data) is None:
+                raise
+            summary['errors'][shard.name] = str(e)
+            continue
+        summary['count'] += result['count']
+        for monitor_id, message in result['errors'].items():
+            summary['errors'][str(global_monitor_id(shard, monitor_id))] = message
+    return summary
 
 def main():
+    input_data = None
+    cache = None
+    timer = RunTimer('get_monitor_beats')
     try:
         # Read JSON from stdin
-        input_data = json.load(sys.stdin)
+        input_data = timer.read_input()
         
-        # Validate required fields
-        if 'id' not in input_data:
+        # Validate required fields before connecting
+        if get_requested_ids(input_data) is None and 'id' not in input_data:
             raise ValueError('Monitor ID is required')
         
-        monitor_id = int(input_data['id'])
-        hours = int(input_data.get('hours', 1))
+        def write_line(obj):
+            line = json.dumps(obj, default=str)
+            timer.payload['outputBytes'] = timer.payload.get('outputBytes', 0) + len(line) + 1
+            sys.stdout.write(line)
+            sys.stdout.write('\n')
         
-        # Get environment variables
-        api_url = os.getenv('UPTIME_KUMA_API_URL', 'http://localhost:3003')
-        username = os.getenv('UPTIME_KUMA_USERNAME', 'admin')
-        password = os.getenv('UPTIME_KUMA_PASSWORD', 'admin123')
+        # With several Uptime Kuma instances, read from the shards holding the monitors
+        if sharding_enabled():
+            with timer.phase('operation'):
+                if input_data.get('stream'):
+                    output = stream_sharded(input_data, write_line)
+                else:
+                    output = run_sharded(input_data)
+            print(timer.emit(output))
+            return
         
-        # Debug logging (mask password)
-        print(f"[get_monitor_beats] Connecting to: {api_url}", file=sys.stderr)
-        print(f"[get_monitor_beats] Username: {username}", file=sys.stderr)
-        print(f"[get_monitor_beats] Password: {'***' if password else '(not set)'}", file=sys.stderr)
+        # Identical requests are answered from (or wait for) the results cache
+        cache = open_cache(input_data)
+        if cache is not None:
+            with timer.phase('cache'):
+                output = cached_output(input_data, cache)
+            if output is not None:
+                print(timer.emit(output))
+                return
+        
+        # Debug diagnostics (UPTIME_KUMA_VERBOSITY=2), never password material
+        log_diagnostics('get_monitor_beats')
         
         # Connect to Uptime Kuma
-        with UptimeKumaApi(api_url) as api:
-            # Authenticate using username/password
-            api.login(username, password)
-            
-            # Get monitor beats
-            beats = api.get_monitor_beats(monitor_id, hours)
-            
-            # Normalize beats data - ensure all fields are properly serialized
-            normalized_beats = []
-            if isinstance(beats, list):
-                for beat in beats:
-                    normalized_beat = {}
-                    # Copy all fields
-                    for key, value in beat.items():
-                        # Handle MonitorStatus enum objects
-                        if key == 'status' and hasattr(value, 'value'):
-                            normalized_beat[key] = value.value
-                        # Handle any other enum types
-                        elif hasattr(value, 'value'):
-                            normalized_beat[key] = value.value
-                        # Handle datetime objects
-                        elif hasattr(value, 'isoformat'):
-                            normalized_beat[key] = str(value)
-                        else:
-                            normalized_beat[key] = value
-                    normalized_beats.append(normalized_beat)
+        api, session = open_session('get_monitor_beats', timeout=10, max_login_retries=1, timer=timer)
+        with api:
+            if input_data.get('stream'):
+                # Beat lines are serialized while streaming, so they count as operation time
+                with timer.phase('operation'):
+                    summary = stream(api, input_data, write_line)
+                summary.update(session)
+                print(timer.emit(summary))
+                return
             
-            # Output success result
-            output = {
-                'success': True,
-                'beats': normalized_beats
-            }
-            print(json.dumps(output, default=str))  # default=str handles any remaining non-serializable objects
+            with timer.phase('operation'):
+                output = run(api, input_data, cache)
+            output.update(session)
+            print(timer.emit(output))  # default=str handles any remaining non-serializable objects
             
     except Exception as e:
         # Output error result
@@ -131,9 +612,15 @@ def main():
             'error': str(e),
             'traceback': traceback.format_exc()
         }
-        print(json.dumps(error_output))
+        if isinstance(input_data, dict) and input_data.get('stream'):
+            # In stream mode the error is the final "done" line
+            error_output['done'] = True
+        print(timer.emit(error_output))
         sys.exit(1)
+    finally:
+        if cache is not None:
+            cache.close()
 
 if __name__ == '__main__':
-    main()
+    run_main('get_monitor_beats', main)
 
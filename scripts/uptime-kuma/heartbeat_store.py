@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Local on-disk heartbeat store for get_monitor_beats.py.
+
+Beats are kept in SQLite, keyed by (monitor_id, time). A window request is
+served from the store; only beats newer than the last sync are fetched from
+Uptime Kuma and merged in. The full window is fetched when it reaches further
+back than the store covers, or when the last sync is older than the window
+(the beats in between were never fetched, so the store only covers the new
+fetch from then on). subscribe_beats.py can keep the store current from Uptime
+Kuma's live heartbeat pushes instead.
+
+Monitor IDs are only unique per Uptime Kuma server, so each server has its own
+database: UPTIME_KUMA_BEAT_STORE_PATH (default: heartbeats.sqlite3 in the state
+directory) with a key of the server URL added to the file name. Beats older
+than UPTIME_KUMA_BEAT_RETENTION_DAYS (default 30) are dropped by the compaction
+command. Hourly and daily rollups of every merged beat (beat_rollups.py) and an
+index of its status transitions (beat_transitions.py) are kept in the same
+database and outlive the compaction:
+
+  python3 heartbeat_store.py compact [--retention-days N]
+  python3 heartbeat_store.py stats
+"""
+
+import sys
+import json
+import math
+import os
+import time
+import argparse
+import hashlib
+from datetime import datetime, timezone
+from pathlib import Path
+
+from kuma_common import get_state_dir
+
+DEFAULT_RETENTION_DAYS = float(os.getenv('UPTIME_KUMA_BEAT_RETENTION_DAYS', '30'))
+
+# Re-fetch a little before the last sync so beats written while the previous
+# fetch was in flight are not missed (duplicates are ignored on insert)
+SYNC_OVERLAP_SECONDS = 60
+
+# Uptime Kuma stores beat times in UTC as 'YYYY-MM-DD HH:MM:SS.mmm', which
+# sorts correctly as text
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS beats (
+    monitor_id INTEGER NOT NULL,
+    time TEXT NOT NULL,
+    data TEXT NOT NULL,
+    PRIMARY KEY (monitor_id, time)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    monitor_id INTEGER PRIMARY KEY,
+    covered_from TEXT NOT NULL,
+    synced_at REAL NOT NULL
+);
+"""
+
+
+def store_enabled(input_data):
+    """The store is used when the request sets "store": true or UPTIME_KUMA_BEAT_STORE=true."""
+    if 'store' in input_data:
+        return bool(input_data['store'])
+    return os.getenv('UPTIME_KUMA_BEAT_STORE', 'false').lower() in ('1', 'true', 'yes')
+
+
+def store_path(api_url):
+    """The database of one Uptime Kuma server's beats."""
+    base = Path(os.getenv('UPTIME_KUMA_BEAT_STORE_PATH') or get_state_dir() / 'heartbeats.sqlite3')
+    key = hashlib.sha256(api_url.rstrip('/').encode('utf-8')).hexdigest()[:16]
+    return base.with_name(f'{base.stem}-{key}{base.suffix}')
+
+
+def format_beat_time(timestamp):
+    """Format a unix timestamp the way Uptime Kuma formats beat times."""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime(TIME_FORMAT)[:-3]
+
+
+class HeartbeatStore:
+    """
+    SQLite-backed beat store for one Uptime Kuma server (default: the
+    UPTIME_KUMA_API_URL one). Open one instance per thread.
+    """
+
+    def __init__(self, api_url=None, path=None):
+        # Imported here so scripts that only check store_enabled() start faster
+        import sqlite3
+
+        if path is None:
+            if api_url is None:
+                from kuma_common import get_connection_settings
+                api_url = get_connection_settings()['api_url']
+            path = store_path(api_url)
+        self.path = str(path)
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        # WAL lets dashboard reads proceed while another process merges beats
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+        # Imported here so reading the store doesn't pay for the rollup and index code
+        from beat_rollups import create_schema as create_rollup_schema
+        from beat_transitions import create_schema as create_transition_schema
+        create_rollup_schema(self.conn)
+        create_transition_schema(self.conn)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def get_sync_state(self, monitor_id):
+        row = self.conn.execute(
+            'SELECT covered_from, synced_at FROM sync_state WHERE monitor_id = ?', (monitor_id,)
+        ).fetchone()
+        return row if row else (None, None)
+
+    def merge(self, monitor_id, beats, covered_from, synced_at, restart=False):
+        """
+        Insert new beats (existing (monitor_id, time) keys are kept), record the
+        sync, and update the rollups (beat_rollups.py) and the status-transition
+        index (beat_transitions.py) from the new beats, in one transaction.
+
+        The store then covers every beat from covered_from to synced_at. The
+        beats must join up with what it covered before, unless `restart` is
+        set: then beats before covered_from may be missing, and the covered
+        range starts over at covered_from.
+        """
+        from beat_rollups import RollupStore
+        from beat_transitions import TransitionStore
+
+        beats = [beat for beat in beats if beat.get('time')]
+        with self.conn:
+            derived = [RollupStore(self.conn), TransitionStore(self.conn)]
+            backfills = [table.before_merge(monitor_id, beats) for table in derived]
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO beats (monitor_id, time, data) VALUES (?, ?, ?)',
+                ((monitor_id, str(beat['time']), json.dumps(beat, default=str)) for beat in beats)
+            )
+            self.conn.execute(
+                'INSERT INTO sync_state (monitor_id, covered_from, synced_at) VALUES (?, ?, ?) '
+                'ON CONFLICT(monitor_id) DO UPDATE SET '
+                f'covered_from = {"excluded.covered_from" if restart else "MIN(covered_from, excluded.covered_from)"}, '
+                'synced_at = excluded.synced_at',
+                (monitor_id, covered_from, synced_at)
+            )
+            for table, backfill in zip(derived, backfills):
+                table.after_merge(monitor_id, backfill)
+
+    def drop_sync_state(self, monitor_id):
+        """Forget what the store covers for a monitor, e.g. after beats may have been missed."""
+        with self.conn:
+            self.conn.execute('DELETE FROM sync_state WHERE monitor_id = ?', (monitor_id,))
+
+    def iter_window(self, monitor_id, since):
+        """Yield stored beats for the monitor with time >= since, oldest first."""
+        rows = self.conn.execute(
+            'SELECT data FROM beats WHERE monitor_id = ? AND time >= ? ORDER BY time',
+            (monitor_id, since)
+        )
+        for (data,) in rows:
+            yield json.loads(data)
+
+    def read_window(self, monitor_id, since):
+        return list(self.iter_window(monitor_id, since))
+
+    def compact(self, retention_days=DEFAULT_RETENTION_DAYS):
+        """Drop beats older than the retention period and reclaim the space."""
+        cutoff = format_beat_time(time.time() - retention_days * 86400)
+        with self.conn:
+            deleted = self.conn.execute('DELETE FROM beats WHERE time < ?', (cutoff,)).rowcount
+            self.conn.execute(
+                'UPDATE sync_state SET covered_from = ? WHERE covered_from < ?', (cutoff, cutoff)
+            )
+        self.conn.execute('VACUUM')
+        return {'deletedBeats': deleted, 'cutoff': cutoff}
+
+    def stats(self):
+        beats, monitors = self.conn.execute(
+            'SELECT COUNT(*), COUNT(DISTINCT monitor_id) FROM beats'
+        ).fetchone()
+        return {
+            'path': self.path,
+            'beats': beats,
+            'monitors': monitors,
+            'sizeBytes': os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+        }
+
+
+def sync_window(store, api, monitor_id, hours, normalize):
+    """
+    Bring the store up to date for a beats window, fetching only what is missing.
+
+    Returns (window_start, info) where info reports how many hours and beats
+    were actually fetched from Uptime Kuma.
+    """
+    now = time.time()
+    window_start = format_beat_time(now - hours * 3600)
+    covered_from, synced_at = store.get_sync_state(monitor_id)
+    # A last sync older than the window leaves beats between it and the window
+    # that were never fetched: the store then covers the new fetch only
+    restart = synced_at is not None and now - synced_at + SYNC_OVERLAP_SECONDS > hours * 3600
+
+    if covered_from is None or covered_from > window_start or restart:
+        # The store doesn't reach back far enough: fetch the whole window
+        fetch_hours = hours
+        covered_from = window_start
+    else:
+        fetch_seconds = now - synced_at + SYNC_OVERLAP_SECONDS
+        # getMonitorBeats takes whole hours
+        fetch_hours = max(1, math.ceil(fetch_seconds / 3600))
+
+    fetched = normalize(api.get_monitor_beats(monitor_id, fetch_hours))
+    store.merge(monitor_id, fetched, covered_from, now, restart)
+
+    return window_start, {
+        'fetchedHours': fetch_hours,
+        'fetchedBeats': len(fetched),
+    }
+
+
+def fetch_window(store, api, monitor_id, hours, normalize):
+    """Serve a beats window for one monitor from the store. Returns (beats, info)."""
+    window_start, info = sync_window(store, api, monitor_id, hours, normalize)
+    return store.read_window(monitor_id, window_start), info
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Maintain the local Uptime Kuma heartbeat store.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    compact_parser = subparsers.add_parser('compact', help='Drop beats past the retention period and vacuum')
+    compact_parser.add_argument('--retention-days', type=float, default=DEFAULT_RETENTION_DAYS)
+    subparsers.add_parser('stats', help='Show store size')
+    args = parser.parse_args()
+
+    try:
+        with HeartbeatStore() as store:
+            if args.command == 'compact':
+                output = store.compact(args.retention_days)
+                output.update(store.stats())
+            else:
+                output = store.stats()
+        output['success'] = True
+        print(json.dumps(output))
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': str(e)}))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
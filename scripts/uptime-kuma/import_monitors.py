@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+"""
+Bulk-import monitors from a URL list CSV (e.g. the crawler export
+public/df_doc_crawler1.csv) using the uptime-kuma-api wrapper.
+
+Reads JSON from stdin:
+{
+  "csv": "public/df_doc_crawler1.csv",
+  "column": "Webpage",
+  "monitor": {"type": "https", "heartbeatInterval": 60},
+  "chunkSize": 200,
+  "concurrency": 4
+}
+
+- csv: the file (relative paths are tried from the working directory, then
+  the project root); column: the URL column (default "Webpage").
+- monitor: fields every monitor gets, as add_monitor.py takes them; "name"
+  and "url" are the normalized URL of the row.
+- chunkSize: rows read, checked and submitted at a time (default 200).
+- maxChunks: stop after this many chunks; the next run resumes.
+- restart: ignore the checkpoint and start from the first row.
+- checkpoint: checkpoint file (default: one per CSV in the state directory).
+
+The CSV is streamed: only one chunk of rows is in memory at a time. Each URL
+is normalized as monitor_index.py defines it (scheme and host case, default
+port, trailing slash; fragments are dropped), and rows that are not http(s)
+URLs are skipped as invalid. Duplicates are dropped on the fly without
+keeping every URL seen: every add is idempotent (see add_monitor.py), so a
+URL that is already a monitor, added by an earlier chunk, an earlier run or
+anyone else, is found in the local monitor key index, and repeats within a
+chunk are sent once.
+
+All chunks go over one session (with UPTIME_KUMA_SHARDS, over one session
+per shard per chunk). After each chunk the checkpoint file records the byte
+offset of the next row and the running totals, so an interrupted run
+resumes at the first unfinished chunk; at most one chunk is re-read, and
+its rows already added are found in the index. A CSV that changed since the
+checkpoint is refused unless "restart" is set.
+
+Rows Uptime Kuma rejects count as "failed" and are not retried. When the
+session itself fails instead (the connection drops or a call times out),
+the run stops at that chunk without checkpointing it, so the next run
+retries it rather than counting the rest of the file as failed.
+
+Progress goes to stderr after every chunk: rows, percent of the file, rows
+per second and the estimated time remaining (from the bytes left).
+
+Outputs JSON to stdout:
+{
+  "success": true,
+  "done": true,
+  "rows": 100, "added": 61, "duplicates": 35, "invalid": 1, "failed": 3,
+  "resumedFromRow": 0, "rowsPerSecond": 240.5,
+  "checkpoint": "...", "errors": [{"row": 17, "url": "...", "error": "..."}]
+}
+"""
+
+import sys
+import json
+import time
+from pathlib import Path
+
+# Add .python-packages directory to Python path (for Render deployment)
+# This ensures uptime-kuma-api is found even if PYTHONPATH isn't set correctly
+project_root = Path(__file__).parent.parent.parent
+python_packages_path = project_root / '.python-packages'
+if python_packages_path.exists():
+    sys.path.insert(0, str(python_packages_path))
+
+from kuma_common import DEFAULT_BATCH_CONCURRENCY, get_state_dir, log, log_diagnostics, open_session, run_batch, write_private_file
+from kuma_metrics import RunTimer, run_main
+from kuma_shards import run_sharded_batch, shard_for_monitor, sharding_enabled
+from add_monitor import resolve_existing, run as add_one
+from monitor_index import normalize_url
+from monitor_schema import validate_batch
+
+TAG = 'import_monitors'
+
+DEFAULT_CHUNK_SIZE = 200
+
+# Failed rows reported in the output; the counts cover all of them
+MAX_REPORTED_ERRORS = 20
+
+class SessionLostError(RuntimeError):
+    """The session failed during a chunk; the checkpoint still points at its first row."""
+
+def is_session_error(error):
+    """True when an add failed because of the connection, not because Uptime Kuma rejected the monitor."""
+    from socketio.exceptions import SocketIOError
+    from uptime_kuma_api import Timeout
+    
+    return isinstance(error, (SocketIOError, Timeout, OSError))
+
+def add_chunk(api, items, concurrency):
+    """
+    Add one chunk's monitors as a batch (api=None: on their shards). Returns
+    the batch output and the errors of the adds that failed because of the
+    session.
+    """
+    session_errors = []
+    
+    def add(api, item):
+        try:
+            return add_one(api, item)
+        except Exception as e:
+            if is_session_error(e):
+                session_errors.append(e)
+            raise
+    
+    if api is None:
+        output = run_sharded_batch(TAG, items, lambda item: (shard_for_monitor(item), item),
+                                   lambda shard_api, shard_items: run_batch(shard_api, shard_items, add, concurrency, tag=TAG))
+        # A shard whose session couldn't be opened fails all of its items
+        session_errors += [info['error'] for info in output['shards'].values() if 'error' in info]
+    else:
+        output = run_batch(api, items, add, concurrency, tag=TAG)
+    return output, session_errors
+
+def resolve_csv_path(path):
+    """The CSV as given, or relative to the project root."""
+    if not path:
+        raise ValueError('"csv" is required')
+    candidate = Path(path)
+    if not candidate.is_absolute() and not candidate.exists():
+        candidate = project_root / path
+    if not candidate.is_file():
+        raise ValueError(f'CSV file not found: {path}')
+    return candidate.resolve()
+
+def default_checkpoint_path(csv_path):
+    import hashlib
+    
+    key = hashlib.sha256(str(csv_path).encode('utf-8')).hexdigest()[:16]
+    return get_state_dir() / f'import-{key}.json'
+
+def file_signature(csv_path):
+    """Size and mtime, to tell whether a checkpoint still matches the file."""
+    stat = csv_path.stat()
+    return {'size': stat.st_size, 'mtime': stat.st_mtime}
+
+def load_checkpoint(path, csv_path, restart):
+    """The saved progress for this CSV, or None to start from the first row."""
+    if restart:
+        return None
+    try:
+        with open(path) as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if checkpoint.get('csv') != str(csv_path):
+        return None
+    if checkpoint.get('file') != file_signature(csv_path):
+        raise ValueError(f'{csv_path} changed since the checkpoint in {path}; pass "restart": true to start over')
+    return checkpoint
+
+def monitor_url(value):
+    """The normalized URL of a CSV cell, or None if it is not an http(s) URL."""
+    from urllib.parse import urlsplit
+    
+    url = normalize_url(value)
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        return None
+    return url
+
+def read_chunks(f, column, chunk_size):
+    """
+    Yield (URL column cells, offset after their rows) from a CSV opened at a
+    row boundary. csv.reader pulls one line at a time through readline(), so
+    f.tell() is exactly the end of the last row read.
+    """
+    import csv
+    
+    reader = csv.reader(iter(f.readline, ''))
+    rows = []
+    for row in reader:
+        rows.append(row[column] if column < len(row) else '')
+        if len(rows) == chunk_size:
+            yield rows, f.tell()
+            rows = []
+    if rows:
+        yield rows, f.tell()
+
+def count_results(totals, errors, first_row, urls, output, skipped):
+    """Add one chunk's batch results (indexes into `urls`) and pre-sent answers to the totals."""
+    for result in skipped + (output['results'] if output else []):
+        if not result.get('success'):
+            totals['failed'] += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'row': first_row + urls[result['index']][0], 'url': urls[result['index']][1],
+                               'error': result.get('error')})
+        elif result.get('created'):
+            totals['added'] += 1
+        else:
+            totals['duplicates'] += 1
+
+def run_import(api, input_data):
+    """Stream the CSV and add its URLs chunk by chunk; returns the JSON output dict."""
+    import csv
+    
+    csv_path = resolve_csv_path(input_data.get('csv'))
+    column_name = input_data.get('column') or 'Webpage'
+    template = dict(input_data.get('monitor') or {'type': 'https'})
+    chunk_size = max(1, int(input_data.get('chunkSize') or DEFAULT_CHUNK_SIZE))
+    concurrency = int(input_data.get('concurrency') or DEFAULT_BATCH_CONCURRENCY)
+    max_chunks = input_data.get('maxChunks')
+    checkpoint_path = Path(input_data.get('checkpoint') or default_checkpoint_path(csv_path))
+    checkpoint = load_checkpoint(checkpoint_path, csv_path, input_data.get('restart'))
+    
+    totals = dict(checkpoint['totals']) if checkpoint else {'added': 0, 'duplicates': 0, 'invalid': 0, 'failed': 0}
+    errors = []
+    size = csv_path.stat().st_size
+    
+    # utf-8-sig drops the byte order mark crawler exports start with
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        header = next(csv.reader([f.readline()]), [])
+        if column_name not in header:
+            raise ValueError(f'CSV has no "{column_name}" column (columns: {", ".join(header)})')
+        column = header.index(column_name)
+        if checkpoint:
+            f.seek(checkpoint['offset'])
+        rows_done = checkpoint['rows'] if checkpoint else 0
+        resumed_from = rows_done
+        start_offset = f.tell()
+        offset = start_offset
+        started = time.perf_counter()
+        chunks = 0
+        if checkpoint:
+            log(TAG, f"Resuming {csv_path.name} at row {rows_done} ({offset / size:.0%})", level=0)
+        
+        for cells, offset in read_chunks(f, column, chunk_size):
+            urls = []
+            for n, cell in enumerate(cells):
+                url = monitor_url(cell)
+                if url is None:
+                    totals['invalid'] += 1
+                else:
+                    urls.append((n + 1, url))
+            items = [dict(template, name=url, url=url, idempotent=True) for _, url in urls]
+            
+            # Invalid monitors and URLs that already are monitors are answered without a call
+            rejected, pending = validate_batch(items, mode='add')
+            resolved, pending, repeats = resolve_existing(items, pending)
+            output = None
+            if pending:
+                output, session_errors = add_chunk(api, [items[i] for i in pending], concurrency)
+                if session_errors:
+                    # Nothing of this chunk is counted or checkpointed; its rows
+                    # added before the failure are found in the index next time
+                    raise SessionLostError(f'Uptime Kuma session failed ({session_errors[0]}); '
+                                           f'stopped at row {rows_done + 1}, rerun to resume there')
+                for result in output['results']:
+                    result['index'] = pending[result['index']]
+            repeated = [{'index': index, 'success': True, 'created': False} for index in repeats]
+            count_results(totals, errors, rows_done, urls, output, rejected + resolved + repeated)
+            
+            rows_done += len(cells)
+            chunks += 1
+            write_private_file(checkpoint_path, json.dumps({
+                'csv': str(csv_path),
+                'file': file_signature(csv_path),
+                'column': column_name,
+                'offset': offset,
+                'rows': rows_done,
+                'totals': totals,
+                'savedAt': time.time(),
+            }))
+            
+            elapsed = time.perf_counter() - started
+            rate = (rows_done - resumed_from) / elapsed if elapsed else 0.0
+            bytes_rate = (offset - start_offset) / elapsed if elapsed else 0.0
+            eta = (size - offset) / bytes_rate if bytes_rate else None
+            log(TAG, f"{rows_done} rows ({offset / size:.1%}), {rate:.1f} rows/s, "
+                     f"ETA {'-' if eta is None else f'{eta:.0f} s'}; added {totals['added']}, "
+                     f"duplicates {totals['duplicates']}, invalid {totals['invalid']}, failed {totals['failed']}",
+                level=0)
+            if max_chunks is not None and chunks >= int(max_chunks):
+                break
+    
+    elapsed = time.perf_counter() - started
+    output = {
+        'success': True,
+        'done': offset >= size,
+        'csv': str(csv_path),
+        'rows': rows_done,
+        **totals,
+        'resumedFromRow': resumed_from,
+        'chunks': chunks,
+        'rowsPerSecond': round((rows_done - resumed_from) / elapsed, 1) if elapsed else None,
+        'checkpoint': str(checkpoint_path),
+        'errors': errors,
+    }
+    return output
+
+def main():
+    timer = RunTimer(TAG)
+    try:
+        # Read JSON from stdin
+        input_data = timer.read_input()
+        if not isinstance(input_data, dict):
+            raise ValueError('Input must be a JSON object with "csv"')
+        # Fail on a missing file or column before connecting
+        resolve_csv_path(input_data.get('csv'))
+        
+        # Debug diagnostics (UPTIME_KUMA_VERBOSITY=2), never password material
+        log_diagnostics(TAG)
+        
+        # With several Uptime Kuma instances, each chunk goes to the shards that own its domains
+        if sharding_enabled():
+            with timer.phase('operation'):
+                output = run_import(None, input_data)
+            print(timer.emit(output))
+            return
+        
+        # One session for every chunk
+        api, session = open_session(TAG, timer=timer)
+        with api:
+            with timer.phase('operation'):
+                output = run_import(api, input_data)
+            output.update(session)
+            print(timer.emit(output))
+    
+    except Exception as e:
+        # Output error result
+        import traceback
+        error_output = {
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }
+        print(timer.emit(error_output))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    run_main(TAG, main)
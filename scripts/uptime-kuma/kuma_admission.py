@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Host-wide admission control for Uptime Kuma sessions.
+
+Every script process opens its own Socket.io connection and logs in, so a
+burst of dashboard refreshes can open dozens of sessions against one small
+instance at once. Two mechanisms, shared by all processes on the host through
+files in the state directory, keep that in check:
+
+- Session slots: a session holds one of UPTIME_KUMA_MAX_SESSIONS lock files
+  (flock) per Uptime Kuma URL from just before it connects (after the Render
+  wake probe) until it disconnects. A process that finds every slot taken
+  waits for one, up to UPTIME_KUMA_ADMISSION_TIMEOUT seconds. The kernel
+  drops the lock when a process dies, so a crashed script never leaks its
+  slot. 0 turns slots off. Sessions that stay open (the worker, live
+  heartbeat subscribers) take their slots from a separate pool of
+  UPTIME_KUMA_MAX_LONG_SESSIONS, so they can't starve the one-shot scripts.
+
+- Circuit breaker: after UPTIME_KUMA_BREAKER_THRESHOLD consecutive connect or
+  login failures the circuit opens and every script fails at once with
+  CircuitOpenError instead of waiting out its own timeout. After
+  UPTIME_KUMA_BREAKER_COOLDOWN seconds one process is let through as a probe
+  (half-open); its success closes the circuit, its failure opens it again.
+
+open_session() (kuma_common.py) applies both, so every script and the worker
+get them without changes.
+
+  python3 kuma_admission.py status
+  python3 kuma_admission.py reset
+"""
+
+import sys
+import json
+import os
+import time
+import argparse
+
+from kuma_common import get_connection_settings, get_state_dir, log, write_private_file
+
+MAX_SESSIONS = int(os.getenv('UPTIME_KUMA_MAX_SESSIONS', '4'))
+MAX_LONG_SESSIONS = int(os.getenv('UPTIME_KUMA_MAX_LONG_SESSIONS', '8'))
+ADMISSION_TIMEOUT = float(os.getenv('UPTIME_KUMA_ADMISSION_TIMEOUT', '30'))
+
+BREAKER_THRESHOLD = int(os.getenv('UPTIME_KUMA_BREAKER_THRESHOLD', '3'))
+BREAKER_COOLDOWN = float(os.getenv('UPTIME_KUMA_BREAKER_COOLDOWN', '30'))
+
+# A half-open probe that hasn't reported back within this long is presumed
+# dead (its process was killed), and the next caller probes instead
+PROBE_TIMEOUT = 90.0
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitOpenError(RuntimeError):
+    """Uptime Kuma failed repeatedly; calls fail fast until the cooldown is over."""
+
+
+class AdmissionTimeoutError(RuntimeError):
+    """No session slot became free in time."""
+
+
+def _url_key(api_url):
+    import hashlib
+
+    return hashlib.sha256(api_url.rstrip('/').encode('utf-8')).hexdigest()[:16]
+
+
+class SessionSlot:
+    """One held session slot; release() (or process exit) frees it."""
+
+    def __init__(self, fd=None, index=None, wait_ms=0.0, pool='short'):
+        self.fd = fd
+        self.index = index
+        self.wait_ms = wait_ms
+        self.pool = pool
+
+    def release(self):
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def info(self):
+        return {'slot': self.index, 'pool': self.pool, 'waitMs': round(self.wait_ms, 1)}
+
+
+def acquire_session_slot(api_url, tag, max_sessions=None, timeout=None, long_lived=False):
+    """
+    Take one of the host-wide session slots for this Uptime Kuma, waiting up
+    to `timeout` seconds for one to be released. Long-lived sessions take
+    theirs from the separate UPTIME_KUMA_MAX_LONG_SESSIONS pool.
+    """
+    import fcntl
+    import random
+
+    pool, setting = ('long', 'UPTIME_KUMA_MAX_LONG_SESSIONS') if long_lived else ('short', 'UPTIME_KUMA_MAX_SESSIONS')
+    if max_sessions is None:
+        max_sessions = MAX_LONG_SESSIONS if long_lived else MAX_SESSIONS
+    timeout = ADMISSION_TIMEOUT if timeout is None else timeout
+    if max_sessions <= 0:
+        return SessionSlot(pool=pool)
+
+    slot_dir = get_state_dir() / 'session-slots'
+    slot_dir.mkdir(mode=0o700, exist_ok=True)
+    key = _url_key(api_url)
+    prefix = f'{key}-long' if long_lived else key
+    paths = [slot_dir / f'{prefix}-{i}.lock' for i in range(max_sessions)]
+
+    started = time.perf_counter()
+    delay = 0.05
+    logged = False
+    while True:
+        # Start at a random slot so waiting processes don't all race for slot 0
+        offset = random.randrange(max_sessions)
+        for n in range(max_sessions):
+            index = (offset + n) % max_sessions
+            fd = os.open(paths[index], os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                os.close(fd)
+                continue
+            return SessionSlot(fd, index, (time.perf_counter() - started) * 1000, pool)
+
+        waited = time.perf_counter() - started
+        if waited >= timeout:
+            raise AdmissionTimeoutError(
+                f'All {max_sessions} Uptime Kuma session slots stayed busy for {timeout:g} s '
+                f'({setting}); try again later'
+            )
+        if not logged:
+            log(tag, f"All {max_sessions} session slots are busy, waiting for one", level=2)
+            logged = True
+        time.sleep(min(delay, timeout - waited))
+        delay = min(delay * 2, 0.5)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker for one Uptime Kuma URL, with its state in a JSON file
+    shared by every process on the host (read-modify-write under flock).
+    """
+
+    def __init__(self, api_url, threshold=None, cooldown=None):
+        self.key = _url_key(api_url)
+        self.threshold = BREAKER_THRESHOLD if threshold is None else threshold
+        self.cooldown = BREAKER_COOLDOWN if cooldown is None else cooldown
+        self.path = get_state_dir() / 'circuit-breaker.json'
+        self.probing = False
+
+    def _update(self, change):
+        """Apply change(state) -> result to this URL's state under the file lock."""
+        import fcntl
+
+        with open(str(self.path) + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(self.path) as f:
+                    states = json.load(f)
+            except (OSError, ValueError):
+                states = {}
+            state = states.get(self.key) or {'state': CLOSED, 'failures': 0}
+            before = dict(state)
+            result = change(state)
+            if state != before:
+                states[self.key] = state
+                write_private_file(self.path, json.dumps(states))
+            return result
+
+    def state(self):
+        return self._update(lambda state: dict(state))
+
+    def _open_error(self, state, now):
+        if state['state'] == HALF_OPEN:
+            return CircuitOpenError(
+                'Uptime Kuma circuit breaker is half-open and another process is probing the instance; '
+                f"last error: {state.get('lastError')}"
+            )
+        retry_in = max(0.0, state['openedAt'] + self.cooldown - now)
+        return CircuitOpenError(
+            f"Uptime Kuma circuit breaker is open after {state['failures']} consecutive connect/login failures "
+            f"(last error: {state.get('lastError')}); failing fast, next probe in {retry_in:.0f} s"
+        )
+
+    def check(self):
+        """Raise CircuitOpenError if a connection attempt would be refused right now (no state change)."""
+        if self.threshold <= 0:
+            return
+        state = self.state()
+        now = time.time()
+        if state['state'] == OPEN and now - state['openedAt'] < self.cooldown:
+            raise self._open_error(state, now)
+        if state['state'] == HALF_OPEN and now - state['probeStartedAt'] < PROBE_TIMEOUT:
+            raise self._open_error(state, now)
+
+    def before_connect(self):
+        """
+        Admit one connection attempt, or raise CircuitOpenError. When the
+        cooldown is over, the first caller becomes the half-open probe.
+        Returns the circuit state the attempt runs under.
+        """
+        if self.threshold <= 0:
+            return CLOSED
+        now = time.time()
+
+        def admit(state):
+            if state['state'] == CLOSED:
+                return CLOSED, None
+            if state['state'] == OPEN and now - state['openedAt'] < self.cooldown:
+                return None, self._open_error(state, now)
+            if state['state'] == HALF_OPEN and now - state['probeStartedAt'] < PROBE_TIMEOUT:
+                return None, self._open_error(state, now)
+            state['state'] = HALF_OPEN
+            state['probeStartedAt'] = now
+            return HALF_OPEN, None
+
+        admitted, error = self._update(admit)
+        if error is not None:
+            raise error
+        self.probing = admitted == HALF_OPEN
+        return admitted
+
+    def record_success(self):
+        if self.threshold <= 0:
+            return
+
+        def close(state):
+            state.clear()
+            state.update({'state': CLOSED, 'failures': 0})
+
+        self._update(close)
+        if self.probing:
+            log('circuit-breaker', 'Probe succeeded, circuit closed', level=0)
+        self.probing = False
+
+    def record_failure(self, error):
+        if self.threshold <= 0:
+            return
+        now = time.time()
+
+        def fail(state):
+            state['failures'] = state.get('failures', 0) + 1
+            state['lastError'] = f'{type(error).__name__}: {error}'[:300]
+            if state['state'] == HALF_OPEN or state['failures'] >= self.threshold:
+                opened = state['state'] != OPEN
+                state['state'] = OPEN
+                state['openedAt'] = now
+                state.pop('probeStartedAt', None)
+                return opened
+            return False
+
+        if self._update(fail):
+            log('circuit-breaker', f'Circuit opened after a connect/login failure ({error}); '
+                                   f'failing fast for {self.cooldown:g} s', level=0)
+        self.probing = False
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or reset the Uptime Kuma circuit breaker.')
+    parser.add_argument('command', choices=['status', 'reset'])
+    args = parser.parse_args()
+
+    try:
+        api_url = get_connection_settings()['api_url']
+        breaker = CircuitBreaker(api_url)
+        if args.command == 'reset':
+            breaker.record_success()
+        output = {'success': True, 'apiUrl': api_url, 'circuit': breaker.state(),
+                  'maxSessions': MAX_SESSIONS, 'maxLongSessions': MAX_LONG_SESSIONS,
+                  'threshold': breaker.threshold, 'cooldown': breaker.cooldown}
+        print(json.dumps(output))
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': str(e)}))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,604 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the Uptime Kuma scripts.
+
+Holds the connection settings, the Render readiness probe, the Uptime Kuma v2
+'conditions' patch, the login retry loop and the login token cache so that the
+one-shot scripts and the long-running worker (kuma_worker.py) open sessions the
+same way, under the same session limit and circuit breaker (kuma_admission.py).
+"""
+
+import sys
+import os
+import time
+import json
+from contextlib import nullcontext
+from pathlib import Path
+
+# Heavier stdlib modules (hashlib, tempfile, urllib, concurrent.futures, ...) are
+# imported where they are used, so a script that answers early starts faster
+
+# Add .python-packages directory to Python path (for Render deployment)
+# This ensures uptime-kuma-api is found even if PYTHONPATH isn't set correctly
+project_root = Path(__file__).parent.parent.parent
+python_packages_path = project_root / '.python-packages'
+if python_packages_path.exists() and str(python_packages_path) not in sys.path:
+    sys.path.insert(0, str(python_packages_path))
+
+# 0: errors only, 1: progress (default), 2: debug diagnostics. Password material
+# is never logged at any level.
+VERBOSITY = int(os.getenv('UPTIME_KUMA_VERBOSITY', '1'))
+
+# Render free tier services can be slow to wake up, so use 60 second timeout
+DEFAULT_TIMEOUT = 60.0
+
+# Render instances go to sleep after 15 minutes without traffic; a script that
+# reached the instance within this many seconds lets the next ones skip the probe
+WARM_MARKER_TTL = float(os.getenv('UPTIME_KUMA_WARM_TTL', '300'))
+
+# How long the readiness probe waits for a cold Render instance to answer
+WAKE_TIMEOUT = float(os.getenv('UPTIME_KUMA_WAKE_TIMEOUT', '90'))
+
+# How many batch items may be in flight on one session at the same time
+DEFAULT_BATCH_CONCURRENCY = int(os.getenv('UPTIME_KUMA_BATCH_CONCURRENCY', '4'))
+
+
+def get_state_dir():
+    """
+    Directory for local state shared between script runs (token cache etc.).
+
+    Defaults to a private directory under the system temp dir; override with
+    UPTIME_KUMA_STATE_DIR. The temp dir is shared, so a directory that is a
+    symlink, belongs to another user or is writable by others is refused
+    (PermissionError) rather than used to hold the login token.
+    """
+    import stat
+    import tempfile
+
+    state_dir = Path(os.getenv('UPTIME_KUMA_STATE_DIR') or Path(tempfile.gettempdir()) / 'iaccessible-cc-uptime-kuma')
+    state_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+    info = os.lstat(state_dir)
+    if (not stat.S_ISDIR(info.st_mode) or info.st_mode & 0o022
+            or (hasattr(os, 'getuid') and info.st_uid != os.getuid())):
+        raise PermissionError(
+            f"Refusing state directory {state_dir}: it must be a directory owned by this user "
+            f"and not writable by others (set UPTIME_KUMA_STATE_DIR to a private directory)"
+        )
+    return state_dir
+
+
+def write_private_file(path, content):
+    """
+    Atomically write a file readable only by the current user.
+
+    The temp file gets a random name and is created exclusively (mkstemp), so
+    a file or symlink planted next to it is never written through.
+    """
+    import tempfile
+
+    path = Path(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{path.name}.", suffix='.tmp', dir=path.parent)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def acquire_file_lock(path, timeout=None):
+    """
+    flock a per-key lock file that release_file_lock() removes again, so such
+    files don't pile up in the state directory. Waits up to `timeout` seconds
+    (None: for as long as it takes). Returns the fd, or None on timeout.
+    """
+    import fcntl
+
+    started = time.monotonic()
+    delay = 0.02
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        while True:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX if timeout is None else fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                waited = time.monotonic() - started
+                if waited >= timeout:
+                    os.close(fd)
+                    return None
+                time.sleep(min(delay, timeout - waited))
+                delay = min(delay * 2, 0.25)
+        try:
+            current = os.stat(path).st_ino == os.fstat(fd).st_ino
+        except FileNotFoundError:
+            current = False
+        if current:
+            return fd
+        # The holder we waited for removed the file; lock the one at the path now
+        os.close(fd)
+
+
+def release_file_lock(path, fd):
+    """Remove and unlock a lock file taken with acquire_file_lock()."""
+    try:
+        # Only the holder unlinks, so waiters notice the file is gone and reopen it
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    os.close(fd)
+
+
+def log(tag, message, level=1):
+    """Write a log line to stderr (stdout is reserved for JSON output) if VERBOSITY allows it."""
+    if VERBOSITY >= level:
+        print(f"[{tag}] {message}", file=sys.stderr)
+
+
+def log_diagnostics(tag):
+    """Log where packages are loaded from and which server is used (UPTIME_KUMA_VERBOSITY=2)."""
+    if VERBOSITY < 2:
+        return
+    if python_packages_path.exists():
+        try:
+            contents = sorted(item.name for item in python_packages_path.iterdir())
+        except OSError as e:
+            contents = [f'(could not list: {e})']
+        log(tag, f".python-packages: {python_packages_path} ({len(contents)} entries: {contents[:10]})", level=2)
+        if 'uptime_kuma_api' not in contents:
+            log(tag, "WARNING: uptime_kuma_api directory not found in .python-packages", level=2)
+    else:
+        log(tag, f".python-packages not found at {python_packages_path} (cwd: {os.getcwd()})", level=2)
+    log(tag, f"sys.path: {sys.path[:3]}", level=2)
+    settings = get_connection_settings()
+    log(tag, f"Connecting to {settings['api_url']} as {settings['username']} "
+             f"(password {'set' if settings['password'] else 'not set'})", level=2)
+
+
+def get_connection_settings():
+    """Read the Uptime Kuma connection settings from the environment."""
+    # Note: API keys are for REST endpoints only, not Socket.io authentication
+    return {
+        'api_url': os.getenv('UPTIME_KUMA_API_URL', 'http://localhost:3003'),
+        'username': os.getenv('UPTIME_KUMA_USERNAME', 'admin'),
+        'password': os.getenv('UPTIME_KUMA_PASSWORD', 'admin123'),
+    }
+
+
+def is_render_service(api_url):
+    return 'onrender.com' in api_url or 'render.com' in api_url
+
+
+def _warm_marker_path(api_url):
+    import hashlib
+
+    key = hashlib.sha256(api_url.rstrip('/').encode('utf-8')).hexdigest()[:16]
+    return get_state_dir() / f'warm-{key}'
+
+
+def is_marked_warm(api_url):
+    """True when a script reached this instance less than UPTIME_KUMA_WARM_TTL seconds ago."""
+    try:
+        return time.time() - os.path.getmtime(_warm_marker_path(api_url)) <= WARM_MARKER_TTL
+    except OSError:
+        return False
+
+
+def mark_warm(api_url, warm=True):
+    """Set (or with warm=False, clear) the shared warm marker for this instance."""
+    try:
+        if warm:
+            write_private_file(_warm_marker_path(api_url), str(time.time()))
+        else:
+            os.unlink(_warm_marker_path(api_url))
+    except OSError:
+        pass
+
+
+def wait_until_ready(api_url, tag, timeout=WAKE_TIMEOUT, base_delay=0.5, max_delay=8.0):
+    """
+    Poll the instance until it answers, with capped exponential backoff and jitter.
+
+    Any HTTP response below 500 counts as ready (Render answers 502/503 while
+    the instance boots). Returns {'ready', 'attempts', 'waitMs'}; never raises,
+    so a failed probe just leaves the login to its own retries.
+    """
+    import random
+    import urllib.error
+    import urllib.request
+
+    probe_url = api_url.rstrip('/') + '/api/entry-page'
+    started = time.monotonic()
+    delay = base_delay
+    attempt = 0
+    ready = False
+
+    while True:
+        attempt += 1
+        remaining = timeout - (time.monotonic() - started)
+        try:
+            req = urllib.request.Request(probe_url)
+            req.add_header('User-Agent', 'iaccessible-cc/1.0')
+            with urllib.request.urlopen(req, timeout=max(1.0, min(10.0, remaining))) as response:
+                status = response.getcode()
+        except urllib.error.HTTPError as e:
+            status = e.code
+        except Exception as e:
+            status = None
+            log(tag, f"Readiness probe {attempt} failed: {e}", level=2)
+        if status is not None and status < 500:
+            ready = True
+            break
+
+        remaining = timeout - (time.monotonic() - started)
+        if remaining <= 0:
+            break
+        # Jitter keeps concurrent scripts from probing in lockstep
+        sleep_for = min(delay / 2 + random.uniform(0, delay / 2), remaining)
+        log(tag, f"Instance not ready (status: {status}), retrying in {sleep_for:.1f}s")
+        time.sleep(sleep_for)
+        delay = min(delay * 2, max_delay)
+
+    wait_ms = round((time.monotonic() - started) * 1000, 1)
+    log(tag, f"Readiness probe {'succeeded' if ready else 'gave up'} after {attempt} attempt(s), {wait_ms}ms")
+    return {'ready': ready, 'attempts': attempt, 'waitMs': wait_ms}
+
+
+def wake_render_service(api_url, tag):
+    """
+    For Render services, make sure the instance is awake before opening Socket.io.
+
+    Skips the probe entirely when the shared warm marker says the instance
+    answered recently. Returns the cold-start report for the script output:
+    {'probed', 'warmMarker', 'ready', 'attempts', 'waitMs'}.
+    """
+    if is_marked_warm(api_url):
+        return {'probed': False, 'warmMarker': 'hit', 'ready': True, 'attempts': 0, 'waitMs': 0.0}
+
+    log(tag, "Detected Render service without a recent warm marker, probing readiness...")
+    report = {'probed': True, 'warmMarker': 'miss'}
+    report.update(wait_until_ready(api_url, tag))
+    if report['ready']:
+        mark_warm(api_url)
+    return report
+
+
+def patch_monitor_conditions(api, tag):
+    """
+    Monkey-patch to inject 'conditions' field for Uptime Kuma v2 compatibility.
+
+    Uptime Kuma v2 requires 'conditions' to be NOT NULL, but the library doesn't support it.
+    """
+    # Patch _build_monitor_data if it exists (this is the method that builds the data dict)
+    if hasattr(api, '_build_monitor_data'):
+        original_build_monitor_data = api._build_monitor_data
+
+        def patched_build_monitor_data(**kwargs):
+            data = original_build_monitor_data(**kwargs)
+            # Add conditions field if not present (required by Uptime Kuma v2)
+            if 'conditions' not in data or data['conditions'] is None:
+                data['conditions'] = []  # Default to empty array for new monitors
+                log(tag, "Injected 'conditions' field (empty array) for Uptime Kuma v2 compatibility", level=2)
+            else:
+                log(tag, f"'conditions' field already present: {data.get('conditions')}", level=2)
+            return data
+
+        api._build_monitor_data = patched_build_monitor_data
+        log(tag, "Successfully patched _build_monitor_data method for Uptime Kuma v2", level=2)
+    else:
+        # Fallback: patch _call method to inject conditions into data before sending
+        log(tag, "_build_monitor_data not found, patching _call method instead", level=2)
+        original_call = api._call
+
+        def patched_call(event, data=None, **kwargs):
+            # If this is an 'add' event for a monitor, inject conditions
+            if event == 'add' and isinstance(data, dict):
+                if 'conditions' not in data or data['conditions'] is None:
+                    data['conditions'] = []
+                    log(tag, "Injected 'conditions' field via _call patch for Uptime Kuma v2", level=2)
+            return original_call(event, data, **kwargs)
+
+        api._call = patched_call
+
+
+def login_with_retry(api, username, password, tag, max_retries=3, retries=None):
+    """
+    Authenticate using username/password.
+
+    Retries login up to max_retries times with exponential backoff (2s, 4s, 8s)
+    when the server times out, which happens while Render services wake up.
+    The number of retries is recorded in the optional `retries` dict.
+    """
+    retry_delay = 2  # Start with 2 seconds
+
+    for attempt in range(1, max_retries + 1):
+        if retries is not None:
+            retries['login'] = attempt - 1
+        try:
+            log(tag, f"Login attempt {attempt}/{max_retries}", level=2)
+            result = api.login(username, password)
+            log(tag, "Authentication successful")
+            return result
+        except Exception as login_error:
+            error_type = type(login_error).__name__
+            if error_type == 'TimeoutError' and attempt < max_retries:
+                # Wait before retrying (exponential backoff)
+                log(tag, f"Timeout on attempt {attempt}, waiting {retry_delay}s before retry...")
+                time.sleep(retry_delay)
+                retry_delay *= 2
+            else:
+                # Not a timeout or last attempt, re-raise
+                raise
+
+
+def token_cache_enabled():
+    return os.getenv('UPTIME_KUMA_TOKEN_CACHE', 'true').lower() not in ('0', 'false', 'no')
+
+
+def _token_cache_path():
+    return get_state_dir() / 'login-tokens.json'
+
+
+def _token_cache_key(api_url, username):
+    import hashlib
+
+    return hashlib.sha256(f"{api_url.rstrip('/')}\n{username}".encode('utf-8')).hexdigest()
+
+
+def _read_token_cache():
+    try:
+        with open(_token_cache_path()) as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def _token_expired(token):
+    """Check the JWT 'exp' claim if there is one. Uptime Kuma tokens usually have none."""
+    import base64
+
+    try:
+        payload = token.split('.')[1]
+        payload += '=' * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+    except (IndexError, ValueError):
+        return False
+    exp = claims.get('exp') if isinstance(claims, dict) else None
+    return isinstance(exp, (int, float)) and exp <= time.time()
+
+
+def load_cached_token(api_url, username):
+    """Return the cached login token for this server and user, or None."""
+    entry = _read_token_cache().get(_token_cache_key(api_url, username))
+    token = entry.get('token') if isinstance(entry, dict) else None
+    if not token or _token_expired(token):
+        return None
+    return token
+
+
+def save_cached_token(api_url, username, token):
+    cache = _read_token_cache()
+    key = _token_cache_key(api_url, username)
+    if token:
+        cache[key] = {'token': token, 'savedAt': time.time()}
+    else:
+        cache.pop(key, None)
+    write_private_file(_token_cache_path(), json.dumps(cache))
+
+
+def login_with_cached_token(api, api_url, username, password, tag, max_retries=3, retries=None):
+    """
+    Log in with the cached token when there is one, otherwise with username/password.
+
+    Returns 'hit' when the cached token was accepted, 'miss' when a password
+    login was needed, or 'disabled' when UPTIME_KUMA_TOKEN_CACHE is off.
+    """
+    if not token_cache_enabled():
+        login_with_retry(api, username, password, tag, max_retries=max_retries, retries=retries)
+        return 'disabled'
+
+    token = load_cached_token(api_url, username)
+    if token:
+        try:
+            api.login_by_token(token)
+            log(tag, "Authenticated with cached login token")
+            return 'hit'
+        except Exception as token_error:
+            log(tag, f"Cached login token rejected ({type(token_error).__name__}), falling back to password login")
+            save_cached_token(api_url, username, None)
+
+    result = login_with_retry(api, username, password, tag, max_retries=max_retries, retries=retries)
+    new_token = result.get('token') if isinstance(result, dict) else None
+    if new_token:
+        try:
+            save_cached_token(api_url, username, new_token)
+        except OSError as e:
+            log(tag, f"Could not write login token cache (ignored): {e}")
+    return 'miss'
+
+
+def _phase(timer, name):
+    return timer.phase(name) if timer is not None else nullcontext()
+
+
+def open_session(tag, timeout=DEFAULT_TIMEOUT, wake_render=True, max_login_retries=3, timer=None, settings=None,
+                 long_lived=False):
+    """
+    Open an authenticated UptimeKumaApi session.
+
+    Returns (api, session_info). The caller owns the api object and must call
+    api.disconnect() (or use it as a context manager) when done. session_info
+    reports how the session was set up, e.g. {'tokenCache': 'hit', 'coldStart': {...}};
+    scripts copy it into their JSON output.
+
+    The session keeps the local monitor list snapshot (monitor_list_snapshot.py)
+    up to date from the monitorList pushes it receives.
+
+    With a kuma_metrics.RunTimer, the wake, connect and login phases and the
+    retry counts are recorded on it.
+
+    The session holds a host-wide session slot until it disconnects, and a
+    circuit breaker shared by all scripts fails fast with CircuitOpenError
+    while Uptime Kuma keeps failing (see kuma_admission.py). Sessions that
+    stay open (long_lived) take their slot from a separate pool.
+
+    `settings` (as returned by get_connection_settings()) selects another
+    instance, e.g. one shard of kuma_shards.py.
+    """
+    from uptime_kuma_api import UptimeKumaApi
+    from monitor_list_snapshot import attach as attach_monitor_list_snapshot
+    from kuma_admission import CircuitBreaker, acquire_session_slot
+
+    settings = settings or get_connection_settings()
+    api_url = settings['api_url']
+
+    # Fail fast while the circuit is open, before probing or waiting for a slot
+    breaker = CircuitBreaker(api_url)
+    breaker.check()
+
+    # Wake Render first, so a cold start (up to UPTIME_KUMA_WAKE_TIMEOUT) doesn't hold a slot
+    render = is_render_service(api_url)
+    with _phase(timer, 'wake'):
+        if wake_render and render:
+            cold_start = wake_render_service(api_url, tag)
+        else:
+            cold_start = {'probed': False, 'warmMarker': 'n/a', 'ready': True, 'attempts': 0, 'waitMs': 0.0}
+    if timer is not None:
+        timer.retries['wakeProbe'] = max(0, cold_start['attempts'] - 1)
+
+    with _phase(timer, 'admission'):
+        slot = acquire_session_slot(api_url, tag, long_lived=long_lived)
+    try:
+        circuit = breaker.before_connect()
+    except Exception:
+        slot.release()
+        raise
+
+    try:
+        log(tag, f"Creating UptimeKumaApi connection to {api_url} with {timeout}s timeout", level=2)
+        try:
+            with _phase(timer, 'connect'):
+                api = UptimeKumaApi(api_url, timeout=timeout)
+        except Exception:
+            if render:
+                # The instance may have gone back to sleep; probe again next time
+                mark_warm(api_url, warm=False)
+            raise
+        try:
+            patch_monitor_conditions(api, tag)
+            # Before login, so the monitorList push that follows it is seen
+            attach_monitor_list_snapshot(api, api_url, tag)
+            with _phase(timer, 'login'):
+                token_cache = login_with_cached_token(
+                    api, api_url, settings['username'], settings['password'], tag,
+                    max_retries=max_login_retries, retries=timer.retries if timer is not None else None
+                )
+        except Exception:
+            api.disconnect()
+            raise
+    except Exception as e:
+        slot.release()
+        breaker.record_failure(e)
+        raise
+    breaker.record_success()
+    _release_on_disconnect(api, slot)
+    if render:
+        # A successful login proves the instance is up for the next scripts too
+        mark_warm(api_url)
+    admission = slot.info()
+    admission['circuit'] = circuit
+    return api, {'tokenCache': token_cache, 'coldStart': cold_start, 'admission': admission}
+
+
+def _release_on_disconnect(api, slot):
+    """Free the session slot when the session disconnects (also via `with api:`)."""
+    original_disconnect = api.disconnect
+
+    def disconnect():
+        try:
+            original_disconnect()
+        finally:
+            slot.release()
+
+    api.disconnect = disconnect
+
+
+def get_batch(input_data):
+    """
+    Detect batch input.
+
+    Accepts either a JSON array of items or {"items": [...], "concurrency": N}.
+    Returns (items, concurrency) for batch input, or (None, None) for a single item.
+    """
+    if isinstance(input_data, list):
+        return input_data, DEFAULT_BATCH_CONCURRENCY
+    if isinstance(input_data, dict) and isinstance(input_data.get('items'), list):
+        concurrency = int(input_data.get('concurrency') or DEFAULT_BATCH_CONCURRENCY)
+        return input_data['items'], concurrency
+    return None, None
+
+
+def run_batch(api, items, handler, concurrency=DEFAULT_BATCH_CONCURRENCY, tag='batch'):
+    """
+    Run handler(api, item) for every item over one authenticated session.
+
+    Up to `concurrency` calls are in flight at once; Socket.io matches each
+    response to its call, so they can share the connection. A failing item
+    is reported in its own result and does not stop the rest of the batch.
+    """
+    import traceback
+
+    concurrency = max(1, min(int(concurrency), len(items) or 1))
+    log(tag, f"Running batch of {len(items)} items with concurrency {concurrency}")
+
+    def run_item(index):
+        item = items[index]
+        started = time.perf_counter()
+        try:
+            if not isinstance(item, dict):
+                raise ValueError('Batch item must be a JSON object')
+            result = handler(api, item)
+        except Exception as e:
+            result = {
+                'success': False,
+                'error': str(e),
+                'traceback': traceback.format_exc()
+            }
+        item_result = {'index': index}
+        item_result.update(result)
+        item_result['durationMs'] = round((time.perf_counter() - started) * 1000, 1)
+        return item_result
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        results = [run_item(i) for i in range(len(items))]
+    else:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(run_item, range(len(items))))
+    return batch_output(results, concurrency, (time.perf_counter() - started) * 1000)
+
+
+def batch_output(results, concurrency, total_ms):
+    """The output of a batch: the per-item results and a summary of their timings."""
+    item_durations = [r['durationMs'] for r in results]
+    succeeded = sum(1 for r in results if r.get('success'))
+    return {
+        'success': True,
+        'results': results,
+        'batch': {
+            'count': len(results),
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'concurrency': concurrency,
+            'totalMs': round(total_ms, 1),
+            'sumItemMs': round(sum(item_durations), 1),
+            'maxItemMs': max(item_durations) if item_durations else 0,
+        }
+    }
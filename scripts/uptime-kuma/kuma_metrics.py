@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Per-phase timings, metrics files and profiling for the Uptime Kuma scripts.
+
+Every script adds a "timings" block to its JSON output:
+{
+  "timings": {
+    "interpreterStartMs": 61.0,   # process start until main() (interpreter + imports)
+    "wakeMs": 0.0,                # Render readiness probe
+    "connectMs": 212.4,           # Socket.io connect
+    "loginMs": 95.1,
+    "operationMs": 48.7,          # the add/update/delete/list/beats call itself
+    "serializationMs": 0.4,       # JSON encoding of the output
+    "totalMs": 420.3
+  },
+  "payload": {"inputBytes": 154, "outputBytes": 212},
+  "retries": {"login": 0, "wakeProbe": 0}
+}
+
+kuma_worker.py adds the same block (without interpreterStartMs, and with
+wake/connect/login only when the request had to reconnect) to each response.
+
+interpreterStartMs is measured from UPTIME_KUMA_SPAWNED_AT (epoch ms, set by
+the Node caller just before spawning) or, on Linux, from the process start
+time in /proc. It is null when neither is available.
+
+Opt-in:
+- UPTIME_KUMA_METRICS_FILE=path appends the same data for every run. Paths
+  ending in .prom are written as a Prometheus textfile-collector file (last
+  run per script); anything else gets one JSON object per line.
+- UPTIME_KUMA_PROFILE_DIR=dir runs main() under cProfile and tracemalloc and
+  writes <script>-<time>-<pid>.prof and ...-tracemalloc.txt there.
+"""
+
+import sys
+import json
+import os
+import time
+from contextlib import contextmanager
+
+from kuma_common import log
+
+
+def interpreter_start_ms():
+    """Milliseconds since the process was started (or spawned by Node), or None."""
+    spawned_at = os.getenv('UPTIME_KUMA_SPAWNED_AT')
+    if spawned_at:
+        try:
+            return round(time.time() * 1000 - float(spawned_at), 1)
+        except ValueError:
+            pass
+    try:
+        with open('/proc/self/stat') as f:
+            # Field 22 (after the parenthesized command name) is the start time in clock ticks since boot
+            start_ticks = int(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return round((uptime - start_ticks / os.sysconf('SC_CLK_TCK')) * 1000, 1)
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class RunTimer:
+    """Collects phase timings, payload sizes and retry counts for one script run."""
+
+    def __init__(self, script, process_start=True):
+        self.script = script
+        self.started = time.perf_counter()
+        # A long-lived worker times each request, not the process
+        self.start_offset_ms = interpreter_start_ms() if process_start else None
+        self.timings = {'interpreterStartMs': self.start_offset_ms} if process_start else {}
+        self.payload = {}
+        self.retries = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            key = f'{name}Ms'
+            self.timings[key] = round(self.timings.get(key, 0) + (time.perf_counter() - started) * 1000, 1)
+
+    def read_input(self, stream=None):
+        """Read and parse the JSON request from stdin, recording its size."""
+        raw = (stream or sys.stdin).read()
+        self.payload['inputBytes'] = len(raw.encode('utf-8'))
+        return json.loads(raw) if raw.strip() else {}
+
+    def report(self):
+        elapsed_ms = (time.perf_counter() - self.started) * 1000
+        self.timings['totalMs'] = round(elapsed_ms + (self.start_offset_ms or 0), 1)
+        return {'timings': self.timings, 'payload': self.payload, 'retries': self.retries}
+
+    def emit(self, output):
+        """
+        Serialize the output with the timing report added, and record metrics.
+
+        The output is serialized once; the report (which includes the
+        serialization time) is then spliced into the JSON object.
+        """
+        with self.phase('serialization'):
+            body = json.dumps(output, default=str)
+        self.payload['outputBytes'] = self.payload.get('outputBytes', 0) + len(body.encode('utf-8'))
+        report = self.report()
+        write_metrics(self.script, bool(output.get('success')), report)
+        if body.endswith('}'):
+            extra = json.dumps(report)[1:-1]
+            body = body[:-1] + (', ' if body != '{}' else '') + extra + '}'
+        return body
+
+
+def _write_jsonl(path, record):
+    with open(path, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+def _render_prometheus(runs):
+    families = [
+        ('uptime_kuma_script_phase_seconds', 'Duration of each phase of the last run', 'phase',
+         lambda run: {k[:-2]: v / 1000 for k, v in run['timings'].items() if v is not None}),
+        ('uptime_kuma_script_payload_bytes', 'Payload sizes of the last run', 'direction',
+         lambda run: {k[:-5]: v for k, v in run['payload'].items()}),
+        ('uptime_kuma_script_retries', 'Retries in the last run', 'kind',
+         lambda run: run['retries']),
+    ]
+    lines = []
+    for name, help_text, label, values in families:
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+        for script, run in sorted(runs.items()):
+            for key, value in sorted(values(run).items()):
+                lines.append(f'{name}{{script="{script}",{label}="{key}"}} {value}')
+    lines += ['# HELP uptime_kuma_script_last_success Whether the last run succeeded',
+              '# TYPE uptime_kuma_script_last_success gauge']
+    lines += [f'uptime_kuma_script_last_success{{script="{s}"}} {int(r["success"])}' for s, r in sorted(runs.items())]
+    lines += ['# HELP uptime_kuma_script_last_run_timestamp_seconds When the last run finished',
+              '# TYPE uptime_kuma_script_last_run_timestamp_seconds gauge']
+    lines += [f'uptime_kuma_script_last_run_timestamp_seconds{{script="{s}"}} {r["time"]}' for s, r in sorted(runs.items())]
+    return '\n'.join(lines) + '\n'
+
+
+def _write_prometheus(path, record):
+    """Keep the last run per script in a JSON sidecar and re-render the textfile from it."""
+    import fcntl
+    from kuma_common import write_private_file
+
+    state_path = path + '.state.json'
+    with open(path + '.lock', 'a') as lock:
+        # Several scripts may finish at once; they must not drop each other's runs
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            with open(state_path) as f:
+                runs = json.load(f)
+        except (OSError, ValueError):
+            runs = {}
+        runs[record['script']] = record
+        write_private_file(state_path, json.dumps(runs))
+        # The textfile collector must never see a half-written file
+        write_private_file(path, _render_prometheus(runs))
+
+
+def write_metrics(script, success, report):
+    """Append the run to UPTIME_KUMA_METRICS_FILE when it is set. Never raises."""
+    path = os.getenv('UPTIME_KUMA_METRICS_FILE')
+    if not path:
+        return
+    record = {'time': round(time.time(), 3), 'script': script, 'success': success}
+    record.update(report)
+    try:
+        if path.endswith('.prom'):
+            _write_prometheus(path, record)
+        else:
+            _write_jsonl(path, record)
+    except Exception as e:
+        log(script, f"Could not write metrics file (ignored): {e}")
+
+
+def run_main(script, main):
+    """
+    Run a script's main(); with UPTIME_KUMA_PROFILE_DIR set, under cProfile and
+    tracemalloc, writing both profiles to that directory.
+    """
+    profile_dir = os.getenv('UPTIME_KUMA_PROFILE_DIR')
+    if not profile_dir:
+        return main()
+
+    import cProfile
+    import tracemalloc
+
+    os.makedirs(profile_dir, exist_ok=True)
+    prefix = os.path.join(profile_dir, f"{script}-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}")
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        return main()
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        profiler.dump_stats(f'{prefix}.prof')
+        with open(f'{prefix}-tracemalloc.txt', 'w') as f:
+            f.write(f'current={current} peak={peak}\n')
+            for stat in snapshot.statistics('lineno')[:50]:
+                f.write(f'{stat}\n')
+        log(script, f"Profiles written to {prefix}.prof and {prefix}-tracemalloc.txt")
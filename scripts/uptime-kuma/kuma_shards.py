@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Sharding monitors across several Uptime Kuma instances.
+
+One instance can only check so many monitors at 60 s intervals, so
+UPTIME_KUMA_SHARDS may list several. Either a comma-separated list of URLs
+(shard numbers follow the list order, and all shards use
+UPTIME_KUMA_USERNAME / UPTIME_KUMA_PASSWORD), or a JSON array:
+
+  [{"id": 0, "url": "https://kuma-a.onrender.com"},
+   {"id": 1, "url": "https://kuma-b.onrender.com", "username": "...", "password": "..."}]
+
+Without it, UPTIME_KUMA_API_URL is the only shard and nothing changes.
+
+- Placement: a new monitor goes to the shard chosen by rendezvous hashing of
+  its domain (the URL host, or the hostname for non-HTTP monitors) with each
+  shard's number. Adding a shard only moves the domains the new shard wins,
+  about 1/N of them; nothing moves between the existing shards.
+- Global monitor IDs: shard number * SHARD_ID_STRIDE + the instance's own
+  ID. Shard 0 keeps its IDs, so the original instance's IDs stay valid. A
+  shard's number must never change once it holds monitors; append new shards
+  with new numbers.
+- Scatter-gather: reads over several shards run on one session per shard, in
+  parallel, and their results are merged under the global IDs.
+
+Monitors already on a shard stay there when placement changes; `place`
+shows where domains belong now.
+
+  python3 kuma_shards.py list
+  python3 kuma_shards.py place example.gov https://other.gov/page
+"""
+
+import sys
+import json
+import os
+import time
+import argparse
+from collections import namedtuple
+
+from kuma_common import batch_output, get_connection_settings, log, open_session
+
+# Global monitor ID = shard number * SHARD_ID_STRIDE + the shard's own monitor ID
+SHARD_ID_STRIDE = 10_000_000
+
+
+class Shard(namedtuple('Shard', 'number name api_url username password')):
+    """One Uptime Kuma instance of the shard set."""
+
+    def settings(self):
+        """Connection settings in the form open_session() takes."""
+        return {'api_url': self.api_url, 'username': self.username, 'password': self.password}
+
+
+_shards = None
+
+
+def get_shards():
+    """The configured shards, ordered by number (read from the environment once per process)."""
+    global _shards
+    if _shards is not None:
+        return _shards
+
+    settings = get_connection_settings()
+    raw = os.getenv('UPTIME_KUMA_SHARDS', '').strip()
+    if not raw:
+        entries = [{'id': 0, 'url': settings['api_url']}]
+    elif raw.startswith('['):
+        entries = json.loads(raw)
+    else:
+        entries = [{'id': index, 'url': url.strip()} for index, url in enumerate(raw.split(',')) if url.strip()]
+
+    shards = []
+    for entry in entries:
+        if not isinstance(entry, dict) or not entry.get('url') or not isinstance(entry.get('id'), int):
+            raise ValueError('UPTIME_KUMA_SHARDS entries need an integer "id" and a "url"')
+        shards.append(Shard(
+            number=entry['id'],
+            name=entry.get('name') or f"shard-{entry['id']}",
+            api_url=entry['url'].rstrip('/'),
+            username=entry.get('username') or settings['username'],
+            password=entry.get('password') or settings['password'],
+        ))
+    numbers = [shard.number for shard in shards]
+    if len(set(numbers)) != len(numbers) or min(numbers) < 0:
+        raise ValueError('UPTIME_KUMA_SHARDS shard ids must be unique and not negative')
+    _shards = sorted(shards, key=lambda shard: shard.number)
+    return _shards
+
+
+def sharding_enabled():
+    """True when UPTIME_KUMA_SHARDS lists more than one instance."""
+    return len(get_shards()) > 1
+
+
+def placement_key(monitor):
+    """The domain a monitor is placed by: its URL host, else its hostname, else its name."""
+    from urllib.parse import urlsplit
+
+    url = (monitor.get('url') or '').strip()
+    host = urlsplit(url if '//' in url else f'//{url}').hostname if url else None
+    return (host or (monitor.get('hostname') or '').strip() or monitor.get('name') or '').lower()
+
+
+def shard_for_key(key, shards=None):
+    """Rendezvous (highest random weight) hashing: the shard whose hash with the key is highest."""
+    import hashlib
+
+    shards = shards or get_shards()
+
+    def weight(shard):
+        return hashlib.sha256(f'{shard.number}|{key}'.encode('utf-8')).digest()
+
+    return max(shards, key=weight)
+
+
+def shard_for_monitor(monitor):
+    """The shard a new monitor (add_monitor input or kwargs) belongs on."""
+    return shard_for_key(placement_key(monitor))
+
+
+def global_monitor_id(shard, monitor_id):
+    if monitor_id is None:
+        return None
+    return shard.number * SHARD_ID_STRIDE + int(monitor_id)
+
+
+def resolve_monitor_id(global_id):
+    """Return (shard, the shard's own monitor ID) for a global monitor ID."""
+    global_id = int(global_id)
+    number, monitor_id = divmod(global_id, SHARD_ID_STRIDE)
+    for shard in get_shards():
+        if shard.number == number:
+            return shard, monitor_id
+    raise ValueError(f'Monitor ID {global_id} belongs to shard {number}, which UPTIME_KUMA_SHARDS does not list')
+
+
+def group_monitor_ids(global_ids):
+    """Group global monitor IDs by shard: {shard: [(global ID, shard's own ID)]}."""
+    groups = {}
+    for global_id in global_ids:
+        shard, monitor_id = resolve_monitor_id(global_id)
+        groups.setdefault(shard, []).append((int(global_id), monitor_id))
+    return groups
+
+
+def globalize_monitor(shard, monitor):
+    """Rewrite the monitor IDs in a monitor dict (id, parent, childrenIDs) to global IDs."""
+    if shard.number == 0:
+        return monitor
+    for field in ('id', 'parent'):
+        if monitor.get(field) is not None:
+            monitor[field] = global_monitor_id(shard, monitor[field])
+    if isinstance(monitor.get('childrenIDs'), list):
+        monitor['childrenIDs'] = [global_monitor_id(shard, child) for child in monitor['childrenIDs']]
+    return monitor
+
+
+def globalize_beats(shard, beats):
+    """Rewrite the monitor_id of every beat to the global ID."""
+    if shard.number != 0:
+        for beat in beats:
+            if beat.get('monitor_id') is not None:
+                beat['monitor_id'] = global_monitor_id(shard, beat['monitor_id'])
+    return beats
+
+
+def open_shard_session(shard, tag, **kwargs):
+    """open_session() against one shard; same return value."""
+    return open_session(tag, settings=shard.settings(), **kwargs)
+
+
+def scatter_gather(groups, fn, tag='shards'):
+    """
+    Run fn(shard, work) for every {shard: work} at once, one thread per shard.
+    Returns {shard: (result, error)}; a failing shard doesn't fail the others.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def run(shard):
+        try:
+            return shard, fn(shard, groups[shard]), None
+        except Exception as e:
+            log(tag, f"{shard.name} ({shard.api_url}) failed: {e}", level=0)
+            return shard, None, e
+
+    if not groups:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(groups)) as executor:
+        return {shard: (result, error) for shard, result, error in executor.map(run, list(groups))}
+
+
+def run_sharded_batch(tag, items, route, run_group, **session_kwargs):
+    """
+    Run a batch across shards: route(item) returns (shard, the item as that
+    shard sees it); every shard's items then run through
+    run_group(api, shard_items) -> batch output, on one session per shard,
+    all shards at once.
+
+    Returns the batch output over all items in their original order, with
+    "shard" in every result and "monitorID" as a global ID, plus "shards"
+    with each shard's item count and session info.
+    """
+    groups = {}
+    results = []
+    for index, item in enumerate(items):
+        try:
+            shard, shard_item = route(item)
+        except Exception as e:
+            results.append({'index': index, 'success': False, 'error': str(e), 'durationMs': 0.0})
+            continue
+        groups.setdefault(shard, []).append((index, shard_item))
+
+    def run_shard(shard, entries):
+        api, session = open_shard_session(shard, tag, **session_kwargs)
+        with api:
+            output = run_group(api, [shard_item for _, shard_item in entries])
+        output['session'] = session
+        return output
+
+    started = time.perf_counter()
+    concurrency = 0
+    shards_info = {}
+    for shard, (output, error) in scatter_gather(groups, run_shard, tag).items():
+        entries = groups[shard]
+        if error is not None:
+            results += [
+                {'index': index, 'success': False, 'error': str(error), 'shard': shard.name, 'durationMs': 0.0}
+                for index, _ in entries
+            ]
+            shards_info[shard.name] = {'count': len(entries), 'error': str(error)}
+            continue
+        for result in output['results']:
+            result['index'] = entries[result['index']][0]
+            result['shard'] = shard.name
+            if result.get('monitorID') is not None:
+                result['monitorID'] = global_monitor_id(shard, result['monitorID'])
+            results.append(result)
+        concurrency += output['batch']['concurrency']
+        shards_info[shard.name] = dict(count=len(entries), **output['session'])
+
+    results.sort(key=lambda result: result['index'])
+    output = batch_output(results, concurrency, (time.perf_counter() - started) * 1000)
+    output['shards'] = shards_info
+    return output
+
+
+def single_result(output):
+    """The result of a one-item sharded batch as a single-request output; raises if it failed."""
+    result = dict(output['results'][0])
+    if not result.get('success'):
+        raise RuntimeError(result.get('error'))
+    result.pop('index', None)
+    result.pop('durationMs', None)
+    session = dict(output['shards'].get(result.get('shard'), {}))
+    session.pop('count', None)
+    result.update(session)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Show the Uptime Kuma shards and where domains are placed.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('list')
+    place = sub.add_parser('place')
+    place.add_argument('targets', nargs='+', help='domains or URLs')
+    args = parser.parse_args()
+
+    try:
+        shards = get_shards()
+        if args.command == 'list':
+            output = {'success': True, 'shards': [
+                {'id': shard.number, 'name': shard.name, 'url': shard.api_url,
+                 'firstMonitorId': shard.number * SHARD_ID_STRIDE} for shard in shards
+            ]}
+        else:
+            placements = {}
+            for target in args.targets:
+                shard = shard_for_monitor({'url': target})
+                placements[target] = {'domain': placement_key({'url': target}), 'shard': shard.name, 'url': shard.api_url}
+            output = {'success': True, 'placements': placements}
+        print(json.dumps(output))
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': str(e)}))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
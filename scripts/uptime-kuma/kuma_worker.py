@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Long-running Uptime Kuma worker.
+
+Keeps one authenticated UptimeKumaApi session open and serves requests for the
+add_monitor, update_monitor, delete_monitor, get_monitor_beats, list_monitors
+and reconcile_monitors operations, so callers don't pay for a new
+interpreter, Socket.io connection and login on every request.
+
+Requests are newline-delimited JSON, one per line:
+{"requestId": "abc", "op": "add_monitor", "payload": {...}}
+
+Each request gets exactly one JSON line back. It has the same fields the
+matching one-shot script prints, plus the echoed "requestId":
+{"requestId": "abc", "success": true, "monitorID": 12, "message": "..."}
+
+add_monitor, update_monitor and delete_monitor run through the scripts' own
+run_request(), so a batch payload (a JSON array or {"items": [...],
+"concurrency": N}) gets the same validation, "fieldErrors" and idempotent
+dedupe as the one-shot scripts.
+
+Requests run concurrently over the one session, up to
+UPTIME_KUMA_WORKER_CONCURRENCY (default 8) at a time on stdin, and one per
+connection on a socket: Socket.io matches every answer to its call, which is
+also what kuma_common.run_batch() relies on. Responses may therefore come back
+out of order; match them by "requestId". Only (re)connecting is serialized.
+
+Usage:
+  python3 kuma_worker.py                     # serve requests on stdin/stdout
+  python3 kuma_worker.py --socket /tmp/kuma.sock   # serve on a local Unix socket
+"""
+
+import sys
+import json
+import argparse
+import os
+import socketserver
+import threading
+import traceback
+from contextlib import nullcontext
+
+from kuma_common import log, open_session
+from kuma_metrics import RunTimer
+from monitor_schema import MonitorInputError
+
+import add_monitor
+import update_monitor
+import delete_monitor
+import get_monitor_beats
+import list_monitors
+import reconcile_monitors
+
+TAG = 'kuma_worker'
+
+WORKER_CONCURRENCY = int(os.getenv('UPTIME_KUMA_WORKER_CONCURRENCY', '8'))
+
+OPERATIONS = {
+    'add_monitor': add_monitor.run_request,
+    'update_monitor': update_monitor.run_request,
+    'delete_monitor': delete_monitor.run_request,
+    'get_monitor_beats': get_monitor_beats.run,
+    'list_monitors': list_monitors.run,
+    'reconcile_monitors': reconcile_monitors.run,
+}
+
+# Only these are retried after a dropped connection: a write may already have
+# reached Uptime Kuma before the drop, and retrying it would apply it twice
+RETRY_OPERATIONS = frozenset({'get_monitor_beats', 'list_monitors'})
+
+
+class KumaWorker:
+    """Owns the shared session and dispatches requests to the operation handlers."""
+
+    def __init__(self):
+        self.api = None
+        # Calls on the session may overlap (see the module docstring); the lock
+        # only keeps two requests from replacing a lost session at once
+        self.session_lock = threading.Lock()
+
+    def _ensure_session(self, timer=None):
+        """Return the connected session, reconnecting it if it was lost."""
+        from kuma_shards import sharding_enabled
+
+        if sharding_enabled():
+            raise RuntimeError('kuma_worker.py keeps one session to one Uptime Kuma instance; '
+                               'with several in UPTIME_KUMA_SHARDS, run the scripts directly')
+        with self.session_lock:
+            if self.api is None or not self.api.sio.connected:
+                if self.api is not None:
+                    log(TAG, "Session lost, reconnecting...")
+                    self._close_session()
+                self.api, _ = open_session(TAG, timer=timer, long_lived=True)
+            return self.api
+
+    def _close_session(self):
+        if self.api is not None:
+            try:
+                self.api.disconnect()
+            except Exception as e:
+                log(TAG, f"Error while disconnecting (ignored): {e}")
+            self.api = None
+
+    def handle(self, request, timer=None):
+        """Run one request and return the response dict (never raises)."""
+        request_id = request.get('requestId') if isinstance(request, dict) else None
+        try:
+            if not isinstance(request, dict):
+                raise ValueError('Request must be a JSON object')
+            op = request.get('op')
+            if op not in OPERATIONS:
+                raise ValueError(f"Unknown op: {op!r}. Expected one of: {', '.join(OPERATIONS)}")
+            payload = request.get('payload') or {}
+            handler = OPERATIONS[op]
+
+            api = self._ensure_session(timer)
+            try:
+                with timer.phase('operation') if timer is not None else nullcontext():
+                    output = handler(api, payload)
+            except Exception:
+                # A dropped connection surfaces as a generic error; reconnect
+                # once and retry reads so a restarted Kuma doesn't fail them
+                if api.sio.connected or op not in RETRY_OPERATIONS:
+                    raise
+                api = self._ensure_session(timer)
+                with timer.phase('operation') if timer is not None else nullcontext():
+                    output = handler(api, payload)
+        except Exception as e:
+            output = {
+                'success': False,
+                'error': str(e),
+                'traceback': traceback.format_exc()
+            }
+            if isinstance(e, MonitorInputError):
+                output['fieldErrors'] = e.errors
+
+        response = {'requestId': request_id}
+        response.update(output)
+        return response
+
+    def handle_line(self, line):
+        """Parse one NDJSON request line and return the serialized response line (with timings)."""
+        timer = RunTimer(TAG, process_start=False)
+        timer.payload['inputBytes'] = len(line.encode('utf-8'))
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            response = {'requestId': None, 'success': False, 'error': f'Invalid JSON request: {e}'}
+        else:
+            if isinstance(request, dict) and request.get('op') in OPERATIONS:
+                timer.script = request['op']
+            response = self.handle(request, timer)
+        return timer.emit(response) + '\n'
+
+    def close(self):
+        with self.session_lock:
+            self._close_session()
+
+
+def serve_stdio(worker, concurrency=WORKER_CONCURRENCY):
+    from concurrent.futures import ThreadPoolExecutor
+
+    write_lock = threading.Lock()
+
+    def answer(line):
+        response = worker.handle_line(line)
+        with write_lock:
+            sys.stdout.write(response)
+            sys.stdout.flush()
+
+    # Exiting the executor on EOF waits for the requests still running
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for line in sys.stdin:
+            if not line.strip():
+                continue
+            executor.submit(answer, line)
+
+
+def serve_socket(worker, socket_path):
+    class RequestHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for raw_line in self.rfile:
+                line = raw_line.decode('utf-8')
+                if not line.strip():
+                    continue
+                self.wfile.write(worker.handle_line(line).encode('utf-8'))
+                self.wfile.flush()
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+
+    with socketserver.ThreadingUnixStreamServer(socket_path, RequestHandler) as server:
+        os.chmod(socket_path, 0o600)
+        log(TAG, f"Listening on {socket_path}")
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve Uptime Kuma operations over one long-lived session.')
+    parser.add_argument('--socket', help='Listen on this Unix socket path instead of stdin/stdout')
+    args = parser.parse_args()
+
+    worker = KumaWorker()
+    try:
+        # Log in up front so the first request doesn't pay for it
+        worker._ensure_session()
+    except Exception as e:
+        # Not fatal: the next request retries the connection
+        log(TAG, f"Initial connection failed, will retry on first request: {e}")
+
+    try:
+        if args.socket:
+            serve_socket(worker, args.socket)
+        else:
+            serve_stdio(worker)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.close()
+
+
+if __name__ == '__main__':
+    main()
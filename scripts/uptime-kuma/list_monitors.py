@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+List all monitors in Uptime Kuma, served from the local monitor list snapshot
+when it is fresh (see monitor_list_snapshot.py).
+
+Reads JSON from stdin (all fields optional):
+{
+  "ifVersion": "3f2a9c0d1e4b5a67",
+  "maxAge": 30,
+  "refresh": false
+}
+
+- ifVersion: the "version" from a previous call. If the list still has that
+  version the output is just {"success": true, "notModified": true, ...}.
+- maxAge: how old (in seconds) the snapshot may be before Uptime Kuma is
+  asked again (default UPTIME_KUMA_MONITOR_LIST_TTL, 30). Within that age
+  no connection is made at all.
+- refresh: always ask Uptime Kuma.
+
+Outputs JSON to stdout:
+{
+  "success": true,
+  "notModified": false,
+  "version": "3f2a9c0d1e4b5a67",
+  "source": "snapshot",
+  "ageSeconds": 4.2,
+  "monitors": [{"id": 1, "name": "...", "url": "...", "type": "http", ...}]
+}
+
+"source" is "snapshot" when served from disk and "server" when the list came
+from Uptime Kuma.
+
+With several Uptime Kuma instances in UPTIME_KUMA_SHARDS, the lists of all
+shards are gathered in parallel and merged under global monitor IDs, with a
+"shards" block per instance (see kuma_shards.py).
+
+The run() function is also used by kuma_worker.py to serve list requests
+over a long-lived session.
+"""
+
+import sys
+import os
+import time
+from copy import deepcopy
+from pathlib import Path
+
+# Add .python-packages directory to Python path (for Render deployment)
+# This ensures uptime-kuma-api is found even if PYTHONPATH isn't set correctly
+project_root = Path(__file__).parent.parent.parent
+python_packages_path = project_root / '.python-packages'
+if python_packages_path.exists():
+    sys.path.insert(0, str(python_packages_path))
+
+from kuma_common import get_connection_settings, log_diagnostics, open_session
+from kuma_metrics import RunTimer, run_main
+from kuma_shards import sharding_enabled
+from monitor_list_snapshot import MonitorListSnapshot, strip_secrets
+from monitor_snapshots import parse_monitor, to_plain
+
+DEFAULT_MAX_AGE = float(os.getenv('UPTIME_KUMA_MONITOR_LIST_TTL', '30'))
+
+def format_monitors(monitors):
+    """Raw monitor dicts ({id: monitor}) to a JSON-ready list sorted by ID."""
+    return [
+        to_plain(parse_monitor(deepcopy(monitors[monitor_id])))
+        for monitor_id in sorted(monitors, key=int)
+    ]
+
+def serve_from_snapshot(input_data, api_url):
+    """Answer from the on-disk snapshot when it is fresh enough, or return None."""
+    if input_data.get('refresh'):
+        return None
+    
+    snapshot = MonitorListSnapshot(api_url)
+    version, saved_at = snapshot.read_version()
+    if version is None:
+        return None
+    age = time.time() - saved_at
+    if age > float(input_data.get('maxAge', DEFAULT_MAX_AGE)):
+        return None
+    
+    output = {
+        'success': True,
+        'notModified': input_data.get('ifVersion') == version,
+        'version': version,
+        'source': 'snapshot',
+        'ageSeconds': round(age, 3)
+    }
+    if output['notModified']:
+        # Only the version file was read
+        return output
+    
+    data = snapshot.load()
+    if data is None or data.get('version') != version:
+        # Caught between the two writes of an update; ask the server instead
+        return None
+    output['monitors'] = format_monitors(data['monitors'])
+    return output
+
+def run(api, input_data):
+    """List monitors over an authenticated session and return the JSON output dict."""
+    from uptime_kuma_api import Event
+    
+    if api._event_data.get(Event.MONITOR_LIST) is None:
+        # Waits for the monitorList push that follows login
+        api.get_monitors()
+    monitors = deepcopy(api._event_data[Event.MONITOR_LIST])
+    
+    version, _ = MonitorListSnapshot(api.url).replace(monitors)
+    
+    output = {
+        'success': True,
+        'notModified': input_data.get('ifVersion') == version,
+        'version': version,
+        'source': 'server',
+        'ageSeconds': 0
+    }
+    if not output['notModified']:
+        # Without credentials, like the snapshot, so the list is the same from either source
+        output['monitors'] = format_monitors({monitor_id: strip_secrets(m) for monitor_id, m in monitors.items()})
+    return output
+
+def run_sharded(input_data):
+    """
+    List the monitors of every shard under global monitor IDs (see
+    kuma_shards.py). Each shard is served from its own snapshot when fresh,
+    otherwise over its own session, all shards at once. A failing shard fails
+    the request, since a partial list would look like deleted monitors.
+    """
+    import hashlib
+    from kuma_shards import get_shards, globalize_monitor, open_shard_session, scatter_gather
+    
+    request = {k: v for k, v in input_data.items() if k != 'ifVersion'}
+    
+    def list_shard(shard, _):
+        output = serve_from_snapshot(request, shard.api_url)
+        if output is None:
+            api, _ = open_shard_session(shard, 'list_monitors', timeout=10, max_login_retries=1)
+            with api:
+                output = run(api, request)
+        return output
+    
+    gathered = scatter_gather({shard: None for shard in get_shards()}, list_shard, 'list_monitors')
+    failed = [f'{shard.name}: {error}' for shard, (_, error) in gathered.items() if error is not None]
+    if failed:
+        raise RuntimeError('Could not list every shard (' + '; '.join(failed) + ')')
+    
+    shards = sorted(gathered, key=lambda shard: shard.number)
+    outputs = [gathered[shard][0] for shard in shards]
+    combined = '|'.join(f'{shard.number}:{output["version"]}' for shard, output in zip(shards, outputs))
+    version = hashlib.sha256(combined.encode('utf-8')).hexdigest()[:16]
+    output = {
+        'success': True,
+        'notModified': input_data.get('ifVersion') == version,
+        'version': version,
+        'source': 'snapshot' if all(o['source'] == 'snapshot' for o in outputs) else 'server',
+        'ageSeconds': max(o['ageSeconds'] for o in outputs),
+        'shards': {
+            shard.name: {'version': o['version'], 'source': o['source'], 'count': len(o['monitors'])}
+            for shard, o in zip(shards, outputs)
+        }
+    }
+    if not output['notModified']:
+        monitors = [globalize_monitor(shard, monitor) for shard, o in zip(shards, outputs) for monitor in o['monitors']]
+        output['monitors'] = sorted(monitors, key=lambda monitor: monitor['id'])
+    return output
+
+def main():
+    timer = RunTimer('list_monitors')
+    try:
+        # Read JSON from stdin (empty input lists everything)
+        input_data = timer.read_input()
+        
+        # With several Uptime Kuma instances, gather the lists of every shard
+        if sharding_enabled():
+            with timer.phase('operation'):
+                output = run_sharded(input_data)
+            print(timer.emit(output))
+            return
+        
+        settings = get_connection_settings()
+        
+        # A fresh snapshot answers without importing the client or connecting
+        with timer.phase('operation'):
+            output = serve_from_snapshot(input_data, settings['api_url'])
+        if output is not None:
+            print(timer.emit(output))
+            return
+        
+        # Debug diagnostics (UPTIME_KUMA_VERBOSITY=2), never password material
+        log_diagnostics('list_monitors')
+        
+        # Connect to Uptime Kuma
+        api, session = open_session('list_monitors', timeout=10, max_login_retries=1, timer=timer)
+        with api:
+            with timer.phase('operation'):
+                output = run(api, input_data)
+            output.update(session)
+            print(timer.emit(output))
+    
+    except Exception as e:
+        # Output error result
+        import traceback
+        error_output = {
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }
+        print(timer.emit(error_output))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    run_main('list_monitors', main)
@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Local index of monitors by key, for idempotent adds.
+
+A monitor's key is its type plus its normalized URL (hostname and port for
+non-HTTP types), as reconcile_monitors.py matches monitors. Normalizing makes
+"HTTPS://Example.gov:443/" and "https://example.gov" the same key: the scheme
+and host are lower-cased, a missing scheme means https, the default port and
+a trailing slash are dropped.
+
+The index is a SQLite table {(server, key): monitor ID} in the state
+directory. It is kept in sync by:
+- the monitor list snapshot (monitor_list_snapshot.py): every session applies
+  the monitor list pushes and add/delete events it receives to the index too.
+  When the index has fallen behind the snapshot, it is rebuilt from it.
+- add_monitor.py and delete_monitor.py, right after a monitor is added or
+  deleted.
+
+With several monitors on one key, the lowest ID wins. Adds of one key are
+serialized across processes with a per-key flock (claim()), so two
+concurrent idempotent adds can't both create the monitor.
+
+  python3 monitor_index.py lookup https://example.gov [--type http]
+  python3 monitor_index.py stats
+"""
+
+import sys
+import json
+import argparse
+import hashlib
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit
+
+from kuma_common import acquire_file_lock, get_state_dir, release_file_lock
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS monitor_keys (
+    server TEXT NOT NULL,
+    key TEXT NOT NULL,
+    monitor_id INTEGER NOT NULL,
+    PRIMARY KEY (server, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS monitor_keys_id ON monitor_keys (server, monitor_id);
+
+CREATE TABLE IF NOT EXISTS index_state (
+    server TEXT PRIMARY KEY,
+    version TEXT NOT NULL
+);
+"""
+
+
+def normalize_url(url):
+    """
+    Lower-case scheme and host, default a missing scheme to https, and drop the
+    default port and a trailing slash, so equivalent URLs match.
+    """
+    url = (url or '').strip()
+    if url and '://' not in url:
+        url = f'https://{url}'
+    parts = urlsplit(url)
+    if not parts.scheme or not parts.netloc:
+        return url.rstrip('/')
+    scheme = parts.scheme.lower()
+    try:
+        host, port = parts.hostname or '', parts.port
+    except ValueError:
+        # Not a valid port; compare the rest as written
+        return urlunsplit((scheme, parts.netloc.lower(), parts.path.rstrip('/'), parts.query, ''))
+    if ':' in host:
+        host = f'[{host}]'
+    netloc = host if port is None or port == DEFAULT_PORTS.get(scheme) else f'{host}:{port}'
+    if '@' in parts.netloc:
+        netloc = f"{parts.netloc.rsplit('@', 1)[0]}@{netloc}"
+    return urlunsplit((scheme, netloc, parts.path.rstrip('/'), parts.query, ''))
+
+
+def monitor_key(monitor):
+    """Identity of a monitor for matching: its type plus normalized URL (or hostname/port)."""
+    monitor_type = getattr(monitor.get('type'), 'value', monitor.get('type'))
+    if monitor.get('url') and monitor_type in ('http', 'keyword', 'json-query'):
+        return f"{monitor_type} {normalize_url(monitor['url'])}"
+    target = (monitor.get('hostname') or '').strip().lower()
+    if monitor.get('port'):
+        target = f"{target}:{monitor['port']}"
+    return f"{monitor_type} {target or monitor.get('name', '')}"
+
+
+def _server_key(api_url):
+    return hashlib.sha256(api_url.rstrip('/').encode('utf-8')).hexdigest()[:16]
+
+
+class MonitorIndex:
+    """The key -> monitor ID index for one Uptime Kuma server."""
+
+    def __init__(self, api_url, path=None):
+        # Imported here so scripts that never touch the index start faster
+        import sqlite3
+
+        self.server = _server_key(api_url)
+        self.path = str(path or get_state_dir() / 'monitor-index.sqlite3')
+        self.conn = sqlite3.connect(self.path, timeout=30)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def lookup(self, key):
+        """The ID of the monitor with this key, or None."""
+        row = self.conn.execute(
+            'SELECT monitor_id FROM monitor_keys WHERE server = ? AND key = ?', (self.server, key)
+        ).fetchone()
+        return row[0] if row else None
+
+    def record(self, key, monitor_id):
+        """Index a monitor that was just added (a key already taken keeps its lower ID)."""
+        with self.conn:
+            self.conn.execute(
+                'INSERT INTO monitor_keys (server, key, monitor_id) VALUES (?, ?, ?) '
+                'ON CONFLICT(server, key) DO UPDATE SET monitor_id = MIN(monitor_id, excluded.monitor_id)',
+                (self.server, key, int(monitor_id))
+            )
+
+    def forget(self, monitor_id):
+        """Drop a deleted monitor from the index."""
+        with self.conn:
+            self.conn.execute(
+                'DELETE FROM monitor_keys WHERE server = ? AND monitor_id = ?', (self.server, int(monitor_id))
+            )
+
+    def sync(self, monitors, changes, previous_version, version):
+        """
+        Bring the index up to date with the monitor list snapshot ({id: monitor}).
+        When the index matches the snapshot before this change, only the changed
+        monitors are re-keyed; otherwise the index is rebuilt from every monitor.
+        """
+        row = self.conn.execute('SELECT version FROM index_state WHERE server = ?', (self.server,)).fetchone()
+        if row is not None and row[0] == version and not any(changes.values()):
+            return
+        with self.conn:
+            if row is not None and row[0] == previous_version:
+                dropped = [int(monitor_id) for monitor_id in changes['removed'] + changes['updated']]
+                keys = {key for (key,) in self.conn.execute(
+                    f'SELECT key FROM monitor_keys WHERE server = ? AND monitor_id IN ({",".join("?" * len(dropped))})',
+                    [self.server] + dropped
+                )} if dropped else set()
+                self.conn.executemany(
+                    'DELETE FROM monitor_keys WHERE server = ? AND monitor_id = ?',
+                    [(self.server, monitor_id) for monitor_id in dropped]
+                )
+                # A dropped key may still belong to another monitor (a duplicate)
+                candidates = [str(m) for m in changes['added'] + changes['updated']] + [
+                    monitor_id for monitor_id, monitor in monitors.items() if keys and monitor_key(monitor) in keys
+                ]
+            else:
+                self.conn.execute('DELETE FROM monitor_keys WHERE server = ?', (self.server,))
+                candidates = list(monitors)
+            entries = sorted(
+                (int(monitor_id), monitor_key(monitors[monitor_id])) for monitor_id in set(candidates)
+                if monitor_id in monitors
+            )
+            self.conn.executemany(
+                'INSERT INTO monitor_keys (server, key, monitor_id) VALUES (?, ?, ?) '
+                'ON CONFLICT(server, key) DO UPDATE SET monitor_id = MIN(monitor_id, excluded.monitor_id)',
+                [(self.server, key, monitor_id) for monitor_id, key in entries]
+            )
+            self.conn.execute(
+                'INSERT INTO index_state (server, version) VALUES (?, ?) '
+                'ON CONFLICT(server) DO UPDATE SET version = excluded.version',
+                (self.server, version)
+            )
+
+    @contextmanager
+    def claim(self, key):
+        """Hold the per-key add lock: only one process at a time looks up and adds a key."""
+        lock_dir = get_state_dir() / 'monitor-index-locks'
+        lock_dir.mkdir(mode=0o700, exist_ok=True)
+        name = hashlib.sha256(f'{self.server}|{key}'.encode('utf-8')).hexdigest()[:32]
+        path = lock_dir / f'{name}.lock'
+        fd = acquire_file_lock(path)
+        try:
+            yield
+        finally:
+            release_file_lock(path, fd)
+
+    def stats(self):
+        keys = self.conn.execute('SELECT COUNT(*) FROM monitor_keys WHERE server = ?', (self.server,)).fetchone()[0]
+        row = self.conn.execute('SELECT version FROM index_state WHERE server = ?', (self.server,)).fetchone()
+        return {'path': self.path, 'keys': keys, 'version': row[0] if row else None}
+
+
+def main():
+    from kuma_common import get_connection_settings
+
+    parser = argparse.ArgumentParser(description='Look monitors up in the local monitor key index.')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    lookup_parser = subparsers.add_parser('lookup')
+    lookup_parser.add_argument('targets', nargs='+', help='URLs (or hostnames, with --type)')
+    lookup_parser.add_argument('--type', default='http', help='monitor type (default: http)')
+    subparsers.add_parser('stats')
+    args = parser.parse_args()
+
+    try:
+        with MonitorIndex(get_connection_settings()['api_url']) as index:
+            if args.command == 'stats':
+                output = index.stats()
+            else:
+                output = {'monitors': {}}
+                for target in args.targets:
+                    key = monitor_key({'type': args.type, 'url': target, 'hostname': target})
+                    output['monitors'][target] = {'key': key, 'monitorID': index.lookup(key)}
+        output['success'] = True
+        print(json.dumps(output))
+    except Exception as e:
+        print(json.dumps({'success': False, 'error': str(e)}))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Local snapshot of the full monitor list, kept up to date from Socket.io events.
+
+Every session opened with kuma_common.open_session() attaches to the
+monitorList push Uptime Kuma sends on login and after every change (and to
+the per-monitor updateMonitorIntoList / deleteMonitorFromList events of
+Uptime Kuma 2.x). Each event updates the snapshot: monitors are hashed one by
+one, and the file is rewritten atomically only when one of them was added,
+changed or removed.
+
+Two files per Uptime Kuma server live in the state directory:
+- monitor-list-<server>.json: {"version", "savedAt", "monitors": {id: monitor}}
+- monitor-list-<server>.version: "<version> <savedAt>", so a conditional read
+  only needs a few bytes
+
+"version" is a hash of all monitors, so it doesn't change unless a monitor
+did; list_monitors.py uses it as an ETag. "savedAt" is the last time the list
+was confirmed by the server.
+
+Credentials (SECRET_FIELDS: passwords, client secrets, private keys, push
+tokens) are stripped before a monitor is hashed or written, so they never
+reach the disk. Every load/merge/write holds an flock on
+monitor-list-<server>.lock, so sessions in several processes don't lose
+each other's updates.
+
+Every change is also applied to the monitor key index (monitor_index.py) that
+idempotent adds look monitors up in.
+"""
+
+import os
+import json
+import hashlib
+import threading
+import time
+from contextlib import contextmanager
+
+from kuma_common import get_state_dir, log, write_private_file
+from monitor_snapshots import monitor_version
+
+# Monitor fields that hold credentials; they are never written to the snapshot
+SECRET_FIELDS = (
+    'basic_auth_pass', 'oauth_client_secret', 'tlsKey', 'pushToken', 'radiusPassword', 'radiusSecret',
+    'mqttPassword', 'databaseConnectionString', 'kafkaProducerSaslOptions',
+)
+
+
+def _server_key(api_url):
+    return hashlib.sha256(api_url.rstrip('/').encode('utf-8')).hexdigest()[:16]
+
+
+def strip_secrets(monitor):
+    """A copy of a raw monitor without its SECRET_FIELDS."""
+    return {field: value for field, value in monitor.items() if field not in SECRET_FIELDS}
+
+
+def list_version(hashes):
+    """ETag of the whole list from the per-monitor hashes."""
+    joined = '\n'.join(f"{monitor_id}:{hashes[monitor_id]}" for monitor_id in sorted(hashes, key=int))
+    return hashlib.sha256(joined.encode('utf-8')).hexdigest()[:16]
+
+
+class MonitorListSnapshot:
+    """The on-disk monitor list for one Uptime Kuma server."""
+
+    def __init__(self, api_url):
+        self.api_url = api_url
+        key = _server_key(api_url)
+        state_dir = get_state_dir()
+        self.path = state_dir / f'monitor-list-{key}.json'
+        self.version_path = state_dir / f'monitor-list-{key}.version'
+        self.lock_path = state_dir / f'monitor-list-{key}.lock'
+        self.lock = threading.Lock()
+        self.monitors = None
+        self.hashes = None
+        # Identity of the file self.monitors was read from (or written as)
+        self.stamp = None
+        self.needs_rewrite = False
+
+    def read_version(self):
+        """Return (version, saved_at) from the small version file, or (None, None)."""
+        try:
+            with open(self.version_path) as f:
+                version, saved_at = f.read().split()
+            return version, float(saved_at)
+        except (OSError, ValueError):
+            return None, None
+
+    def load(self):
+        """Return the stored {"version", "savedAt", "monitors"} document, or None."""
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return data if isinstance(data, dict) and isinstance(data.get('monitors'), dict) else None
+
+    def _file_stamp(self):
+        try:
+            info = os.stat(self.path)
+        except OSError:
+            return None
+        return info.st_ino, info.st_mtime_ns, info.st_size
+
+    def _ensure_loaded(self):
+        """(Re)load the file unless it is still the one this object last read or wrote."""
+        stamp = self._file_stamp()
+        if self.monitors is None or stamp != self.stamp:
+            data = self.load()
+            monitors = data['monitors'] if data else {}
+            # A file written before secrets were stripped is rewritten on the next event
+            self.needs_rewrite = any(field in monitor for monitor in monitors.values() for field in SECRET_FIELDS)
+            self.monitors = {monitor_id: strip_secrets(monitor) for monitor_id, monitor in monitors.items()}
+            self.hashes = {monitor_id: monitor_version(m) for monitor_id, m in self.monitors.items()}
+            self.stamp = stamp
+
+    @contextmanager
+    def _locked(self):
+        """Hold the snapshot for a load/merge/write: the thread lock, then the flock other processes take."""
+        import fcntl
+
+        with self.lock:
+            fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                yield
+            finally:
+                os.close(fd)
+
+    def _apply(self, updates, removed, replace_all):
+        """Merge changed monitors into the snapshot; returns the change summary."""
+        updates = {monitor_id: strip_secrets(monitor) for monitor_id, monitor in updates.items()}
+        with self._locked():
+            self._ensure_loaded()
+            previous_version = list_version(self.hashes)
+            changes = {'added': [], 'updated': [], 'removed': []}
+
+            if replace_all:
+                for monitor_id in set(self.monitors) - set(updates):
+                    removed.append(monitor_id)
+            for monitor_id in removed:
+                if self.monitors.pop(monitor_id, None) is not None:
+                    self.hashes.pop(monitor_id, None)
+                    changes['removed'].append(int(monitor_id))
+
+            for monitor_id, monitor in updates.items():
+                new_hash = monitor_version(monitor)
+                old_hash = self.hashes.get(monitor_id)
+                if old_hash == new_hash:
+                    continue
+                changes['added' if old_hash is None else 'updated'].append(int(monitor_id))
+                self.monitors[monitor_id] = monitor
+                self.hashes[monitor_id] = new_hash
+
+            version = list_version(self.hashes)
+            now = time.time()
+            if any(changes.values()) or self.needs_rewrite or not self.path.exists():
+                write_private_file(self.path, json.dumps(
+                    {'version': version, 'savedAt': now, 'monitors': self.monitors}, default=str
+                ))
+                self.stamp = self._file_stamp()
+                self.needs_rewrite = False
+            # Always refresh the version file: the list was just confirmed
+            write_private_file(self.version_path, f"{version} {now}")
+            self._sync_index(changes, previous_version, version)
+            return version, changes
+
+    def _sync_index(self, changes, previous_version, version):
+        """Apply the change to the monitor key index; a failure there never fails the snapshot."""
+        from monitor_index import MonitorIndex
+
+        try:
+            with MonitorIndex(self.api_url) as index:
+                index.sync(self.monitors, changes, previous_version, version)
+        except Exception as e:
+            log('monitor_list_snapshot', f"Could not update the monitor key index (ignored): {e}")
+
+    def replace(self, monitor_list):
+        """Apply a full monitorList push ({id: monitor})."""
+        updates = {str(monitor_id): monitor for monitor_id, monitor in monitor_list.items()}
+        return self._apply(updates, [], replace_all=True)
+
+    def update(self, monitor_list):
+        """Apply an updateMonitorIntoList push (only the changed monitors)."""
+        updates = {str(monitor_id): monitor for monitor_id, monitor in monitor_list.items()}
+        return self._apply(updates, [], replace_all=False)
+
+    def remove(self, monitor_id):
+        """Apply a deleteMonitorFromList push."""
+        return self._apply({}, [str(monitor_id)], replace_all=False)
+
+
+def attach(api, api_url, tag):
+    """
+    Keep the monitor list snapshot up to date from this session's Socket.io events.
+
+    The client's own monitorList handler still runs first, so api.get_monitors()
+    is unaffected. Returns the MonitorListSnapshot.
+    """
+    from uptime_kuma_api import Event
+
+    snapshot = MonitorListSnapshot(api_url)
+
+    def guarded(apply):
+        try:
+            apply()
+        except Exception as e:
+            log(tag, f"Could not update monitor list snapshot (ignored): {e}")
+
+    def on_monitor_list(data):
+        api._event_monitor_list(data)
+        if isinstance(data, dict):
+            guarded(lambda: snapshot.replace(data))
+
+    def on_update_monitor_into_list(data):
+        if isinstance(data, dict):
+            if api._event_data.get(Event.MONITOR_LIST) is not None:
+                api._event_data[Event.MONITOR_LIST].update(data)
+            guarded(lambda: snapshot.update(data))
+
+    def on_delete_monitor_from_list(monitor_id):
+        if api._event_data.get(Event.MONITOR_LIST) is not None:
+            api._event_data[Event.MONITOR_LIST].pop(str(monitor_id), None)
+        guarded(lambda: snapshot.remove(monitor_id))
+
+    api.sio.on(Event.MONITOR_LIST, on_monitor_list)
+    # Uptime Kuma 2.x sends single-monitor updates instead of the whole list
+    api.sio.on('updateMonitorIntoList', on_update_monitor_into_list)
+    api.sio.on('deleteMonitorFromList', on_delete_monitor_from_list)
+    return snapshot
@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+"""
+Shared schema for the monitor fields add_monitor.py and update_monitor.py accept.
+
+FIELDS is the one table of input field -> uptime_kuma_api kwarg, with the
+kind of each value and its allowed choices or bounds. normalize_monitor_input()
+validates a whole payload against it and returns the kwargs, or raises
+MonitorInputError listing every bad field at once:
+
+  {"field": "heartbeatInterval", "error": "must be at least 20"}
+  {"field": "type", "error": "must be one of: dns, http, https, ..."}
+
+The scripts validate the request (every item of a batch) before they connect,
+so bad input is rejected without a Render wake-up, connect and login. In a
+batch, only the invalid items are rejected (with "fieldErrors" in their
+results); the rest still run.
+
+Unknown enum values are errors instead of silently falling back to a
+default. The bounds match the checks uptime_kuma_api runs before sending.
+"""
+
+import json
+from collections import namedtuple
+
+# inputs: accepted input names, first one wins; kwarg: uptime_kuma_api name
+# kind: str | int | bool | choice | list | headers
+# skip_empty: on add, an empty value is left out (the server default applies)
+Field = namedtuple('Field', 'inputs kwarg kind choices min max skip_empty', defaults=(None, None, None, False))
+
+# Monitor types by input name; 'https' and 'tcp' are the names the dashboard uses
+MONITOR_TYPES = {
+    'http': 'http',
+    'https': 'http',  # HTTP includes HTTPS
+    'keyword': 'keyword',
+    'json-query': 'json-query',
+    'tcp': 'port',  # PORT is the TCP Port monitor type
+    'port': 'port',
+    'ping': 'ping',
+    'dns': 'dns',
+}
+
+AUTH_METHODS = {
+    'none': '',
+    '': '',
+    'basic': 'basic',
+    'ntlm': 'ntlm',
+    'mtls': 'mtls',
+    'oauth2-cc': 'oauth2-cc',
+}
+
+BODY_ENCODINGS = {'json': 'json', 'xml': 'xml'}
+
+HTTP_METHODS = {method.lower(): method for method in ('GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'HEAD', 'OPTIONS')}
+
+FIELDS = (
+    Field(('name',), 'name', 'str'),
+    Field(('type',), 'type', 'choice', MONITOR_TYPES),
+    Field(('url',), 'url', 'str', skip_empty=True),
+    Field(('hostname',), 'hostname', 'str', skip_empty=True),
+    Field(('port',), 'port', 'int', min=0, max=65535),
+    Field(('description',), 'description', 'str', skip_empty=True),
+    Field(('parent',), 'parent', 'int', skip_empty=True),
+    Field(('heartbeatInterval',), 'interval', 'int', min=20),
+    Field(('heartbeatRetryInterval',), 'retryInterval', 'int', min=20),
+    Field(('resendInterval',), 'resendInterval', 'int', min=0),
+    Field(('retries',), 'maxretries', 'int', min=0),
+    Field(('upsideDown',), 'upsideDown', 'bool'),
+    Field(('requestTimeout',), 'timeout', 'int', min=0),
+    Field(('httpMethod', 'method'), 'method', 'choice', HTTP_METHODS, skip_empty=True),
+    Field(('body',), 'body', 'str'),
+    Field(('bodyEncoding',), 'httpBodyEncoding', 'choice', BODY_ENCODINGS, skip_empty=True),
+    Field(('keyword',), 'keyword', 'str'),
+    Field(('invertKeyword',), 'invertKeyword', 'bool'),
+    Field(('maxredirects',), 'maxredirects', 'int', min=0),
+    Field(('expiryNotification',), 'expiryNotification', 'bool'),
+    Field(('ignoreTls',), 'ignoreTls', 'bool'),
+    Field(('proxyId',), 'proxyId', 'int'),
+    Field(('acceptedStatusCodes',), 'accepted_statuscodes', 'list', skip_empty=True),
+    Field(('headers',), 'headers', 'headers', skip_empty=True),
+    Field(('notificationIDList',), 'notificationIDList', 'list', skip_empty=True),
+    Field(('authMethod',), 'authMethod', 'choice', AUTH_METHODS, skip_empty=True),
+    Field(('basicAuthUser',), 'basic_auth_user', 'str', skip_empty=True),
+    Field(('basicAuthPass',), 'basic_auth_pass', 'str', skip_empty=True),
+    Field(('authDomain',), 'authDomain', 'str', skip_empty=True),
+    Field(('authWorkstation',), 'authWorkstation', 'str', skip_empty=True),
+    Field(('tlsCert',), 'tlsCert', 'str', skip_empty=True),
+    Field(('tlsKey',), 'tlsKey', 'str', skip_empty=True),
+    Field(('tlsCa',), 'tlsCa', 'str', skip_empty=True),
+    Field(('oauthAuthMethod',), 'oauth_auth_method', 'str', skip_empty=True),
+    Field(('oauthTokenUrl',), 'oauth_token_url', 'str', skip_empty=True),
+    Field(('oauthClientId',), 'oauth_client_id', 'str', skip_empty=True),
+    Field(('oauthClientSecret',), 'oauth_client_secret', 'str', skip_empty=True),
+    Field(('oauthScopes',), 'oauth_scopes', 'str', skip_empty=True),
+)
+
+# Input fields a new monitor of each type needs (as uptime_kuma_api checks them)
+REQUIRED_BY_TYPE = {
+    'http': ('url',),
+    'keyword': ('url', 'keyword'),
+    'json-query': ('url',),
+    'port': ('hostname', 'port'),
+    'ping': ('hostname',),
+    'dns': ('hostname',),
+}
+
+INPUT_NAMES = {field.kwarg: field.inputs[0] for field in FIELDS}
+
+
+class MonitorInputError(ValueError):
+    """A monitor payload failed validation; `errors` lists [{"field", "error"}]."""
+
+    def __init__(self, errors):
+        self.errors = errors
+        super().__init__('Invalid monitor input: ' + '; '.join(f"{e['field']}: {e['error']}" for e in errors))
+
+
+def _is_empty(value):
+    return value is None or value == '' or value == [] or value == {}
+
+
+def _to_int(value, field):
+    if isinstance(value, bool):
+        raise ValueError('must be an integer')
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    elif isinstance(value, str) and value.strip().lstrip('-').isdigit():
+        value = int(value.strip())
+    if not isinstance(value, int):
+        raise ValueError('must be an integer')
+    if field.min is not None and value < field.min:
+        raise ValueError(f'must be at least {field.min}')
+    if field.max is not None and value > field.max:
+        raise ValueError(f'must be at most {field.max}')
+    return value
+
+
+def _to_bool(value):
+    if isinstance(value, bool):
+        return value
+    if value in (0, 1):
+        return bool(value)
+    if isinstance(value, str) and value.strip().lower() in ('true', 'false', '1', '0', 'yes', 'no'):
+        return value.strip().lower() in ('true', '1', 'yes')
+    raise ValueError('must be true or false')
+
+
+def _to_headers(value):
+    """Headers go to Uptime Kuma as one string; a list of {"key", "value"} becomes "Key: Value" lines."""
+    if isinstance(value, list):
+        lines = []
+        for header in value:
+            if isinstance(header, dict):
+                lines.append(f"{header.get('key', '')}: {header.get('value', '')}")
+            else:
+                lines.append(str(header))
+        return '\n'.join(lines)
+    if isinstance(value, dict):
+        return json.dumps(value)
+    return str(value)
+
+
+def _convert(field, value):
+    """Normalize one present, non-empty value, or raise ValueError with the field-level message."""
+    if field.kind == 'str':
+        if isinstance(value, (dict, list, bool)):
+            raise ValueError('must be a string')
+        return str(value)
+    if field.kind == 'int':
+        return _to_int(value, field)
+    if field.kind == 'bool':
+        return _to_bool(value)
+    if field.kind == 'choice':
+        key = value.strip().lower() if isinstance(value, str) else None
+        if key not in field.choices:
+            raise ValueError('must be one of: ' + ', '.join(sorted(c for c in field.choices if c)))
+        return field.choices[key]
+    if field.kind == 'list':
+        if not isinstance(value, list):
+            raise ValueError('must be a list')
+        if field.kwarg == 'notificationIDList':
+            return [_to_int(item, field) for item in value]
+        return [str(item) for item in value]
+    if field.kind == 'headers':
+        return _to_headers(value)
+    raise AssertionError(f'unknown field kind {field.kind!r}')
+
+
+def _to_enums(kwargs):
+    """Give type and authMethod the uptime_kuma_api enum types the API methods expect."""
+    # Imported here so validating doesn't pay for the client stack
+    from uptime_kuma_api import AuthMethod, MonitorType
+
+    if 'type' in kwargs:
+        kwargs['type'] = MonitorType(kwargs['type'])
+    if 'authMethod' in kwargs:
+        kwargs['authMethod'] = AuthMethod(kwargs['authMethod'])
+    return kwargs
+
+
+def normalize_monitor_input(input_data, mode='add', enums=True):
+    """
+    Validate a monitor payload and return the uptime_kuma_api kwargs for it.
+
+    mode='add' returns a complete new monitor: "name" is required, "type"
+    defaults to https and the fields its type needs must be present; empty
+    optional values are left out. mode='update' requires "id" (not part of
+    the kwargs) and returns only the fields the payload sets.
+    Raises MonitorInputError with every invalid field.
+    """
+    if not isinstance(input_data, dict):
+        raise MonitorInputError([{'field': None, 'error': 'must be a JSON object'}])
+
+    errors = []
+    kwargs = {}
+    if mode == 'update':
+        if 'id' not in input_data:
+            errors.append({'field': 'id', 'error': 'is required'})
+        else:
+            try:
+                _to_int(input_data['id'], Field(('id',), 'id', 'int', min=1))
+            except ValueError as e:
+                errors.append({'field': 'id', 'error': str(e)})
+
+    for field in FIELDS:
+        name = next((n for n in field.inputs if not _is_empty(input_data.get(n))), None)
+        if name is None:
+            name = next((n for n in field.inputs if n in input_data), None)
+        if name is None:
+            continue
+        value = input_data[name]
+        if value is None:
+            continue
+        if _is_empty(value):
+            # Clearing a text or list field is a valid update; other empty values count as absent
+            if field.kind in ('str', 'list', 'headers') and not (mode == 'add' and field.skip_empty):
+                kwargs[field.kwarg] = value
+            continue
+        try:
+            kwargs[field.kwarg] = _convert(field, value)
+        except ValueError as e:
+            errors.append({'field': name, 'error': str(e)})
+
+    if mode == 'add':
+        if not kwargs.get('name') and not any(e['field'] == 'name' for e in errors):
+            errors.append({'field': 'name', 'error': 'is required'})
+        # Without a valid type there is nothing to check the other fields against
+        type_ok = not any(e['field'] == 'type' for e in errors)
+        kwargs.setdefault('type', 'http')
+        for kwarg in REQUIRED_BY_TYPE.get(kwargs['type'], ()) if type_ok else ():
+            if _is_empty(kwargs.get(kwarg)) and not any(e['field'] == INPUT_NAMES[kwarg] for e in errors):
+                errors.append({'field': INPUT_NAMES[kwarg], 'error': f"is required for {kwargs['type']} monitors"})
+
+    if errors:
+        raise MonitorInputError(errors)
+    return _to_enums(kwargs) if enums else kwargs
+
+
+def rejected_result(index, error):
+    """The batch result of an item rejected before it was sent."""
+    result = {'index': index, 'success': False, 'error': str(error), 'durationMs': 0.0}
+    if isinstance(error, MonitorInputError):
+        result['fieldErrors'] = error.errors
+    return result
+
+
+def validate_batch(items, mode='add'):
+    """
+    Validate every batch item up front. Returns (rejected, pending): the
+    results of the invalid items and the indexes of the valid ones.
+    """
+    rejected = []
+    pending = []
+    for index, item in enumerate(items):
+        try:
+            normalize_monitor_input(item, mode, enums=False)
+        except MonitorInputError as e:
+            rejected.append(rejected_result(index, e))
+        else:
+            pending.append(index)
+    return rejected, pending
+
+
+def merge_rejected(output, rejected, pending):
+    """
+    Fold the rejected items back into the output of a batch run over only the
+    pending items, so results keep their original indexes and order.
+    """
+    from kuma_common import batch_output
+
+    results = []
+    for result in output['results'] if output else []:
+        result['index'] = pending[result['index']]
+        results.append(result)
+    results = sorted(results + rejected, key=lambda r: r['index'])
+    batch = output['batch'] if output else {'concurrency': 0, 'totalMs': 0.0}
+    merged = batch_output(results, batch['concurrency'], batch['totalMs'])
+    # Keep anything else the batch reported, e.g. "shards"
+    for key, value in (output or {}).items():
+        merged.setdefault(key, value)
+    return merged
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Monitor snapshots for update_monitor.py, so an update can skip the getMonitor
+round trip when a recent copy of the monitor is already at hand.
+
+A snapshot is taken from, in order:
+- "live": the monitorList push Uptime Kuma sends on login and after every
+  change (to every session of the user, so edits made elsewhere arrive too).
+  An update that runs before the login push has arrived waits for it for up
+  to UPTIME_KUMA_MONITOR_SNAPSHOT_WAIT seconds (default 2)
+- "fetched": api.get_monitor(), when the push did not arrive in time or does
+  not hold the monitor
+
+Nothing is reused across sessions: editMonitor replaces every field, so a
+copy saved by an earlier process would silently undo any edit made since.
+
+Every snapshot has a "version": a short hash of its contents. update_monitor.py
+returns the version of the monitor it saved; passing it back as "version"
+makes the next update use the live snapshot only if it still has that
+version (anything else is fetched again).
+"""
+
+import json
+import hashlib
+import os
+import time
+from copy import deepcopy
+
+SNAPSHOT_WAIT = float(os.getenv('UPTIME_KUMA_MONITOR_SNAPSHOT_WAIT', '2'))
+
+
+def to_plain(value):
+    """Enums to their values, so snapshots can be hashed and written as JSON."""
+    if isinstance(value, dict):
+        return {k: to_plain(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [to_plain(v) for v in value]
+    return getattr(value, 'value', value)
+
+
+def parse_monitor(monitor):
+    """Convert a raw monitor dict the way api.get_monitor() does."""
+    from uptime_kuma_api.api import _convert_monitor_return, int_to_bool, parse_auth_method, parse_monitor_type
+
+    _convert_monitor_return(monitor)
+    int_to_bool(monitor, ['active'])
+    parse_monitor_type(monitor)
+    parse_auth_method(monitor)
+    return monitor
+
+
+def monitor_version(monitor):
+    """Short content hash of a monitor, stable across processes."""
+    plain = json.dumps(to_plain(monitor), sort_keys=True, default=str)
+    return hashlib.sha256(plain.encode('utf-8')).hexdigest()[:16]
+
+
+def live_snapshot(api, monitor_id, wait=SNAPSHOT_WAIT):
+    """
+    The monitor as last pushed in this session's monitorList, or None.
+
+    Waits up to `wait` seconds for the login push if it hasn't arrived yet.
+    """
+    from uptime_kuma_api import Event
+
+    event_data = getattr(api, '_event_data', {})
+    deadline = time.monotonic() + wait
+    while event_data.get(Event.MONITOR_LIST) is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+    monitor_list = event_data.get(Event.MONITOR_LIST)
+    if not monitor_list:
+        return None
+    raw = monitor_list.get(str(monitor_id))
+    return parse_monitor(deepcopy(raw)) if raw else None
+
+
+def get_monitor_snapshot(api, monitor_id, version=None, wait=SNAPSHOT_WAIT):
+    """
+    Return (monitor, source) for an update, where source is 'live' or
+    'fetched'. With a version, the live snapshot is only used when it
+    matches it; wait=0 always fetches.
+    """
+    if wait > 0:
+        try:
+            monitor = live_snapshot(api, monitor_id, wait)
+        except Exception:
+            monitor = None
+        if monitor is not None and (version is None or monitor_version(monitor) == version):
+            return monitor, 'live'
+    return api.get_monitor(monitor_id), 'fetched'
+
+
+def edit_monitor_from_snapshot(api, monitor, changes):
+    """
+    Save a monitor from a snapshot plus changes.
+
+    Does what api.edit_monitor() does, minus its own get_monitor() call.
+    Uptime Kuma's editMonitor replaces every field, so the merged monitor is
+    sent, not just the changes.
+    """
+    from uptime_kuma_api import Event
+    from uptime_kuma_api.api import _check_arguments_monitor, _convert_monitor_input
+
+    merged = deepcopy(monitor)
+    merged.update(changes)
+    data = deepcopy(merged)
+    _convert_monitor_input(data)
+    _check_arguments_monitor(data)
+    with api.wait_for_event(Event.MONITOR_LIST):
+        result = api._call('editMonitor', data)
+    return result, merged
@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Reconcile Uptime Kuma with a desired set of monitors.
+
+Reads JSON from stdin:
+{
+  "monitors": [
+    {"name": "https://example.gov", "url": "https://example.gov", "type": "https", "heartbeatInterval": 60},
+    ...
+  ],
+  "owner": "operating-unit-sync",
+  "prune": true,
+  "dryRun": false,
+  "concurrency": 4
+}
+
+Each desired monitor takes the same fields as add_monitor.py. Monitors are
+matched to existing ones by key: the monitor type plus the normalized URL (or
+hostname, for non-HTTP types), as monitor_index.py defines it.
+
+The current state is read once, from the monitorList push that follows login.
+For every matched monitor a fingerprint of the fields the desired monitor sets
+is compared with the same fields of the existing one; only monitors whose
+fingerprints differ are edited, and only with the fields that changed. The
+network work therefore grows with the number of changes, not monitors.
+
+- owner: stamps "[managed-by:<owner>]" into the description of every monitor
+  this command adds or edits. Only monitors with that marker are ever deleted.
+- prune: delete monitors carrying the owner marker that are no longer desired
+  (and duplicates of a desired key). Requires "owner".
+- dryRun: return the plan without changing anything. A dry run is served from
+  the local monitor list snapshot (see monitor_list_snapshot.py) when it is
+  younger than "maxAge" seconds, without connecting at all.
+
+Outputs JSON to stdout:
+{
+  "success": true,
+  "dryRun": false,
+  "source": "server",
+  "summary": {"add": 1, "update": 2, "delete": 1, "unchanged": 120},
+  "plan": [
+    {"action": "update", "key": "http https://example.gov", "name": "...", "monitorID": 7,
+     "changedFields": ["interval"], "fingerprint": "...", "currentFingerprint": "..."},
+    ...
+  ],
+  "results": [{"index": 0, "action": "update", "monitorID": 7, "success": true, "durationMs": 61.2}],
+  "batch": {"count": 4, "succeeded": 4, "failed": 0, ...}
+}
+
+"results" and "batch" are only present when changes were applied. As in batch
+mode, a failing change is reported in its own result (and counted in
+"batch.failed") and does not stop the others.
+
+The run() function is also used by kuma_worker.py to serve reconcile requests
+over a long-lived session.
+"""
+
+import sys
+import json
+import hashlib
+import os
+import time
+from copy import deepcopy
+from pathlib import Path
+
+# Add .python-packages directory to Python path (for Render deployment)
+# This ensures uptime-kuma-api is found even if PYTHONPATH isn't set correctly
+project_root = Path(__file__).parent.parent.parent
+python_packages_path = project_root / '.python-packages'
+if python_packages_path.exists():
+    sys.path.insert(0, str(python_packages_path))
+
+from kuma_common import DEFAULT_BATCH_CONCURRENCY, get_connection_settings, log_diagnostics, open_session, run_batch
+from kuma_metrics import RunTimer, run_main
+from add_monitor import build_monitor_kwargs
+from monitor_schema import MonitorInputError
+from update_monitor import diff_monitor_fields, normalize_field
+from monitor_list_snapshot import SECRET_FIELDS, MonitorListSnapshot
+from monitor_index import monitor_key
+from monitor_snapshots import parse_monitor, to_plain
+
+DEFAULT_MAX_AGE = float(os.getenv('UPTIME_KUMA_MONITOR_LIST_TTL', '30'))
+
+def config_fingerprint(monitor, fields):
+    """Short hash of the given fields of a monitor, normalized as update_monitor.py compares them."""
+    normalized = {field: normalize_field(field, monitor.get(field)) for field in sorted(fields)}
+    plain = json.dumps(to_plain(normalized), sort_keys=True, default=str)
+    return hashlib.sha256(plain.encode('utf-8')).hexdigest()[:16]
+
+def owner_marker(owner):
+    return f'[managed-by:{owner}]'
+
+def build_desired(input_data):
+    """Validate the desired monitors and return {key: kwargs}, in input order."""
+    monitors = input_data.get('monitors')
+    if not isinstance(monitors, list):
+        raise ValueError('"monitors" must be a list of monitors')
+    owner = input_data.get('owner')
+    
+    desired = {}
+    errors = []
+    for index, item in enumerate(monitors):
+        try:
+            kwargs = build_monitor_kwargs(item)
+        except MonitorInputError as e:
+            # Collect the field errors of every monitor before failing
+            errors += [
+                {'field': f"monitors[{index}]" + (f".{error['field']}" if error['field'] else ''), 'error': error['error']}
+                for error in e.errors
+            ]
+            continue
+        if owner:
+            description = (kwargs.get('description') or '').replace(owner_marker(owner), '').strip()
+            kwargs['description'] = f'{description} {owner_marker(owner)}'.strip()
+        key = monitor_key(kwargs)
+        if key in desired:
+            raise ValueError(f'monitors[{index}]: duplicate monitor {key!r}')
+        desired[key] = kwargs
+    if errors:
+        raise MonitorInputError(errors)
+    return desired
+
+def build_plan(desired, current_monitors, owner=None, prune=False):
+    """
+    Diff the desired monitors ({key: kwargs}) against the current raw monitor
+    list ({id: monitor}). Returns (steps, unchanged_count); each step is
+    {"entry": public plan entry, "kwargs": ..., "monitor": ...}.
+    """
+    if prune and not owner:
+        raise ValueError('"prune" requires an "owner", so only monitors this command manages are deleted')
+    marker = owner_marker(owner) if owner else None
+    
+    existing = {}
+    duplicates = []
+    for monitor_id in sorted(current_monitors, key=int):
+        monitor = parse_monitor(deepcopy(current_monitors[monitor_id]))
+        key = monitor_key(monitor)
+        if key in existing:
+            duplicates.append((key, monitor))
+        else:
+            existing[key] = monitor
+    
+    steps = []
+    unchanged = 0
+    for key, kwargs in desired.items():
+        monitor = existing.get(key)
+        fingerprint = config_fingerprint(kwargs, kwargs)
+        if monitor is None:
+            steps.append({
+                'entry': {'action': 'add', 'key': key, 'name': kwargs['name'], 'fingerprint': fingerprint},
+                'kwargs': kwargs
+            })
+            continue
+        current_fingerprint = config_fingerprint(monitor, kwargs)
+        if current_fingerprint == fingerprint:
+            unchanged += 1
+            continue
+        changes = diff_monitor_fields(kwargs, monitor)
+        steps.append({
+            'entry': {
+                'action': 'update',
+                'key': key,
+                'name': kwargs['name'],
+                'monitorID': monitor['id'],
+                'changedFields': sorted(changes),
+                'fingerprint': fingerprint,
+                'currentFingerprint': current_fingerprint
+            },
+            'kwargs': changes,
+            'monitor': monitor
+        })
+    
+    if prune:
+        retired = [(key, monitor, 'not desired') for key, monitor in existing.items() if key not in desired]
+        retired += [(key, monitor, 'duplicate') for key, monitor in duplicates]
+        for key, monitor, reason in retired:
+            if marker not in (monitor.get('description') or ''):
+                continue
+            steps.append({
+                'entry': {'action': 'delete', 'key': key, 'name': monitor.get('name'), 'monitorID': monitor['id'], 'reason': reason}
+            })
+    return steps, unchanged
+
+def apply_step(api, step):
+    """Carry out one plan step over the session and return its result dict."""
+    from monitor_snapshots import edit_monitor_from_snapshot
+    
+    entry = step['entry']
+    if entry['action'] == 'add':
+        result = api.add_monitor(**step['kwargs'])
+        monitor_id = (result.get('monitorID') or result.get('monitorId')) if isinstance(result, dict) else None
+    elif entry['action'] == 'update':
+        result, _ = edit_monitor_from_snapshot(api, step['monitor'], step['kwargs'])
+        monitor_id = entry['monitorID']
+    else:
+        # The monitor is known to exist from the list just read, so skip the
+        # get_monitors() check api.delete_monitor() would do first
+        result = api._call('deleteMonitor', entry['monitorID'])
+        monitor_id = entry['monitorID']
+    return {
+        'success': True,
+        'action': entry['action'],
+        'monitorID': monitor_id,
+        'message': result.get('msg') if isinstance(result, dict) else None
+    }
+
+def plan_output(steps, unchanged, dry_run, source):
+    summary = {'add': 0, 'update': 0, 'delete': 0, 'unchanged': unchanged}
+    for step in steps:
+        summary[step['entry']['action']] += 1
+    return {
+        'success': True,
+        'dryRun': dry_run,
+        'source': source,
+        'summary': summary,
+        'plan': [step['entry'] for step in steps]
+    }
+
+def plan_from_snapshot(input_data, api_url):
+    """Plan a dry run from the on-disk monitor list when it is fresh enough, or return None."""
+    if not input_data.get('dryRun') or input_data.get('refresh'):
+        return None
+    snapshot = MonitorListSnapshot(api_url)
+    _, saved_at = snapshot.read_version()
+    if saved_at is None or time.time() - saved_at > float(input_data.get('maxAge', DEFAULT_MAX_AGE)):
+        return None
+    data = snapshot.load()
+    if data is None:
+        return None
+    
+    desired = build_desired(input_data)
+    if any(field in kwargs for kwargs in desired.values() for field in SECRET_FIELDS):
+        # The snapshot holds no credentials to compare them with
+        return None
+    steps, unchanged = build_plan(desired, data['monitors'], input_data.get('owner'), bool(input_data.get('prune')))
+    return plan_output(steps, unchanged, True, 'snapshot')
+
+def run(api, input_data):
+    """Reconcile over an authenticated session and return the JSON output dict."""
+    from uptime_kuma_api import Event
+    
+    desired = build_desired(input_data)
+    
+    if api._event_data.get(Event.MONITOR_LIST) is None:
+        # Waits for the monitorList push that follows login
+        api.get_monitors()
+    current_monitors = deepcopy(api._event_data[Event.MONITOR_LIST])
+    
+    steps, unchanged = build_plan(desired, current_monitors, input_data.get('owner'), bool(input_data.get('prune')))
+    dry_run = bool(input_data.get('dryRun'))
+    output = plan_output(steps, unchanged, dry_run, 'server')
+    if dry_run or not steps:
+        return output
+    
+    concurrency = input_data.get('concurrency') or DEFAULT_BATCH_CONCURRENCY
+    applied = run_batch(api, steps, apply_step, concurrency, tag='reconcile_monitors')
+    output['results'] = applied['results']
+    output['batch'] = applied['batch']
+    return output
+
+def main():
+    timer = RunTimer('reconcile_monitors')
+    try:
+        # Read JSON from stdin
+        input_data = timer.read_input()
+        
+        settings = get_connection_settings()
+        
+        # A dry run against a fresh snapshot doesn't need a connection
+        with timer.phase('operation'):
+            output = plan_from_snapshot(input_data, settings['api_url'])
+        if output is not None:
+            print(timer.emit(output))
+            return
+        
+        # Validate every desired monitor before connecting
+        build_desired(input_data)
+        
+        # Debug diagnostics (UPTIME_KUMA_VERBOSITY=2), never password material
+        log_diagnostics('reconcile_monitors')
+        
+        # Connect to Uptime Kuma
+        api, session = open_session('reconcile_monitors', timer=timer)
+        with api:
+            with timer.phase('operation'):
+                output = run(api, input_data)
+            output.update(session)
+            print(timer.emit(output))
+    
+    except Exception as e:
+        # Output error result
+        import traceback
+        error_output = {
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }
+        if isinstance(e, MonitorInputError):
+            error_output['fieldErrors'] = e.errors
+        print(timer.emit(error_output))
+        sys.exit(1)
+
+if __name__ == '__main__':
+    run_main('reconcile_monitors', main)
@@ -0,0 +1,342 @@
+#!/usr/bin/env python3
+"""
+Subscribe to live heartbeats from Uptime Kuma instead of polling get_monitor_beats.py.
+
+Reads JSON from stdin:
+{
+  "ids": [1, 2, 3],
+  "output": "ndjson",
+  "since": "2024-05-01 12:00:00.000",
+  "maxSeconds": 300
+}
+
+All fields are optional:
+- ids: the monitors to follow (a list, or "all", the default).
+- output: "ndjson" (default) writes each beat to stdout as one JSON line as
+  soon as it arrives, shaped like the beats of get_monitor_beats.py. "store"
+  merges the beats into the local heartbeat store (heartbeat_store.py)
+  instead, so get_monitor_beats.py with "store": true serves windows without
+  fetching from Uptime Kuma.
+- since: a beat time (or unix timestamp) to replay from before the live beats
+  (NDJSON only; with "store" replay starts where the store left off).
+- maxSeconds: stop after this many seconds; by default the subscriber runs
+  until SIGTERM or SIGINT.
+
+The subscriber logs in once and handles the heartbeat events Uptime Kuma
+pushes to every logged-in socket, so Uptime Kuma does no work beyond what it
+does anyway. The last beat time seen for each monitor is tracked; when the
+connection drops, it reconnects with backoff (1 s doubling to 30 s), logs in
+again and replays what was missed: first from the heartbeatList Uptime Kuma
+pushes after login, then, for monitors whose gap that doesn't cover, with one
+getMonitorBeats call (at most UPTIME_KUMA_REPLAY_MAX_HOURS, default 24).
+Beats are never written twice or out of order per monitor.
+
+When it stops, a final line is written:
+{"done": true, "success": true, "count": 1234, "replayed": 12, "reconnects": 1, "errors": {}}
+"""
+
+import sys
+import json
+import math
+import os
+import queue
+import signal
+import threading
+import time
+from pathlib import Path
+
+# Add .python-packages directory to Python path (for Render deployment)
+# This ensures uptime-kuma-api is found even if PYTHONPATH isn't set correctly
+project_root = Path(__file__).parent.parent.parent
+python_packages_path = project_root / '.python-packages'
+if python_packages_path.exists():
+    sys.path.insert(0, str(python_packages_path))
+
+from beat_aggregates import parse_beat_time
+from kuma_common import log, log_diagnostics, open_session
+from kuma_metrics import RunTimer, run_main
+from get_monitor_beats import get_requested_ids, normalize_beats
+from heartbeat_store import SYNC_OVERLAP_SECONDS, format_beat_time
+
+TAG = 'subscribe_beats'
+
+MAX_REPLAY_HOURS = float(os.getenv('UPTIME_KUMA_REPLAY_MAX_HOURS', '24'))
+
+RECONNECT_BASE_DELAY = 1.0
+RECONNECT_MAX_DELAY = 30.0
+
+# Monitor interval assumed when the monitor list doesn't say
+DEFAULT_INTERVAL = 60
+
+def normalize_pushed_beat(data):
+    """Shape a pushed heartbeat ({"monitorID": ...}) like the beats getMonitorBeats returns."""
+    beat = dict(data)
+    if 'monitorID' in beat:
+        beat['monitor_id'] = beat.pop('monitorID')
+    beat['monitor_id'] = int(beat['monitor_id'])
+    if 'important' in beat:
+        beat['important'] = bool(beat['important'])
+    return beat
+
+class NdjsonWriter:
+    """Writes beats to stdout, one JSON line each."""
+
+    def __init__(self, since=None, timer=None):
+        if isinstance(since, (int, float)):
+            since = format_beat_time(since)
+        self.since = since
+        self.timer = timer
+
+    def resume_from(self, monitor_id):
+        return self.since
+
+    def write(self, monitor_id, beats):
+        for beat in beats:
+            line = json.dumps(beat, default=str)
+            if self.timer is not None:
+                self.timer.payload['outputBytes'] = self.timer.payload.get('outputBytes', 0) + len(line) + 1
+            sys.stdout.write(line)
+            sys.stdout.write('\n')
+        sys.stdout.flush()
+
+    def gap(self, monitor_id):
+        pass
+
+    def close(self):
+        pass
+
+class StoreWriter:
+    """Merges beats into the local heartbeat store, keeping its sync state accurate."""
+
+    def __init__(self):
+        from heartbeat_store import HeartbeatStore
+        
+        self.store = HeartbeatStore()
+
+    def resume_from(self, monitor_id):
+        # Everything up to the last sync is stored; replay from a little
+        # before it, as sync_window() does (duplicates are ignored)
+        _, synced_at = self.store.get_sync_state(monitor_id)
+        return format_beat_time(synced_at - SYNC_OVERLAP_SECONDS) if synced_at else None
+
+    def write(self, monitor_id, beats):
+        # The store now holds every beat of this monitor up to now
+        self.store.merge(monitor_id, beats, str(beats[0]['time']), time.time())
+
+    def gap(self, monitor_id):
+        # Beats before the next write may be missing, so the store must not
+        # claim to cover them
+        self.store.drop_sync_state(monitor_id)
+
+    def close(self):
+        self.store.close()
+
+class BeatSubscriber:
+    """Turns heartbeat pushes into an ordered, de-duplicated beat stream per monitor."""
+
+    def __init__(self, monitor_ids, writer):
+        self.monitor_ids = None if monitor_ids == 'all' else set(monitor_ids)
+        self.writer = writer
+        self.last_seen = {}
+        self.resumed = set()
+        self.events = queue.Queue()
+        self.count = 0
+        self.replayed = 0
+        self.reconnects = 0
+        self.errors = {}
+
+    def attach(self, api):
+        """Route the session's heartbeat pushes (and its disconnect) to a new event queue."""
+        from uptime_kuma_api import Event
+        
+        events = self.events = queue.Queue()
+        # Reconnecting is done here, with a new login and a replay
+        api.sio.reconnection = False
+        api.sio.on(Event.HEARTBEAT, lambda data: events.put(('live', [data])))
+        api.sio.on(Event.HEARTBEAT_LIST, lambda monitor_id, data, overwrite=False: events.put(('list', data)))
+        api.sio.on(Event.DISCONNECT, lambda *args: events.put(('disconnect', None)))
+
+    def accept(self, beats, live):
+        """
+        Keep the beats newer than the last one seen for their monitor, and return
+        them grouped by monitor ID. Pushed history (live=False) is only used for
+        a monitor when it reaches back to the last beat seen, so it never leaves
+        a hole.
+        """
+        by_monitor = {}
+        for beat in beats:
+            beat = normalize_pushed_beat(beat)
+            if self.monitor_ids is None or beat['monitor_id'] in self.monitor_ids:
+                by_monitor.setdefault(beat['monitor_id'], []).append(beat)
+        
+        accepted = {}
+        for monitor_id, monitor_beats in by_monitor.items():
+            monitor_beats.sort(key=lambda b: str(b.get('time')))
+            last = self.last_seen.get(monitor_id)
+            if not live and (last is None or str(monitor_beats[0].get('time')) > last):
+                continue
+            new_beats = [b for b in monitor_beats if last is None or str(b.get('time')) > last]
+            if new_beats:
+                self.last_seen[monitor_id] = str(new_beats[-1].get('time'))
+                accepted[monitor_id] = new_beats
+        return accepted
+
+    def deliver(self, accepted, replay=False):
+        for monitor_id, beats in accepted.items():
+            self.writer.write(monitor_id, beats)
+            self.count += len(beats)
+            if replay:
+                self.replayed += len(beats)
+
+    def catch_up(self, api):
+        """After a (re)login: replay what was missed since the last beat seen for each monitor."""
+        from uptime_kuma_api import Event
+        
+        if api._event_data.get(Event.MONITOR_LIST) is None:
+            # Waits for the monitorList push that follows login
+            api.get_monitors()
+        monitors = api._event_data[Event.MONITOR_LIST]
+        followed = [int(m) for m in monitors] if self.monitor_ids is None else sorted(self.monitor_ids)
+        for monitor_id in followed:
+            if monitor_id not in self.resumed:
+                self.resumed.add(monitor_id)
+                resume_from = self.writer.resume_from(monitor_id)
+                if resume_from is not None:
+                    self.last_seen.setdefault(monitor_id, resume_from)
+        
+        # The heartbeatList pushed after login often covers a short gap already
+        for beats in list((api._event_data.get(Event.HEARTBEAT_LIST) or {}).values()):
+            self.deliver(self.accept(beats, live=False), replay=True)
+        
+        now = time.time()
+        for monitor_id, last in list(self.last_seen.items()):
+            monitor = monitors.get(str(monitor_id)) or {}
+            gap_seconds = now - parse_beat_time(last)
+            if gap_seconds < 2 * (monitor.get('interval') or DEFAULT_INTERVAL):
+                continue
+            # getMonitorBeats takes whole hours
+            hours = math.ceil((gap_seconds + SYNC_OVERLAP_SECONDS) / 3600)
+            if hours > MAX_REPLAY_HOURS:
+                log(TAG, f"Monitor {monitor_id}: gap of {gap_seconds / 3600:.1f} h, replaying the last {MAX_REPLAY_HOURS:g} h only", level=0)
+                self.writer.gap(monitor_id)
+                hours = MAX_REPLAY_HOURS
+            try:
+                beats = normalize_beats(api.get_monitor_beats(monitor_id, hours))
+            except Exception as e:
+                self.errors[str(monitor_id)] = str(e)
+                self.writer.gap(monitor_id)
+                continue
+            self.deliver(self.accept(beats, live=False), replay=True)
+
+    def pump(self, stop):
+        """Deliver pushed beats until the connection drops (returns False) or `stop` is set (True)."""
+        while not stop.is_set():
+            try:
+                items = [self.events.get(timeout=0.5)]
+            except queue.Empty:
+                continue
+            # Deliver everything queued together, one write per monitor
+            while True:
+                try:
+                    items.append(self.events.get_nowait())
+                except queue.Empty:
+                    break
+            beats = {'live': [], 'list': []}
+            disconnected = False
+            for kind, data in items:
+                if kind == 'disconnect':
+                    disconnected = True
+                else:
+                    beats[kind].extend(data)
+            self.deliver(self.accept(beats['list'], live=False), replay=True)
+            self.deliver(self.accept(beats['live'], live=True))
+            if disconnected:
+                return False
+        return True
+
+def subscribe(input_data, writer, stop, timer=None):
+    """Run the subscription until `stop` is set and return the summary dict."""
+    monitor_ids = get_requested_ids(input_data)
+    subscriber = BeatSubscriber('all' if monitor_ids is None else monitor_ids, writer)
+    
+    delay = RECONNECT_BASE_DELAY
+    connected_once = False
+    while not stop.is_set():
+        try:
+            api, session = open_session(TAG, timeout=10, max_login_retries=1, timer=None if connected_once else timer,
+                                        long_lived=True)
+        except Exception as e:
+            if not connected_once:
+                raise
+            log(TAG, f"Reconnect failed ({type(e).__name__}: {e}), retrying in {delay:g} s", level=0)
+        else:
+            with api:
+                subscriber.attach(api)
+                if connected_once:
+                    subscriber.reconnects += 1
+                connected_once = True
+                subscriber.catch_up(api)
+                log(TAG, f"Subscribed, {len(subscriber.last_seen)} monitors with a resume point")
+                delay = RECONNECT_BASE_DELAY
+                if subscriber.pump(stop):
+                    break
+            log(TAG, f"Connection lost, reconnecting in {delay:g} s", level=0)
+        stop.wait(delay)
+        delay = min(delay * 2, RECONNECT_MAX_DELAY)
+    
+    return {
+        'done': True,
+        'success': True,
+        'count': subscriber.count,
+        'replayed': subscriber.replayed,
+        'reconnects': subscriber.reconnects,
+        'errors': subscriber.errors
+    }
+
+def main():
+    input_data = None
+    timer = RunTimer(TAG)
+    writer = None
+    try:
+        # Read JSON from stdin
+        input_data = timer.read_input()
+        
+        output = input_data.get('output', 'ndjson')
+        if output not in ('ndjson', 'store'):
+            raise ValueError('"output" must be "ndjson" or "store"')
+        get_requested_ids(input_data)
+        
+        # Stop cleanly (with a summary line) on SIGTERM/SIGINT or after maxSeconds
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda *args: stop.set())
+        signal.signal(signal.SIGINT, lambda *args: stop.set())
+        if input_data.get('maxSeconds'):
+            timer_thread = threading.Timer(float(input_data['maxSeconds']), stop.set)
+            timer_thread.daemon = True
+            timer_thread.start()
+        
+        # Debug diagnostics (UPTIME_KUMA_VERBOSITY=2), never password material
+        log_diagnostics(TAG)
+        
+        writer = StoreWriter() if output == 'store' else NdjsonWriter(input_data.get('since'), timer)
+        with timer.phase('operation'):
+            summary = subscribe(input_data, writer, stop, timer)
+        print(timer.emit(summary))
+    
+    except Exception as e:
+        # Output error result; the error is the final "done" line
+        import traceback
+        error_output = {
+            'done': True,
+            'success': False,
+            'error': str(e),
+            'traceback': traceback.format_exc()
+        }
+        print(timer.emit(error_output))
+        sys.exit(1)
+    finally:
+        if writer is not None:
+            writer.close()
+
+if __name__ == '__main__':
+    run_main(TAG, main)
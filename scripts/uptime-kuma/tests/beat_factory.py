@@ -0,0 +1,78 @@
+"""Synthetic beats and a fake getMonitorBeats source for the store tests."""
+
+import random
+
+from beat_aggregates import STATUS_DOWN, STATUS_PENDING, STATUS_UP, parse_beat_time
+from heartbeat_store import format_beat_time
+
+
+def make_beats(monitor_id, start, end, interval=60, seed=0):
+    """
+    Beats every `interval` seconds in [start, end): mostly up, with down and
+    pending runs of a few beats, and pings missing on some beats.
+    """
+    rng = random.Random(seed)
+    beats = []
+    status = STATUS_UP
+    run_left = rng.randint(20, 200)
+    t = start + 0.123
+    while t < end:
+        if run_left == 0:
+            status = STATUS_UP if status != STATUS_UP else rng.choice([STATUS_DOWN, STATUS_DOWN, STATUS_PENDING])
+            run_left = rng.randint(20, 200) if status == STATUS_UP else rng.randint(1, 15)
+        ping = None if status == STATUS_DOWN or rng.random() < 0.05 else rng.randint(20, 900)
+        beats.append({
+            'id': len(beats) + 1,
+            'monitor_id': monitor_id,
+            'status': status,
+            'ping': ping,
+            'msg': '200 - OK' if status == STATUS_UP else 'timeout',
+            'time': format_beat_time(t),
+            'duration': 0,
+            'important': False,
+            'down_count': 0,
+        })
+        run_left -= 1
+        t += interval
+    return beats
+
+
+def brute_force_runs(beats):
+    """Runs of equal status as (started, status, ended, beats), the last one open."""
+    runs = []
+    for beat in beats:
+        t = parse_beat_time(beat['time'])
+        if runs and runs[-1][1] == beat['status']:
+            runs[-1][3] += 1
+            continue
+        if runs:
+            runs[-1][2] = t
+        runs.append([t, beat['status'], None, 1])
+    return [tuple(run) for run in runs]
+
+
+class FakeBeatsApi:
+    """Answers get_monitor_beats(monitor_id, hours) from fixed beats, relative to a settable clock."""
+
+    url = 'http://kuma.test'
+
+    def __init__(self, beats_by_monitor, clock):
+        self.beats_by_monitor = beats_by_monitor
+        self.clock = clock
+        self.calls = []
+
+    def get_monitor_beats(self, monitor_id, hours):
+        self.calls.append((monitor_id, hours))
+        since = self.clock.now - hours * 3600
+        return [
+            dict(beat) for beat in self.beats_by_monitor[monitor_id]
+            if since <= parse_beat_time(beat['time']) <= self.clock.now
+        ]
+
+
+class Clock:
+    def __init__(self, now):
+        self.now = now
+
+    def time(self):
+        return self.now
@@ -0,0 +1,24 @@
+"""
+Shared fixtures for the Uptime Kuma script tests.
+
+  python3 -m pytest scripts/uptime-kuma/tests
+
+The tests need no Uptime Kuma instance: Socket.io calls go to small fakes.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# The scripts import each other as top-level modules
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+@pytest.fixture(autouse=True)
+def state_dir(tmp_path, monkeypatch):
+    """Every test gets its own state directory (token cache, stores, locks)."""
+    path = tmp_path / 'state'
+    monkeypatch.setenv('UPTIME_KUMA_STATE_DIR', str(path))
+    monkeypatch.delenv('UPTIME_KUMA_BEAT_STORE_PATH', raising=False)
+    return path
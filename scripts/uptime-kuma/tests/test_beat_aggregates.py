@@ -0,0 +1,120 @@
+"""Columns and aggregates computed from raw beats."""
+
+import math
+import random
+from fractions import Fraction
+
+import pytest
+
+from beat_aggregates import STATUS_DOWN, STATUS_PENDING, STATUS_UP, aggregate_beats, parse_beat_time, to_columns
+from beat_factory import make_beats
+from beat_rollups import raw_summary
+from heartbeat_store import format_beat_time
+
+
+def test_beats_at_the_same_time_with_and_without_a_ping():
+    # Equal times and statuses used to fall through to comparing None with an int
+    beats = [
+        {'time': '2026-01-01 00:00:00.000', 'status': STATUS_UP, 'ping': 40},
+        {'time': '2026-01-01 00:00:00.000', 'status': STATUS_UP, 'ping': None},
+        {'time': '2026-01-01 00:01:00.000', 'status': STATUS_DOWN, 'ping': None},
+    ]
+    times, statuses, pings = to_columns(reversed(beats))
+    assert times[0] == times[1] < times[2]
+    assert sorted(pings[:2], key=str) == [40, None]
+
+    start = int(times[0])
+    summary = raw_summary(beats, start, start + 3600, start + 120)
+    assert summary['beats'] == 3
+
+
+def brute_force_aggregate(beats, start, end, buckets):
+    """aggregate_beats()'s definitions computed beat by beat, with exact (Fraction) sums and percentiles."""
+    rows = sorted(
+        ((parse_beat_time(beat['time']), beat['status'], beat['ping']) for beat in beats),
+        key=lambda row: row[0]
+    )
+    statuses = [status for _, status, _ in rows]
+    pings = sorted(ping for _, _, ping in rows if ping is not None)
+
+    def mean(values):
+        return float(sum(Fraction(v) for v in values) / len(values)) if values else None
+
+    def exact_percentile(pct):
+        rank = Fraction(len(pings) - 1) * pct / 100
+        lower = pings[math.floor(rank)]
+        upper = pings[math.ceil(rank)]
+        return float(lower + (upper - lower) * (rank - math.floor(rank)))
+
+    # A down run lasts until the next beat that isn't down, or the end of the window
+    incidents, downtime = 0, []
+    for (t, status, _), previous in zip(rows, [None] + rows[:-1]):
+        if status == STATUS_DOWN and (previous is None or previous[1] != STATUS_DOWN):
+            incidents += 1
+            ended = next((u for u, s, _ in rows if u >= t and s != STATUS_DOWN), end)
+            downtime.append(ended - t)
+
+    width = (end - start) / buckets
+    series = {'up': [], 'down': [], 'pending': [], 'avgPing': [], 'maxPing': []}
+    for i in range(buckets):
+        bucket_start = start + i * width
+        last = i == buckets - 1
+        inside = [row for row in rows if bucket_start <= row[0] and (row[0] < bucket_start + width or last)]
+        bucket_pings = [ping for _, _, ping in inside if ping is not None]
+        series['up'].append(sum(1 for row in inside if row[1] == STATUS_UP))
+        series['down'].append(sum(1 for row in inside if row[1] == STATUS_DOWN))
+        series['pending'].append(sum(1 for row in inside if row[1] not in (STATUS_UP, STATUS_DOWN)))
+        series['avgPing'].append(mean(bucket_pings))
+        series['maxPing'].append(max(bucket_pings) if bucket_pings else None)
+
+    up, down = statuses.count(STATUS_UP), statuses.count(STATUS_DOWN)
+    return {
+        'beats': len(rows),
+        'up': up,
+        'down': down,
+        'pending': statuses.count(STATUS_PENDING),
+        'uptimePercent': up / (up + down) * 100,
+        'ping': {
+            'count': len(pings),
+            'avg': mean(pings),
+            'min': pings[0],
+            'max': pings[-1],
+            'p50': exact_percentile(50),
+            'p95': exact_percentile(95),
+            'p99': exact_percentile(99),
+        },
+        'incidents': incidents,
+        'downtimeSeconds': float(sum(Fraction(d) for d in downtime)),
+        'ongoingIncident': statuses[-1] == STATUS_DOWN,
+        'series': series,
+    }
+
+
+def test_aggregate_matches_a_brute_force_over_the_raw_beats():
+    start = 1_760_000_400  # a whole minute, so every other beat sits on a bucket boundary
+    end = start + 2 * 3600
+    beats = make_beats(3, 0, 241 * 30, interval=30, seed=11)
+    for i, beat in enumerate(beats):
+        beat['time'] = format_beat_time(start + i * 30)
+    # A few more outages, the last one still ongoing at the window end
+    for i in [*range(30, 34), *range(150, 152), *range(237, 241)]:
+        beats[i].update(status=STATUS_DOWN, ping=None)
+    # The last beat is at exactly the window end; two more share a time, one without a ping
+    beats += [dict(beats[100], ping=None, status=STATUS_UP), dict(beats[100], ping=999)]
+    random.Random(5).shuffle(beats)
+
+    result = aggregate_beats(beats, start, end, buckets=120)
+    expected = brute_force_aggregate(beats, start, end, 120)
+
+    assert any(beat['ping'] is None and beat['status'] == STATUS_UP for beat in beats)
+    assert expected['incidents'] >= 3 and expected['ongoingIncident']
+    for field in ('beats', 'up', 'down', 'pending', 'uptimePercent', 'incidents', 'downtimeSeconds', 'ongoingIncident'):
+        assert result[field] == expected[field], field
+    for field in ('count', 'avg', 'min', 'max'):
+        assert result['ping'][field] == expected['ping'][field], field
+    # The interpolation rank is a float, so percentiles are only within rounding of the exact value
+    for field in ('p50', 'p95', 'p99'):
+        assert result['ping'][field] == pytest.approx(expected['ping'][field], rel=1e-12, abs=0), field
+    for field, column in expected['series'].items():
+        assert result['series'][field] == column, field
+    assert result['series']['start'] == [start + i * 60 for i in range(120)]
@@ -0,0 +1,112 @@
+"""Rollup reports against the same statistics computed from the raw beats."""
+
+import math
+import random
+
+import pytest
+
+from beat_aggregates import STATUS_DOWN, STATUS_MAINTENANCE, STATUS_PENDING, STATUS_UP, parse_beat_time, percentile
+from beat_factory import make_beats
+from beat_rollups import DAY, HOUR, SKETCH_ACCURACY, PingSketch, RollupStore, compare_summaries, raw_summary
+from heartbeat_store import HeartbeatStore, format_beat_time
+
+DAY0 = 1_760_054_400  # a UTC midnight
+MONITOR = 4
+PERCENTILES = (1, 25, 50, 90, 95, 99)
+
+
+def brute_force(beats, start, end, now):
+    """Counts, downtime and pings of [start, end) straight from the beats (sorted by time)."""
+    rows = [(parse_beat_time(beat['time']), beat['status'], beat['ping']) for beat in beats]
+    downtime = 0.0
+    for (t, status, _), (next_t, _, _) in zip(rows, rows[1:] + [(now, None, None)]):
+        if status == STATUS_DOWN:
+            downtime += max(0.0, min(next_t, end) - max(t, start))
+    inside = [row for row in rows if start <= row[0] < end]
+    statuses = [status for _, status, _ in inside]
+    counts = tuple(statuses.count(status) for status in (STATUS_UP, STATUS_DOWN, STATUS_PENDING, STATUS_MAINTENANCE))
+    return counts, downtime, sorted(float(ping) for _, _, ping in inside if ping is not None)
+
+
+def assert_matches_raw(rollup, beats, start, end, now):
+    counts, downtime, pings = brute_force(beats, start, end, now)
+    assert (rollup.up, rollup.down, rollup.pending, rollup.maintenance) == counts
+    assert rollup.downtime == pytest.approx(downtime, abs=1e-6)
+    assert rollup.ping_count == len(pings)
+    assert rollup.ping_sum == pytest.approx(math.fsum(pings), rel=1e-12)
+    assert (rollup.ping_min, rollup.ping_max) == ((pings[0], pings[-1]) if pings else (None, None))
+    for pct in PERCENTILES:
+        exact = percentile(pings, pct)
+        assert rollup.sketch.quantile(pct) == pytest.approx(exact, rel=SKETCH_ACCURACY), pct
+
+
+@pytest.fixture
+def beats():
+    """Two and a half days of beats 47 s apart around DAY0, some of them in maintenance."""
+    beats = make_beats(MONITOR, DAY0 - 30 * HOUR, DAY0 + 40 * HOUR, interval=47, seed=3)
+    for beat in beats[::97]:
+        beat['status'] = STATUS_MAINTENANCE
+    return beats
+
+
+@pytest.fixture
+def rollups(beats):
+    """The beats merged in uneven chunks, across midnight, with one chunk backfilled after newer ones."""
+    cuts = [0, 400, 1700, 1701, 2900, 4100, len(beats)]
+    chunks = [beats[a:b] for a, b in zip(cuts, cuts[1:])]
+    order = [0, 2, 1, 3, 4, 5]
+    with HeartbeatStore('http://kuma.test') as store:
+        for index in order:
+            chunk = chunks[index]
+            store.merge(MONITOR, chunk, chunk[0]['time'], parse_beat_time(chunk[-1]['time']))
+        yield RollupStore(store.conn)
+
+
+def test_every_hour_matches_the_raw_beats(rollups, beats):
+    now = DAY0 + 40 * HOUR
+    for start in range(DAY0 - 30 * HOUR, DAY0 + 40 * HOUR, HOUR):
+        assert_matches_raw(rollups.read_range(MONITOR, start, start + HOUR, now), beats, start, start + HOUR, now)
+
+
+@pytest.mark.parametrize('start, end', [
+    (DAY0 - 5 * HOUR, DAY0 + 29 * HOUR),   # partial day, whole day, partial day
+    (DAY0 - HOUR, DAY0 + HOUR),            # across midnight, hourly rows only
+    (DAY0, DAY0 + DAY),                    # exactly one daily row
+    (DAY0 - 30 * HOUR, DAY0 + 40 * HOUR),  # everything
+])
+def test_ranges_across_hour_and_day_boundaries(rollups, beats, start, end):
+    now = DAY0 + 40 * HOUR
+    rollup = rollups.read_range(MONITOR, start, end, now)
+    assert_matches_raw(rollup, beats, start, end, now)
+    assert compare_summaries(rollup.summary(), raw_summary(beats, start, end, now)) == []
+
+
+def test_downtime_is_split_at_hour_and_day_boundaries():
+    beats = [
+        {'time': format_beat_time(DAY0 - 30), 'status': STATUS_DOWN, 'ping': None},
+        {'time': format_beat_time(DAY0 + 30), 'status': STATUS_UP, 'ping': 80},
+    ]
+    with HeartbeatStore('http://kuma.test') as store:
+        store.merge(MONITOR, beats, beats[0]['time'], DAY0 + 60)
+        rollups = RollupStore(store.conn)
+        assert rollups.read(MONITOR, 'hour', DAY0 - HOUR, DAY0).downtime == pytest.approx(30)
+        assert rollups.read(MONITOR, 'hour', DAY0, DAY0 + HOUR).downtime == pytest.approx(30)
+        assert rollups.read(MONITOR, 'day', DAY0 - DAY, DAY0).downtime == pytest.approx(30)
+        assert rollups.read(MONITOR, 'day', DAY0, DAY0 + DAY).downtime == pytest.approx(30)
+
+
+def test_merged_sketches_equal_one_sketch_of_every_ping():
+    rng = random.Random(11)
+    pings = [rng.lognormvariate(5, 1) for _ in range(5000)] + [0.0] * 3
+    whole, parts = PingSketch(), [PingSketch() for _ in range(7)]
+    for index, ping in enumerate(pings):
+        whole.add(ping)
+        parts[index % 7].add(ping)
+    merged = PingSketch()
+    for part in parts:
+        merged.merge(part)
+
+    assert (merged.bins, merged.zeros) == (whole.bins, whole.zeros)
+    exact = sorted(pings)
+    for pct in PERCENTILES:
+        assert merged.quantile(pct) == pytest.approx(percentile(exact, pct), rel=SKETCH_ACCURACY)
@@ -0,0 +1,58 @@
+"""encode_output() -> decode_output() round trips for every wire form."""
+
+import json
+
+import pytest
+
+from beat_factory import make_beats
+from beat_wire import decode_columnar, decode_output, encode_columnar, encode_output
+
+FORMS = [
+    ('json', None),
+    ('json', 'gzip'),
+    ('json', 'zlib'),
+    ('msgpack', None),
+    ('msgpack', 'gzip'),
+]
+
+
+@pytest.fixture
+def beats():
+    beats = make_beats(1, 1_760_000_000, 1_760_000_000 + 6 * 3600, seed=5)
+    beats[3]['important'] = True
+    beats[4]['ping'] = 12.5
+    del beats[5]['msg']             # absent, not null
+    beats[6]['extra'] = {'a': 1}    # a field only one beat has, with no encoding
+    return beats
+
+
+@pytest.mark.parametrize('encoding, compression', FORMS)
+def test_round_trip(beats, encoding, compression):
+    if encoding == 'msgpack':
+        pytest.importorskip('msgpack')
+    value = encode_output(beats, encoding, compression)
+
+    # Whatever the form, the script output must stay JSON
+    decoded = decode_output(json.loads(json.dumps(value)))
+    assert decoded == beats
+    assert 'msg' not in decoded[5]
+    if encoding == 'json' and not compression:
+        assert 'payload' not in value
+    else:
+        assert (value['encoding'], value['compression']) == (encoding, compression)
+
+
+def test_columnar_encodings(beats):
+    document = encode_columnar(beats)
+    assert document['encodings'] == {
+        'id': 'delta', 'monitor_id': 'delta', 'msg': 'dict', 'time': 'delta-ms', 'important': 'bool',
+    }
+    assert document['missing'] == {'msg': [5], 'extra': [i for i in range(len(beats)) if i != 6]}
+    assert decode_columnar(document) == beats
+
+
+def test_time_column_outside_the_beat_format_falls_back_to_the_dict():
+    beats = [{'time': '2026-01-01 00:00:00.000'}, {'time': '2026-01-01T00:00:01Z'}]
+    document = encode_columnar(beats)
+    assert document['encodings'] == {'time': 'dict'}
+    assert decode_columnar(document) == beats
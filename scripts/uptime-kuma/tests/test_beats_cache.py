@@ -0,0 +1,45 @@
+"""Cross-process coalescing in the beats cache, and the lock files it leaves behind."""
+
+import threading
+
+from beats_cache import BeatsCache
+
+API_URL = 'http://kuma.test'
+
+
+def test_fetch_leaves_no_lock_files():
+    with BeatsCache(API_URL, ttl=60) as cache:
+        assert cache.fetch(1, 24, lambda: [{'id': 1}]) == [{'id': 1}]
+        assert cache.fetch(1, 24, lambda: []) == [{'id': 1}]
+        cache.prefetch(2, 24)
+        assert list(cache.lock_dir.iterdir()) != []
+    assert list(cache.lock_dir.iterdir()) == []
+
+
+def test_concurrent_misses_are_coalesced():
+    started = threading.Event()
+    release = threading.Event()
+    loads = []
+
+    def slow_load():
+        loads.append(1)
+        started.set()
+        release.wait(5)
+        return [{'id': 1}]
+
+    results = []
+    with BeatsCache(API_URL, ttl=60) as first, BeatsCache(API_URL, ttl=60) as second:
+        claimant = threading.Thread(target=lambda: results.append(first.fetch(1, 24, slow_load)))
+        claimant.start()
+        started.wait(5)
+        waiter = threading.Thread(target=lambda: results.append(second.fetch(1, 24, slow_load)))
+        waiter.start()
+        threading.Event().wait(0.1)
+        release.set()
+        claimant.join()
+        waiter.join()
+
+        assert results == [[{'id': 1}], [{'id': 1}]]
+        assert len(loads) == 1
+        assert second.report(True)['status'] == 'coalesced'
+        assert list(first.lock_dir.iterdir()) == []
@@ -0,0 +1,110 @@
+"""Incremental syncs of the heartbeat store, and the rollups and transition index built from its merges."""
+
+from types import SimpleNamespace
+
+import pytest
+
+import heartbeat_store
+from beat_aggregates import parse_beat_time
+from beat_factory import Clock, FakeBeatsApi, brute_force_runs, make_beats
+from beat_rollups import HOUR, RollupStore, compare_summaries, raw_summary
+from beat_transitions import TransitionStore
+from heartbeat_store import HeartbeatStore, fetch_window, store_path
+
+T0 = 1_760_000_000.0
+MONITOR = 7
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock(T0)
+    monkeypatch.setattr(heartbeat_store, 'time', SimpleNamespace(time=clock.time))
+    return clock
+
+
+@pytest.fixture
+def source(clock):
+    """Uptime Kuma's beats: one every minute from two days before T0 to a day after."""
+    return FakeBeatsApi({MONITOR: make_beats(MONITOR, T0 - 48 * HOUR, T0 + 24 * HOUR)}, clock)
+
+
+@pytest.fixture
+def store(source):
+    with HeartbeatStore(source.url) as store:
+        yield store
+
+
+def expected_window(source, hours):
+    since = source.clock.now - hours * HOUR
+    return [beat for beat in source.beats_by_monitor[MONITOR] if since <= parse_beat_time(beat['time']) <= source.clock.now]
+
+
+def sync(store, source, hours, at):
+    source.clock.now = at
+    beats, info = fetch_window(store, source, MONITOR, hours, list)
+    return beats, info
+
+
+def assert_derived_match(store, source, start, end):
+    """Rollups and transitions over [start, end) match a computation over every source beat since the first stored one."""
+    first = store.read_window(MONITOR, '')[0]['time']
+    now = source.clock.now
+    raw = [beat for beat in source.beats_by_monitor[MONITOR] if first <= beat['time'] and parse_beat_time(beat['time']) <= now]
+
+    rolled = RollupStore(store.conn).read_range(MONITOR, start, end, now).summary()
+    assert compare_summaries(rolled, raw_summary(raw, start, end, now)) == []
+
+    runs = TransitionStore(store.conn).runs(MONITOR, 0, now + HOUR)
+    assert [tuple(run[:4]) for run in runs] == brute_force_runs(raw)
+
+
+def test_sync_fetches_only_the_delta(store, source):
+    beats, info = sync(store, source, 24, T0)
+    assert beats == expected_window(source, 24)
+    assert info['fetchedHours'] == 24
+
+    beats, info = sync(store, source, 24, T0 + 30 * 60)
+    assert beats == expected_window(source, 24)
+    assert info['fetchedHours'] == 1
+
+
+def test_short_sync_after_a_long_pause_leaves_no_hole(store, source):
+    # The 1 h sync only fetches its own hour, so the 22 h before it were never
+    # fetched; the next 24 h window must fetch them instead of serving a hole
+    sync(store, source, 24, T0)
+    sync(store, source, 1, T0 + 23 * HOUR)
+    beats, info = sync(store, source, 24, T0 + 23 * HOUR)
+
+    assert info['fetchedHours'] == 24
+    assert beats == expected_window(source, 24)
+    assert len(beats) >= 1439
+    start = (int(T0 - HOUR) // HOUR + 1) * HOUR
+    assert_derived_match(store, source, start, int(T0 + 23 * HOUR) // HOUR * HOUR)
+
+
+def test_pause_longer_than_the_window_restarts_coverage(store, source):
+    sync(store, source, 2, T0)
+    sync(store, source, 2, T0 + 10 * HOUR)
+    covered_from, _ = store.get_sync_state(MONITOR)
+    assert covered_from == heartbeat_store.format_beat_time(T0 + 8 * HOUR)
+
+    beats, _ = sync(store, source, 6, T0 + 10 * HOUR)
+    assert beats == expected_window(source, 6)
+
+
+def test_derived_tables_follow_incremental_merges(store, source):
+    sync(store, source, 24, T0)
+    for step in range(1, 40):
+        sync(store, source, 24, T0 + step * 17 * 60)
+    start = (int(T0 - 24 * HOUR) // HOUR + 1) * HOUR
+    assert_derived_match(store, source, start, int(source.clock.now) // HOUR * HOUR)
+
+
+def test_servers_get_separate_stores(source):
+    assert store_path('http://kuma-a.test') != store_path('http://kuma-b.test')
+    assert store_path('http://kuma-a.test/') == store_path('http://kuma-a.test')
+
+    with HeartbeatStore('http://kuma-a.test') as a, HeartbeatStore('http://kuma-b.test') as b:
+        a.merge(1, [{'time': '2026-01-01 00:00:00.000', 'status': 1}], '2026-01-01 00:00:00.000', T0)
+        assert b.read_window(1, '') == []
+        assert b.get_sync_state(1) == (None, None)
@@ -0,0 +1,51 @@
+"""Session slot pools and the order open_session() takes them in."""
+
+import pytest
+
+import kuma_admission
+import kuma_common
+from kuma_admission import AdmissionTimeoutError, SessionSlot, acquire_session_slot
+
+API_URL = 'http://kuma.test'
+
+
+def test_long_lived_sessions_have_their_own_pool():
+    short = [acquire_session_slot(API_URL, 'test', max_sessions=2) for _ in range(2)]
+    with pytest.raises(AdmissionTimeoutError, match='UPTIME_KUMA_MAX_SESSIONS'):
+        acquire_session_slot(API_URL, 'test', max_sessions=2, timeout=0)
+
+    # Full short pool: a live subscriber still gets a slot, and vice versa
+    long_slot = acquire_session_slot(API_URL, 'test', max_sessions=1, long_lived=True)
+    assert long_slot.info()['pool'] == 'long'
+    with pytest.raises(AdmissionTimeoutError, match='UPTIME_KUMA_MAX_LONG_SESSIONS'):
+        acquire_session_slot(API_URL, 'test', max_sessions=1, timeout=0, long_lived=True)
+
+    short[0].release()
+    assert acquire_session_slot(API_URL, 'test', max_sessions=2, timeout=0).info()['pool'] == 'short'
+
+
+def test_wake_probe_runs_before_a_slot_is_taken(monkeypatch):
+    import uptime_kuma_api
+
+    calls = []
+
+    def wake(api_url, tag):
+        calls.append('wake')
+        return {'probed': True, 'warmMarker': 'miss', 'ready': True, 'attempts': 1, 'waitMs': 0.0}
+
+    def acquire(api_url, tag, long_lived=False):
+        calls.append('slot')
+        return SessionSlot()
+
+    def connect(*args, **kwargs):
+        calls.append('connect')
+        raise ConnectionError('refused')
+
+    monkeypatch.setattr(kuma_common, 'is_render_service', lambda api_url: True)
+    monkeypatch.setattr(kuma_common, 'wake_render_service', wake)
+    monkeypatch.setattr(kuma_admission, 'acquire_session_slot', acquire)
+    monkeypatch.setattr(uptime_kuma_api, 'UptimeKumaApi', connect)
+
+    with pytest.raises(ConnectionError):
+        kuma_common.open_session('test', settings={'api_url': API_URL, 'username': 'u', 'password': 'p'})
+    assert calls == ['wake', 'slot', 'connect']
@@ -0,0 +1,138 @@
+"""The asyncio batch path against the sync one, over fake_kuma_server.py."""
+
+import asyncio
+import threading
+import time
+
+import pytest
+from socketio.exceptions import TimeoutError
+
+import add_monitor
+import delete_monitor
+import get_monitor_beats
+from fake_kuma_server import FakeKuma, serve
+from kuma_async import AsyncKumaClient
+from kuma_common import open_session
+
+SEED_MONITORS = 4
+
+
+@pytest.fixture
+def start_kuma(monkeypatch):
+    """Start a fresh fake Uptime Kuma and point the scripts at it; returns the FakeKuma."""
+    servers = []
+    monkeypatch.delenv('UPTIME_KUMA_SHARDS', raising=False)
+    monkeypatch.delenv('UPTIME_KUMA_ASYNC', raising=False)
+
+    def start(**options):
+        kuma = FakeKuma(seed_monitors=SEED_MONITORS, **options)
+        server, url = serve(kuma, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setenv('UPTIME_KUMA_API_URL', url)
+        return kuma
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def comparable(output):
+    """An output without what legitimately differs between runs: timings, tracebacks and beat times."""
+    output = dict(output)
+    if 'batch' in output:
+        output['batch'] = {k: v for k, v in output['batch'].items() if not k.endswith('Ms')}
+        output['results'] = [
+            {k: v for k, v in result.items() if k not in ('durationMs', 'traceback')} for result in output['results']
+        ]
+    if 'beatsByMonitor' in output:
+        output['beatsByMonitor'] = {
+            monitor_id: [{k: v for k, v in beat.items() if k != 'time'} for beat in beats]
+            for monitor_id, beats in output['beatsByMonitor'].items()
+        }
+    return output
+
+
+def pending_acks(api):
+    """The ack callbacks python-socketio still holds (next to its ack ID counter)."""
+    return [callback for callback in api.sio.callbacks.get('/', {}).values() if callable(callback)]
+
+
+def run_scenario(use_async):
+    """The same adds, deletes and multi-monitor beats request, sync or async."""
+    api, _ = open_session('test')
+    with api:
+        added = add_monitor.run_request(api, {'async': use_async, 'concurrency': 3, 'items': [
+            {'type': 'http', 'name': 'a', 'url': 'https://a.example.gov'},
+            {'type': 'keyword', 'name': 'b', 'url': 'https://b.example.gov', 'keyword': 'ok'},
+            {'type': 'http', 'name': 'no url'},
+            {'type': 'port', 'name': 'c', 'hostname': 'c.example.gov', 'port': 5432},
+        ]})
+        deleted = delete_monitor.run_request(api, {'async': use_async, 'concurrency': 3, 'items': [
+            {'id': 2}, {'id': 99}, {'id': 6},
+        ]})
+        beats = get_monitor_beats.run(api, {'async': use_async, 'cache': False, 'store': False,
+                                            'ids': [1, 2, 3, 5, 99], 'hours': 2})
+    return [comparable(added), comparable(deleted), comparable(beats)]
+
+
+def test_async_batches_match_the_sync_path(start_kuma):
+    start_kuma()
+    sync_outputs = run_scenario(use_async=False)
+    start_kuma()
+    async_outputs = run_scenario(use_async=True)
+
+    assert async_outputs == sync_outputs
+    added, deleted, beats = sync_outputs
+    assert [r['success'] for r in added['results']] == [True, True, False, True]
+    assert [r['success'] for r in deleted['results']] == [True, False, True]
+    assert sorted(beats['beatsByMonitor']) == ['1', '3', '5'] and sorted(beats['errors']) == ['2', '99']
+    assert all(len(beats['beatsByMonitor'][m]) == 120 for m in ('1', '3', '5'))
+
+
+def test_answers_are_matched_to_their_calls(start_kuma):
+    start_kuma(latency_ms=30, jitter_ms=25)
+    api, _ = open_session('test')
+    with api:
+        client = AsyncKumaClient(api)
+
+        async def fetch_all():
+            return await asyncio.gather(*(client.get_monitor(monitor_id) for monitor_id in (4, 1, 3, 2, 1)))
+
+        monitors = asyncio.run(fetch_all())
+    assert [monitor['id'] for monitor in monitors] == [4, 1, 3, 2, 1]
+
+
+def test_timed_out_call_drops_its_ack_callback(start_kuma):
+    start_kuma(latency_ms=300)
+    api, _ = open_session('test')
+    with api:
+        client = AsyncKumaClient(api)
+        started = time.perf_counter()
+        with pytest.raises(TimeoutError):
+            asyncio.run(client.get_monitor(1, timeout=0.05))
+        assert time.perf_counter() - started < 0.25
+        assert pending_acks(api) == []
+
+        # The late answer arrives with no callback to take it; the session still works
+        time.sleep(0.4)
+        assert asyncio.run(client.get_monitor(2, timeout=5))['id'] == 2
+
+
+def test_cancelled_call_drops_its_ack_callback(start_kuma):
+    start_kuma(latency_ms=300)
+    api, _ = open_session('test')
+    with api:
+        client = AsyncKumaClient(api)
+
+        async def cancel_midway():
+            task = asyncio.create_task(client.get_monitor(1))
+            await asyncio.sleep(0.05)
+            assert len(pending_acks(api)) == 1
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(cancel_midway())
+        assert pending_acks(api) == []
@@ -0,0 +1,61 @@
+"""The private state directory and the files written into it."""
+
+import os
+import threading
+
+import pytest
+
+from kuma_common import acquire_file_lock, get_state_dir, release_file_lock, write_private_file
+
+
+def test_state_dir_writable_by_others_is_refused(state_dir):
+    state_dir.mkdir(mode=0o700)
+    os.chmod(state_dir, 0o777)
+    with pytest.raises(PermissionError, match='UPTIME_KUMA_STATE_DIR'):
+        get_state_dir()
+
+
+def test_state_dir_symlink_is_refused(state_dir, tmp_path):
+    (tmp_path / 'elsewhere').mkdir(mode=0o700)
+    state_dir.symlink_to(tmp_path / 'elsewhere')
+    with pytest.raises(PermissionError):
+        get_state_dir()
+
+
+def test_write_does_not_follow_a_planted_temp_symlink(tmp_path):
+    state = get_state_dir()
+    target = tmp_path / 'leak.txt'
+    target.write_text('')
+    # The old fixed temp name: a symlink there used to receive the content
+    (state / f'.login-tokens.json.{os.getpid()}.tmp').symlink_to(target)
+
+    write_private_file(state / 'login-tokens.json', 'secret')
+    assert target.read_text() == ''
+    assert (state / 'login-tokens.json').read_text() == 'secret'
+    assert (state / 'login-tokens.json').stat().st_mode & 0o777 == 0o600
+
+
+def test_released_lock_file_is_removed():
+    path = get_state_dir() / 'key.lock'
+    fd = acquire_file_lock(path)
+    assert acquire_file_lock(path, timeout=0) is None
+    release_file_lock(path, fd)
+    assert not path.exists()
+
+
+def test_waiter_relocks_the_file_at_the_path():
+    path = get_state_dir() / 'key.lock'
+    fd = acquire_file_lock(path)
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(acquire_file_lock(path, timeout=5)))
+    waiter.start()
+    # The waiter opened the file that is about to be unlinked
+    threading.Event().wait(0.1)
+    release_file_lock(path, fd)
+    waiter.join()
+
+    assert acquired[0] is not None
+    # It holds the lock on the file now at the path, so a third process is kept out
+    assert os.fstat(acquired[0]).st_ino == os.stat(path).st_ino
+    assert acquire_file_lock(path, timeout=0) is None
+    release_file_lock(path, acquired[0])
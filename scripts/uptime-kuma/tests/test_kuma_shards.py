@@ -0,0 +1,63 @@
+"""Shard placement and the global monitor ID mapping."""
+
+import pytest
+
+import kuma_shards
+from kuma_shards import (
+    SHARD_ID_STRIDE, global_monitor_id, globalize_monitor, placement_key, resolve_monitor_id, shard_for_key,
+)
+
+URLS = ['https://kuma-a.test', 'https://kuma-b.test', 'https://kuma-c.test']
+DOMAINS = [f'site{i}.example.gov' for i in range(2000)]
+
+
+def use_shards(monkeypatch, urls):
+    monkeypatch.setenv('UPTIME_KUMA_SHARDS', ','.join(urls))
+    monkeypatch.setattr(kuma_shards, '_shards', None)
+    return kuma_shards.get_shards()
+
+
+def test_global_ids_round_trip(monkeypatch):
+    shards = use_shards(monkeypatch, URLS)
+    for shard in shards:
+        for monitor_id in (1, 42, SHARD_ID_STRIDE - 1):
+            global_id = global_monitor_id(shard, monitor_id)
+            assert global_id == shard.number * 10_000_000 + monitor_id
+            assert resolve_monitor_id(global_id) == (shard, monitor_id)
+
+
+def test_shard_zero_keeps_its_ids(monkeypatch):
+    first = use_shards(monkeypatch, URLS)[0]
+    assert global_monitor_id(first, 42) == 42
+    monitor = {'id': 42, 'parent': 7, 'childrenIDs': [43]}
+    assert globalize_monitor(first, dict(monitor)) == monitor
+    assert globalize_monitor(kuma_shards.get_shards()[2], dict(monitor)) == {
+        'id': 20_000_042, 'parent': 20_000_007, 'childrenIDs': [20_000_043],
+    }
+
+
+def test_unknown_shard_number_is_an_error(monkeypatch):
+    use_shards(monkeypatch, URLS)
+    with pytest.raises(ValueError, match='shard 5'):
+        resolve_monitor_id(5 * SHARD_ID_STRIDE + 1)
+
+
+def test_adding_a_shard_moves_only_what_it_wins(monkeypatch):
+    before = use_shards(monkeypatch, URLS[:2])
+    after = use_shards(monkeypatch, URLS)
+    new = after[2]
+
+    moved = 0
+    for domain in DOMAINS:
+        old_home, new_home = shard_for_key(domain, before), shard_for_key(domain, after)
+        if new_home != old_home:
+            assert new_home == new
+            moved += 1
+    # About a third of the domains go to the third shard
+    assert 0.25 < moved / len(DOMAINS) < 0.42
+
+
+def test_placement_is_by_domain():
+    assert placement_key({'url': 'https://WWW.Example.gov:8443/a'}) == 'www.example.gov'
+    assert placement_key({'url': 'example.gov/page'}) == 'example.gov'
+    assert placement_key({'type': 'port', 'hostname': 'DB.example.gov'}) == 'db.example.gov'
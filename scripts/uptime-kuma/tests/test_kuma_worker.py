@@ -0,0 +1,96 @@
+"""Requests served by kuma_worker.py over its shared session."""
+
+import json
+import threading
+from types import SimpleNamespace
+
+import kuma_worker
+from kuma_worker import KumaWorker
+
+
+def connected_worker():
+    worker = KumaWorker()
+    worker.api = SimpleNamespace(url='http://kuma.test', sio=SimpleNamespace(connected=True))
+    return worker
+
+
+def test_slow_request_does_not_block_others(monkeypatch):
+    release = threading.Event()
+
+    def slow(api, payload):
+        release.wait(5)
+        return {'success': True}
+
+    monkeypatch.setitem(kuma_worker.OPERATIONS, 'get_monitor_beats', slow)
+    monkeypatch.setitem(kuma_worker.OPERATIONS, 'list_monitors', lambda api, payload: {'success': True, 'monitors': []})
+    worker = connected_worker()
+
+    slow_request = threading.Thread(target=worker.handle, args=({'op': 'get_monitor_beats'},))
+    slow_request.start()
+    try:
+        assert worker.handle({'requestId': 'b', 'op': 'list_monitors'}) == {'requestId': 'b', 'success': True, 'monitors': []}
+        assert slow_request.is_alive()
+    finally:
+        release.set()
+        slow_request.join()
+
+
+def test_batch_add_is_validated_like_the_script():
+    response = connected_worker().handle({'op': 'add_monitor', 'payload': [{'type': 'http', 'name': 'x'}]})
+    assert response['batch']['failed'] == 1
+    assert response['results'][0]['fieldErrors'] == [{'field': 'url', 'error': 'is required for http monitors'}]
+
+
+def test_invalid_single_add_reports_field_errors():
+    response = connected_worker().handle({'op': 'add_monitor', 'payload': {'type': 'http'}})
+    assert response['success'] is False
+    assert {error['field'] for error in response['fieldErrors']} >= {'name'}
+
+
+def test_stdio_requests_run_concurrently(monkeypatch):
+    import io
+
+    listed = threading.Event()
+
+    def slow(api, payload):
+        # Only finishes once the request after it has been answered
+        assert listed.wait(5)
+        return {'success': True}
+
+    def fast(api, payload):
+        listed.set()
+        return {'success': True, 'monitors': []}
+
+    monkeypatch.setitem(kuma_worker.OPERATIONS, 'get_monitor_beats', slow)
+    monkeypatch.setitem(kuma_worker.OPERATIONS, 'list_monitors', fast)
+    monkeypatch.setattr('sys.stdin', io.StringIO(
+        '{"requestId": "a", "op": "get_monitor_beats"}\n{"requestId": "b", "op": "list_monitors"}\n'
+    ))
+    stdout = io.StringIO()
+    monkeypatch.setattr('sys.stdout', stdout)
+
+    kuma_worker.serve_stdio(connected_worker())
+    responses = [json.loads(line) for line in stdout.getvalue().splitlines()]
+    assert [(r['requestId'], r['success']) for r in responses] == [('b', True), ('a', True)]
+
+
+def test_only_reads_are_retried_after_a_dropped_connection(monkeypatch):
+    worker = connected_worker()
+    calls = []
+
+    def dropped(api, payload):
+        calls.append(1)
+        api.sio.connected = False
+        raise ConnectionError('connection closed')
+
+    monkeypatch.setitem(kuma_worker.OPERATIONS, 'add_monitor', dropped)
+    monkeypatch.setitem(kuma_worker.OPERATIONS, 'list_monitors', dropped)
+    # Reconnecting hands back the same (still failing) session
+    monkeypatch.setattr(worker, '_ensure_session', lambda timer=None: worker.api)
+
+    assert worker.handle({'op': 'add_monitor', 'payload': {}})['success'] is False
+    assert len(calls) == 1
+
+    worker.api.sio.connected = True
+    assert worker.handle({'op': 'list_monitors'})['success'] is False
+    assert len(calls) == 3
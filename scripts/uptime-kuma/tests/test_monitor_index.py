@@ -0,0 +1,84 @@
+"""Monitor keys, the per-key add claim, and idempotent adds through the index."""
+
+import pytest
+
+import add_monitor
+from kuma_common import get_state_dir
+from monitor_index import MonitorIndex, monitor_key, normalize_url
+
+API_URL = 'http://kuma.test'
+
+
+class FakeAddApi:
+    url = API_URL
+
+    def __init__(self):
+        self.added = []
+
+    def add_monitor(self, **kwargs):
+        self.added.append(kwargs)
+        return {'msg': 'Added Successfully.', 'monitorID': 40 + len(self.added)}
+
+
+@pytest.fixture
+def api(monkeypatch):
+    monkeypatch.setenv('UPTIME_KUMA_API_URL', API_URL)
+    monkeypatch.delenv('UPTIME_KUMA_SHARDS', raising=False)
+    monkeypatch.delenv('UPTIME_KUMA_ASYNC', raising=False)
+    return FakeAddApi()
+
+
+@pytest.mark.parametrize('url', [
+    'example.gov',
+    'https://example.gov/',
+    'HTTPS://Example.GOV',
+    'https://example.gov:443',
+    'https://EXAMPLE.gov:443/',
+])
+def test_equivalent_urls_normalize_alike(url):
+    assert normalize_url(url) == 'https://example.gov'
+
+
+def test_urls_that_differ_keep_their_difference():
+    assert normalize_url('http://example.gov:80/') == 'http://example.gov'
+    assert normalize_url('http://example.gov:443') == 'http://example.gov:443'
+    assert normalize_url('https://example.gov:8443/status/') == 'https://example.gov:8443/status'
+    # Only the host is case-insensitive
+    assert normalize_url('https://example.gov/Status') != normalize_url('https://example.gov/status')
+
+
+def test_monitor_key_uses_type_and_target():
+    assert monitor_key({'type': 'http', 'url': 'Example.gov/'}) == monitor_key({'type': 'http', 'url': 'https://example.gov:443'})
+    assert monitor_key({'type': 'http', 'url': 'https://example.gov'}) != monitor_key({'type': 'keyword', 'url': 'https://example.gov'})
+    assert monitor_key({'type': 'port', 'hostname': 'DB.example.gov ', 'port': 5432}) == 'port db.example.gov:5432'
+
+
+def test_idempotent_add_returns_the_existing_monitor(api):
+    monitor = {'type': 'http', 'name': 'Example', 'url': 'https://example.gov', 'idempotent': True}
+    first = add_monitor.run_request(api, monitor)
+    again = add_monitor.run_request(api, dict(monitor, url='Example.gov/'))
+
+    assert (first['created'], first['monitorID']) == (True, 41)
+    assert (again['success'], again['created'], again['monitorID']) == (True, False, 41)
+    assert len(api.added) == 1
+
+
+def test_repeats_within_a_batch_are_added_once(api):
+    output = add_monitor.run_request(api, {'idempotent': True, 'items': [
+        {'type': 'http', 'name': 'Example', 'url': 'https://example.gov'},
+        {'type': 'http', 'name': 'Other', 'url': 'https://other.example.gov'},
+        {'type': 'http', 'name': 'Example again', 'url': 'HTTPS://EXAMPLE.GOV:443/'},
+    ]})
+
+    results = output['results']
+    assert [result['index'] for result in results] == [0, 1, 2]
+    assert (results[0]['created'], results[2]['created']) == (True, False)
+    assert results[2]['monitorID'] == results[0]['monitorID']
+    assert sorted(added['url'] for added in api.added) == ['https://example.gov', 'https://other.example.gov']
+
+
+def test_claim_leaves_no_lock_file():
+    with MonitorIndex(API_URL) as index:
+        with index.claim('http https://example.gov'):
+            assert list((get_state_dir() / 'monitor-index-locks').iterdir()) != []
+        assert list((get_state_dir() / 'monitor-index-locks').iterdir()) == []
@@ -0,0 +1,60 @@
+"""The on-disk monitor list: no credentials on disk, no lost updates between processes."""
+
+import json
+import multiprocessing
+
+from monitor_list_snapshot import MonitorListSnapshot
+
+API_URL = 'http://kuma.test'
+
+
+def monitor(monitor_id, **fields):
+    return dict({'id': monitor_id, 'name': f'm{monitor_id}', 'type': 'http', 'url': f'https://{monitor_id}.example'}, **fields)
+
+
+def test_credentials_are_not_written():
+    snapshot = MonitorListSnapshot(API_URL)
+    snapshot.replace({1: monitor(1, basic_auth_pass='hunter2', oauth_client_secret='s3cret', basic_auth_user='bob')})
+
+    text = snapshot.path.read_text()
+    assert 'hunter2' not in text and 's3cret' not in text
+    assert snapshot.load()['monitors']['1']['basic_auth_user'] == 'bob'
+
+
+def test_a_file_with_credentials_is_rewritten_without_them():
+    snapshot = MonitorListSnapshot(API_URL)
+    snapshot.replace({1: monitor(1)})
+    data = json.loads(snapshot.path.read_text())
+    data['monitors']['1']['basic_auth_pass'] = 'hunter2'
+    snapshot.path.write_text(json.dumps(data))
+
+    MonitorListSnapshot(API_URL).update({1: monitor(1)})
+    assert 'hunter2' not in snapshot.path.read_text()
+
+
+def test_a_stale_copy_rereads_what_another_writer_saved():
+    first, second = MonitorListSnapshot(API_URL), MonitorListSnapshot(API_URL)
+    first.replace({1: monitor(1), 2: monitor(2)})
+    second.update({3: monitor(3)})
+    # first still holds {1, 2} in memory; its next update must not drop 3
+    first.update({4: monitor(4)})
+    assert sorted(MonitorListSnapshot(API_URL).load()['monitors'], key=int) == ['1', '2', '3', '4']
+
+
+def add_monitors(first_id):
+    snapshot = MonitorListSnapshot(API_URL)
+    for monitor_id in range(first_id, first_id + 15):
+        snapshot.update({monitor_id: monitor(monitor_id)})
+
+
+def test_concurrent_processes_lose_no_updates():
+    MonitorListSnapshot(API_URL).replace({})
+    processes = [multiprocessing.Process(target=add_monitors, args=(start,)) for start in (100, 200, 300, 400)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+        assert process.exitcode == 0
+
+    monitors = MonitorListSnapshot(API_URL).load()['monitors']
+    assert len(monitors) == 60
@@ -0,0 +1,102 @@
+"""Monitor payload validation and how batches keep their rejected items."""
+
+import io
+import json
+
+import pytest
+
+import add_monitor
+import update_monitor
+from kuma_common import run_batch
+from monitor_schema import MonitorInputError, merge_rejected, normalize_monitor_input, validate_batch
+
+
+def field_errors(input_data, mode='add'):
+    with pytest.raises(MonitorInputError) as error:
+        normalize_monitor_input(input_data, mode, enums=False)
+    return {e['field']: e['error'] for e in error.value.errors}
+
+
+def test_valid_add_maps_input_names_to_kwargs():
+    kwargs = normalize_monitor_input({
+        'name': 'Example', 'type': 'https', 'url': 'https://example.gov', 'heartbeatInterval': '60',
+        'retries': 2, 'upsideDown': 'false', 'authMethod': 'none', 'httpMethod': 'post', 'description': '',
+    }, enums=False)
+    assert kwargs == {
+        'name': 'Example', 'type': 'http', 'url': 'https://example.gov', 'interval': 60, 'maxretries': 2,
+        'upsideDown': False, 'authMethod': '', 'method': 'POST',
+    }
+
+
+def test_unknown_enum_values_are_rejected_instead_of_defaulted():
+    errors = field_errors({'name': 'x', 'type': 'smtp', 'authMethod': 'kerberos', 'bodyEncoding': 'yaml'})
+    assert errors['type'].startswith('must be one of: dns, http, https')
+    assert errors['authMethod'].startswith('must be one of:')
+    assert errors['bodyEncoding'] == 'must be one of: json, xml'
+
+
+def test_bounds_are_checked():
+    errors = field_errors({
+        'name': 'x', 'url': 'https://example.gov', 'heartbeatInterval': 19, 'port': 70000, 'retries': -1,
+    })
+    assert errors == {
+        'heartbeatInterval': 'must be at least 20',
+        'port': 'must be at most 65535',
+        'retries': 'must be at least 0',
+    }
+    assert normalize_monitor_input({'name': 'x', 'url': 'https://example.gov', 'heartbeatInterval': 20},
+                                   enums=False)['interval'] == 20
+
+
+def test_every_bad_field_is_listed_at_once():
+    errors = field_errors({'type': 'port', 'port': 'abc', 'upsideDown': 'maybe', 'notificationIDList': 3})
+    assert errors == {
+        'name': 'is required',
+        'port': 'must be an integer',
+        'upsideDown': 'must be true or false',
+        'notificationIDList': 'must be a list',
+        'hostname': 'is required for port monitors',
+    }
+
+
+def test_update_needs_an_id_and_returns_only_the_fields_set():
+    assert field_errors({'name': 'x'}, mode='update') == {'id': 'is required'}
+    assert normalize_monitor_input({'id': 4, 'heartbeatInterval': 90}, 'update', enums=False) == {'interval': 90}
+
+
+def test_rejected_items_keep_their_index():
+    items = [
+        {'name': 'a', 'url': 'https://a.example.gov'},
+        {'name': 'b'},
+        {'name': 'c', 'url': 'https://c.example.gov'},
+        'not an object',
+    ]
+    rejected, pending = validate_batch(items)
+    assert pending == [0, 2]
+    assert [(r['index'], r['success']) for r in rejected] == [(1, False), (3, False)]
+    assert rejected[0]['fieldErrors'] == [{'field': 'url', 'error': 'is required for http monitors'}]
+
+    # The batch runs over the pending items only, so its results are numbered 0 and 1
+    output = run_batch(None, [items[i] for i in pending], lambda api, item: {'success': True, 'name': item['name']})
+    merged = merge_rejected(output, rejected, pending)
+    assert [(r['index'], r['success'], r.get('name')) for r in merged['results']] == [
+        (0, True, 'a'), (1, False, None), (2, True, 'c'), (3, False, None),
+    ]
+    assert merged['batch']['failed'] == 2
+
+
+@pytest.mark.parametrize('script, items', [
+    (add_monitor, [{'name': 'a'}, {'type': 'bogus', 'name': 'b', 'url': 'https://b.example.gov'}]),
+    (update_monitor, [{'name': 'a'}, {'id': 'x'}]),
+])
+def test_batch_with_nothing_valid_never_connects(script, items, monkeypatch, capsys):
+    def connect(*args, **kwargs):
+        raise AssertionError('connected for a batch with no valid items')
+
+    monkeypatch.setattr(script, 'open_session', connect)
+    monkeypatch.setattr('sys.stdin', io.StringIO(json.dumps(items)))
+    script.main()
+
+    output = json.loads(capsys.readouterr().out)
+    assert [(r['index'], r['success']) for r in output['results']] == [(0, False), (1, False)]
+    assert all(r['fieldErrors'] for r in output['results'])
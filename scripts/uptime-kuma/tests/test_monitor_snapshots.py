@@ -0,0 +1,49 @@
+"""Where update_monitor.py takes the current monitor from."""
+
+import threading
+
+from uptime_kuma_api import Event
+
+from monitor_snapshots import get_monitor_snapshot, monitor_version
+
+MONITOR = {
+    'id': 3, 'name': 'site', 'type': 'http', 'url': 'https://example.org', 'active': 1, 'interval': 60,
+    'authMethod': None, 'notificationIDList': {}, 'tags': [],
+}
+
+
+class FakeSessionApi:
+    """A session whose monitorList push may or may not have arrived yet."""
+
+    url = 'http://kuma.test'
+
+    def __init__(self, monitor_list=None):
+        self._event_data = {Event.MONITOR_LIST: monitor_list}
+        self.fetched = []
+
+    def get_monitor(self, monitor_id):
+        self.fetched.append(monitor_id)
+        return dict(MONITOR, name='fetched')
+
+
+def test_live_push_is_used_when_it_holds_the_monitor():
+    api = FakeSessionApi({'3': dict(MONITOR)})
+    monitor, source = get_monitor_snapshot(api, 3)
+    assert (source, monitor['name'], api.fetched) == ('live', 'site', [])
+
+
+def test_update_waits_for_the_login_push():
+    api = FakeSessionApi()
+    threading.Timer(0.05, lambda: api._event_data.update({Event.MONITOR_LIST: {'3': dict(MONITOR)}})).start()
+    _, source = get_monitor_snapshot(api, 3, wait=2)
+    assert source == 'live'
+
+
+def test_missing_push_or_other_version_is_fetched():
+    _, source = get_monitor_snapshot(FakeSessionApi(), 3, wait=0.05)
+    assert source == 'fetched'
+
+    live = FakeSessionApi({'3': dict(MONITOR)})
+    stale = monitor_version(dict(MONITOR, interval=30))
+    monitor, source = get_monitor_snapshot(live, 3, version=stale)
+    assert (source, monitor['name']) == ('fetched', 'fetched')
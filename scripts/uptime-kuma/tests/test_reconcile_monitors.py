@@ -0,0 +1,81 @@
+"""Reconcile plans: what build_plan() adds, edits and deletes."""
+
+import pytest
+
+from reconcile_monitors import build_desired, build_plan
+
+OWNER = 'operating-unit-sync'
+MARKER = f'[managed-by:{OWNER}]'
+
+
+def desired_for(*domains, **fields):
+    monitors = [dict({'name': domain, 'url': f'https://{domain}', 'type': 'https', 'heartbeatInterval': 60}, **fields)
+                for domain in domains]
+    return build_desired({'monitors': monitors, 'owner': OWNER})
+
+
+def existing(monitor_id, domain, description=MARKER, **fields):
+    """A monitor as the monitorList push sends it."""
+    return dict({
+        'id': monitor_id, 'name': domain, 'type': 'http', 'url': f'https://{domain}', 'interval': 60,
+        'description': description, 'active': 1, 'authMethod': None, 'notificationIDList': {}, 'tags': [],
+    }, **fields)
+
+
+def plan(desired, current, prune=True):
+    steps, unchanged = build_plan(desired, {str(m['id']): m for m in current}, OWNER, prune)
+    return [step['entry'] for step in steps], unchanged
+
+
+def test_matching_fingerprints_are_a_no_op():
+    # Fields the desired monitors don't set (maxretries) are not compared
+    entries, unchanged = plan(desired_for('a.example.gov', 'b.example.gov'),
+                              [existing(1, 'a.example.gov'), existing(2, 'b.example.gov', maxretries=0)])
+    assert (entries, unchanged) == ([], 2)
+
+
+def test_edit_sends_only_the_changed_fields():
+    steps, unchanged = build_plan(desired_for('a.example.gov'),
+                                  {'1': existing(1, 'a.example.gov', interval=300)}, OWNER)
+    assert unchanged == 0
+    [step] = steps
+    assert step['entry']['action'] == 'update'
+    assert (step['entry']['monitorID'], step['entry']['changedFields']) == (1, ['interval'])
+    assert step['kwargs'] == {'interval': 60}
+    assert step['entry']['fingerprint'] != step['entry']['currentFingerprint']
+
+
+def test_new_domain_is_added_with_the_owner_marker():
+    steps, _ = build_plan(desired_for('a.example.gov', 'new.example.gov'), {'1': existing(1, 'a.example.gov')}, OWNER)
+    [step] = steps
+    assert (step['entry']['action'], step['entry']['name']) == ('add', 'new.example.gov')
+    assert step['kwargs']['url'] == 'https://new.example.gov'
+    assert step['kwargs']['description'] == MARKER
+
+
+def test_prune_deletes_only_marked_monitors():
+    entries, unchanged = plan(desired_for('a.example.gov'), [
+        existing(1, 'a.example.gov'),
+        existing(2, 'retired.example.gov'),
+        existing(3, 'manual.example.gov', description='added by hand'),
+        existing(4, 'other.example.gov', description='[managed-by:someone-else]'),
+        existing(5, 'a.example.gov', url='https://a.example.gov:443'),
+    ])
+    assert unchanged == 1
+    assert [(e['action'], e['monitorID'], e['reason']) for e in entries] == [
+        ('delete', 2, 'not desired'), ('delete', 5, 'duplicate'),
+    ]
+
+
+def test_unmarked_monitors_are_never_pruned():
+    entries, _ = plan(desired_for('a.example.gov'), [existing(3, 'manual.example.gov', description=None)])
+    assert [e['action'] for e in entries] == ['add']
+
+    # Without prune, even a marked monitor that is no longer desired stays
+    entries, _ = plan({}, [existing(2, 'retired.example.gov')], prune=False)
+    assert entries == []
+
+
+def test_prune_needs_an_owner():
+    with pytest.raises(ValueError, match='owner'):
+        build_plan({}, {}, None, prune=True)
@@ -3,11 +3,32 @@
 Update an existing monitor in Uptime Kuma using the uptime-kuma-api wrapper.
 
 Reads JSON from stdin and outputs JSON to stdout.
+
+Batch mode: pass a JSON array of updates (or {"items": [...], "concurrency": 4})
+to apply them all over one authenticated session. The output then has a
+per-item "results" array and "batch" timing totals; a failing item does not
+fail the batch.
+
+Fields that already match the monitor are not re-saved: when nothing changed
+the edit is skipped (Uptime Kuma restarts a monitor's check loop on every
+save) and the output has "changed": false. Otherwise "changedFields" lists
+what was updated. The current monitor comes from the session's monitorList
+push when it holds it (see monitor_snapshots.py); "snapshot" says which source
+was used and "version" identifies the saved monitor. Pass that "version" back
+with the next update to only trust a snapshot of exactly that monitor.
+
+The input is validated against monitor_schema.py before connecting: invalid
+input fails at once with "fieldErrors", and invalid batch items are rejected
+in their own results without being sent.
+
+With several Uptime Kuma instances in UPTIME_KUMA_SHARDS, "id" is a global
+monitor ID and each update goes to the shard holding it (see kuma_shards.py).
+
+The run() function is also used by kuma_worker.py to serve update requests
+over a long-lived session.
 """
 
 import sys
-import json
-import os
 from pathlib import Path
 
 # Add .python-packages directory to Python path (for Render deployment)
@@ -17,174 +38,179 @@ python_packages_path = project_root / '.python-packages'
 if python_packages_path.exists():
     sys.path.insert(0, str(python_packages_path))
 
-from uptime_kuma_api import UptimeKumaApi, MonitorType, AuthMethod
+from kuma_common import get_batch, log_diagnostics, open_session, run_batch
+from kuma_metrics import RunTimer, run_main
+from kuma_shards import sharding_enabled
+from monitor_schema import FIELDS, MonitorInputError, merge_rejected, normalize_monitor_input, validate_batch
+from monitor_snapshots import edit_monitor_from_snapshot, get_monitor_snapshot, monitor_version
+
+# Fields compared as numbers, so "60" and 60 count as the same value
+NUMERIC_FIELDS = {'interval', 'maxretries', 'retryInterval', 'timeout', 'maxredirects'}
+
+def normalize_field(key, value):
+    """Normalize a monitor field value for comparison with the existing monitor."""
+    value = getattr(value, 'value', value)
+    if value == '' or value is None:
+        return None
+    if key in NUMERIC_FIELDS:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return value
+    if key == 'notificationIDList':
+        ids = value.keys() if isinstance(value, dict) else value
+        return sorted(int(i) for i in ids)
+    if key == 'accepted_statuscodes':
+        return sorted(str(code) for code in value)
+    if key == 'method':
+        return str(value).upper()
+    if isinstance(value, str):
+        return value.replace('\r\n', '\n').strip()
+    return value
+
+def diff_monitor_fields(monitor_kwargs, existing_monitor):
+    """Return the subset of monitor_kwargs that differs from the existing monitor."""
+    return {
+        key: value
+        for key, value in monitor_kwargs.items()
+        if normalize_field(key, value) != normalize_field(key, existing_monitor.get(key))
+    }
+
+def build_update_kwargs(input_data, existing_monitor):
+    """Merge the requested updates (validated, see monitor_schema.py) with the existing monitor into edit_monitor kwargs."""
+    updates = normalize_monitor_input(input_data, mode='update')
+    
+    # Keep the existing value of every field the schema knows unless it is updated
+    monitor_kwargs = {
+        field.kwarg: existing_monitor[field.kwarg]
+        for field in FIELDS
+        if field.kwarg in existing_monitor and not (field.kind == 'headers' and not existing_monitor[field.kwarg])
+    }
+    monitor_kwargs.update(updates)
+    return monitor_kwargs
+
+def run(api, input_data):
+    """Update a monitor over an authenticated session and return the JSON output dict."""
+    # Validate the whole update before reading the monitor
+    normalize_monitor_input(input_data, mode='update', enums=False)
+    
+    monitor_id = int(input_data['id'])
+    
+    # Get existing monitor to merge with updates (from the session's monitorList push if it has it)
+    existing_monitor, snapshot_source = get_monitor_snapshot(api, monitor_id, input_data.get('version'))
+    
+    monitor_kwargs = build_update_kwargs(input_data, existing_monitor)
+    changes = diff_monitor_fields(monitor_kwargs, existing_monitor)
+    
+    if not changes:
+        # Nothing to save, so don't make Uptime Kuma restart the monitor
+        return {
+            'success': True,
+            'monitorID': monitor_id,
+            'changed': False,
+            'changedFields': [],
+            'snapshot': snapshot_source,
+            'version': monitor_version(existing_monitor),
+            'message': 'Monitor already up to date'
+        }
+    
+    # Update monitor with only the changed fields on top of the snapshot
+    result, saved_monitor = edit_monitor_from_snapshot(api, existing_monitor, changes)
+    
+    # Output success result
+    return {
+        'success': True,
+        'monitorID': monitor_id,
+        'changed': True,
+        'changedFields': sorted(changes),
+        'snapshot': snapshot_source,
+        'version': monitor_version(saved_monitor),
+        'message': result.get('msg', 'Monitor updated successfully') if isinstance(result, dict) else 'Monitor updated successfully'
+    }
+
+def run_sharded(items, concurrency):
+    """Apply updates on the shards that hold the monitors; "id" is a global monitor ID (see kuma_shards.py)."""
+    from kuma_shards import resolve_monitor_id, run_sharded_batch
+    
+    def route(item):
+        shard, monitor_id = resolve_monitor_id(item['id'])
+        return shard, dict(item, id=monitor_id)
+    
+    return run_sharded_batch(
+        'update_monitor', items, route,
+        lambda api, shard_items: run_batch(api, shard_items, run, concurrency, tag='update_monitor'),
+        timeout=10, max_login_retries=1
+    )
+
+def prepare(input_data):
+    """
+    Validate a request before connecting. Returns (plan, answer): answer is the
+    whole output when every batch item was rejected, otherwise plan is what
+    execute() runs.
+    """
+    # A JSON array (or {"items": [...]}) runs every item over one session
+    items, concurrency = get_batch(input_data)
+    
+    # Validate before connecting: a bad request (or batch item) fails without a login
+    if items is None:
+        normalize_monitor_input(input_data, mode='update', enums=False)
+        return (items, concurrency, [], None), None
+    rejected, pending = validate_batch(items, mode='update')
+    if not pending:
+        return None, merge_rejected(None, rejected, pending)
+    return (items, concurrency, rejected, pending), None
+
+def execute(api, input_data, plan):
+    """Run a prepare()d request over an authenticated session and return the JSON output dict."""
+    items, concurrency, rejected, pending = plan
+    if items is None:
+        return run(api, input_data)
+    output = run_batch(api, [items[i] for i in pending], run, concurrency, tag='update_monitor')
+    return merge_rejected(output, rejected, pending) if rejected else output
+
+def run_request(api, input_data):
+    """A single or batch request over an open session, exactly as main() runs it (used by kuma_worker.py)."""
+    plan, answer = prepare(input_data)
+    return answer if plan is None else execute(api, input_data, plan)
 
 def main():
+    timer = RunTimer('update_monitor')
     try:
         # Read JSON from stdin
-        input_data = json.load(sys.stdin)
-        
-        # Validate required fields
-        if 'id' not in input_data:
-            raise ValueError('Monitor ID is required')
+        input_data = timer.read_input()
         
-        monitor_id = int(input_data['id'])
+        plan, answer = prepare(input_data)
+        if plan is None:
+            print(timer.emit(answer))
+            return
+        items, concurrency, rejected, pending = plan
         
-        # Get environment variables
-        api_url = os.getenv('UPTIME_KUMA_API_URL', 'http://localhost:3003')
-        username = os.getenv('UPTIME_KUMA_USERNAME', 'admin')
-        password = os.getenv('UPTIME_KUMA_PASSWORD', 'admin123')
-        # Note: API keys are for REST endpoints only, not Socket.io authentication
+        # Debug diagnostics (UPTIME_KUMA_VERBOSITY=2), never password material
+        log_diagnostics('update_monitor')
         
-        # Map monitor type string to MonitorType enum
-        type_map = {
-            'http': MonitorType.HTTP,
-            'https': MonitorType.HTTP,  # HTTP includes HTTPS
-            'tcp': MonitorType.PORT,  # PORT is the TCP Port monitor type
-            'ping': MonitorType.PING,
-            'dns': MonitorType.DNS,
-        }
-        
-        monitor_type = type_map.get(input_data.get('type', 'https'), MonitorType.HTTP)
-        
-        # Connect to Uptime Kuma
-        with UptimeKumaApi(api_url) as api:
-            # Authenticate using username/password
-            # Note: API keys are for REST endpoints only, not Socket.io
-            # login_by_token() requires a JWT token from a previous login session
-            api.login(username, password)
-            
-            # Get existing monitor to merge with updates
-            existing_monitor = api.get_monitor(monitor_id)
+        # With several Uptime Kuma instances, each update goes to the shard holding the monitor
+        if sharding_enabled():
+            from kuma_shards import single_result
             
-            # Prepare update kwargs according to uptime-kuma-api documentation
-            # edit_monitor(id_, **kwargs) - id is first positional parameter
-            monitor_kwargs = {}
-            
-            # Merge with existing monitor values, override with input_data if provided
-            # Name
-            if 'name' in input_data:
-                monitor_kwargs['name'] = input_data['name']
-            elif 'name' in existing_monitor:
-                monitor_kwargs['name'] = existing_monitor['name']
-            
-            # URL
-            if 'url' in input_data:
-                monitor_kwargs['url'] = input_data['url']
-            elif 'url' in existing_monitor:
-                monitor_kwargs['url'] = existing_monitor['url']
-            
-            # Type
-            if 'type' in input_data or 'type' in existing_monitor:
-                monitor_kwargs['type'] = monitor_type
-            
-            # Interval
-            if 'heartbeatInterval' in input_data:
-                monitor_kwargs['interval'] = input_data['heartbeatInterval']
-            elif 'interval' in existing_monitor:
-                monitor_kwargs['interval'] = existing_monitor['interval']
-            
-            # Retry settings
-            if 'retries' in input_data:
-                monitor_kwargs['maxretries'] = input_data['retries']
-            elif 'maxretries' in existing_monitor:
-                monitor_kwargs['maxretries'] = existing_monitor['maxretries']
-            
-            if 'heartbeatRetryInterval' in input_data:
-                monitor_kwargs['retryInterval'] = input_data['heartbeatRetryInterval']
-            elif 'retryInterval' in existing_monitor:
-                monitor_kwargs['retryInterval'] = existing_monitor['retryInterval']
-            
-            # Timeout
-            if 'requestTimeout' in input_data:
-                monitor_kwargs['timeout'] = input_data['requestTimeout']
-            elif 'timeout' in existing_monitor:
-                monitor_kwargs['timeout'] = existing_monitor['timeout']
-            
-            # HTTP method
-            if 'httpMethod' in input_data or 'method' in input_data:
-                monitor_kwargs['method'] = input_data.get('httpMethod') or input_data.get('method', 'GET')
-            elif 'method' in existing_monitor:
-                monitor_kwargs['method'] = existing_monitor['method']
-            
-            # Body
-            if 'body' in input_data:
-                monitor_kwargs['body'] = input_data['body']
-            elif 'body' in existing_monitor:
-                monitor_kwargs['body'] = existing_monitor['body']
-            
-            # Body encoding - map to httpBodyEncoding
-            if 'bodyEncoding' in input_data:
-                body_encoding = input_data.get('bodyEncoding', 'json').lower()
-                if body_encoding == 'json':
-                    monitor_kwargs['httpBodyEncoding'] = 'json'
-                elif body_encoding == 'xml':
-                    monitor_kwargs['httpBodyEncoding'] = 'xml'
-            elif 'httpBodyEncoding' in existing_monitor:
-                monitor_kwargs['httpBodyEncoding'] = existing_monitor['httpBodyEncoding']
-            
-            # Keyword
-            if 'keyword' in input_data:
-                monitor_kwargs['keyword'] = input_data['keyword']
-            elif 'keyword' in existing_monitor:
-                monitor_kwargs['keyword'] = existing_monitor['keyword']
-            
-            # Max redirects
-            if 'maxredirects' in input_data:
-                monitor_kwargs['maxredirects'] = input_data['maxredirects']
-            elif 'maxredirects' in existing_monitor:
-                monitor_kwargs['maxredirects'] = existing_monitor['maxredirects']
-            
-            # Accepted status codes (not expectedStatusCode - that parameter doesn't exist)
-            if 'acceptedStatusCodes' in input_data:
-                monitor_kwargs['accepted_statuscodes'] = input_data['acceptedStatusCodes']
-            elif 'accepted_statuscodes' in existing_monitor:
-                monitor_kwargs['accepted_statuscodes'] = existing_monitor['accepted_statuscodes']
-            
-            # Headers - should be string
-            if 'headers' in input_data:
-                headers = input_data['headers']
-                if isinstance(headers, list):
-                    header_lines = []
-                    for h in headers:
-                        if isinstance(h, dict):
-                            header_lines.append(f"{h.get('key', '')}: {h.get('value', '')}")
-                        else:
-                            header_lines.append(str(h))
-                    monitor_kwargs['headers'] = '\n'.join(header_lines)
+            with timer.phase('operation'):
+                if items is None:
+                    output = single_result(run_sharded([input_data], 1))
                 else:
-                    monitor_kwargs['headers'] = str(headers)
-            elif 'headers' in existing_monitor and existing_monitor['headers']:
-                monitor_kwargs['headers'] = existing_monitor['headers']
-            
-            # Notification ID List
-            if 'notificationIDList' in input_data:
-                monitor_kwargs['notificationIDList'] = input_data['notificationIDList']
-            elif 'notificationIDList' in existing_monitor:
-                monitor_kwargs['notificationIDList'] = existing_monitor['notificationIDList']
-            
-            # Auth method - convert to AuthMethod enum
-            if 'authMethod' in input_data:
-                auth_str = input_data.get('authMethod', 'none').lower()
-                auth_map = {
-                    'none': AuthMethod.NONE,
-                    'basic': AuthMethod.HTTP_BASIC,
-                    'ntlm': AuthMethod.NTLM,
-                }
-                monitor_kwargs['authMethod'] = auth_map.get(auth_str, AuthMethod.NONE)
-            elif 'authMethod' in existing_monitor:
-                monitor_kwargs['authMethod'] = existing_monitor['authMethod']
-            
-            # Update monitor - id is first positional parameter, not keyword
-            result = api.edit_monitor(monitor_id, **monitor_kwargs)
-            
-            # Output success result
-            output = {
-                'success': True,
-                'monitorID': monitor_id,
-                'message': result.get('msg', 'Monitor updated successfully') if isinstance(result, dict) else 'Monitor updated successfully'
-            }
-            print(json.dumps(output))
+                    output = run_sharded([items[i] for i in pending], concurrency)
+                    if rejected:
+                        output = merge_rejected(output, rejected, pending)
+            print(timer.emit(output))
+            return
+        
+        # Connect to Uptime Kuma
+        # Note: API keys are for REST endpoints only, not Socket.io
+        # login_by_token() requires a JWT token from a previous login session
+        api, session = open_session('update_monitor', timeout=10, max_login_retries=1, timer=timer)
+        with api:
+            with timer.phase('operation'):
+                output = execute(api, input_data, plan)
+            output.update(session)
+            print(timer.emit(output))
             
     except Exception as e:
         # Output error result with more details for debugging
@@ -194,8 +220,10 @@ def main():
             'error': str(e),
             'traceback': traceback.format_exc()
         }
-        print(json.dumps(error_output))
+        if isinstance(e, MonitorInputError):
+            error_output['fieldErrors'] = e.errors
+        print(timer.emit(error_output))
         sys.exit(1)
 
 if __name__ == '__main__':
-    main()
+    run_main('update_monitor', main)
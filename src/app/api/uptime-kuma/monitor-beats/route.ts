@@ -1,14 +1,42 @@
 import { NextRequest, NextResponse } from 'next/server';
-import { executePythonScript } from '@/lib/uptime-kuma-python';
+import { executePythonScript, streamPythonScript } from '@/lib/uptime-kuma-python';
 
 /**
  * GET /api/uptime-kuma/monitor-beats?id=X&hours=Y - Get monitor beats (heartbeat history)
+ * GET /api/uptime-kuma/monitor-beats?ids=1,2,3&hours=Y (or ids=all) - Get beats for several
+ * monitors over one Python session, grouped by monitor ID
+ * Add stream=1 to either form to get NDJSON (one beat per line, then a summary line
+ * with "done": true) that the client can render before the last beat arrives
+ * Add format=columnar to get "columnar" ("columnarByMonitor") documents with one array
+ * per field instead of beat objects; decode them with decodeColumnarPayload()
+ * Add aggregate=1 (optionally buckets=N) to get summary statistics instead of beats:
+ * "aggregate" ("aggregatesByMonitor") with uptime, ping percentiles, incidents and a
+ * series downsampled to N buckets (see scripts/uptime-kuma/beat_aggregates.py)
+ * Add live=1 (with id or ids, optionally since=<last beat time>) to get new beats as NDJSON
+ * as Uptime Kuma pushes them, for up to LIVE_MAX_SECONDS; the client reconnects with the
+ * time of the last beat it got as "since" and nothing is missed
  */
 export async function GET(request: NextRequest) {
   try {
     const { searchParams } = new URL(request.url);
     const monitorId = searchParams.get('id');
+    const monitorIds = searchParams.get('ids');
     const hours = searchParams.get('hours') || '1';
+    const format = searchParams.get('format') === 'columnar' ? 'columnar' : undefined;
+    const aggregate = getAggregate(searchParams);
+
+    if (searchParams.get('live') === '1') {
+      return liveMonitorBeats(request, monitorId, monitorIds, searchParams.get('since'));
+    }
+
+    // An aggregate is one small document, so it is never streamed
+    if (searchParams.get('stream') === '1' && !aggregate) {
+      return streamMonitorBeats(request, monitorId, monitorIds, parseInt(hours));
+    }
+
+    if (monitorIds) {
+      return getMultiMonitorBeats(monitorIds, parseInt(hours), format, aggregate);
+    }
 
     if (!monitorId) {
       return NextResponse.json(
@@ -21,6 +49,8 @@ export async function GET(request: NextRequest) {
     const scriptData = {
       id: parseInt(monitorId),
       hours: parseInt(hours),
+      format,
+      aggregate,
     };
 
     console.log(`[monitor-beats] Executing Python script for monitor ${monitorId}, hours: ${hours}`);
@@ -33,6 +63,19 @@ export async function GET(request: NextRequest) {
     console.log(`[monitor-beats] Python script completed for monitor ${monitorId} in ${duration}ms`);
 
     if (result.success) {
+      if (result.aggregate) {
+        return NextResponse.json({
+          success: true,
+          aggregate: result.aggregate,
+        });
+      }
+      if (result.columnar) {
+        return NextResponse.json({
+          success: true,
+          format: 'columnar',
+          columnar: result.columnar,
+        });
+      }
       return NextResponse.json({
         success: true,
         beats: result.beats || [],
@@ -58,5 +101,176 @@ export async function GET(request: NextRequest) {
   }
 }
 
+/**
+ * The "aggregate" script input for aggregate=1 (with an optional buckets=N), or undefined for raw beats
+ */
+function getAggregate(searchParams: URLSearchParams): true | { buckets: number } | undefined {
+  if (searchParams.get('aggregate') !== '1') {
+    return undefined;
+  }
+  const buckets = parseInt(searchParams.get('buckets') || '');
+  return isNaN(buckets) ? true : { buckets };
+}
+
+/**
+ * Fetch beats for several monitors (comma-separated IDs or "all") in one script run
+ */
+async function getMultiMonitorBeats(
+  monitorIds: string,
+  hours: number,
+  format?: 'columnar',
+  aggregate?: true | { buckets: number }
+) {
+  const ids = monitorIds === 'all'
+    ? 'all'
+    : monitorIds.split(',').map(id => parseInt(id.trim())).filter(id => !isNaN(id));
+
+  if (ids !== 'all' && ids.length === 0) {
+    return NextResponse.json(
+      { success: false, error: 'At least one valid monitor ID is required' },
+      { status: 400 }
+    );
+  }
+
+  console.log(`[monitor-beats] Executing Python script for monitors ${monitorIds}, hours: ${hours}`);
+  const startTime = Date.now();
+
+  const result = await executePythonScript('get_monitor_beats', { ids, hours, format, aggregate });
+
+  const duration = Date.now() - startTime;
+  console.log(`[monitor-beats] Python script completed for monitors ${monitorIds} in ${duration}ms`);
+
+  if (result.success) {
+    if (result.aggregatesByMonitor) {
+      return NextResponse.json({
+        success: true,
+        aggregatesByMonitor: result.aggregatesByMonitor,
+        errors: result.errors || {},
+      });
+    }
+    if (result.columnarByMonitor) {
+      return NextResponse.json({
+        success: true,
+        format: 'columnar',
+        columnarByMonitor: result.columnarByMonitor,
+        errors: result.errors || {},
+      });
+    }
+    return NextResponse.json({
+      success: true,
+      beatsByMonitor: result.beatsByMonitor || {},
+      errors: result.errors || {},
+    });
+  }
+  return NextResponse.json(
+    {
+      success: false,
+      error: result.error || 'Failed to fetch monitor beats',
+    },
+    { status: 500 }
+  );
+}
+
+const LIVE_MAX_SECONDS = 300;
 
+/**
+ * Stream live beats as NDJSON from subscribe_beats.py, which stays connected to
+ * Uptime Kuma and forwards its heartbeat pushes instead of polling
+ */
+function liveMonitorBeats(
+  request: NextRequest,
+  monitorId: string | null,
+  monitorIds: string | null,
+  since: string | null
+) {
+  const ids = monitorIds === 'all' || (!monitorIds && !monitorId)
+    ? 'all'
+    : (monitorIds || monitorId as string).split(',').map(id => parseInt(id.trim())).filter(id => !isNaN(id));
+
+  const scriptData = { ids, since: since || undefined, maxSeconds: LIVE_MAX_SECONDS };
+  const encoder = new TextEncoder();
+  const abort = new AbortController();
+  request.signal.addEventListener('abort', () => abort.abort(), { once: true });
 
+  const body = new ReadableStream({
+    start(controller) {
+      const enqueue = (line: string) => {
+        if (!abort.signal.aborted) controller.enqueue(encoder.encode(line + '\n'));
+      };
+      streamPythonScript('subscribe_beats', scriptData, enqueue, (LIVE_MAX_SECONDS + 60) * 1000, abort.signal)
+        .then((summary) => enqueue(JSON.stringify(summary)))
+        .catch((error) => enqueue(JSON.stringify({
+          done: true,
+          success: false,
+          error: error instanceof Error ? error.message : 'Unknown error',
+        })))
+        .finally(() => {
+          if (!abort.signal.aborted) controller.close();
+        });
+    },
+    cancel() {
+      abort.abort();
+    },
+  });
+
+  return new Response(body, {
+    headers: {
+      'Content-Type': 'application/x-ndjson',
+      'Cache-Control': 'no-cache',
+    },
+  });
+}
+
+/**
+ * Stream beats as NDJSON straight from the Python script's output
+ */
+function streamMonitorBeats(
+  request: NextRequest,
+  monitorId: string | null,
+  monitorIds: string | null,
+  hours: number
+) {
+  if (!monitorId && !monitorIds) {
+    return NextResponse.json(
+      { success: false, error: 'Monitor ID is required' },
+      { status: 400 }
+    );
+  }
+
+  const scriptData = monitorIds
+    ? { ids: monitorIds === 'all' ? 'all' : monitorIds.split(',').map(id => parseInt(id.trim())).filter(id => !isNaN(id)), hours }
+    : { id: parseInt(monitorId as string), hours };
+
+  const encoder = new TextEncoder();
+  // A disconnected client stops the script; nothing is written to the closed stream after that
+  const abort = new AbortController();
+  request.signal.addEventListener('abort', () => abort.abort(), { once: true });
+
+  const body = new ReadableStream({
+    start(controller) {
+      const enqueue = (line: string) => {
+        if (!abort.signal.aborted) controller.enqueue(encoder.encode(line + '\n'));
+      };
+      streamPythonScript('get_monitor_beats', scriptData, enqueue, undefined, abort.signal)
+        .then((summary) => enqueue(JSON.stringify(summary)))
+        .catch((error) => enqueue(JSON.stringify({
+          done: true,
+          success: false,
+          error: error instanceof Error ? error.message : 'Unknown error',
+        })))
+        .finally(() => {
+          if (!abort.signal.aborted) controller.close();
+        });
+    },
+    cancel() {
+      abort.abort();
+    },
+  });
+
+  return new Response(body, {
+    headers: {
+      'Content-Type': 'application/x-ndjson',
+      'Cache-Control': 'no-cache',
+    },
+  });
+}
@@ -38,6 +38,8 @@ export function SyncDialog({ onSync, children }: SyncDialogProps) {
         success: false,
         message: error instanceof Error ? error.message : "Failed to sync domains",
         addedMonitors: [],
+        updatedMonitors: [],
+        removedMonitors: [],
         skippedMonitors: [],
         errors: [error instanceof Error ? error.message : "Unknown error"],
       });
@@ -138,6 +140,42 @@ export function SyncDialog({ onSync, children }: SyncDialogProps) {
                 </div>
               )}
 
+              {/* Updated Monitors */}
+              {result.updatedMonitors.length > 0 && (
+                <div className="space-y-2">
+                  <div className="flex items-center gap-2 text-sm font-medium">
+                    <RefreshCw className="h-4 w-4 text-blue-600 dark:text-blue-400" />
+                    <span>Updated Monitors ({result.updatedMonitors.length})</span>
+                  </div>
+                  <ul className="space-y-1 ml-6 text-sm text-muted-foreground">
+                    {result.updatedMonitors.map((domain, index) => (
+                      <li key={index} className="flex items-center gap-2">
+                        <span className="h-1.5 w-1.5 rounded-full bg-blue-500" />
+                        {domain}
+                      </li>
+                    ))}
+                  </ul>
+                </div>
+              )}
+
+              {/* Removed Monitors */}
+              {result.removedMonitors.length > 0 && (
+                <div className="space-y-2">
+                  <div className="flex items-center gap-2 text-sm font-medium">
+                    <XCircle className="h-4 w-4 text-muted-foreground" />
+                    <span>Removed Monitors ({result.removedMonitors.length})</span>
+                  </div>
+                  <ul className="space-y-1 ml-6 text-sm text-muted-foreground">
+                    {result.removedMonitors.map((domain, index) => (
+                      <li key={index} className="flex items-center gap-2">
+                        <span className="h-1.5 w-1.5 rounded-full bg-muted-foreground" />
+                        {domain}
+                      </li>
+                    ))}
+                  </ul>
+                </div>
+              )}
+
               {/* Skipped Monitors */}
               {result.skippedMonitors.length > 0 && (
                 <div className="space-y-2">
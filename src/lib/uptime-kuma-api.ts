@@ -63,6 +63,217 @@ export interface MonitorBeat {
   down_count: number; // Count of consecutive down events
 }
 
+/**
+ * Columnar beats document from get_monitor_beats.py "format": "columnar"
+ * (schema documented in scripts/uptime-kuma/beat_wire.py)
+ */
+export interface ColumnarBeats {
+  version: number;
+  count: number;
+  fields: string[];
+  encodings: Record<string, 'delta' | 'delta-ms' | 'dict' | 'bool'>;
+  msgDict: string[];
+  columns: Record<string, any[]>;
+  missing?: Record<string, number[]>;
+}
+
+/**
+ * Summary statistics for one monitor's beats from get_monitor_beats.py "aggregate"
+ * (computed in scripts/uptime-kuma/beat_aggregates.py); times are unix seconds
+ */
+export interface MonitorBeatAggregate {
+  windowStart: number;
+  windowEnd: number;
+  beats: number;
+  up: number;
+  down: number;
+  pending: number;
+  maintenance: number;
+  uptimePercent: number | null;
+  ping: {
+    count: number;
+    avg: number | null;
+    min: number | null;
+    max: number | null;
+    p50: number | null;
+    p95: number | null;
+    p99: number | null;
+  };
+  incidents: number;
+  downtimeSeconds: number;
+  ongoingIncident: boolean;
+  series: {
+    bucketSeconds: number;
+    start: number[];
+    up: number[];
+    down: number[];
+    pending: number[];
+    avgPing: (number | null)[];
+    maxPing: (number | null)[];
+  };
+}
+
+/**
+ * Decode a columnar beats document back into one object per beat
+ */
+export function decodeColumnarBeats(doc: ColumnarBeats): any[] {
+  if (doc.version !== 1) {
+    throw new Error(`Unsupported columnar beats version: ${doc.version}`);
+  }
+
+  const decoded: Record<string, any[]> = {};
+  for (const field of doc.fields) {
+    let values = doc.columns[field];
+    const encoding = doc.encodings[field];
+    if (encoding === 'delta' || encoding === 'delta-ms') {
+      let total = 0;
+      values = values.map((delta: number) => (total += delta));
+      if (encoding === 'delta-ms') {
+        // Back to Uptime Kuma's 'YYYY-MM-DD HH:MM:SS.mmm' (UTC)
+        values = values.map((ms: number) => new Date(ms).toISOString().replace('T', ' ').slice(0, 23));
+      }
+    } else if (encoding === 'dict') {
+      values = values.map((index: number | null) => (index === null ? null : doc.msgDict[index]));
+    } else if (encoding === 'bool') {
+      values = values.map((value: number | null) => (value === null ? null : Boolean(value)));
+    }
+    decoded[field] = values;
+  }
+
+  const missing: Record<string, Set<number>> = {};
+  for (const [field, rows] of Object.entries(doc.missing || {})) {
+    missing[field] = new Set(rows);
+  }
+
+  const beats: any[] = [];
+  for (let row = 0; row < doc.count; row++) {
+    const beat: Record<string, any> = {};
+    for (const field of doc.fields) {
+      if (!missing[field]?.has(row)) {
+        beat[field] = decoded[field][row];
+      }
+    }
+    beats.push(beat);
+  }
+  return beats;
+}
+
+/**
+ * A columnar beats document packed by beat_wire.encode_output() with "encoding"
+ * and/or "compression": base64 of the JSON or MessagePack bytes, optionally compressed
+ */
+export interface ColumnarBeatsPayload {
+  encoding: 'json' | 'msgpack';
+  compression: 'gzip' | 'zlib' | null;
+  payload: string;
+}
+
+/**
+ * Decode a columnar beats value in either form get_monitor_beats.py returns:
+ * the plain document, or a packed payload (see ColumnarBeatsPayload)
+ */
+export async function decodeColumnarPayload(value: ColumnarBeats | ColumnarBeatsPayload): Promise<any[]> {
+  if (!('payload' in value)) {
+    return decodeColumnarBeats(value);
+  }
+
+  let bytes = Uint8Array.from(atob(value.payload), (char) => char.charCodeAt(0));
+  if (value.compression === 'gzip' || value.compression === 'zlib') {
+    // zlib's format is what DecompressionStream calls 'deflate'
+    const format = value.compression === 'gzip' ? 'gzip' : 'deflate';
+    const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream(format));
+    bytes = new Uint8Array(await new Response(stream).arrayBuffer());
+  } else if (value.compression) {
+    throw new Error(`Unsupported columnar beats compression: ${value.compression}`);
+  }
+
+  if (value.encoding === 'msgpack') {
+    return decodeColumnarBeats(decodeMsgpack(bytes));
+  }
+  if ((value.encoding || 'json') !== 'json') {
+    throw new Error(`Unsupported columnar beats encoding: ${value.encoding}`);
+  }
+  return decodeColumnarBeats(JSON.parse(new TextDecoder().decode(bytes)));
+}
+
+/**
+ * Minimal MessagePack decoder for the types msgpack.packb() writes for a
+ * columnar document (nil, booleans, integers, floats, strings, binary, arrays, maps)
+ */
+function decodeMsgpack(bytes: Uint8Array): any {
+  const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+  const text = new TextDecoder();
+  let offset = 0;
+
+  const take = (length: number) => {
+    const slice = bytes.subarray(offset, offset + length);
+    offset += length;
+    return slice;
+  };
+  const uint = (size: 1 | 2 | 4 | 8) => {
+    const value = size === 1 ? view.getUint8(offset)
+      : size === 2 ? view.getUint16(offset)
+      : size === 4 ? view.getUint32(offset)
+      : Number(view.getBigUint64(offset));
+    offset += size;
+    return value;
+  };
+  const int = (size: 1 | 2 | 4 | 8) => {
+    const value = size === 1 ? view.getInt8(offset)
+      : size === 2 ? view.getInt16(offset)
+      : size === 4 ? view.getInt32(offset)
+      : Number(view.getBigInt64(offset));
+    offset += size;
+    return value;
+  };
+  const array = (length: number): any[] => Array.from({ length }, () => read());
+  const map = (length: number) => {
+    const result: Record<string, any> = {};
+    for (let i = 0; i < length; i++) {
+      const key = read();
+      result[key] = read();
+    }
+    return result;
+  };
+
+  const read = (): any => {
+    const type = uint(1);
+    if (type <= 0x7f) return type;
+    if (type >= 0xe0) return type - 0x100;
+    if ((type & 0xf0) === 0x80) return map(type & 0x0f);
+    if ((type & 0xf0) === 0x90) return array(type & 0x0f);
+    if ((type & 0xe0) === 0xa0) return text.decode(take(type & 0x1f));
+    switch (type) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: return take(uint(1));
+      case 0xc5: return take(uint(2));
+      case 0xc6: return take(uint(4));
+      case 0xca: { const value = view.getFloat32(offset); offset += 4; return value; }
+      case 0xcb: { const value = view.getFloat64(offset); offset += 8; return value; }
+      case 0xcc: return uint(1);
+      case 0xcd: return uint(2);
+      case 0xce: return uint(4);
+      case 0xcf: return uint(8);
+      case 0xd0: return int(1);
+      case 0xd1: return int(2);
+      case 0xd2: return int(4);
+      case 0xd3: return int(8);
+      case 0xd9: return text.decode(take(uint(1)));
+      case 0xda: return text.decode(take(uint(2)));
+      case 0xdb: return text.decode(take(uint(4)));
+      case 0xdc: return array(uint(2));
+      case 0xdd: return array(uint(4));
+      case 0xde: return map(uint(2));
+      case 0xdf: return map(uint(4));
+      default: throw new Error(`Unsupported MessagePack type 0x${type.toString(16)}`);
+    }
+  };
+
+  return read();
+}
+
 async function handleApiResponse<T>(response: Response): Promise<T> {
   if (!response.ok) {
     let message = `HTTP ${response.status}`;
@@ -404,9 +615,14 @@ export async function deleteMonitor(id: number): Promise<void> {
  * Uses Python script to fetch data via Socket.io
  * @param monitorId Monitor ID
  * @param hours Number of hours of history to fetch (default: 1 for last hour)
+ * @param columnar Fetch the columnar format (one array per field), which parses faster for long windows
  * @returns Array of MonitorBeat objects
  */
-export async function getMonitorBeats(monitorId: number, hours: number = 1): Promise<MonitorBeat[]> {
+export async function getMonitorBeats(
+  monitorId: number,
+  hours: number = 1,
+  columnar: boolean = false
+): Promise<MonitorBeat[]> {
   try {
     // Create an AbortController for timeout
     // Python script has 60s timeout, so we need at least 65s to allow for processing overhead
@@ -421,7 +637,8 @@ export async function getMonitorBeats(monitorId: number, hours: number = 1): Pro
       console.log(`[getMonitorBeats] Fetching beats for monitor ${monitorId} (${hours} hour(s))`);
       const startTime = Date.now();
       
-      const response = await fetch(`${getApiBase()}/monitor-beats?id=${monitorId}&hours=${hours}`, {
+      const format = columnar ? '&format=columnar' : '';
+      const response = await fetch(`${getApiBase()}/monitor-beats?id=${monitorId}&hours=${hours}${format}`, {
         method: 'GET',
         headers: {
           'Content-Type': 'application/json',
@@ -446,6 +663,9 @@ export async function getMonitorBeats(monitorId: number, hours: number = 1): Pro
         console.error(`[getMonitorBeats] Script returned error for monitor ${monitorId}:`, errorMsg);
         throw new Error(errorMsg);
       }
+      if (result.columnar) {
+        result.beats = await decodeColumnarPayload(result.columnar);
+      }
       
       console.log(`[getMonitorBeats] Successfully fetched ${result.beats?.length || 0} beats for monitor ${monitorId}`);
     } catch (fetchError: any) {
@@ -499,4 +719,32 @@ export async function getMonitorBeats(monitorId: number, hours: number = 1): Pro
   }
 }
 
+/**
+ * Get summary statistics (uptime, ping percentiles, incidents and a downsampled
+ * series) for a monitor instead of its raw beats
+ * @param monitorId Monitor ID
+ * @param hours Number of hours of history to summarize
+ * @param buckets Number of buckets in the downsampled series (the script's default when omitted)
+ */
+export async function getMonitorBeatAggregate(
+  monitorId: number,
+  hours: number = 24,
+  buckets?: number
+): Promise<MonitorBeatAggregate> {
+  const params = new URLSearchParams({ id: String(monitorId), hours: String(hours), aggregate: '1' });
+  if (buckets !== undefined) {
+    params.set('buckets', String(buckets));
+  }
+  const response = await fetch(`${getApiBase()}/monitor-beats?${params}`, {
+    method: 'GET',
+    headers: {
+      'Content-Type': 'application/json',
+    },
+  });
 
+  const result = await response.json().catch(() => ({ error: response.statusText }));
+  if (!response.ok || result.success === false) {
+    throw new Error(result.error || `Failed to get monitor beat aggregate: ${response.statusText}`);
+  }
+  return result.aggregate;
+}
@@ -5,7 +5,7 @@
  * Uptime Kuma via the uptime-kuma-api wrapper.
  */
 
-import { spawn } from 'child_process';
+import { spawn, ChildProcessWithoutNullStreams } from 'child_process';
 import { join } from 'path';
 
 // Explicitly load environment variables from .env.local if not already loaded
@@ -46,6 +46,11 @@ import { promisify } from 'util';
 
 const SCRIPT_TIMEOUT = 60000; // 60 seconds - Python scripts can be slow when connecting to Uptime Kuma
 const PYTHON_SCRIPT_DIR = join(process.cwd(), 'scripts', 'uptime-kuma');
+// stderr kept for error messages; a chatty or long-running script keeps only its last output
+const MAX_STDERR_CHARS = 64 * 1024;
+// Keep one long-running kuma_worker.py session instead of spawning a process per call
+const USE_PYTHON_WORKER = process.env.UPTIME_KUMA_PYTHON_WORKER === 'true';
+const WORKER_OPERATIONS = new Set(['add_monitor', 'update_monitor', 'delete_monitor', 'get_monitor_beats', 'list_monitors', 'reconcile_monitors']);
 
 export interface PythonScriptResult {
   success: boolean;
@@ -128,17 +133,170 @@ async function getPythonCommand(): Promise<string> {
   });
 }
 
+/**
+ * Append a script's stderr output, keeping only the last MAX_STDERR_CHARS characters
+ */
+function appendStderr(stderr: string, text: string): string {
+  const combined = stderr + text;
+  return combined.length > MAX_STDERR_CHARS ? combined.slice(-MAX_STDERR_CHARS) : combined;
+}
+
+/**
+ * Builds the environment for Python script processes
+ */
+function getPythonEnv(): NodeJS.ProcessEnv {
+  // Ensure Uptime Kuma environment variables are explicitly passed
+  // Also ensure PYTHONPATH includes the .python-packages directory (for Render deployment)
+  const pythonPackagesPath = join(process.cwd(), '.python-packages');
+  const existingPythonPath = process.env.PYTHONPATH || '';
+  const pythonPath = existingPythonPath 
+    ? `${pythonPackagesPath}:${existingPythonPath}`
+    : pythonPackagesPath;
+  
+  return {
+    ...process.env,
+    // Set PYTHONPATH to include project packages directory
+    PYTHONPATH: pythonPath,
+    // Explicitly pass Uptime Kuma credentials to ensure they're available
+    UPTIME_KUMA_API_URL: process.env.UPTIME_KUMA_API_URL || 'http://localhost:3003',
+    UPTIME_KUMA_USERNAME: process.env.UPTIME_KUMA_USERNAME || 'admin',
+    UPTIME_KUMA_PASSWORD: process.env.UPTIME_KUMA_PASSWORD || 'admin123',
+    UPTIME_KUMA_API_KEY: process.env.UPTIME_KUMA_API_KEY || '',
+  };
+}
+
+interface PendingWorkerRequest {
+  scriptName: string;
+  resolve: (result: PythonScriptResult) => void;
+  reject: (error: Error) => void;
+  timeout: NodeJS.Timeout;
+  startTime: number;
+}
+
+let workerProcess: ChildProcessWithoutNullStreams | null = null;
+let workerRequestCounter = 0;
+const pendingWorkerRequests = new Map<string, PendingWorkerRequest>();
+
+/**
+ * Starts (or returns) the persistent kuma_worker.py process.
+ * The worker keeps one authenticated Uptime Kuma session open and answers
+ * newline-delimited JSON requests, so each call skips Python startup and login.
+ */
+async function getWorkerProcess(): Promise<ChildProcessWithoutNullStreams> {
+  if (workerProcess && workerProcess.exitCode === null && !workerProcess.killed) {
+    return workerProcess;
+  }
+
+  const pythonCmd = await getPythonCommand();
+  const scriptPath = join(PYTHON_SCRIPT_DIR, 'kuma_worker.py');
+  console.log(`[executePythonScript] Starting persistent worker: ${pythonCmd} ${scriptPath}`);
+
+  const child = spawn(pythonCmd, [scriptPath], { env: getPythonEnv() });
+  workerProcess = child;
+
+  let buffered = '';
+  child.stdout.on('data', (chunk: Buffer) => {
+    buffered += chunk.toString();
+    let newlineIndex = buffered.indexOf('\n');
+    while (newlineIndex !== -1) {
+      const line = buffered.slice(0, newlineIndex).trim();
+      buffered = buffered.slice(newlineIndex + 1);
+      newlineIndex = buffered.indexOf('\n');
+      if (!line) continue;
+
+      let response: PythonScriptResult & { requestId?: string };
+      try {
+        response = JSON.parse(line);
+      } catch {
+        console.error(`[executePythonScript] Worker sent non-JSON output: ${line.substring(0, 500)}`);
+        continue;
+      }
+
+      const requestId = response.requestId;
+      const pending = requestId ? pendingWorkerRequests.get(requestId) : undefined;
+      if (!requestId || !pending) {
+        console.warn(`[executePythonScript] Worker response for unknown request: ${line.substring(0, 200)}`);
+        continue;
+      }
+
+      pendingWorkerRequests.delete(requestId);
+      clearTimeout(pending.timeout);
+      delete response.requestId;
+      const duration = Date.now() - pending.startTime;
+      if (response.success === false && response.traceback) {
+        console.error(`[executePythonScript] Python traceback for ${pending.scriptName}:`, response.traceback);
+      }
+      console.log(`[executePythonScript] ${pending.scriptName} completed via worker in ${duration}ms`);
+      pending.resolve(response);
+    }
+  });
+
+  child.stderr.on('data', (data: Buffer) => {
+    console.log(`[executePythonScript] Python worker stderr: ${data.toString().trim()}`);
+  });
+
+  const failPending = (reason: string) => {
+    if (workerProcess === child) {
+      workerProcess = null;
+    }
+    for (const [requestId, pending] of pendingWorkerRequests) {
+      clearTimeout(pending.timeout);
+      pending.reject(new Error(reason));
+      pendingWorkerRequests.delete(requestId);
+    }
+  };
+
+  child.on('close', (code) => {
+    console.error(`[executePythonScript] Python worker exited with code ${code}`);
+    failPending(`Python worker exited with code ${code}`);
+  });
+
+  child.on('error', (error) => {
+    failPending(`Failed to execute Python worker: ${error.message}`);
+  });
+
+  return child;
+}
+
+/**
+ * Sends one request to the persistent worker and resolves with the same
+ * JSON shape the one-shot script would print
+ */
+async function executeViaWorker(scriptName: string, data: any, timeoutMs: number): Promise<PythonScriptResult> {
+  const child = await getWorkerProcess();
+  const requestId = `${process.pid}-${++workerRequestCounter}`;
+
+  return new Promise((resolve, reject) => {
+    const startTime = Date.now();
+    const timeout = setTimeout(() => {
+      pendingWorkerRequests.delete(requestId);
+      console.error(`[executePythonScript] Worker timeout after ${Date.now() - startTime}ms for ${scriptName}`);
+      reject(new Error(`Python script execution timeout after ${timeoutMs}ms`));
+    }, timeoutMs);
+
+    pendingWorkerRequests.set(requestId, { scriptName, resolve, reject, timeout, startTime });
+    child.stdin.write(JSON.stringify({ requestId, op: scriptName, payload: data }) + '\n');
+  });
+}
+
 /**
  * Executes a Python script with JSON input/output
  * 
  * @param scriptName Name of the Python script (without .py extension)
  * @param data JSON data to pass to the script via stdin
+ * @param timeoutMs How long to wait for the script (batches may need longer than the default)
  * @returns Promise resolving to the script's JSON output
  */
 export async function executePythonScript(
   scriptName: string,
-  data: any
+  data: any,
+  timeoutMs: number = SCRIPT_TIMEOUT
 ): Promise<PythonScriptResult> {
+  // Route through the persistent worker when enabled (UPTIME_KUMA_PYTHON_WORKER=true)
+  if (USE_PYTHON_WORKER && WORKER_OPERATIONS.has(scriptName)) {
+    return executeViaWorker(scriptName, data, timeoutMs);
+  }
+
   // Validate Python environment
   const hasPython = await validatePythonEnvironment();
   if (!hasPython) {
@@ -158,24 +316,7 @@ export async function executePythonScript(
     // Spawn Python process
     console.log(`[executePythonScript] Spawning Python process: ${pythonCmd} ${scriptPath}`);
     
-    // Ensure Uptime Kuma environment variables are explicitly passed
-    // Also ensure PYTHONPATH includes the .python-packages directory (for Render deployment)
-    const pythonPackagesPath = join(process.cwd(), '.python-packages');
-    const existingPythonPath = process.env.PYTHONPATH || '';
-    const pythonPath = existingPythonPath 
-      ? `${pythonPackagesPath}:${existingPythonPath}`
-      : pythonPackagesPath;
-    
-    const env = {
-      ...process.env,
-      // Set PYTHONPATH to include project packages directory
-      PYTHONPATH: pythonPath,
-      // Explicitly pass Uptime Kuma credentials to ensure they're available
-      UPTIME_KUMA_API_URL: process.env.UPTIME_KUMA_API_URL || 'http://localhost:3003',
-      UPTIME_KUMA_USERNAME: process.env.UPTIME_KUMA_USERNAME || 'admin',
-      UPTIME_KUMA_PASSWORD: process.env.UPTIME_KUMA_PASSWORD || 'admin123',
-      UPTIME_KUMA_API_KEY: process.env.UPTIME_KUMA_API_KEY || '',
-    };
+    const env = getPythonEnv();
     
     // Log environment variables (mask password for security)
     const passwordLength = env.UPTIME_KUMA_PASSWORD ? env.UPTIME_KUMA_PASSWORD.length : 0;
@@ -193,6 +334,8 @@ export async function executePythonScript(
       has_UPTIME_KUMA_API_KEY: !!process.env.UPTIME_KUMA_API_KEY,
     });
     
+    // Lets the script report its interpreter start-up time (timings.interpreterStartMs)
+    env.UPTIME_KUMA_SPAWNED_AT = String(Date.now());
     const pythonProcess = spawn(pythonCmd, [scriptPath], {
       shell: true,
       env,
@@ -208,8 +351,8 @@ export async function executePythonScript(
       const duration = Date.now() - startTime;
       console.error(`[executePythonScript] Timeout after ${duration}ms for ${scriptName}`);
       pythonProcess.kill();
-      reject(new Error(`Python script execution timeout after ${SCRIPT_TIMEOUT}ms`));
-    }, SCRIPT_TIMEOUT);
+      reject(new Error(`Python script execution timeout after ${timeoutMs}ms`));
+    }, timeoutMs);
 
     // Send JSON data to stdin
     pythonProcess.stdin.write(JSON.stringify(data));
@@ -223,7 +366,7 @@ export async function executePythonScript(
     // Collect stderr (includes debug output from Python scripts)
     pythonProcess.stderr.on('data', (data: Buffer) => {
       const stderrText = data.toString();
-      stderr += stderrText;
+      stderr = appendStderr(stderr, stderrText);
       // Log Python debug output to console
       console.log(`[executePythonScript] Python stderr: ${stderrText.trim()}`);
     });
@@ -256,6 +399,9 @@ export async function executePythonScript(
       try {
         const result = JSON.parse(stdout.trim());
         console.log(`[executePythonScript] ${scriptName} completed successfully in ${duration}ms`);
+        if (result.timings) {
+          console.log(`[executePythonScript] ${scriptName} timings:`, JSON.stringify(result.timings));
+        }
         resolve(result);
       } catch (parseError) {
         console.error(`[executePythonScript] Failed to parse output for ${scriptName} after ${duration}ms. stdout: ${stdout.substring(0, 500)}, stderr: ${stderr.substring(0, 500)}`);
@@ -271,3 +417,102 @@ export async function executePythonScript(
   });
 }
 
+/**
+ * Executes a Python script in NDJSON stream mode.
+ * Calls onLine for every output line as soon as it arrives, and resolves
+ * with the final summary line (the one with "done": true).
+ *
+ * @param scriptName Name of the Python script (without .py extension)
+ * @param data JSON data to pass to the script via stdin ("stream": true is added)
+ * @param onLine Called with each raw NDJSON line before the summary
+ * @param signal Aborting it stops the script (SIGTERM), which then writes its summary
+ * @returns Promise resolving to the summary line
+ */
+export async function streamPythonScript(
+  scriptName: string,
+  data: any,
+  onLine: (line: string) => void,
+  timeoutMs: number = SCRIPT_TIMEOUT,
+  signal?: AbortSignal
+): Promise<PythonScriptResult> {
+  const pythonCmd = await getPythonCommand();
+  const scriptPath = join(PYTHON_SCRIPT_DIR, `${scriptName}.py`);
+
+  return new Promise((resolve, reject) => {
+    const startTime = Date.now();
+    let buffered = '';
+    let summary: PythonScriptResult | null = null;
+    let stderr = '';
+
+    const pythonProcess = spawn(pythonCmd, [scriptPath], {
+      env: { ...getPythonEnv(), UPTIME_KUMA_SPAWNED_AT: String(Date.now()) },
+    });
+
+    const timeout = setTimeout(() => {
+      console.error(`[streamPythonScript] Timeout after ${Date.now() - startTime}ms for ${scriptName}`);
+      pythonProcess.kill();
+      reject(new Error(`Python script execution timeout after ${timeoutMs}ms`));
+    }, timeoutMs);
+
+    signal?.addEventListener('abort', () => pythonProcess.kill('SIGTERM'), { once: true });
+
+    const handleLine = (line: string) => {
+      if (!line) return;
+      // Beat lines never contain "done"; only parse lines that might be the summary
+      if (line.includes('"done"')) {
+        try {
+          const parsed = JSON.parse(line);
+          if (parsed.done === true) {
+            summary = parsed;
+            return;
+          }
+        } catch {
+          // Not JSON - pass it through as-is
+        }
+      }
+      onLine(line);
+    };
+
+    pythonProcess.stdout.on('data', (chunk: Buffer) => {
+      buffered += chunk.toString();
+      let newlineIndex = buffered.indexOf('\n');
+      while (newlineIndex !== -1) {
+        handleLine(buffered.slice(0, newlineIndex).trim());
+        buffered = buffered.slice(newlineIndex + 1);
+        newlineIndex = buffered.indexOf('\n');
+      }
+    });
+
+    pythonProcess.stderr.on('data', (chunk: Buffer) => {
+      stderr = appendStderr(stderr, chunk.toString());
+    });
+
+    pythonProcess.on('close', (code) => {
+      clearTimeout(timeout);
+      handleLine(buffered.trim());
+      const duration = Date.now() - startTime;
+      const result = summary as PythonScriptResult | null;
+
+      if (code !== 0 || !result || result.success === false) {
+        const errorMessage = result?.error || stderr.trim() || `exited with code ${code}`;
+        console.error(`[streamPythonScript] ${scriptName} failed after ${duration}ms: ${errorMessage}`);
+        reject(new Error(`Python script exited with code ${code}. ${errorMessage}`));
+        return;
+      }
+
+      console.log(`[streamPythonScript] ${scriptName} streamed ${result.count ?? 0} lines in ${duration}ms`);
+      if (result.timings) {
+        console.log(`[streamPythonScript] ${scriptName} timings:`, JSON.stringify(result.timings));
+      }
+      resolve(result);
+    });
+
+    pythonProcess.on('error', (error) => {
+      clearTimeout(timeout);
+      reject(new Error(`Failed to execute Python script: ${error.message}`));
+    });
+
+    pythonProcess.stdin.write(JSON.stringify({ ...data, stream: true }));
+    pythonProcess.stdin.end();
+  });
+}
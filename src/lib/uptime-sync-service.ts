@@ -11,10 +11,15 @@ export interface SyncResult {
   success: boolean;
   message: string;
   addedMonitors: string[];
+  updatedMonitors: string[];
+  removedMonitors: string[];
   skippedMonitors: string[];
   errors: string[];
 }
 
+// Marks the monitors the sync manages; only those are removed when their domain is retired
+const SYNC_OWNER = 'operating-unit-sync';
+
 /**
  * Fetch all Operating Units from the API
  */
@@ -52,12 +57,47 @@ function extractDomains(operatingUnits: OperatingUnit[]): string[] {
   return Array.from(domains);
 }
 
+// Last monitor list seen by this server process, reused while its version is unchanged
+let cachedMonitorList: { version: string; monitors: UptimeKumaMonitor[] } | null = null;
+
 /**
- * Get existing monitors from Uptime Kuma
+ * Get existing monitors from Uptime Kuma.
+ * Reads the local monitor list snapshot via list_monitors.py, passing the version we
+ * already have so an unchanged list comes back as "not modified" without the monitors.
  */
 async function getExistingMonitors(): Promise<UptimeKumaMonitor[]> {
   try {
     console.log('Fetching monitors from Uptime Kuma...');
+    // Imported lazily so this module stays safe to import from client components
+    const { executePythonScript } = await import('./uptime-kuma-python');
+    const result = await executePythonScript('list_monitors', {
+      ifVersion: cachedMonitorList?.version,
+    });
+    if (!result.success) {
+      throw new Error(result.error || 'Failed to list monitors');
+    }
+
+    if (!result.notModified || !cachedMonitorList) {
+      cachedMonitorList = {
+        version: result.version,
+        monitors: (result.monitors || []).map((monitor: any) => ({
+          id: monitor.id,
+          name: monitor.name,
+          url: monitor.url,
+          type: monitor.type,
+          // The monitor list has no heartbeat status; the sync only needs name and url
+          status: 2,
+        })),
+      };
+    }
+    const monitors = cachedMonitorList.monitors;
+    console.log(`Found ${monitors.length} monitors (${result.notModified ? 'not modified' : result.source}):`, monitors.map(m => `${m.name} (${m.url})`));
+    return monitors;
+  } catch (error) {
+    console.error('Error listing monitors via snapshot, falling back to metrics:', error);
+  }
+
+  try {
     const monitors = await getMonitors();
     console.log(`Found ${monitors.length} monitors:`, monitors.map(m => `${m.name} (${m.url})`));
     return monitors;
@@ -69,29 +109,80 @@ async function getExistingMonitors(): Promise<UptimeKumaMonitor[]> {
 }
 
 /**
- * Create a monitor in Uptime Kuma via Python API wrapper
+ * Desired monitor for a domain (domains are already normalized with an https:// prefix)
  */
-async function createMonitorInUptimeKuma(domain: string): Promise<boolean> {
-  try {
-    // Use the createMonitor function from uptime-kuma-api.ts
-    // which calls the Next.js API route that executes Python scripts
-    const { createMonitor } = await import('./uptime-kuma-api');
-    
-    await createMonitor({
-      name: domain,
-      url: `https://${domain}`,
-      type: 'https',
-      heartbeatInterval: 60,
-      retries: 0,
-      heartbeatRetryInterval: 60,
-      requestTimeout: 48,
-    });
-    
-    return true;
-  } catch (error) {
-    console.error(`Error creating monitor for ${domain}:`, error);
-    return false;
+function desiredMonitor(domain: string) {
+  return {
+    name: domain,
+    url: domain,
+    type: 'https',
+    heartbeatInterval: 60,
+    retries: 0,
+    heartbeatRetryInterval: 60,
+    requestTimeout: 48,
+  };
+}
+
+interface ReconcilePlanEntry {
+  action: 'add' | 'update' | 'delete';
+  key: string;
+  name: string;
+  monitorID?: number;
+  changedFields?: string[];
+}
+
+/**
+ * Reconcile Uptime Kuma with the monitors for the given domains via reconcile_monitors.py.
+ * The current monitors are read once, and only the needed adds, edits and deletes are
+ * applied, all over one session.
+ */
+async function reconcileDomains(domains: string[]): Promise<{
+  added: string[];
+  updated: string[];
+  removed: string[];
+  planned: Set<string>;
+  errors: string[];
+}> {
+  // Imported lazily so this module stays safe to import from client components
+  const { executePythonScript } = await import('./uptime-kuma-python');
+
+  const result = await executePythonScript('reconcile_monitors', {
+    monitors: domains.map(desiredMonitor),
+    owner: SYNC_OWNER,
+    prune: true,
+  }, Math.max(60000, domains.length * 5000));
+  if (!result.success) {
+    throw new Error(result.error || 'Reconcile failed');
+  }
+
+  const plan: ReconcilePlanEntry[] = result.plan || [];
+  const outcome = {
+    added: [] as string[],
+    updated: [] as string[],
+    removed: [] as string[],
+    // Every monitor with a change planned; all other domains were already up to date
+    planned: new Set(plan.map(entry => entry.name)),
+    errors: [] as string[],
+  };
+  const itemResults: Array<{ index: number; success: boolean; error?: string }> = result.results || [];
+  for (const itemResult of itemResults) {
+    const entry = plan[itemResult.index];
+    if (!itemResult.success) {
+      outcome.errors.push(`Error during ${entry.action} of monitor ${entry.name}: ${itemResult.error || 'Unknown error'}`);
+    } else if (entry.action === 'add') {
+      outcome.added.push(entry.name);
+    } else if (entry.action === 'update') {
+      console.log(`Updated ${entry.name}: ${(entry.changedFields || []).join(', ')}`);
+      outcome.updated.push(entry.name);
+    } else {
+      outcome.removed.push(entry.name);
+    }
+  }
+  if (result.batch) {
+    console.log(`Reconcile applied ${result.batch.count} changes in ${result.batch.totalMs}ms (${result.batch.failed} failed)`);
   }
+
+  return outcome;
 }
 
 /**
@@ -102,6 +193,8 @@ export async function syncOperatingUnitDomains(): Promise<SyncResult> {
     success: true,
     message: '',
     addedMonitors: [],
+    updatedMonitors: [],
+    removedMonitors: [],
     skippedMonitors: [],
     errors: []
   };
@@ -119,42 +212,32 @@ export async function syncOperatingUnitDomains(): Promise<SyncResult> {
     const domains = extractDomains(operatingUnits);
     console.log(`Found ${domains.length} unique domains:`, domains);
     
-    // Step 3: Get existing monitors
-    console.log('Fetching existing monitors...');
-    const existingMonitors = await getExistingMonitors();
-    const existingUrls = new Set(existingMonitors.map(m => m.url));
-    console.log(`Found ${existingMonitors.length} existing monitors`);
-    
-    // Step 4: Find domains that need monitoring
-    const domainsToAdd = domains.filter(domain => !existingUrls.has(domain));
-    console.log(`Found ${domainsToAdd.length} domains to add:`, domainsToAdd);
-    
-    // Step 5: Create monitors for new domains
-    for (const domain of domainsToAdd) {
-      try {
-        const success = await createMonitorInUptimeKuma(domain);
-        if (success) {
-          result.addedMonitors.push(domain);
-          console.log(`✅ Added monitor for: ${domain}`);
-        } else {
-          result.errors.push(`Failed to create monitor for: ${domain}`);
-          console.log(`❌ Failed to add monitor for: ${domain}`);
-        }
-      } catch (error) {
-        const errorMsg = `Error creating monitor for ${domain}: ${error instanceof Error ? error.message : 'Unknown error'}`;
-        result.errors.push(errorMsg);
-        console.error(errorMsg);
-      }
+    // Step 3: Reconcile monitors with the domains (adds, config drift and retired domains)
+    console.log('Reconciling monitors...');
+    let reconciled;
+    try {
+      reconciled = await reconcileDomains(domains);
+    } catch (error) {
+      // Nothing was checked, so no domain can be reported as already monitored
+      throw new Error(`Error reconciling monitors: ${error instanceof Error ? error.message : 'Unknown error'}`);
     }
+    const { added, updated, removed, planned, errors } = reconciled;
+    result.addedMonitors.push(...added);
+    result.updatedMonitors.push(...updated);
+    result.removedMonitors.push(...removed);
+    result.errors.push(...errors);
+    added.forEach(domain => console.log(`✅ Added monitor for: ${domain}`));
+    updated.forEach(domain => console.log(`🔄 Updated monitor for: ${domain}`));
+    removed.forEach(domain => console.log(`🗑️ Removed monitor for retired domain: ${domain}`));
+    errors.forEach(errorMsg => console.error(`❌ ${errorMsg}`));
     
-    // Step 6: Report skipped domains (already monitored)
-    const skippedDomains = domains.filter(domain => existingUrls.has(domain));
+    // Step 4: Report skipped domains (already monitored)
+    const skippedDomains = domains.filter(domain => !planned.has(domain));
     result.skippedMonitors = skippedDomains;
     console.log(`Skipped ${skippedDomains.length} already monitored domains:`, skippedDomains);
     
-    // Step 7: Generate summary message
-    const totalProcessed = result.addedMonitors.length + result.skippedMonitors.length + result.errors.length;
-    result.message = `Sync completed. Added: ${result.addedMonitors.length}, Skipped: ${result.skippedMonitors.length}, Errors: ${result.errors.length}`;
+    // Step 5: Generate summary message
+    result.message = `Sync completed. Added: ${result.addedMonitors.length}, Updated: ${result.updatedMonitors.length}, Removed: ${result.removedMonitors.length}, Skipped: ${result.skippedMonitors.length}, Errors: ${result.errors.length}`;
     
     console.log('Sync completed:', result.message);
     